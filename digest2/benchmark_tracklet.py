@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of digest2 scoring time per tracklet.
+
+Scores each tracklet of an observation file on its own with
+classify_tracklet (single thread, repeatable=True) and keeps the best of
+several runs, so per-tracklet costs can be compared without file parsing
+or thread scheduling in the way.  Also reports the cost per distance
+searched, which isolates savings in the per-distance setup.
+
+By default only the current code is timed.  To compare against a
+baseline, pass either --baseline-dir, a digest2 directory of another
+checkout, or --baseline-ref, a git ref that is checked out in a temporary
+worktree as in benchmark_optimizations.py.  Baseline and current runs
+then alternate.
+
+Usage:
+    python benchmark_tracklet.py [--repeats 20] [--rounds 3]
+    python benchmark_tracklet.py --baseline-ref HEAD~1
+    python benchmark_tracklet.py --baseline-dir ../../other-checkout/digest2
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from benchmark_optimizations import build_extension
+
+
+def time_tracklets(digest2_src_dir, obs_file, repeats, classes, label,
+                   obscodes_path=None):
+    """Time each tracklet of obs_file with the digest2 in digest2_src_dir.
+
+    Returns a list of (designation, best_us, distances_tried) tuples, or
+    None if scoring failed.
+    """
+    script = f"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join({digest2_src_dir!r}, "src"))
+
+from digest2 import Digest2
+from digest2.observation import iter_mpc80_file
+
+tracklets = [(desig.strip(), obs) for desig, obs in iter_mpc80_file({obs_file!r})
+             if len(obs) >= 2]
+with Digest2(obscodes_path={obscodes_path!r}, repeatable=True) as d2:
+    for desig, obs in tracklets:
+        result = d2.classify_tracklet(obs, classes={classes!r})
+        best = float("inf")
+        for _ in range({repeats!r}):
+            t0 = time.perf_counter()
+            d2.classify_tracklet(obs, classes={classes!r})
+            best = min(best, time.perf_counter() - t0)
+        distances = getattr(result, "distances_tried", 0)
+        print(f"TRACKLET:{{desig}}:{{best * 1e6}}:{{distances}}")
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(f"Scoring failed for {label}:")
+        print(result.stderr)
+        return None
+
+    timings = []
+    for line in result.stdout.strip().split("\n"):
+        if line.startswith("TRACKLET:"):
+            _, desig, best_us, distances = line.split(":")
+            timings.append((desig, float(best_us), int(distances)))
+    return timings
+
+
+def add_worktree(digest2_dir, ref):
+    """Check out ref in a temporary git worktree.
+
+    Returns (worktree_dir, worktree_path), or None if git failed.
+    """
+    repo_root_abs = subprocess.run(
+        ["git", "rev-parse", "--show-toplevel"],
+        cwd=digest2_dir,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+    worktree_dir = tempfile.mkdtemp(prefix="d2bench_")
+    worktree_path = os.path.join(worktree_dir, "mpc-public")
+
+    print(f"Creating worktree for baseline ({ref})...")
+    result = subprocess.run(
+        ["git", "worktree", "add", "--detach", worktree_path, ref],
+        cwd=repo_root_abs or digest2_dir,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(f"Failed to create worktree: {result.stderr}")
+        shutil.rmtree(worktree_dir, ignore_errors=True)
+        return None
+    return worktree_dir, worktree_path
+
+
+def remove_worktree(digest2_dir, worktree_dir, worktree_path):
+    """Remove a worktree made by add_worktree."""
+    subprocess.run(
+        ["git", "worktree", "remove", "--force", worktree_path],
+        cwd=digest2_dir,
+        capture_output=True,
+    )
+    shutil.rmtree(worktree_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark digest2 scoring time per tracklet"
+    )
+    baseline_group = parser.add_mutually_exclusive_group()
+    baseline_group.add_argument(
+        "--baseline-ref",
+        default=None,
+        help="Git ref to build in a temporary worktree and compare against",
+    )
+    baseline_group.add_argument(
+        "--baseline-dir",
+        default=None,
+        help="digest2 directory of another checkout to compare against",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=20,
+        help="Timed runs per tracklet; the best is kept (default: 20)",
+    )
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=3,
+        help="Timing rounds, alternating with the baseline if any "
+             "(default: 3)",
+    )
+    parser.add_argument(
+        "--classes",
+        default="NEO",
+        help="Comma-separated classes to score (default: NEO)",
+    )
+    parser.add_argument(
+        "--obs-file",
+        default=None,
+        help="Observation file to benchmark (default: three-hr-tracklets.obs)",
+    )
+    args = parser.parse_args()
+
+    digest2_dir = os.path.dirname(os.path.abspath(__file__))
+    classes = args.classes.split(",")
+
+    if args.obs_file:
+        obs_file = os.path.abspath(args.obs_file)
+    else:
+        obs_file = os.path.join(digest2_dir, "digest2", "three-hr-tracklets.obs")
+
+    if not os.path.exists(obs_file):
+        print(f"Observation file not found: {obs_file}")
+        sys.exit(1)
+
+    obscodes_path = os.path.join(digest2_dir, "digest2", "digest2.obscodes")
+    if not os.path.exists(obscodes_path):
+        obscodes_path = None
+
+    print("Benchmark: digest2 per-tracklet scoring time")
+    if args.baseline_ref or args.baseline_dir:
+        print(f"  Baseline:      {args.baseline_ref or args.baseline_dir}")
+    print(f"  Obs file:      {obs_file}")
+    print(f"  Classes:       {','.join(classes)}")
+    print(f"  Repeats:       {args.repeats} x {args.rounds} rounds (best kept)")
+    print()
+
+    print("Building CURRENT code...")
+    if not build_extension(digest2_dir):
+        sys.exit(1)
+
+    worktree = None
+    baseline_digest2 = None
+    if args.baseline_ref:
+        worktree = add_worktree(digest2_dir, args.baseline_ref)
+        if worktree is None:
+            sys.exit(1)
+        baseline_digest2 = os.path.join(worktree[1], "digest2")
+    elif args.baseline_dir:
+        baseline_digest2 = os.path.abspath(args.baseline_dir)
+
+    runs = [("current", digest2_dir)]
+    if baseline_digest2:
+        runs.insert(0, ("baseline", baseline_digest2))
+
+    # alternate baseline and current runs so that both see the same machine
+    # load, and keep each tracklet's best time over all rounds
+    try:
+        if baseline_digest2:
+            print("Building BASELINE code...")
+            if not build_extension(baseline_digest2):
+                sys.exit(1)
+        best = {}
+        for r in range(args.rounds):
+            print(f"Timing round {r + 1} of {args.rounds}...")
+            for label, directory in runs:
+                timings = time_tracklets(directory, obs_file, args.repeats,
+                                         classes, label,
+                                         obscodes_path=obscodes_path)
+                if not timings:
+                    sys.exit(1)
+                if label not in best:
+                    best[label] = timings
+                else:
+                    best[label] = [
+                        (desig, min(us, prev_us), distances)
+                        for (desig, us, distances), (_, prev_us, _)
+                        in zip(timings, best[label])]
+    finally:
+        if worktree is not None:
+            remove_worktree(digest2_dir, *worktree)
+
+    current = best["current"]
+    n = len(current)
+    print()
+    print("=" * 72)
+    if not baseline_digest2:
+        print(f"  {'Tracklet':15s} {'Time':>10s} {'Dist.':>6s} "
+              f"{'Time/dist.':>11s}")
+        total = 0.0
+        for desig, us, distances in current:
+            total += us
+            per_distance = us / distances if distances else 0.0
+            print(f"  {desig:15s} {us:8.1f}us {distances:6d} "
+                  f"{per_distance:9.3f}us")
+        print("-" * 72)
+        print(f"  Mean per tracklet: {total / n:.1f}us")
+        print("=" * 72)
+        return
+
+    baseline = best["baseline"]
+    print(f"  {'Tracklet':15s} {'Baseline':>10s} {'Current':>10s} "
+          f"{'Saving':>10s} {'Dist.':>6s} {'Saving/dist.':>13s}")
+    total_base = total_cur = 0.0
+    for (desig, base_us, _), (_, cur_us, distances) in zip(baseline, current):
+        total_base += base_us
+        total_cur += cur_us
+        saving = base_us - cur_us
+        per_distance = saving / distances if distances else 0.0
+        print(f"  {desig:15s} {base_us:8.1f}us {cur_us:8.1f}us "
+              f"{saving:8.1f}us {distances:6d} {per_distance:11.3f}us")
+    print("-" * 72)
+    print(f"  Mean per tracklet: {total_base / n:.1f}us -> "
+          f"{total_cur / n:.1f}us "
+          f"({(1 - total_cur / total_base) * 100:.1f}% faster)")
+    print("=" * 72)
+
+if __name__ == "__main__":
+    main()
@@ -294,19 +294,20 @@ void printVersion() {
     }
 
     // attempt read model header
-    struct stat mod;
-    FILE *fmod = openCP(fnModel, modelSpec, "r");
+    modelHeader hdr;
+    FILE *fmod = openCP(fnModel, modelSpec, "rb");
     if (!fmod) {                  // no binary,
         printf(msgMissing, fnModel);
         return;
     }
-    if (!fread(&mod.st_size, sizeof mod.st_size, 1, fmod) ||
-        !fread(&mod.st_mtime, sizeof mod.st_mtime, 1, fmod)) {
-        fclose(fmod);               // binary seems corrupt
-        printf(msgRead, fnModel);
+    _Bool hdr_ok = readModelHeader(fmod, &hdr);
+    fclose(fmod);
+    if (!hdr_ok) {                // binary corrupt or an older format
+        printf(msgReadInvalid, fnModel);
         return;
     }
-    printf(msgModelBasis, fnModel, mod.st_size, ctime(&mod.st_mtime));
+    time_t mtime = (time_t) hdr.csvMtime;
+    printf(msgModelBasis, fnModel, (int) hdr.csvSize, ctime(&mtime));
 }
 
 void mustParseLimit(char *optarg) {
@@ -3,9 +3,15 @@
 // Public domain.
 //
 // Library API implementation for digest2 scoring engine.
-// Provides init/score/cleanup functions without threading or file I/O
-// for observations. Reuses existing d2math.c, d2model.c, d2modelio.c,
-// d2mpc.c, and common.c unchanged.
+// Provides context/score functions without file I/O for observations,
+// built on the search and model code of d2math.c, d2model.c, d2modelio.c,
+// d2mpc.c and common.c, which the command-line program shares.  Only
+// d2_score_many(), d2_score_columns() and a split search
+// (d2_set_search_threads) start threads.
+
+#ifndef _WIN32
+#define _POSIX_C_SOURCE 200809L   // rand_r, sysconf under -std=c99
+#endif
 
 #include <math.h>
 #include <stdio.h>
@@ -13,12 +19,17 @@
 #include <string.h>
 #include <time.h>
 #include <stdint.h>
+#include <stddef.h>
+#ifndef _WIN32
+#include <pthread.h>
+#include <unistd.h>
+#endif
 
 #include "d2lib.h"
 #include "digest2.h"
 
-// Track initialization state
-static int lib_initialized = 0;
+// initGlobals() sets up constants shared by all contexts; run it once.
+static int lib_globals_ready = 0;
 
 // Library-local copies of globals that in CLI mode are set by d2cli.c.
 // We define them here so the library can be linked without d2cli.c.
@@ -58,8 +69,6 @@ int limit = 0;
 
 int cores = 1;
 
-site siteTable[obscodeNamespaceSize];
-
 // These message strings are referenced by other .c files via extern.
 char msgAccess[]    = "Cannot access URL %s\n";
 char msgCSVData[]   = "Invalid CSV data:  %s\n";
@@ -108,10 +117,10 @@ FILE *openCP(char *fn, _Bool spec, char *mode) {
 
 // Read population model using smart binary/CSV loading.
 // Accepts either a CSV path (*.csv) or binary path; derives the other.
-// Uses mustReadModelStatCSV() which prefers binary for speed, falls back
-// to CSV, and auto-generates binary cache.
+// Uses mustReadModelStatCSV() which maps the binary read-only when it
+// matches the CSV, else reads the CSV and regenerates the binary.
 // Returns 0 on success, -1 on failure.
-static int lib_read_model(const char *path) {
+static int lib_read_model(modelStore *ms, const char *path) {
     char *save_fnCSV = fnCSV;
     char *save_fnModel = fnModel;
     lib_fatal_flag = 0;
@@ -136,7 +145,7 @@ static int lib_read_model(const char *path) {
 
     fnCSV = csv_buf;
     fnModel = model_buf;
-    mustReadModelStatCSV();
+    mustReadModelStatCSV(ms);
 
     fnCSV = save_fnCSV;
     fnModel = save_fnModel;
@@ -144,13 +153,13 @@ static int lib_read_model(const char *path) {
 }
 
 // Read observatory codes file. Returns 0 on success, -1 on failure.
-static int lib_read_obscodes(const char *ocd_path) {
+static int lib_read_obscodes(site *table, const char *ocd_path) {
     char *save_fnOCD = fnOCD;
     fnOCD = (char *)ocd_path;
     ocdSpec = 1;  // tell openCP to use the path directly
 
     lib_fatal_flag = 0;
-    mustReadOCD();
+    mustReadOCD(table);
 
     fnOCD = save_fnOCD;
     ocdSpec = 0;
@@ -163,71 +172,146 @@ static int lib_read_obscodes(const char *ocd_path) {
 
 // --- Public API implementation ---
 
-int d2_init(const char *model_path, const char *obscodes_path) {
-    if (lib_initialized) {
-        d2_cleanup();
+d2_context *d2_context_new(const char *model_path, const char *obscodes_path,
+                           int *status) {
+    if (!lib_globals_ready) {
+        // Initialize mathematical constants
+        initGlobals();
+        lib_globals_ready = 1;
     }
 
-    // Initialize mathematical constants and default obsErr
-    initGlobals();
-
-    // Set up default class computation (all classes)
-    for (int c = 0; c < D2CLASSES; c++) {
-        classCompute[c] = c;
+    d2_context *ctx = (d2_context *)calloc(1, sizeof(d2_context));
+    if (!ctx) {
+        *status = D2_ERR_MEMORY;
+        return NULL;
     }
-    nClassCompute = D2CLASSES;
 
-    // Default configuration
-    repeatable = 1;
-    raw = 1;
-    noid = 1;
-    rms = 1;
+    // Default configuration: all classes, repeatable, 1" obsErr
+    initContext(ctx);
 
     // Read population model (binary preferred, CSV fallback)
-    if (lib_read_model(model_path) != 0) {
-        return D2_ERR_MODEL;
+    if (lib_read_model(&ctx->store, model_path) != 0) {
+        d2_context_free(ctx);
+        *status = D2_ERR_MODEL;
+        return NULL;
     }
+    ctx->model = ctx->store.pm;
 
     // Read observatory codes
-    if (lib_read_obscodes(obscodes_path) != 0) {
-        return D2_ERR_OBSCODES;
+    if (lib_read_obscodes(ctx->siteTable, obscodes_path) != 0) {
+        d2_context_free(ctx);
+        *status = D2_ERR_OBSCODES;
+        return NULL;
     }
 
-    lib_initialized = 1;
-    return D2_OK;
-}
-
-void d2_cleanup(void) {
-    lib_initialized = 0;
+    *status = D2_OK;
+    return ctx;
 }
 
-int d2_is_initialized(void) {
-    return lib_initialized;
+void d2_context_free(d2_context *ctx) {
+    if (ctx) {
+        releaseModel(&ctx->store);
+        free(ctx);
+    }
 }
 
-void d2_set_default_obserr(double arcsec) {
+void d2_set_default_obserr(d2_context *ctx, double arcsec) {
     extern double arcsecrad;
-    obsErr = arcsec * arcsecrad;
+    ctx->obsErr = arcsec * arcsecrad;
 }
 
-void d2_set_site_obserr(int site_index, double arcsec) {
+void d2_set_site_obserr(d2_context *ctx, int site_index, double arcsec) {
     extern double arcsecrad;
     if (site_index >= 0 && site_index < obscodeNamespaceSize) {
-        siteTable[site_index].obsErr = arcsec * arcsecrad;
+        ctx->siteTable[site_index].obsErr = arcsec * arcsecrad;
     }
 }
 
-void d2_set_repeatable(int flag) {
-    repeatable = flag ? 1 : 0;
+void d2_set_repeatable(d2_context *ctx, int flag) {
+    ctx->repeatable = flag ? 1 : 0;
+}
+
+void d2_set_no_threshold(d2_context *ctx, int flag) {
+    ctx->noThreshold = flag ? 1 : 0;
 }
 
-void d2_set_no_threshold(int flag) {
-    noThreshold = flag ? 1 : 0;
+void d2_set_budget(d2_context *ctx, int max_orbits, int max_distances,
+                   double max_seconds) {
+    ctx->maxOrbits = max_orbits > 0 ? max_orbits : 0;
+    ctx->maxDistances = max_distances > 0 ? max_distances : 0;
+    ctx->maxSeconds = max_seconds > 0. ? max_seconds : 0.;
+}
+
+void d2_set_search_threads(d2_context *ctx, int n_threads) {
+    ctx->searchThreads = n_threads > 0 ? n_threads : 0;
 }
 
 // --- Internal helpers for tracklet setup/teardown ---
 
-static void lib_free_tracklet(tracklet *tk);
+// Per-thread scoring arena: a tracklet with room for every class, its class
+// filter and a reusable observation list and scratch space.  Each thread
+// allocates one on first use and keeps it until the thread exits, so
+// steady-state scoring does no heap allocation.
+//
+// Invariant between tracklets: dTag and dClassTag are all zero.
+// lib_release_tracklet restores it with clearDTags, which only touches the
+// bins the tracklet tagged, so setup only needs to clear the perClass
+// array.
+typedef struct lib_part lib_part;      // split search workspace, see below
+
+typedef struct {
+    tracklet tk;
+    perClass class[D2CLASSES];
+    int classFilter[D2CLASSES];
+    uint32_t dClassTag[D2BINS];
+    lib_part **parts;       // split search workspaces, allocated on first use
+    int nParts;
+} lib_arena;
+
+static void lib_free_parts(lib_arena *a);
+
+static void lib_free_arena(void *p) {
+    lib_arena *a = (lib_arena *)p;
+    if (a) {
+        free(a->tk.olist);
+        scratchFree(&a->tk.work);
+        lib_free_parts(a);
+        free(a);
+    }
+}
+
+#ifdef _WIN32
+static __declspec(thread) lib_arena *lib_thread_arena = NULL;
+
+// No thread-exit hook here; an arena is leaked when its thread exits.
+static lib_arena *lib_get_arena(void) {
+    if (!lib_thread_arena)
+        lib_thread_arena = (lib_arena *)calloc(1, sizeof(lib_arena));
+    return lib_thread_arena;
+}
+#else
+static pthread_key_t lib_arena_key;
+static pthread_once_t lib_arena_once = PTHREAD_ONCE_INIT;
+
+static void lib_make_arena_key(void) {
+    pthread_key_create(&lib_arena_key, lib_free_arena);
+}
+
+static lib_arena *lib_get_arena(void) {
+    pthread_once(&lib_arena_once, lib_make_arena_key);
+    lib_arena *a = (lib_arena *)pthread_getspecific(lib_arena_key);
+    if (!a) {
+        a = (lib_arena *)calloc(1, sizeof(lib_arena));
+        if (a && pthread_setspecific(lib_arena_key, a) != 0) {
+            free(a);
+            a = NULL;
+        }
+    }
+    return a;
+}
+#endif
+
+static void lib_release_tracklet(tracklet *tk);
 
 // Validate class filter indices. Returns D2_OK or D2_ERR_INPUT.
 static int lib_validate_classes(int *classes, int n_classes) {
@@ -242,56 +326,61 @@ static int lib_validate_classes(int *classes, int n_classes) {
     return D2_OK;
 }
 
-// Allocate and populate a tracklet from input observations.
+// Populate the calling thread's arena tracklet from input observations.
 // classes/n_classes: per-tracklet class filter (NULL/0 = all classes).
 // Returns NULL on error (sets *status to the error code).
-static tracklet *lib_alloc_tracklet(d2_observation *obs, int n_obs,
-                                     int *classes, int n_classes,
-                                     int is_ades, int *status) {
-    tracklet *tk = (tracklet *)calloc(1, sizeof(tracklet));
-    if (!tk) {
+static tracklet *lib_setup_tracklet(d2_context *ctx,
+                                    d2_observation *obs, int n_obs,
+                                    int *classes, int n_classes,
+                                    int is_ades, int *status) {
+    lib_arena *a = lib_get_arena();
+    if (!a) {
         *status = D2_ERR_MEMORY;
         return NULL;
     }
+    tracklet *tk = &a->tk;
 
-    // Set up per-tracklet class filter
-    if (classes != NULL && n_classes > 0) {
-        tk->classFilter = (int *)malloc(n_classes * sizeof(int));
-        if (!tk->classFilter) {
-            free(tk);
+    // Grow the observation list if needed
+    if (n_obs > tk->obsCap) {
+        observation *olist = (observation *)realloc(tk->olist,
+                n_obs * sizeof(observation));
+        if (!olist) {
             *status = D2_ERR_MEMORY;
             return NULL;
         }
-        memcpy(tk->classFilter, classes, n_classes * sizeof(int));
-        tk->nClassFilter = n_classes;
+        tk->olist = olist;
+        tk->obsCap = n_obs;
     }
-    // else: classFilter = NULL, nClassFilter = 0 (from calloc) -> uses globals
 
-    int nCC = tk->classFilter ? tk->nClassFilter : nClassCompute;
+    // Zero the tracklet as calloc would, keeping the arena's buffers
+    observation *saveOlist = tk->olist;
+    int saveObsCap = tk->obsCap;
+    scratch saveWork = tk->work;
+    memset(tk, 0, sizeof(tracklet));
+    tk->olist = saveOlist;
+    tk->obsCap = saveObsCap;
+    tk->work = saveWork;
+    tk->ctx = ctx;
+    tk->class = a->class;
+    tk->dClassTag = a->dClassTag;
 
-    tk->olist = (observation *)malloc(n_obs * sizeof(observation));
-    if (!tk->olist) {
-        free(tk->classFilter);
-        free(tk);
-        *status = D2_ERR_MEMORY;
-        return NULL;
+    // Set up per-tracklet class filter
+    if (classes != NULL && n_classes > 0) {
+        memcpy(a->classFilter, classes, n_classes * sizeof(int));
+        tk->classFilter = a->classFilter;
+        tk->nClassFilter = n_classes;
     }
+    // else: classFilter = NULL, nClassFilter = 0 -> uses context
 
-    tk->class = (perClass *)calloc(nCC, sizeof(perClass));
-    if (!tk->class) {
-        free(tk->olist);
-        free(tk->classFilter);
-        free(tk);
-        *status = D2_ERR_MEMORY;
-        return NULL;
-    }
+    int nCC = tk->classFilter ? tk->nClassFilter : ctx->nClassCompute;
+    for (int c = 0; c < nCC; c++)
+        memset(&a->class[c], 0, sizeof(perClass));
 
     tk->status = UNPROC;
-    tk->obsCap = n_obs;
     tk->lines = n_obs;
     tk->isAdes = is_ades ? 1 : 0;
 
-    if (repeatable) {
+    if (ctx->repeatable) {
         tk->rand64 = 3;
     } else {
         // rand() is not thread-safe: concurrent calls from multiple threads
@@ -315,6 +404,11 @@ static tracklet *lib_alloc_tracklet(d2_observation *obs, int n_obs,
     extern double arcsecrad;
 
     for (int i = 0; i < n_obs; i++) {
+        if (obs[i].site < 0 || obs[i].site >= obscodeNamespaceSize) {
+            *status = D2_ERR_INPUT;
+            lib_release_tracklet(tk);
+            return NULL;
+        }
         observation *o = &tk->olist[i];
         o->mjd  = obs[i].mjd;
         o->ra   = obs[i].ra;
@@ -344,13 +438,13 @@ static tracklet *lib_alloc_tracklet(d2_observation *obs, int n_obs,
 
     if (last->mjd < first->mjd) {
         *status = D2_ERR_INPUT;
-        lib_free_tracklet(tk);
+        lib_release_tracklet(tk);
         return NULL;
     }
 
     if (first->ra == last->ra && first->dec == last->dec) {
         *status = D2_ERR_INPUT;
-        lib_free_tracklet(tk);
+        lib_release_tracklet(tk);
         return NULL;
     }
 
@@ -361,9 +455,12 @@ static tracklet *lib_alloc_tracklet(d2_observation *obs, int n_obs,
 static void lib_extract_scores(tracklet *tk, d2_result *result) {
     result->rms = tk->rms;
     result->rms_prime = tk->rmsPrime;
+    result->partial = tk->partial;
+    result->orbits_tried = tk->nOrbits;
+    result->distances_tried = tk->nDistances;
 
-    int nCC = tk->classFilter ? tk->nClassFilter : nClassCompute;
-    int *cC = tk->classFilter ? tk->classFilter : classCompute;
+    int nCC = tk->classFilter ? tk->nClassFilter : tk->ctx->nClassCompute;
+    int *cC = tk->classFilter ? tk->classFilter : tk->ctx->classCompute;
 
     for (int c = 0; c < nCC; c++) {
         int ci = cC[c];
@@ -376,25 +473,297 @@ static void lib_extract_scores(tracklet *tk, d2_result *result) {
     result->status = D2_OK;
 }
 
-static void lib_free_tracklet(tracklet *tk) {
-    if (tk) {
-        free(tk->classFilter);
-        free(tk->class);
-        free(tk->olist);
-        free(tk);
+// Hand the tracklet back to its arena: clear the per-distance tags the
+// tracklet left set (see the arena invariant above).
+static void lib_release_tracklet(tracklet *tk) {
+    clearDTags(tk);
+    tk->orbit_buf = NULL;
+}
+
+// Run worker(arg) on n_threads threads, the caller included (<= 0: one per
+// online CPU).  If a thread cannot be created, the remaining workers
+// simply pick up its share.
+static void lib_run_threads(void *(*worker)(void *), void *arg,
+                            int n_threads) {
+#ifdef _WIN32
+    (void)n_threads;
+    worker(arg);
+#else
+    if (n_threads <= 0) {
+        long ncpu = sysconf(_SC_NPROCESSORS_ONLN);
+        n_threads = ncpu > 0 ? (int)ncpu : 1;
+    }
+
+    pthread_t *pool = NULL;
+    int started = 0;
+    if (n_threads > 1) {
+        pool = (pthread_t *)malloc((n_threads - 1) * sizeof(pthread_t));
+        if (pool) {
+            for (; started < n_threads - 1; started++) {
+                if (pthread_create(&pool[started], NULL, worker, arg) != 0)
+                    break;
+            }
+        }
+    }
+    worker(arg);
+    for (int i = 0; i < started; i++)
+        pthread_join(pool[i], NULL);
+    free(pool);
+#endif
+}
+
+// --- Split search ---
+//
+// With a search thread count set (d2_set_search_threads), one tracklet's
+// distance range is divided into D2SEARCHTASKS tasks (see searchTask in
+// d2math.c) that threads claim one at a time.  Each task is searched with
+// tags of its own, starting empty, and its own random sequence, so what it
+// finds does not depend on which thread ran it or what ran before; the
+// tasks' tags are merged into the tracklet and the class sums recomputed
+// from them.  Results are thus the same for any thread count, and
+// repeatable under d2_set_repeatable.  They differ a little from the
+// unsplit search, whose later distances see the tags of earlier ones.
+
+// A thread's workspace: a tracklet with its own tags, reused for each task.
+// The workspaces of a split belong to the arena of the thread that splits,
+// which keeps them for its next split; tags are cleared after each task.
+struct lib_part {
+    tracklet tk;
+    perClass class[D2CLASSES];
+    uint32_t dClassTag[D2BINS];
+    int tagLog[D2BINS];
+    binset tagLogged;
+    scratch work;
+};
+
+typedef struct {
+    tracklet *tk;           // tracklet being scored, set up by scoreSetup
+    double bounds[D2SEARCHTASKS + 1];
+    lib_part **parts;       // one per thread
+    d2_orbit_buffer *orbits; // one per task, if collecting orbits
+    int n_parts;
+    int next_part;          // next unclaimed workspace
+    int next;               // next unclaimed task
+#ifndef _WIN32
+    pthread_mutex_t mNext;  // guards the above and the merge into tk
+#endif
+} lib_split;
+
+static void lib_split_lock(lib_split *s) {
+#ifndef _WIN32
+    pthread_mutex_lock(&s->mNext);
+#else
+    (void)s;
+#endif
+}
+
+static void lib_split_unlock(lib_split *s) {
+#ifndef _WIN32
+    pthread_mutex_unlock(&s->mNext);
+#else
+    (void)s;
+#endif
+}
+
+// Merge the tags a task set into the tracklet and clear them from the
+// workspace, leaving it ready for the next task.
+static void lib_merge_task(lib_split *s, lib_part *p) {
+    tracklet *tk = s->tk;
+    tracklet *pt = &p->tk;
+    int nCC = tk->classFilter ? tk->nClassFilter : tk->ctx->nClassCompute;
+
+    lib_split_lock(s);
+    tk->nOrbits += pt->nOrbits;
+    tk->nDistances += pt->nDistances;
+    tk->partial |= pt->partial;
+    for (int t = 0; t < pt->tagLogCount; t++) {
+        int idx = pt->tagLog[t];
+        for (int c = 0; c < nCC; c++) {
+            if (binTest(p->class[c].tagInClass, idx))
+                binSet(tk->class[c].tagInClass, idx);
+            if (binTest(p->class[c].tagOutOfClass, idx))
+                binSet(tk->class[c].tagOutOfClass, idx);
+        }
+    }
+    lib_split_unlock(s);
+
+    for (int t = 0; t < pt->tagLogCount; t++) {
+        int idx = pt->tagLog[t];
+        binClear(p->tagLogged, idx);
+        for (int c = 0; c < nCC; c++) {
+            binClear(p->class[c].tagInClass, idx);
+            binClear(p->class[c].tagOutOfClass, idx);
+        }
+    }
+    clearDTags(pt);
+    p->work = pt->work;
+}
+
+static void *lib_split_worker(void *arg) {
+    lib_split *s = (lib_split *)arg;
+    tracklet *tk = s->tk;
+    int nCC = tk->classFilter ? tk->nClassFilter : tk->ctx->nClassCompute;
+
+    lib_split_lock(s);
+    lib_part *p = s->next_part < s->n_parts ? s->parts[s->next_part++] : NULL;
+    lib_split_unlock(s);
+    if (!p)
+        return NULL;
+
+    for (;;) {
+        lib_split_lock(s);
+        int j = s->next < D2SEARCHTASKS ? s->next++ : -1;
+        lib_split_unlock(s);
+        if (j < 0)
+            break;
+
+        tracklet *pt = &p->tk;
+        *pt = *tk;
+        pt->class = p->class;
+        pt->dClassTag = p->dClassTag;
+        pt->tagLog = p->tagLog;
+        pt->tagLogged = p->tagLogged;
+        pt->work = p->work;
+        pt->nOrbits = pt->nDistances = 0;
+        // distinct odd seeds, one per task
+        pt->rand64 = (tk->rand64 + 2 * (uint64_t)j * 0x9E3779B97F4A7C15ULL)
+                     & LCGM;
+        for (int c = 0; c < nCC; c++) {
+            p->class[c].sumAllInClass = p->class[c].sumUnkInClass = 0.;
+            p->class[c].sumAllOutOfClass = p->class[c].sumUnkOutOfClass = 0.;
+        }
+        pt->orbit_buf = NULL;
+        if (s->orbits) {
+            d2_orbit_buffer *buf = &s->orbits[j];
+            buf->orbits = (d2_trial_orbit *)malloc(64 * sizeof(d2_trial_orbit));
+            if (buf->orbits) {
+                buf->capacity = 64;
+                pt->orbit_buf = buf;
+            }
+        }
+
+        searchTask(pt, s->bounds, j);
+        lib_merge_task(s, p);
+    }
+    return NULL;
+}
+
+// Append a task's orbits to the tracklet's buffer.
+static void lib_merge_orbits(d2_orbit_buffer *buf, const d2_orbit_buffer *part) {
+    if (buf->count + part->count > buf->capacity) {
+        int cap = buf->count + part->count;
+        d2_trial_orbit *orbits = (d2_trial_orbit *)realloc(buf->orbits,
+                cap * sizeof(d2_trial_orbit));
+        if (!orbits)
+            return;
+        buf->orbits = orbits;
+        buf->capacity = cap;
+    }
+    memcpy(buf->orbits + buf->count, part->orbits,
+           part->count * sizeof(d2_trial_orbit));
+    buf->count += part->count;
+}
+
+static void lib_free_parts(lib_arena *a) {
+    for (int i = 0; i < a->nParts; i++) {
+        scratchFree(&a->parts[i]->work);
+        free(a->parts[i]);
+    }
+    free(a->parts);
+}
+
+// Up to n workspaces from the calling thread's arena, allocating any it
+// does not have yet.  Returns how many there are (0 if none).
+static int lib_get_parts(lib_arena *a, int n) {
+    if (n > a->nParts) {
+        lib_part **parts = (lib_part **)realloc(a->parts,
+                                                n * sizeof(lib_part *));
+        if (parts) {
+            a->parts = parts;
+            while (a->nParts < n) {
+                lib_part *p = (lib_part *)calloc(1, sizeof(lib_part));
+                if (!p)
+                    break;
+                a->parts[a->nParts++] = p;
+            }
+        }
+    }
+    return n < a->nParts ? n : a->nParts;
+}
+
+// scoreSearch for a tracklet set up by scoreSetup, split over up to
+// n_threads threads.  Falls back to the unsplit search if no workspace
+// can be allocated.
+static void lib_search_split(tracklet *tk, int n_threads) {
+    lib_arena *a = lib_get_arena();
+    lib_split s;
+    memset(&s, 0, sizeof(s));
+    s.tk = tk;
+    searchTaskBounds(s.bounds);
+    if (n_threads > D2SEARCHTASKS)
+        n_threads = D2SEARCHTASKS;
+    s.n_parts = a ? lib_get_parts(a, n_threads) : 0;
+    if (s.n_parts)
+        s.parts = a->parts;
+    if (tk->orbit_buf)
+        s.orbits = (d2_orbit_buffer *)calloc(D2SEARCHTASKS,
+                                             sizeof(d2_orbit_buffer));
+    if (!s.n_parts || (tk->orbit_buf && !s.orbits)) {
+        free(s.orbits);
+        scoreSearch(tk);
+        return;
+    }
+    if (n_threads > s.n_parts)
+        n_threads = s.n_parts;
+
+#ifndef _WIN32
+    pthread_mutex_init(&s.mNext, NULL);
+#endif
+    lib_run_threads(lib_split_worker, &s, n_threads);
+#ifndef _WIN32
+    pthread_mutex_destroy(&s.mNext);
+#endif
+
+    if (s.orbits) {
+        for (int j = 0; j < D2SEARCHTASKS; j++) {
+            lib_merge_orbits(tk->orbit_buf, &s.orbits[j]);
+            free(s.orbits[j].orbits);
+        }
+        free(s.orbits);
+    }
+    sumTags(tk);
+}
+
+// score() for the library: with the search split if the context asks and
+// split is set.  Bulk scoring, whose threads already each score a tracklet,
+// clears it: the split tasks solve about 1.5 times the orbits of the
+// unsplit search, which only pays with cores to spare.
+static void lib_score(tracklet *tk, int split) {
+    const d2_context *ctx = tk->ctx;
+    if (split && ctx->searchThreads > 1 && !ctx->maxOrbits
+            && !ctx->maxDistances) {
+        scoreSetup(tk);
+        lib_search_split(tk, ctx->searchThreads);
+        scoreFinish(tk);
+    } else {
+        score(tk);
     }
 }
 
 // --- Public scoring API ---
+//
+// lib_score_observations and lib_score_collect are d2_score_observations
+// and d2_score_observations_collect with the split flag of lib_score.
 
-d2_result d2_score_observations(d2_observation *obs, int n_obs,
-                                int *classes, int n_classes,
-                                int is_ades) {
+static d2_result lib_score_observations(d2_context *ctx,
+                                        d2_observation *obs, int n_obs,
+                                        int *classes, int n_classes,
+                                        int is_ades, int split) {
     d2_result result;
     memset(&result, 0, sizeof(result));
     result.n_classes = D2CLASSES;
 
-    if (!lib_initialized) {
+    if (!ctx) {
         result.status = D2_ERR_NOINIT;
         return result;
     }
@@ -410,28 +779,85 @@ d2_result d2_score_observations(d2_observation *obs, int n_obs,
     }
 
     int status;
-    tracklet *tk = lib_alloc_tracklet(obs, n_obs, classes, n_classes,
-                                       is_ades, &status);
+    tracklet *tk = lib_setup_tracklet(ctx, obs, n_obs, classes, n_classes,
+                                      is_ades, &status);
     if (!tk) {
         result.status = status;
         return result;
     }
 
-    score(tk);
+    lib_score(tk, split);
     lib_extract_scores(tk, &result);
-    lib_free_tracklet(tk);
+    lib_release_tracklet(tk);
 
     return result;
 }
 
-d2_result_ext d2_score_observations_ext(d2_observation *obs, int n_obs,
-                                         int *classes, int n_classes,
-                                         int is_ades) {
+d2_result d2_score_observations(d2_context *ctx,
+                                d2_observation *obs, int n_obs,
+                                int *classes, int n_classes,
+                                int is_ades) {
+    return lib_score_observations(ctx, obs, n_obs, classes, n_classes,
+                                  is_ades, 1);
+}
+
+// Copy the tag sets of the classes computed for tk into ext, one entry per
+// bin tagged in any of them (see d2_result_ext).  Returns D2_OK or
+// D2_ERR_MEMORY.
+static int lib_extract_tags(tracklet *tk, d2_result_ext *ext) {
+    int nCC = tk->classFilter ? tk->nClassFilter : tk->ctx->nClassCompute;
+    int *cC = tk->classFilter ? tk->classFilter : tk->ctx->classCompute;
+    binset any;
+
+    memset(any, 0, sizeof(any));
+    ext->tag_classes = 0;
+    for (int c = 0; c < nCC; c++) {
+        for (int w = 0; w < D2BINWORDS; w++)
+            any[w] |= tk->class[c].tagInClass[w] | tk->class[c].tagOutOfClass[w];
+        ext->tag_classes |= 1 << cC[c];
+    }
+
+    int n = 0;
+    for (int w = 0; w < D2BINWORDS; w++)
+        for (uint64_t x = any[w]; x; x &= x - 1)
+            n++;
+    ext->tag_bins = (int *)malloc((n ? n : 1) * sizeof(int));
+    ext->tag_masks = (uint32_t *)malloc((n ? n : 1) * sizeof(uint32_t));
+    if (!ext->tag_bins || !ext->tag_masks)
+        return D2_ERR_MEMORY;
+
+    int k = 0;
+    for (int w = 0; w < D2BINWORDS; w++) {
+        uint64_t x = any[w];
+        for (int b = 0; x; b++, x >>= 1) {
+            if (!(x & 1))
+                continue;
+            int idx = w * 64 + b;
+            uint32_t mask = 0;
+            for (int c = 0; c < nCC; c++) {
+                if (binTest(tk->class[c].tagInClass, idx))
+                    mask |= (uint32_t) 1 << cC[c];
+                if (binTest(tk->class[c].tagOutOfClass, idx))
+                    mask |= (uint32_t) 1 << (cC[c] + DTAG_OUT);
+            }
+            ext->tag_bins[k] = idx;
+            ext->tag_masks[k++] = mask;
+        }
+    }
+    ext->n_tags = n;
+    return D2_OK;
+}
+
+static d2_result_ext lib_score_collect(d2_context *ctx,
+                                       d2_observation *obs, int n_obs,
+                                       int *classes, int n_classes,
+                                       int is_ades, int collect,
+                                       int split) {
     d2_result_ext ext;
     memset(&ext, 0, sizeof(ext));
     ext.base.n_classes = D2CLASSES;
 
-    if (!lib_initialized) {
+    if (!ctx) {
         ext.base.status = D2_ERR_NOINIT;
         return ext;
     }
@@ -447,52 +873,347 @@ d2_result_ext d2_score_observations_ext(d2_observation *obs, int n_obs,
     }
 
     int status;
-    tracklet *tk = lib_alloc_tracklet(obs, n_obs, classes, n_classes,
-                                       is_ades, &status);
+    tracklet *tk = lib_setup_tracklet(ctx, obs, n_obs, classes, n_classes,
+                                      is_ades, &status);
     if (!tk) {
         ext.base.status = status;
         return ext;
     }
 
-    // Allocate orbit buffer and attach to tracklet
-    d2_orbit_buffer *buf = (d2_orbit_buffer *)malloc(sizeof(d2_orbit_buffer));
-    if (!buf) {
-        lib_free_tracklet(tk);
-        ext.base.status = D2_ERR_MEMORY;
-        return ext;
-    }
-    buf->capacity = 1024;
-    buf->count = 0;
-    buf->orbits = (d2_trial_orbit *)malloc(buf->capacity * sizeof(d2_trial_orbit));
-    if (!buf->orbits) {
-        free(buf);
-        lib_free_tracklet(tk);
-        ext.base.status = D2_ERR_MEMORY;
-        return ext;
+    // Orbit buffer for the tracklet; the orbits array goes to the caller
+    d2_orbit_buffer buf;
+    if (collect & D2_COLLECT_ORBITS) {
+        buf.capacity = 1024;
+        buf.count = 0;
+        buf.orbits = (d2_trial_orbit *)malloc(buf.capacity *
+                                              sizeof(d2_trial_orbit));
+        if (!buf.orbits) {
+            lib_release_tracklet(tk);
+            ext.base.status = D2_ERR_MEMORY;
+            return ext;
+        }
+        tk->orbit_buf = &buf;
     }
-    tk->orbit_buf = buf;
 
-    score(tk);
+    lib_score(tk, split);
     lib_extract_scores(tk, &ext.base);
 
     // Transfer orbit data to result
-    ext.orbits = buf->orbits;
-    ext.n_orbits = buf->count;
-    buf->orbits = NULL;  // prevent double-free
-    free(buf);
-    tk->orbit_buf = NULL;
+    if (collect & D2_COLLECT_ORBITS) {
+        ext.orbits = buf.orbits;
+        ext.n_orbits = buf.count;
+    }
+    if ((collect & D2_COLLECT_TAGS) && lib_extract_tags(tk, &ext) != D2_OK)
+        ext.base.status = D2_ERR_MEMORY;
 
-    lib_free_tracklet(tk);
+    lib_release_tracklet(tk);
 
     return ext;
 }
 
+d2_result_ext d2_score_observations_collect(d2_context *ctx,
+                                            d2_observation *obs, int n_obs,
+                                            int *classes, int n_classes,
+                                            int is_ades, int collect) {
+    return lib_score_collect(ctx, obs, n_obs, classes, n_classes, is_ades,
+                             collect, 1);
+}
+
+d2_result_ext d2_score_observations_ext(d2_context *ctx,
+                                         d2_observation *obs, int n_obs,
+                                         int *classes, int n_classes,
+                                         int is_ades) {
+    return d2_score_observations_collect(ctx, obs, n_obs, classes, n_classes,
+                                         is_ades, D2_COLLECT_ORBITS);
+}
+
+// --- Bulk scoring ---
+
+// A batch is either row-wise (obs + offsets, results) or columnar
+// (cols + offsets64, colResults).
+typedef struct {
+    d2_context *ctx;
+    d2_observation *obs;
+    const int *offsets;
+    const d2_columns *cols;
+    const int64_t *offsets64;
+    int n_tracklets;
+    int *classes;
+    int n_classes;
+    int is_ades;
+    int collect;            // D2_COLLECT_* bits
+    d2_result_ext *results;
+    d2_result *colResults;
+    int next;               // next unclaimed tracklet index
+#ifndef _WIN32
+    pthread_mutex_t mNext;
+#endif
+} lib_batch;
+
+static int lib_batch_claim(lib_batch *b) {
+#ifdef _WIN32
+    return b->next < b->n_tracklets ? b->next++ : -1;
+#else
+    pthread_mutex_lock(&b->mNext);
+    int t = b->next < b->n_tracklets ? b->next++ : -1;
+    pthread_mutex_unlock(&b->mNext);
+    return t;
+#endif
+}
+
+// Worker loop: claim tracklets one at a time until the batch is drained.
+// Per-tracklet work is milliseconds, so a mutex-guarded counter is cheap
+// and balances uneven tracklets better than static partitioning.
+static void *lib_batch_worker(void *arg) {
+    lib_batch *b = (lib_batch *)arg;
+    d2_observation *gather = NULL;   // columnar batches: this worker's rows
+    int gatherCap = 0;
+    int t;
+    while ((t = lib_batch_claim(b)) >= 0) {
+        if (b->cols) {
+            const d2_columns *c = b->cols;
+            int64_t first = b->offsets64[t];
+            int n_obs = (int)(b->offsets64[t + 1] - first);
+            if (n_obs < 2) {
+                memset(&b->colResults[t], 0, sizeof(d2_result));
+                b->colResults[t].status = D2_ERR_INPUT;
+                continue;
+            }
+            if (n_obs > gatherCap) {
+                d2_observation *g = (d2_observation *)realloc(gather,
+                        n_obs * sizeof(d2_observation));
+                if (!g) {
+                    memset(&b->colResults[t], 0, sizeof(d2_result));
+                    b->colResults[t].status = D2_ERR_MEMORY;
+                    continue;
+                }
+                gather = g;
+                gatherCap = n_obs;
+            }
+            memset(gather, 0, n_obs * sizeof(d2_observation));
+            for (int i = 0; i < n_obs; i++) {
+                gather[i].mjd    = c->mjd[first + i];
+                gather[i].ra     = c->ra[first + i];
+                gather[i].dec    = c->dec[first + i];
+                gather[i].vmag   = c->vmag[first + i];
+                gather[i].site   = c->site[first + i];
+                gather[i].rmsRA  = c->rmsRA[first + i];
+                gather[i].rmsDec = c->rmsDec[first + i];
+            }
+            b->colResults[t] = lib_score_observations(b->ctx, gather, n_obs,
+                    b->classes, b->n_classes, b->is_ades, 0);
+            continue;
+        }
+        d2_observation *obs = b->obs + b->offsets[t];
+        int n_obs = b->offsets[t + 1] - b->offsets[t];
+        if (b->collect) {
+            b->results[t] = lib_score_collect(b->ctx, obs, n_obs,
+                    b->classes, b->n_classes, b->is_ades, b->collect, 0);
+        } else {
+            memset(&b->results[t], 0, sizeof(d2_result_ext));
+            b->results[t].base = lib_score_observations(b->ctx, obs, n_obs,
+                    b->classes, b->n_classes, b->is_ades, 0);
+        }
+    }
+    free(gather);
+    return NULL;
+}
+
+// Score every tracklet of b on n_threads threads, the caller included.
+static void lib_run_batch(lib_batch *b, int n_threads) {
+#ifndef _WIN32
+    if (n_threads <= 0) {
+        long ncpu = sysconf(_SC_NPROCESSORS_ONLN);
+        n_threads = ncpu > 0 ? (int)ncpu : 1;
+    }
+    if (n_threads > b->n_tracklets)
+        n_threads = b->n_tracklets;
+    pthread_mutex_init(&b->mNext, NULL);
+#endif
+    lib_run_threads(lib_batch_worker, b, n_threads);
+#ifndef _WIN32
+    pthread_mutex_destroy(&b->mNext);
+#endif
+}
+
+void d2_score_many(d2_context *ctx, d2_observation *obs, const int *offsets,
+                   int n_tracklets, int *classes, int n_classes,
+                   int is_ades, int collect, int n_threads,
+                   d2_result_ext *results) {
+    lib_batch b;
+    memset(&b, 0, sizeof(b));
+    b.ctx = ctx;
+    b.obs = obs;
+    b.offsets = offsets;
+    b.n_tracklets = n_tracklets;
+    b.classes = classes;
+    b.n_classes = n_classes;
+    b.is_ades = is_ades;
+    b.collect = collect;
+    b.results = results;
+    lib_run_batch(&b, n_threads);
+}
+
+void d2_score_columns(d2_context *ctx, const d2_columns *cols,
+                      const int64_t *offsets, int n_tracklets,
+                      int *classes, int n_classes, int is_ades,
+                      int n_threads, d2_result *results) {
+    lib_batch b;
+    memset(&b, 0, sizeof(b));
+    b.ctx = ctx;
+    b.cols = cols;
+    b.offsets64 = offsets;
+    b.n_tracklets = n_tracklets;
+    b.classes = classes;
+    b.n_classes = n_classes;
+    b.is_ades = is_ades;
+    b.colResults = results;
+    lib_run_batch(&b, n_threads);
+}
+
 void d2_free_result_ext(d2_result_ext *result) {
-    if (result && result->orbits) {
+    if (!result)
+        return;
+    if (result->orbits) {
         free(result->orbits);
         result->orbits = NULL;
         result->n_orbits = 0;
     }
+    if (result->tag_bins || result->tag_masks) {
+        free(result->tag_bins);
+        free(result->tag_masks);
+        result->tag_bins = NULL;
+        result->tag_masks = NULL;
+        result->n_tags = 0;
+    }
+}
+
+// --- MPC 80-column parsing ---
+
+// Grow *p to hold cap elements of size sz.  Returns 0 on failure, leaving
+// *p as it was.
+static int lib_grow(void *p, int64_t cap, size_t sz) {
+    void *q = realloc(*(void **)p, (size_t)cap * sz);
+    if (!q)
+        return 0;
+    *(void **)p = q;
+    return 1;
+}
+
+// Start a tracklet.  Returns 0 on memory failure.
+static int lib_mpc80_tracklet(d2_mpc80 *m, const char *desig) {
+    if (m->n_tracklets + 1 >= m->tkCap) {
+        int64_t cap = m->tkCap < 64 ? 64 : m->tkCap * 2;
+        if (!lib_grow(&m->offsets, cap, sizeof(*m->offsets)) ||
+            !lib_grow(&m->desig, cap, sizeof(*m->desig)))
+            return 0;
+        m->tkCap = cap;
+    }
+    m->offsets[m->n_tracklets] = m->n_obs;
+    memcpy(m->desig[m->n_tracklets], desig, 12);
+    m->desig[m->n_tracklets][12] = '\0';
+    m->n_tracklets++;
+    return 1;
+}
+
+// Append an observation row.  Returns 0 on memory failure.
+static int lib_mpc80_row(d2_mpc80 *m, const observation *o) {
+    if (m->n_obs == m->obsCap) {
+        int64_t cap = m->obsCap < 256 ? 256 : m->obsCap * 2;
+        if (!lib_grow(&m->mjd, cap, sizeof(double)) ||
+            !lib_grow(&m->ra, cap, sizeof(double)) ||
+            !lib_grow(&m->dec, cap, sizeof(double)) ||
+            !lib_grow(&m->vmag, cap, sizeof(double)) ||
+            !lib_grow(&m->site, cap, sizeof(int)) ||
+            !lib_grow(&m->spacebased, cap, sizeof(int)) ||
+            !lib_grow(&m->earth_obs, 3 * cap, sizeof(double)))
+            return 0;
+        m->obsCap = cap;
+    }
+    int64_t r = m->n_obs++;
+    m->mjd[r] = o->mjd;
+    m->ra[r] = o->ra;
+    m->dec[r] = o->dec;
+    m->vmag[r] = o->vmag;
+    m->site[r] = o->site;
+    m->spacebased[r] = 0;
+    memset(m->earth_obs + 3 * r, 0, 3 * sizeof(double));
+    return 1;
+}
+
+int d2_parse_mpc80(const char *buf, size_t len, d2_mpc80 *out) {
+    memset(out, 0, sizeof(*out));
+
+    char ln[LINE_SIZE];
+    char desig[13] = "";
+    int open = 0;           // a tracklet is in progress
+    size_t rowStart = 0;    // byte offset of the last row's line
+    size_t pos = 0;
+    while (pos < len) {
+        // one fgets(ln, LINE_SIZE, ...)
+        size_t start = pos, n = 0;
+        while (pos < len && n < LINE_SIZE - 1) {
+            n++;
+            if (buf[pos++] == '\n')
+                break;
+        }
+        // the parsers look no further than column 80
+        memcpy(ln, buf + start, n);
+        memset(ln + n, 0, n < 81 ? 81 - n : 1);
+
+        if (ln[14] == 's' || ln[14] == 'v') {
+            if (open) {
+                int64_t r = out->n_obs - 1;
+                observation o;
+                memset(&o, 0, sizeof(o));
+                o.site = out->site[r];
+                if (ln[14] == 's' ? parseMpcSat(ln, &o)
+                                  : parseMpcRoving(ln, &o)) {
+                    out->spacebased[r] = 1;
+                    memcpy(out->earth_obs + 3 * r, o.earth_observer,
+                           sizeof(o.earth_observer));
+                    continue;
+                }
+            }
+            open = 0;
+            continue;
+        }
+
+        observation o;
+        if (!parseMpc80(ln, &o)) {
+            open = 0;
+            continue;
+        }
+        // parseMpc80 leaves ln terminated after the designation field
+        if (!open || strcmp(ln, desig)) {
+            memcpy(desig, ln, sizeof(desig));
+            if (!lib_mpc80_tracklet(out, desig))
+                return D2_ERR_MEMORY;
+            open = 1;
+        }
+        if (!lib_mpc80_row(out, &o))
+            return D2_ERR_MEMORY;
+        rowStart = start;
+    }
+    out->open_start = open ? (int64_t)rowStart : (int64_t)len;
+    // lib_mpc80_tracklet keeps room for the closing offset
+    if (!out->offsets && !lib_grow(&out->offsets, 1, sizeof(*out->offsets)))
+        return D2_ERR_MEMORY;
+    out->offsets[out->n_tracklets] = out->n_obs;
+    return D2_OK;
+}
+
+void d2_free_mpc80(d2_mpc80 *m) {
+    free(m->mjd);
+    free(m->ra);
+    free(m->dec);
+    free(m->vmag);
+    free(m->site);
+    free(m->spacebased);
+    free(m->earth_obs);
+    free(m->offsets);
+    free(m->desig);
+    memset(m, 0, sizeof(*m));
 }
 
 int d2_parse_obscode(const char *code3) {
@@ -3,13 +3,21 @@
 // Public domain.
 //
 // Library API for digest2 scoring engine.
-// This header provides a clean, non-threaded interface to the core
-// scoring functionality, suitable for embedding in Python or other
-// language bindings.
+// This header provides a clean interface to the core scoring
+// functionality, suitable for embedding in Python or other language
+// bindings.  Only d2_score_many(), d2_score_columns() and a split search
+// (d2_set_search_threads) use threads of their own.
+//
+// All model data and configuration live in a d2_context.  Any number of
+// contexts may be live at once, each with its own model, site table and
+// settings.  Creating a context is not thread-safe (the model and obscode
+// readers share static buffers); scoring against any context is.
 
 #ifndef D2LIB_H
 #define D2LIB_H
 
+#include <stdint.h>
+
 #include "d2model.h"
 
 // Error codes
@@ -20,6 +28,10 @@
 #define D2_ERR_INPUT    -4
 #define D2_ERR_NOINIT   -5
 
+// Number of site indices: d2_parse_obscode returns 0 .. D2_SITES - 1
+// (obscodeNamespaceSize in digest2.h)
+#define D2_SITES 3600
+
 // Observation passed from the caller (mirrors the internal observation struct)
 typedef struct {
     double mjd;            // modified julian date
@@ -41,21 +53,46 @@ typedef struct {
     double rms_prime;
     int    status;         // 0=success, negative=error code
     int    n_classes;      // number of classes scored (D2CLASSES)
+    int    partial;        // 1 if the work budget ran out (see d2_set_budget)
+    int    orbits_tried;   // trial orbits solved
+    int    distances_tried; // distances searched
 } d2_result;
 
+// Scoring context.  Opaque to library callers (defined in digest2.h).
+typedef struct d2_context d2_context;
+
 // Lifecycle
-int  d2_init(const char *model_path, const char *obscodes_path);
-void d2_cleanup(void);
-int  d2_is_initialized(void);
+d2_context *d2_context_new(const char *model_path, const char *obscodes_path,
+                           int *status);
+void d2_context_free(d2_context *ctx);
 
 // Configuration
-void d2_set_default_obserr(double arcsec);
-void d2_set_site_obserr(int site_index, double arcsec);
-void d2_set_repeatable(int flag);
-void d2_set_no_threshold(int flag);
+void d2_set_default_obserr(d2_context *ctx, double arcsec);
+void d2_set_site_obserr(d2_context *ctx, int site_index, double arcsec);
+void d2_set_repeatable(d2_context *ctx, int flag);
+void d2_set_no_threshold(d2_context *ctx, int flag);
+
+// Per-tracklet work budget: stop searching a tracklet after max_orbits
+// trial orbits, max_distances distances or max_seconds of wall-clock
+// time, whichever comes first (0 = no limit).  Such a tracklet is scored
+// from the bins tagged so far and its result has partial set.
+void d2_set_budget(d2_context *ctx, int max_orbits, int max_distances,
+                   double max_seconds);
+
+// Split the search of each tracklet over up to n_threads threads, for low
+// latency on a single tracklet (0 or 1 = no split, the default).  The
+// distance range is divided into fixed tasks searched with tags of their
+// own and merged afterwards (see d2lib.c), so scores differ slightly from
+// the unsplit search but are the same for any n_threads >= 2.  A tracklet
+// is not split while the context has an orbit or distance budget.
+// Only d2_score_observations and d2_score_observations_collect split the
+// search; d2_score_many and d2_score_columns, whose threads each score a
+// tracklet already, always give the scores of the unsplit search.
+void d2_set_search_threads(d2_context *ctx, int n_threads);
 
 // Scoring
-d2_result d2_score_observations(d2_observation *obs, int n_obs,
+d2_result d2_score_observations(d2_context *ctx,
+                                d2_observation *obs, int n_obs,
                                 int *classes, int n_classes,
                                 int is_ades);
 
@@ -80,18 +117,99 @@ typedef struct d2_orbit_buffer {
     int capacity;
 } d2_orbit_buffer;
 
-// Extended result with trial orbits
+// What an extended result collects besides the scores
+#define D2_COLLECT_ORBITS 1   // trial orbits
+#define D2_COLLECT_TAGS   2   // tagged bins
+
+// Extended result with trial orbits and tagged bins
 typedef struct {
     d2_result base;
     d2_trial_orbit *orbits;   // caller must free via d2_free_result_ext
     int n_orbits;
+    // Bins tagged by the search, as flat bin indices
+    // ((iq * EX + ie) * IX + ii) * HX + ih in increasing order, with a mask
+    // per bin: bit c set if the bin is tagged in class c, bit c + 16 if it
+    // is tagged out of class c.  Bit c of tag_classes is set for each class
+    // computed.
+    int *tag_bins;            // caller must free via d2_free_result_ext
+    uint32_t *tag_masks;      // caller must free via d2_free_result_ext
+    int n_tags;
+    int tag_classes;
 } d2_result_ext;
 
-d2_result_ext d2_score_observations_ext(d2_observation *obs, int n_obs,
+// Score a tracklet as d2_score_observations and collect what the
+// D2_COLLECT_* bits of collect ask for.  d2_score_observations_ext collects
+// trial orbits.
+d2_result_ext d2_score_observations_collect(d2_context *ctx,
+                                            d2_observation *obs, int n_obs,
+                                            int *classes, int n_classes,
+                                            int is_ades, int collect);
+d2_result_ext d2_score_observations_ext(d2_context *ctx,
+                                         d2_observation *obs, int n_obs,
                                          int *classes, int n_classes,
                                          int is_ades);
 void d2_free_result_ext(d2_result_ext *result);
 
+// Bulk scoring.  Tracklet t is obs[offsets[t] .. offsets[t+1]); offsets has
+// n_tracklets + 1 entries.  Each tracklet is scored as by
+// d2_score_observations_collect and its result, with its own status,
+// stored in results[t].  collect is a set of D2_COLLECT_* bits.  Work is
+// spread over n_threads threads including the caller (<= 0: one per
+// online CPU).  Free each result with d2_free_result_ext.
+void d2_score_many(d2_context *ctx, d2_observation *obs, const int *offsets,
+                   int n_tracklets, int *classes, int n_classes,
+                   int is_ades, int collect, int n_threads,
+                   d2_result_ext *results);
+
+// Observations as parallel columns, in the units of d2_observation.
+typedef struct {
+    const double *mjd;
+    const double *ra;      // radians
+    const double *dec;     // radians
+    const double *vmag;
+    const int    *site;
+    const double *rmsRA;   // arcsec
+    const double *rmsDec;  // arcsec
+} d2_columns;
+
+// Columnar bulk scoring.  Like d2_score_many without trial orbits, but
+// reads tracklet t from rows offsets[t] .. offsets[t+1] of cols directly,
+// so the caller's arrays need not be repacked.
+void d2_score_columns(d2_context *ctx, const d2_columns *cols,
+                      const int64_t *offsets, int n_tracklets,
+                      int *classes, int n_classes, int is_ades,
+                      int n_threads, d2_result *results);
+
+// Observations of an MPC 80-column file as parallel columns.  Tracklet t
+// is rows offsets[t] .. offsets[t+1] and has designation desig[t] (the
+// 12-character field).  earth_obs holds 3 values per row, zero unless
+// spacebased.
+typedef struct {
+    double  *mjd;
+    double  *ra;           // radians
+    double  *dec;          // radians
+    double  *vmag;
+    int     *site;
+    int     *spacebased;
+    double  *earth_obs;
+    int64_t *offsets;
+    char   (*desig)[13];
+    int64_t  n_obs;
+    int64_t  n_tracklets;
+    int64_t  open_start;   // byte offset of the last row's line if the last
+                           // tracklet is still open at the end, else len
+    int64_t  obsCap;
+    int64_t  tkCap;
+} d2_mpc80;
+
+// Parse an MPC 80-column buffer as the CLI's readMPC80 does: lines are
+// read with the CLI's line length limit, satellite (s) and roving (v)
+// second lines complete the observation before them, and a tracklet ends
+// at a change of designation or at any line that cannot be parsed.
+// Returns D2_OK or D2_ERR_MEMORY.  Free with d2_free_mpc80 either way.
+int  d2_parse_mpc80(const char *buf, size_t len, d2_mpc80 *out);
+void d2_free_mpc80(d2_mpc80 *m);
+
 // Utilities
 int         d2_parse_obscode(const char *code3);
 int         d2_get_class_count(void);
@@ -9,6 +9,10 @@
  * "q" bin model is q, e, i, h, non-uniform bin spacing.
  */
 
+#ifndef _WIN32
+#define _POSIX_C_SOURCE 200809L   // clock_gettime under -std=c99
+#endif
+
 #include <assert.h>
 #include <math.h>
 #include <stdio.h>
@@ -92,6 +96,68 @@ void initGlobals(void) {
 #endif
 }
 
+/*
+ * initContext
+ *
+ * set a scoring context to default configuration:  1 arc second default
+ * observational error, no per-site errors, repeatable, all classes.
+ * the model and site coordinates are left for the caller to load.
+ *
+ * Precondition: initGlobals has been called (for arcsecrad).
+ */
+void initContext(d2_context *ctx) {
+    site *psite = ctx->siteTable;
+    for (int i = 0; i < obscodeNamespaceSize; i++, psite++)
+        psite->obsErr = -1;         // means unspecified
+    ctx->obsErr = 1 * arcsecrad;
+    ctx->repeatable = 1;
+    ctx->noThreshold = 0;
+    for (int c = 0; c < D2CLASSES; c++)
+        ctx->classCompute[c] = c;
+    ctx->nClassCompute = D2CLASSES;
+    ctx->maxOrbits = 0;
+    ctx->maxDistances = 0;
+    ctx->maxSeconds = 0.;
+}
+
+/*
+ * d2Seconds
+ *
+ * monotonic wall-clock time in seconds, for the scoring time limit.
+ */
+double d2Seconds(void) {
+    struct timespec ts;
+#ifdef _WIN32
+    timespec_get(&ts, TIME_UTC);
+#else
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+#endif
+    return ts.tv_sec + ts.tv_nsec * 1e-9;
+}
+
+/*
+ * overBudget (tracklet method)
+ *
+ * true once the tracklet has solved its maximum number of trial orbits
+ * (the context's, see scoreSetup), searched its maximum number of
+ * distances or run out of time.
+ * the search then unwinds and scores are computed from the bins tagged so
+ * far.  the clock is only read every 64 orbits.
+ */
+static _Bool overBudget(tracklet *tk) {
+    if (tk->partial)
+        return 1;
+    if ((tk->maxOrbits && tk->nOrbits >= tk->maxOrbits) ||
+        (tk->maxDistances && tk->nDistances >= tk->maxDistances))
+        tk->partial = 1;
+    else if (tk->deadline > 0. && tk->nOrbits >= tk->clockAt) {
+        tk->clockAt = tk->nOrbits + 64;
+        if (d2Seconds() >= tk->deadline)
+            tk->partial = 1;
+    }
+    return tk->partial;
+}
+
 /*
  * se2000
  * 
@@ -201,65 +267,94 @@ double lst(double j0, double longitude) {
 }
 
 /*
- * tagAngle (tracklet method)
- * 
- * process a single distance-angle combination.
- * 
- * Args: tk: tracklet with distance setup already done. an: angle for
- * orbit solution
- * 
- * Notes: solves orbit for passed angle, converts to bin indicies, sets
- * bin tag and updates tag count. 
+ * solveAngles (tracklet method)
+ *
+ * solve the orbits for a batch of angles at the current distance.
+ *
+ * Args: tk: tracklet with distance setup already done.  n, an: angles for
+ * orbit solutions.
+ *
+ * Returns: q, e, i of each orbit in q, e, inc.  q is -1 for orbits that
+ * fail the stability tests.
+ *
+ * Notes: the orbit math of the angle search, kept apart from the tagging
+ * so that it is a loop over independent array elements, with the
+ * distance-dependent vectors loaded once.  each element is computed
+ * exactly as a single orbit solution would be.
  */
-_Bool tagAngle(tracklet *tk, double an) {
-    double d2 = tk->observer1_object0_mag * sin(an) / sin(M_PI - an - tk->tz);
-
-    // velocity scaled by gravitational constant
-    double v[3];
-    for (int i = 0; i < 3; i++)
-        v[i] =
-                (d2 * tk->observer_object_unit[1][i] -
-                 tk->observer1_object0[i]) * tk->invdt * INV_K;
-
-    // momentum vector
-    double hv[3];
-    cross3(hv, tk->sun_object0, v);
-    double hsq = dot3(hv, hv);
-    double hm = sqrt(hsq);
-
-    // solve for semi-major axis
-    // (and the inverse--it comes in handy)
-    double vsq = dot3(v, v);
-    double temp = 2. - tk->sun_object0_mag * vsq;
-
-    // for stability, require a < 100
-    if (tk->sun_object0_mag > temp * 100.)
-        return 0;
-
-    double orbit_a = tk->sun_object0_mag / temp;
-    double inva = temp / tk->sun_object0_mag;
-
-    // solve for eccentricity
-    // (stability test on a (above) should keep result real)
-    double orbit_e = sqrt(1. - hsq * inva);
-
-    // stability test: require e < .99
-    if (orbit_e > .99)
-        return 0;
-
-    // solve for inclination.
-
-    // reliable check for i=0.  handles
-    // loss of precision in h computation.
-    _Bool izero = hv[2] >= hm;
-
-    // combination of stability tests on a and e (above) should
-    // ensure that hm is well above zero.
-    double orbit_i = izero ? 0. : acos(hv[2] / hm) * 180. / M_PI;
+static void solveAngles(const tracklet *tk, int n, const double *restrict an,
+                        double *restrict q, double *restrict e,
+                        double *restrict inc) {
+    const double o1o0mag = tk->observer1_object0_mag;
+    const double tz = tk->tz;
+    const double invdt = tk->invdt;
+    const double u0 = tk->observer_object_unit[1][0];
+    const double u1 = tk->observer_object_unit[1][1];
+    const double u2 = tk->observer_object_unit[1][2];
+    const double p0 = tk->observer1_object0[0];
+    const double p1 = tk->observer1_object0[1];
+    const double p2 = tk->observer1_object0[2];
+    const double s0 = tk->sun_object0[0];
+    const double s1 = tk->sun_object0[1];
+    const double s2 = tk->sun_object0[2];
+    const double smag = tk->sun_object0_mag;
+
+    for (int k = 0; k < n; k++) {
+        double d2 = o1o0mag * sin(an[k]) / sin(M_PI - an[k] - tz);
+
+        // velocity scaled by gravitational constant
+        double v0 = (d2 * u0 - p0) * invdt * INV_K;
+        double v1 = (d2 * u1 - p1) * invdt * INV_K;
+        double v2 = (d2 * u2 - p2) * invdt * INV_K;
+
+        // momentum vector
+        double h0 = s1 * v2 - s2 * v1;
+        double h1 = s2 * v0 - s0 * v2;
+        double h2 = s0 * v1 - s1 * v0;
+        double hsq = h0 * h0 + h1 * h1 + h2 * h2;
+        double hm = sqrt(hsq);
+
+        // solve for semi-major axis
+        // (and the inverse--it comes in handy)
+        double vsq = v0 * v0 + v1 * v1 + v2 * v2;
+        double temp = 2. - smag * vsq;
+        double orbit_a = smag / temp;
+        double inva = temp / smag;
+
+        // solve for eccentricity.  for stability, require a < 100 and
+        // e < .99; the test on a keeps e real for accepted orbits.
+        double orbit_e = sqrt(1. - hsq * inva);
+        _Bool ok = !(smag > temp * 100.) && !(orbit_e > .99);
+
+        // solve for inclination.  reliable check for i=0 handles loss
+        // of precision in h computation.
+        double orbit_i = h2 >= hm ? 0. : acos(h2 / hm) * 180. / M_PI;
+
+        q[k] = ok ? orbit_a * (1 - orbit_e) : -1.;
+        e[k] = orbit_e;
+        inc[k] = orbit_i;
+    }
+}
 
+/*
+ * tagOrbit (tracklet method)
+ *
+ * bin one orbit solved by solveAngles.
+ *
+ * Args: tk: tracklet with distance setup already done.  an: angle of the
+ * orbit solution.  q, orbit_e, orbit_i: its elements.
+ *
+ * Notes: converts elements to bin indicies, sets bin tag and updates tag
+ * count.  collects the trial orbit if requested.
+ *
+ * Returns: true if a per-distance class tag was new.
+ */
+static _Bool tagOrbit(tracklet *tk, double an, double q, double orbit_e,
+                      double orbit_i) {
     int bin[3];
-    double q = orbit_a * (1 - orbit_e);
-    if (!qeiToBin(q, orbit_e, orbit_i, bin))
+    uint32_t inClass;
+    if (q < 0. || !qeiToBinMask(q, orbit_e, orbit_i, tk->hmag, tk->classMask,
+                                bin, &inClass))
         return 0;
 
     int iq = bin[0];
@@ -298,32 +393,17 @@ _Bool tagAngle(tracklet *tk, double an) {
         }
     }
 
-    _Bool newTag = 0;
-
-    int _nCC = tk->classFilter ? tk->nClassFilter : nClassCompute;
-    int *_cC = tk->classFilter ? tk->classFilter : classCompute;
-    for (int c = 0; c < _nCC; c++) {
-        perClass *cl = tk->class + c;
-        if ((*isClass[_cC[c]])(q, orbit_e, orbit_i, tk->hmag)) {
-            if (!cl->dInClass[iq][ie][ii][ih]) {
-                cl->dInClass[iq][ie][ii][ih] = 1;
-                newTag = 1;
-            }
-        } else {
-            if (!cl->dOutOfClass[iq][ie][ii][ih]) {
-                cl->dOutOfClass[iq][ie][ii][ih] = 1;
-                newTag = 1;
-            }
-        }
-    }
+    int bi = binIndex(iq, ie, ii, ih);
+    uint32_t tags = inClass | (tk->classMask & ~inClass) << DTAG_OUT;
+    _Bool newTag = (tags & ~tk->dClassTag[bi]) != 0;
+    tk->dClassTag[bi] |= tags;
 
     if (newTag) {
         tk->dAnyTag = 1;
-        if (!tk->dTag[iq][ie][ii][ih]) {
-            tk->dTag[iq][ie][ii][ih] = 1;
+        if (!binTest(tk->dTag, bi)) {
+            binSet(tk->dTag, bi);
             if (tk->dTagCount < 512)
-                tk->dTagList[tk->dTagCount++] =
-                    ((iq * EX + ie) * IX + ii) * HX + ih;
+                tk->dTagList[tk->dTagCount++] = bi;
         }
         // Mark the collected orbit as tagging a new bin
         if (tk->orbit_buf && appended_idx >= 0) {
@@ -340,71 +420,145 @@ double tkRand(tracklet *tk) {
     return tk->rand64 * invLCGM;
 }
 
+/*
+ * angleStack
+ *
+ * intervals waiting to be split, as parallel arrays: the right halves of
+ * intervals whose left halves are being searched.
+ */
+typedef struct {
+    int n, cap;
+    double *lo, *hi;            // interval bounds
+    int *age;
+} angleStack;
+
+// push an interval, growing the stack from scratch.  false if out of memory.
+static _Bool stackPush(scratch *w, angleStack *st, double lo, double hi,
+                       int age) {
+    if (st->n == st->cap) {
+        int cap = st->cap ? 2 * st->cap : 64;
+        double *p = scratchAlloc(w, 3 * (size_t)cap);
+        if (!p)
+            return 0;
+        if (st->n > 0) {
+            memcpy(p, st->lo, st->n * sizeof(double));
+            memcpy(p + cap, st->hi, st->n * sizeof(double));
+            memcpy(p + 2 * cap, st->age, st->n * sizeof(int));
+        }
+        st->lo = p;
+        st->hi = p + cap;
+        st->age = (int *)(p + 2 * cap);
+        st->cap = cap;
+    }
+    st->lo[st->n] = lo;
+    st->hi[st->n] = hi;
+    st->age[st->n++] = age;
+    return 1;
+}
+
 /*
  * aRange (tracklet method)
  * 
- * recursive function explores the space between two angles (at a set
- * distance)
+ * explores the space between two angles (at a set distance)
  * 
  * Args: tk: tracklet with distance setup already done ang1, ang2: search
  * boundaries.
  * 
- * Algorithm: - pick mid point.  a little jiggle is thrown in to help find 
- * new bins at closely adjacent distances.
+ * Algorithm: an interval is split as follows.
+ *
+ * - pick mid point.  a little jiggle is thrown in to help find new bins
+ * at closely adjacent distances.
  * 
  * - solve angle at mid point.  if it resulted in tagging a new bin,
- * recurse both halves.
+ * split both halves.
  * 
- * - if passed angle range is sufficiently large, recurse.
+ * - if passed angle range is sufficiently large, split.
  * 
- * - age criterion: if a passed angle recently yielded a new bin, recurse. 
+ * - age criterion: if a passed angle recently yielded a new bin, split. 
+ *
+ * the search goes depth first, left half first, with an explicit stack of
+ * right halves.  an interval that is large or young splits whatever its
+ * orbit tags, so its left half is searched next: mid points are drawn down
+ * such a chain of left halves, solved together by solveAngles, then tagged
+ * in order.  draws, tags and orbits are in the order of the recursive
+ * search.
  */
-void aRange(tracklet *tk, double ang1, double ang2, int age) {
-    double d3 = (ang2 - ang1) / 3.;
-    double mid = ang1 + d3 + d3 * tkRand(tk);
-
-    // .1 rad = "sufficiently large"
-    if (tagAngle(tk, mid) || d3 > minAngleStep) {
-        aRange(tk, ang1, mid, 0);
-        aRange(tk, mid, ang2, 0);
-        return;
-    }
+#define chainCap 32             // most angles solved together
+
+void aRange(tracklet *tk, double ang1, double ang2) {
+    scratchPos mark = scratchMark(&tk->work);
+    angleStack st = {0};
+    double hi[chainCap], d3[chainCap], mid[chainCap];
+    double q[chainCap], e[chainCap], inc[chainCap];
+    double lo = ang1;
+    int age = 0;
+    _Bool more = 1;
+    hi[0] = ang2;
+
+    while (more && !overBudget(tk)) {
+        // chain k + 1 is the left half of chain k.  ages only reset, so
+        // chain k is at most age + k old.
+        int limit = chainCap;
+        if (tk->maxOrbits && limit > tk->maxOrbits - tk->nOrbits)
+            limit = tk->maxOrbits - tk->nOrbits;
+        int n = 0;
+        for (;;) {
+            d3[n] = (hi[n] - lo) / 3.;
+            mid[n] = lo + d3[n] + d3[n] * tkRand(tk);
+            // .1 rad = "sufficiently large"
+            _Bool splits = d3[n] > minAngleStep || age + n < ageLimit;
+            if (++n == limit || !splits)
+                break;
+            hi[n] = mid[n - 1];
+        }
+        solveAngles(tk, n, mid, q, e, inc);
+        tk->nOrbits += n;
+
+        more = 1;
+        for (int k = 0; k < n && more; k++) {
+            if (tagOrbit(tk, mid[k], q[k], e[k], inc[k]) ||
+                d3[k] > minAngleStep)
+                age = 0;
+            else if (age < ageLimit)
+                age++;
+            else
+                more = 0;       // only the last of the chain
+            if (more && !stackPush(&tk->work, &st, mid[k], hi[k], age)) {
+                tk->partial = 1;
+                more = 0;
+            }
+        }
 
-    if (age < ageLimit) {
-        aRange(tk, ang1, mid, age + 1);
-        aRange(tk, mid, ang2, age + 1);
+        if (more) {
+            hi[0] = mid[n - 1];
+        } else if (st.n > 0 && !tk->partial) {
+            st.n--;
+            lo = st.lo[st.n];
+            hi[0] = st.hi[st.n];
+            age = st.age[st.n];
+            more = 1;
+        }
     }
+    scratchRelease(&tk->work, mark);
 }
 
 void clearDTags(tracklet *tk) {
-    int _nCC = tk->classFilter ? tk->nClassFilter : nClassCompute;
     if (tk->dTagCount >= 512) {
         // Overflow: fall back to full memset
         memset(tk->dTag, 0, sizeof(tk->dTag));
-        perClass *cl = tk->class;
-        for (int c = 0; c < _nCC; c++, cl++) {
-            memset(cl->dInClass, 0, sizeof(cl->dInClass));
-            memset(cl->dOutOfClass, 0, sizeof(cl->dOutOfClass));
-        }
+        memset(tk->dClassTag, 0, D2BINS * sizeof(*tk->dClassTag));
     } else {
         for (int t = 0; t < tk->dTagCount; t++) {
             int idx = tk->dTagList[t];
-            int ih = idx % HX; idx /= HX;
-            int ii = idx % IX;  idx /= IX;
-            int ie = idx % EX;
-            int iq = idx / EX;
-            tk->dTag[iq][ie][ii][ih] = 0;
-            perClass *cl = tk->class;
-            for (int c = 0; c < _nCC; c++, cl++) {
-                cl->dInClass[iq][ie][ii][ih] = 0;
-                cl->dOutOfClass[iq][ie][ii][ih] = 0;
-            }
+            binClear(tk->dTag, idx);
+            tk->dClassTag[idx] = 0;
         }
     }
     tk->dTagCount = 0;
 }
 
-void updateRMSValues(double *rmsRA, double *rmsDec, double *errorFromConfig) {
+void updateRMSValues(const d2_context *ctx, double *rmsRA, double *rmsDec,
+                     double *errorFromConfig) {
 
     // if errorFromConfig is zero/missing, set it to 1.0
     if (!*errorFromConfig) *errorFromConfig = 1.0;
@@ -419,7 +573,7 @@ void updateRMSValues(double *rmsRA, double *rmsDec, double *errorFromConfig) {
         if (!*rmsRA) *rmsRA = *rmsDec;
         if (!*rmsDec) *rmsDec = *rmsRA;
 
-	if(noThreshold){
+	if(ctx->noThreshold){
 	  if (*errorFromConfig > *rmsRA ) *rmsRA  = *errorFromConfig ;
 	  if (*errorFromConfig > *rmsDec ) *rmsDec  = *errorFromConfig ;
 	}
@@ -456,7 +610,7 @@ void offsetMotionVector(tracklet *tk, int rx, int dx)
         if (tk->isAdes) {
             double rmsRA = tk->obsPair[i].rmsRA;
             double rmsDec = tk->obsPair[i].rmsDec;
-            updateRMSValues(&rmsRA, &rmsDec, &errorFromConfig);
+            updateRMSValues(tk->ctx, &rmsRA, &rmsDec, &errorFromConfig);
             dec = obsp->dec + dx * rmsDec * 0.5;
             cosdec = cos(dec);
             ra = obsp->ra + rx * rmsRA * 0.5 * cosdec;
@@ -476,6 +630,25 @@ void offsetMotionVector(tracklet *tk, int rx, int dx)
     }
 }
 
+/*
+ * setupOffsets (tracklet method)
+ *
+ * solve the observer-object unit vectors of the 3x3 grid of RA/Dec
+ * offsets searched at every distance.
+ *
+ * Notes: they depend only on the observations, so they are solved once per
+ * tracklet rather than once per distance.  with no observational error
+ * all offsets are the same and only the first is searched.
+ */
+void setupOffsets(tracklet *tk) {
+    tk->nOffsets = tk->noObsErr ? 1 : 9;
+    for (int k = 0; k < tk->nOffsets; k++) {
+        offsetMotionVector(tk, k / 3 - 1, k % 3 - 1);
+        memcpy(tk->offsetUnit[k], tk->observer_object_unit,
+               sizeof(tk->offsetUnit[k]));
+    }
+}
+
 void setupDistanceDependentVectors(tracklet *tk, double d) {
     // solve some distance dependent vectors:
     // observer_object0
@@ -556,82 +729,104 @@ _Bool solveAngleRange(tracklet *tk, double *ang1, double *ang2) {
     return 1;
 }
 
+// for one bin tagged at the current distance, promote per-distance class
+// tags to tracklet tags and add the model population of newly tagged bins
+// to the class sums.  returns true if any tag was new.
+static _Bool accumulateBin(tracklet *tk, const popModel *pm, int nCC,
+                           const int *cC, int idx)
+{
+    // model arrays are contiguous, so the flat bin index addresses them
+    const double *allSS = &pm->allSS[0][0][0][0];
+    const double *unkSS = &pm->unkSS[0][0][0][0];
+    uint32_t tags = tk->dClassTag[idx];
+    _Bool newTag = 0;
+    perClass *cl = tk->class;
+    for (int c = 0; c < nCC; c++, cl++) {
+        const double *allClass = &pm->allClass[cC[c]][0][0][0][0];
+        const double *unkClass = &pm->unkClass[cC[c]][0][0][0][0];
+        uint32_t bit = (uint32_t) 1 << cC[c];
+        if ((tags & bit) && !binTest(cl->tagInClass, idx)) {
+            newTag = 1;
+            binSet(cl->tagInClass, idx);
+            cl->sumAllInClass += allClass[idx];
+            cl->sumUnkInClass += unkClass[idx];
+        }
+        if ((tags & bit << DTAG_OUT) && !binTest(cl->tagOutOfClass, idx)) {
+            newTag = 1;
+            binSet(cl->tagOutOfClass, idx);
+            cl->sumAllOutOfClass += (allSS[idx] - allClass[idx]);
+            cl->sumUnkOutOfClass += (unkSS[idx] - unkClass[idx]);
+        }
+    }
+    if (newTag && tk->tagLog && !binTest(tk->tagLogged, idx)) {
+        binSet(tk->tagLogged, idx);
+        tk->tagLog[tk->tagLogCount++] = idx;
+    }
+    return newTag;
+}
+
+/*
+ * sumTags (tracklet method)
+ *
+ * recompute the class sums from the tracklet tags, in bin order.  for
+ * callers that merge the tags of several searches into one tracklet.
+ */
+void sumTags(tracklet *tk) {
+    const popModel *pm = tk->ctx->model;
+    const double *allSS = &pm->allSS[0][0][0][0];
+    const double *unkSS = &pm->unkSS[0][0][0][0];
+    int _nCC = tk->classFilter ? tk->nClassFilter : tk->ctx->nClassCompute;
+    int *_cC = tk->classFilter ? tk->classFilter : tk->ctx->classCompute;
+    perClass *cl = tk->class;
+    for (int c = 0; c < _nCC; c++, cl++) {
+        const double *allClass = &pm->allClass[_cC[c]][0][0][0][0];
+        const double *unkClass = &pm->unkClass[_cC[c]][0][0][0][0];
+        cl->sumAllInClass = cl->sumUnkInClass = 0.;
+        cl->sumAllOutOfClass = cl->sumUnkOutOfClass = 0.;
+        for (int w = 0; w < D2BINWORDS; w++) {
+            uint64_t in = cl->tagInClass[w];
+            uint64_t out = cl->tagOutOfClass[w];
+            for (int b = 0; in | out; b++, in >>= 1, out >>= 1) {
+                int idx = w * 64 + b;
+                if (in & 1) {
+                    cl->sumAllInClass += allClass[idx];
+                    cl->sumUnkInClass += unkClass[idx];
+                }
+                if (out & 1) {
+                    cl->sumAllOutOfClass += (allSS[idx] - allClass[idx]);
+                    cl->sumUnkOutOfClass += (unkSS[idx] - unkClass[idx]);
+                }
+            }
+        }
+    }
+}
+
 _Bool searchAngles(tracklet *tk) {
     double ang1, ang2;
     if (!solveAngleRange(tk, &ang1, &ang2))
         return 0;
 
-    aRange(tk, ang1, ang2, 0);
+    aRange(tk, ang1, ang2);
 
     if (!tk->dAnyTag)
         return 0;
 
+    const popModel *pm = tk->ctx->model;
     _Bool newTag = 0;
-    int _nCC = tk->classFilter ? tk->nClassFilter : nClassCompute;
-    int *_cC = tk->classFilter ? tk->classFilter : classCompute;
+    int _nCC = tk->classFilter ? tk->nClassFilter : tk->ctx->nClassCompute;
+    int *_cC = tk->classFilter ? tk->classFilter : tk->ctx->classCompute;
 
     if (tk->dTagCount >= 512) {
-        // Overflow: fall back to dense scan
-        for (int iq = 0; iq < QX; iq++)
-            for (int ie = 0; ie < EX; ie++)
-                for (int ii = 0; ii < IX; ii++)
-                    for (int ih = 0; ih < HX; ih++)
-                        if (tk->dTag[iq][ie][ii][ih]) {
-                            perClass *cl = tk->class;
-                            for (int c = 0; c < _nCC; c++, cl++) {
-                                if (cl->dInClass[iq][ie][ii][ih]
-                                    && !cl->tagInClass[iq][ie][ii][ih]) {
-                                    newTag = 1;
-                                    cl->tagInClass[iq][ie][ii][ih] = 1;
-                                    cl->sumAllInClass +=
-                                            modelAllClass[_cC[c]][iq][ie][ii][ih];
-                                    cl->sumUnkInClass +=
-                                            modelUnkClass[_cC[c]][iq][ie][ii][ih];
-                                }
-                                if (cl->dOutOfClass[iq][ie][ii][ih]
-                                    && !cl->tagOutOfClass[iq][ie][ii][ih]) {
-                                    newTag = 1;
-                                    cl->tagOutOfClass[iq][ie][ii][ih] = 1;
-                                    cl->sumAllOutOfClass +=
-                                            (modelAllSS[iq][ie][ii][ih]
-                                             - modelAllClass[_cC[c]][iq][ie][ii][ih]);
-                                    cl->sumUnkOutOfClass +=
-                                            (modelUnkSS[iq][ie][ii][ih]
-                                             - modelUnkClass[_cC[c]][iq][ie][ii][ih]);
-                                }
-                            }
-                        }
-    } else {
-        for (int t = 0; t < tk->dTagCount; t++) {
-            int idx = tk->dTagList[t];
-            int ih = idx % HX; idx /= HX;
-            int ii = idx % IX;  idx /= IX;
-            int ie = idx % EX;
-            int iq = idx / EX;
-            perClass *cl = tk->class;
-            for (int c = 0; c < _nCC; c++, cl++) {
-                if (cl->dInClass[iq][ie][ii][ih]
-                    && !cl->tagInClass[iq][ie][ii][ih]) {
-                    newTag = 1;
-                    cl->tagInClass[iq][ie][ii][ih] = 1;
-                    cl->sumAllInClass +=
-                            modelAllClass[_cC[c]][iq][ie][ii][ih];
-                    cl->sumUnkInClass +=
-                            modelUnkClass[_cC[c]][iq][ie][ii][ih];
-                }
-                if (cl->dOutOfClass[iq][ie][ii][ih]
-                    && !cl->tagOutOfClass[iq][ie][ii][ih]) {
-                    newTag = 1;
-                    cl->tagOutOfClass[iq][ie][ii][ih] = 1;
-                    cl->sumAllOutOfClass +=
-                            (modelAllSS[iq][ie][ii][ih]
-                             - modelAllClass[_cC[c]][iq][ie][ii][ih]);
-                    cl->sumUnkOutOfClass +=
-                            (modelUnkSS[iq][ie][ii][ih]
-                             - modelUnkClass[_cC[c]][iq][ie][ii][ih]);
-                }
-            }
+        // Overflow: fall back to a scan of the whole dTag set, in bin order
+        for (int w = 0; w < D2BINWORDS; w++) {
+            uint64_t word = tk->dTag[w];
+            for (int b = 0; word; b++, word >>= 1)
+                if (word & 1)
+                    newTag |= accumulateBin(tk, pm, _nCC, _cC, w * 64 + b);
         }
+    } else {
+        for (int t = 0; t < tk->dTagCount; t++)
+            newTag |= accumulateBin(tk, pm, _nCC, _cC, tk->dTagList[t]);
     }
 
     return newTag;
@@ -657,19 +852,22 @@ _Bool searchAngles(tracklet *tk) {
  * no bins that hadn't been seen at other distances. 
  */
 _Bool searchDistance(tracklet *tk, double d) {
+    if (overBudget(tk))
+        return 0;
+    tk->nDistances++;
     clearDTags(tk);
     tk->dAnyTag = 0;
     _Bool newTag = 0;
 
-    for (int ri = -1; ri <= 1; ri++)
-        for (int di = -1; di <= 1; di++) {
-            offsetMotionVector(tk, ri, di);
-            setupDistanceDependentVectors(tk, d);
-            if (searchAngles(tk))
-                newTag = 1;
-            if (tk->noObsErr)
-                return newTag;
-        }
+    for (int k = 0; k < tk->nOffsets; k++) {
+        memcpy(tk->observer_object_unit, tk->offsetUnit[k],
+               sizeof(tk->observer_object_unit));
+        setupDistanceDependentVectors(tk, d);
+        if (searchAngles(tk))
+            newTag = 1;
+        if (tk->partial)
+            break;
+    }
     return newTag;
 }
 
@@ -690,6 +888,8 @@ _Bool searchDistance(tracklet *tk, double d) {
  * - if young, recurse 
  */
 void dRange(tracklet *tk, double d1, double d2, int age) {
+    if (tk->partial)
+        return;
     double dmid = (d1 + d2) * .5;
 
     // .2 au = "big"
@@ -762,6 +962,67 @@ void transpose3(double m[3][3]) {
     m[2][1] = t;
 }
 
+/*
+ * scratch space (see digest2.h).
+ *
+ * scratchAlloc returns n doubles from the current block, moving on to a
+ * later (free) block or appending a new one when the current block is
+ * full.  scratchRelease returns everything allocated since the matching
+ * scratchMark.  returns NULL only if a new block can't be allocated.
+ */
+double *scratchAlloc(scratch *s, size_t n) {
+    scratchBlock *b = s->cur ? s->cur : s->first;
+    scratchBlock *last = NULL;
+    // blocks after cur are unused; skip any too small for this request
+    while (b && b->cap - b->used < n) {
+        last = b;
+        b = b->next;
+    }
+    if (!b) {
+        size_t cap = last && 2 * last->cap > 4096 ? 2 * last->cap : 4096;
+        if (cap < n)
+            cap = n;
+        b = (scratchBlock *)malloc(sizeof(scratchBlock) + cap * sizeof(double));
+        if (!b)
+            return NULL;
+        b->next = NULL;
+        b->cap = cap;
+        b->used = 0;
+        if (last)
+            last->next = b;
+        else
+            s->first = b;
+    }
+    s->cur = b;
+    double *p = b->data + b->used;
+    b->used += n;
+    return p;
+}
+
+scratchPos scratchMark(const scratch *s) {
+    scratchPos pos = {s->cur, s->cur ? s->cur->used : 0};
+    return pos;
+}
+
+void scratchRelease(scratch *s, scratchPos pos) {
+    scratchBlock *b = pos.block ? pos.block->next : s->first;
+    for (; b; b = b->next)
+        b->used = 0;
+    if (pos.block)
+        pos.block->used = pos.used;
+    s->cur = pos.block;
+}
+
+void scratchFree(scratch *s) {
+    scratchBlock *b = s->first;
+    while (b) {
+        scratchBlock *next = b->next;
+        free(b);
+        b = next;
+    }
+    s->first = s->cur = NULL;
+}
+
 /*
  * gcFit
  * 
@@ -773,9 +1034,10 @@ void transpose3(double m[3][3]) {
  */
 void gcFit(gcfparam *gcf, double *mjd, double (*sphr)[2]) {
     int nObs = gcf->nObs;
+    scratchPos mark = scratchMark(gcf->work);
 
     // convert obs to cartesian
-    double (*cart)[3] = (double (*)[3])malloc(nObs * sizeof(double[3]));
+    double (*cart)[3] = (double (*)[3])scratchAlloc(gcf->work, nObs * 3);
     dSphr2Cart(nObs, sphr, cart);
 
     // vector normal to motion
@@ -813,7 +1075,7 @@ void gcFit(gcfparam *gcf, double *mjd, double (*sphr)[2]) {
     gcf->mRot[2][2] = cosa;
 
     // rotate all of cart
-    double (*rotated)[3] = (double (*)[3])malloc(nObs * sizeof(double[3]));
+    double (*rotated)[3] = (double (*)[3])scratchAlloc(gcf->work, nObs * 3);
     mult3(nObs, rotated, gcf->mRot, cart);
 
     // transpose rotation array so it will derotate, after least-squares
@@ -825,13 +1087,12 @@ void gcFit(gcfparam *gcf, double *mjd, double (*sphr)[2]) {
     if (fabs(rotated[0][2]) > rtol || fabs(rotated[nObs - 1][2]) > rtol) {
         fprintf(stderr, "%f %f %f\n", rotated[0][2], rotated[nObs - 1][2], rtol);
         fputs("*** rotation failed ***\n", stderr);
-        free(cart);
-        free(rotated);
+        scratchRelease(gcf->work, mark);
         exit(-1);
     }
     // convert back to spherical coordinates for adjustment.
     // (this does the cylindrical projection.)
-    double (*rs)[2] = (double (*)[2])malloc(nObs * sizeof(double[2]));
+    double (*rs)[2] = (double (*)[2])scratchAlloc(gcf->work, nObs * 2);
     dCart2Sphr(nObs, rotated, rs);
 
     // normalize ra to near 0 to avoid wraparound problems
@@ -842,7 +1103,7 @@ void gcFit(gcfparam *gcf, double *mjd, double (*sphr)[2]) {
 
     // normalize time to near 0 to maintain precision
     double t0;
-    double *ntime = (double *)malloc(nObs * sizeof(double));
+    double *ntime = scratchAlloc(gcf->work, nObs);
     gcf->t0 = t0 = mjd[0];
     for (int i = 0; i < nObs; i++)
         ntime[i] = mjd[i] - t0;
@@ -879,10 +1140,7 @@ void gcFit(gcfparam *gcf, double *mjd, double (*sphr)[2]) {
         gcf->dr = invd * (nObs * sumtdec - sumdec * sumt);
     }
 
-    free(cart);
-    free(rotated);
-    free(rs);
-    free(ntime);
+    scratchRelease(gcf->work, mark);
 }
 
 void gcPos(gcfparam *gcf, double t, double *ra, double *dec) {
@@ -907,9 +1165,10 @@ void gcPos(gcfparam *gcf, double t, double *ra, double *dec) {
 
 void gcRes(gcfparam *gcf, double (*res)[2]) {
     int nObs = gcf->nObs;
+    scratchPos mark = scratchMark(gcf->work);
 
     // computed positions on fitted great circle
-    double (*rsc)[2] = (double (*)[2])malloc(nObs * sizeof(double[2]));
+    double (*rsc)[2] = (double (*)[2])scratchAlloc(gcf->work, nObs * 2);
     for (int i = 0; i < nObs; i++) {
         rsc[i][0] = gcf->r0 + gcf->rr * gcf->ntime[i];
         rsc[i][1] = gcf->d0 + gcf->dr * gcf->ntime[i];
@@ -926,16 +1185,16 @@ void gcRes(gcfparam *gcf, double (*res)[2]) {
     }
 
     // rotate both back up to original place in the sky
-    double (*rco)[3] = (double (*)[3])malloc(nObs * sizeof(double[3]));
-    double (*rcc)[3] = (double (*)[3])malloc(nObs * sizeof(double[3]));
+    double (*rco)[3] = (double (*)[3])scratchAlloc(gcf->work, nObs * 3);
+    double (*rcc)[3] = (double (*)[3])scratchAlloc(gcf->work, nObs * 3);
     dSphr2Cart(nObs, gcf->rs, rco);
     dSphr2Cart(nObs, rsc, rcc);
-    double (*co)[3] = (double (*)[3])malloc(nObs * sizeof(double[3]));
-    double (*cc)[3] = (double (*)[3])malloc(nObs * sizeof(double[3]));
+    double (*co)[3] = (double (*)[3])scratchAlloc(gcf->work, nObs * 3);
+    double (*cc)[3] = (double (*)[3])scratchAlloc(gcf->work, nObs * 3);
     mult3(nObs, co, gcf->mRot, rco);
     mult3(nObs, cc, gcf->mRot, rcc);
-    double (*so)[2] = (double (*)[2])malloc(nObs * sizeof(double[2]));
-    double (*sc)[2] = (double (*)[2])malloc(nObs * sizeof(double[2]));
+    double (*so)[2] = (double (*)[2])scratchAlloc(gcf->work, nObs * 2);
+    double (*sc)[2] = (double (*)[2])scratchAlloc(gcf->work, nObs * 2);
     dCart2Sphr(nObs, co, so);
     dCart2Sphr(nObs, cc, sc);
 
@@ -944,13 +1203,7 @@ void gcRes(gcfparam *gcf, double (*res)[2]) {
         res[i][0] = (so[i][0] - sc[i][0]) * cos(sc[i][1]) / arcsecrad;
     }
 
-    free(rsc);
-    free(rco);
-    free(rcc);
-    free(co);
-    free(cc);
-    free(so);
-    free(sc);
+    scratchRelease(gcf->work, mark);
 }
 
 /*
@@ -977,9 +1230,10 @@ double gcRmsRes(gcfparam *gcf, double (*res)[2]) {
  * just return the Rms, never mind the residuals. 
  */
 double gcRms(gcfparam *gcf) {
-    double (*res)[2] = (double (*)[2])malloc(gcf->nObs * sizeof(double[2]));
+    scratchPos mark = scratchMark(gcf->work);
+    double (*res)[2] = (double (*)[2])scratchAlloc(gcf->work, gcf->nObs * 2);
     double result = gcRmsRes(gcf, res);
-    free(res);
+    scratchRelease(gcf->work, mark);
     return result;
 }
 
@@ -992,7 +1246,7 @@ double gcRmsPrimeAdes(tracklet *tk) {
     for (int i = 0; i < tk->lines; i++) {
         rmsDec = tk->olist[i].rmsDec / arcsecrad;
         rmsRA = tk->olist[i].rmsRA / arcsecrad;
-	if(noThreshold){
+	if(tk->ctx->noThreshold){
         s += rmsRA * rmsRA + rmsDec * rmsDec;
         }
         else{
@@ -1033,7 +1287,7 @@ double gcRmsPrimeMPC(tracklet *tk) {
 
 double
 oneObs(int o1, int o2, _Bool arcsUseAllObs, double pt,
-       observation *olist, observation *result) {
+       observation *olist, observation *result, scratch *work) {
     // a default result
     memcpy(result, olist + o1, sizeof(observation));
 
@@ -1073,6 +1327,7 @@ oneObs(int o1, int o2, _Bool arcsUseAllObs, double pt,
         double rs[2][2];
         gcf.ntime = nt;
         gcf.rs = rs;
+        gcf.work = work;
         gcFit(&gcf, t, s);
         // ? gc  midpoint : gc at pt
         result->mjd = arcsUseAllObs ? (olist[o1].mjd + olist[o2].mjd) * .5 : pt;
@@ -1101,8 +1356,9 @@ oneObs(int o1, int o2, _Bool arcsUseAllObs, double pt,
 
     // gc fit, result is computed obs at time tr
     int np = o2 - o1 + 1;
-    double *t = (double *)malloc(np * sizeof(double));
-    double (*c)[2] = (double (*)[2])malloc(np * sizeof(double[2]));
+    scratchPos mark = scratchMark(work);
+    double *t = scratchAlloc(work, np);
+    double (*c)[2] = (double (*)[2])scratchAlloc(work, np * 2);
     observation *obsp = olist + o1;
     for (int i = 0; i < np; i++, obsp++) {
         t[i] = obsp->mjd;
@@ -1111,19 +1367,17 @@ oneObs(int o1, int o2, _Bool arcsUseAllObs, double pt,
     }
     gcfparam gcf;
     gcf.nObs = np;
-    double *nt = (double *)malloc(np * sizeof(double));
-    double (*rs)[2] = (double (*)[2])malloc(np * sizeof(double[2]));
+    double *nt = scratchAlloc(work, np);
+    double (*rs)[2] = (double (*)[2])scratchAlloc(work, np * 2);
     gcf.ntime = nt;
     gcf.rs = rs;
+    gcf.work = work;
     gcFit(&gcf, t, c);
     memcpy(result, olist + o1, sizeof(observation));
     result->mjd = tr;
     gcPos(&gcf, tr, &result->ra, &result->dec);
     double rms_val = gcRms(&gcf);
-    free(t);
-    free(c);
-    free(nt);
-    free(rs);
+    scratchRelease(work, mark);
     return rms_val;
 }
 
@@ -1146,8 +1400,10 @@ void twoObs(tracklet *tk, double rms[]) {
     // > 2 obs, do a great circle fit over all obs to get rms return
     // value.
     // Fit may also be used in some cases for synthesizing observations.
-    double *t = (double *)malloc(nObs * sizeof(double));
-    double (*c)[2] = (double (*)[2])malloc(nObs * sizeof(double[2]));
+    scratch *work = &tk->work;
+    scratchPos mark = scratchMark(work);
+    double *t = scratchAlloc(work, nObs);
+    double (*c)[2] = (double (*)[2])scratchAlloc(work, nObs * 2);
     observation *obsp = olist;
     for (int i = 0; i < nObs; i++, obsp++) {
         t[i] = obsp->mjd;
@@ -1156,10 +1412,11 @@ void twoObs(tracklet *tk, double rms[]) {
     }
     gcfparam gcf;
     gcf.nObs = nObs;
-    double *nt = (double *)malloc(nObs * sizeof(double));
-    double (*rs)[2] = (double (*)[2])malloc(nObs * sizeof(double[2]));
+    double *nt = scratchAlloc(work, nObs);
+    double (*rs)[2] = (double (*)[2])scratchAlloc(work, nObs * 2);
     gcf.ntime = nt;
     gcf.rs = rs;
+    gcf.work = work;
     gcFit(&gcf, t, c);
     tk->rms = gcRms(&gcf);
 
@@ -1172,8 +1429,8 @@ void twoObs(tracklet *tk, double rms[]) {
         if (obsp->site != olist->site)
             allSame = 0;
 
-        if (siteTable[obsp->site].rhoCosPhi == 0 &&
-            siteTable[obsp->site].rhoSinPhi == 0){
+        if (tk->ctx->siteTable[obsp->site].rhoCosPhi == 0 &&
+            tk->ctx->siteTable[obsp->site].rhoSinPhi == 0){
             spaceBased = 1;
         }
     }
@@ -1261,23 +1518,21 @@ void twoObs(tracklet *tk, double rms[]) {
     } while (o2 > o1 + 1);
 
     // handle each arc
-    rms[0] = oneObs(0, o1, o2 == o1 + 1, t17, olist, &tk->obsPair[0]);
-    rms[1] = oneObs(o2, nObs - 1, o2 == o1 + 1, t83, olist, &tk->obsPair[1]);
+    rms[0] = oneObs(0, o1, o2 == o1 + 1, t17, olist, &tk->obsPair[0], work);
+    rms[1] = oneObs(o2, nObs - 1, o2 == o1 + 1, t83, olist, &tk->obsPair[1],
+                    work);
 
 twoObs_cleanup:
-    free(t);
-    free(c);
-    free(nt);
-    free(rs);
+    scratchRelease(work, mark);
 }
 
-double clipErr(double computedRms, site *sitep) {
+double clipErr(const d2_context *ctx, double computedRms, const site *sitep) {
     // look for config file specified obs err for this site
     double defaultErr = sitep->obsErr;
     if (defaultErr == -1)
         // not there, fall back on default (which also may been specified
         // in the config file, or may be hard coded default.)
-        defaultErr = obsErr;
+        defaultErr = ctx->obsErr;
 
     if (defaultErr == 0)
         // if obs err is configured to be zero, that
@@ -1303,6 +1558,7 @@ double clipErr(double computedRms, site *sitep) {
  * 
  * Preconditions:
  * - all globals must be initialized.
+ * - tk->ctx must point to a context with model and site table loaded.
  * - tk->status must be UNPROC
  * - tk->olist must have valid observations
  * - tk->lines must say how many
@@ -1310,8 +1566,43 @@ double clipErr(double computedRms, site *sitep) {
  * - tk->rand must be odd.
  * - with exception of tk->desig and tk->obsCap, which are not used,
  * everything else in tk must be zero. 
+ *
+ * if the context sets a work budget, the search stops when it runs out;
+ * tk->partial is then set and the scores cover the bins tagged so far.
+ * tk->nOrbits and tk->nDistances report the work done either way.
+ *
+ * score is scoreSetup, scoreSearch and scoreFinish in turn.  a caller
+ * may replace scoreSearch with its own search that leaves the tracklet
+ * tags and class sums as scoreSearch would.
  */
 void score(tracklet *tk) {
+    scoreSetup(tk);
+    scoreSearch(tk);
+    scoreFinish(tk);
+}
+
+/*
+ * scoreSetup (tracklet method)
+ *
+ * everything score does before the search:  budget, class mask, the motion
+ * vector and the distance independent vectors.
+ */
+void scoreSetup(tracklet *tk) {
+    tk->nOrbits = 0;
+    tk->nDistances = 0;
+    tk->partial = 0;
+    tk->clockAt = 0;
+    tk->deadline = tk->ctx->maxSeconds > 0.
+                   ? d2Seconds() + tk->ctx->maxSeconds : 0.;
+    tk->maxOrbits = tk->ctx->maxOrbits;
+    tk->maxDistances = tk->ctx->maxDistances;
+
+    int _nCC = tk->classFilter ? tk->nClassFilter : tk->ctx->nClassCompute;
+    int *_cC = tk->classFilter ? tk->classFilter : tk->ctx->classCompute;
+    tk->classMask = 0;
+    for (int c = 0; c < _nCC; c++)
+        tk->classMask |= (uint32_t) 1 << _cC[c];
+
     // sythesize or select two observations to determine motion vector
     double rms[2];
     rms[0] = rms[1] = 0;
@@ -1324,8 +1615,8 @@ void score(tracklet *tk) {
     // solve vectors at observation times
     observation *obsp = tk->obsPair;
     for (int i = 0; i < 2; i++, obsp++) {
-        site *sitep = siteTable + obsp->site;
-        tk->obsErr[i] = clipErr(rms[i], sitep);
+        const site *sitep = tk->ctx->siteTable + obsp->site;
+        tk->obsErr[i] = clipErr(tk->ctx, rms[i], sitep);
         double sun_earth[3];
         se2000(obsp->mjd, sun_earth, &tk->soe, &tk->coe);
 
@@ -1345,20 +1636,76 @@ void score(tracklet *tk) {
     }
     if (tk->obsErr[0] == 0. && tk->obsErr[1] == 0.)
         tk->noObsErr = 1;
+    setupOffsets(tk);
+}
+
+/*
+ * scoreSearch (tracklet method)
+ *
+ * search distance and angle space over tk->nOffsets motion vector
+ * offsets, tagging bins and accumulating class sums.
+ */
+void scoreSearch(tracklet *tk) {
     searchDistance(tk, MIN_DISTANCE);
     searchDistance(tk, MAX_DISTANCE);
     dRange(tk, MIN_DISTANCE, MAX_DISTANCE, 0);
+}
+
+// fill b[lo..hi] with the distances dRange splits b[lo]..b[hi] at.
+static void splitBounds(double *b, int lo, int hi) {
+    if (hi - lo < 2)
+        return;
+    int mid = (lo + hi) / 2;
+    b[mid] = (b[lo] + b[hi]) * .5;
+    splitBounds(b, lo, mid);
+    splitBounds(b, mid, hi);
+}
+
+/*
+ * searchTaskBounds
+ *
+ * divide the distance range into D2SEARCHTASKS tasks for a split search.
+ *
+ * Notes: dRange splits every range wider than minDistanceStep regardless
+ * of tags, so the first levels of its recursion are fixed.  the tasks are
+ * the subtrees below them:  task j is the range bounds[j]..bounds[j+1],
+ * the same ranges dRange visits.  D2SEARCHTASKS must be a power of two
+ * and the ranges wider than minDistanceStep.
+ */
+void searchTaskBounds(double bounds[D2SEARCHTASKS + 1]) {
+    bounds[0] = MIN_DISTANCE;
+    bounds[D2SEARCHTASKS] = MAX_DISTANCE;
+    splitBounds(bounds, 0, D2SEARCHTASKS);
+}
 
+/*
+ * searchTask (tracklet method)
+ *
+ * search task j of searchTaskBounds.  run on tracklets with their own
+ * tags, the tasks together search the distances scoreSearch does; the
+ * midpoints dRange searches above the tasks are their lower bounds.
+ */
+void searchTask(tracklet *tk, const double bounds[D2SEARCHTASKS + 1], int j) {
+    searchDistance(tk, bounds[j]);
+    if (j == D2SEARCHTASKS - 1)
+        searchDistance(tk, MAX_DISTANCE);
+    dRange(tk, bounds[j], bounds[j + 1], 0);
+}
+
+/*
+ * scoreFinish (tracklet method)
+ *
+ * RMS' and the scores, from the class sums left by the search.
+ */
+void scoreFinish(tracklet *tk) {
     if (tk->isAdes) {
         tk->rmsPrime = gcRmsPrimeAdes(tk);
         if (tk->rmsPrime == 0)
             tk->rmsPrime = gcRmsPrimeMPC(tk);
     }
 
-
-
-    int _nCC = tk->classFilter ? tk->nClassFilter : nClassCompute;
-    int *_cC = tk->classFilter ? tk->classFilter : classCompute;
+    int _nCC = tk->classFilter ? tk->nClassFilter : tk->ctx->nClassCompute;
+    int *_cC = tk->classFilter ? tk->classFilter : tk->ctx->classCompute;
     perClass *cl = tk->class;
     for (int c = 0; c < _nCC; c++, cl++) {
         double d = cl->sumAllInClass + cl->sumAllOutOfClass;
@@ -12,11 +12,6 @@
 #define M_PI 3.14159265358979323846264338327
 #endif
 
-double modelAllSS[QX][EX][IX][HX];
-double modelUnkSS[QX][EX][IX][HX];
-double modelAllClass[D2CLASSES][QX][EX][IX][HX];
-double modelUnkClass[D2CLASSES][QX][EX][IX][HX];
-
 double qpart[QX] = { .4, .7, .8, .9, 1., 1.1, 1.2, 1.3, 1.4, 1.5,
   1.67, 1.8, 2., 2.2, 2.4, 2.6, 2.8, 3., 3.2, 3.5,
   4., 4.5, 5., 5.5, 10., 20., 30., 40., 100.
@@ -45,18 +40,26 @@ _Bool qeihToBin(double q, double e, double i, double h, int bin[4])
   return r;
 }
 
+// number of partitions in p[0..n-1], ascending, that x is >= to.  this is
+// the bin index of x, or n if x is beyond the last partition.
+static int partIndex(const double *p, int n, double x)
+{
+  int lo = 0, hi = n;
+  while (lo < hi) {
+    int mid = (lo + hi) >> 1;
+    if (x >= p[mid])
+      lo = mid + 1;
+    else
+      hi = mid;
+  }
+  return lo;
+}
+
 _Bool qeiToBin(double q, double e, double i, int bin[3])
 {
-  for (bin[0] = 0; q >= qpart[bin[0]]; ++bin[0])
-    if (bin[0] == QX)
-      return 0;
-  for (bin[1] = 0; e >= epart[bin[1]]; ++bin[1])
-    if (bin[1] == EX)
-      return 0;
-  for (bin[2] = 0; i >= ipart[bin[2]]; ++bin[2])
-    if (bin[2] == IX)
-      return 0;
-  return 1;
+  return (bin[0] = partIndex(qpart, QX, q)) < QX &&
+      (bin[1] = partIndex(epart, EX, e)) < EX &&
+      (bin[2] = partIndex(ipart, IX, i)) < IX;
 }
 
 int hToBin(double h)
@@ -66,136 +69,131 @@ int hToBin(double h)
   return ih;
 }
 
+/* class tests
+
+each class is tested on elements q, e, i, h and on a = q / (1 - e) and
+Q = q * (1 + e) / (1 - e), which most of the tests share.  the isClass
+functions and qeiToBinMask are both built on these, so they agree.
+*/
+
 // 'MPC interesting' objects
 // The definition of MPC interesting implemented here is:
 // any of: q < 1.3, e > .5, i > 40, or Q > 10
-_Bool isMpcint(double q, double e, double i, double h)
+static inline _Bool inMpcint(double q, double e, double i, double h,
+                             double a, double bigQ)
 {
-    return q < 1.3 || e >= .5 || i >= 40. || q * (1. + e) / (1. - e) > 10.;
+  return q < 1.3 || e >= .5 || i >= 40. || bigQ > 10.;
 }
 
 // 'NEO' objects
 // The definition of NEO implemented here is q < 1.3
-_Bool isNeo(double q, double e, double i, double h)
+static inline _Bool inNeo(double q, double e, double i, double h,
+                          double a, double bigQ)
 {
   return q < 1.3;
 }
 
 // H18 NEOs
 // H rounded to nearest integer <= 18
-_Bool isH18Neo(double q, double e, double i, double h)
+static inline _Bool inH18Neo(double q, double e, double i, double h,
+                             double a, double bigQ)
 {
   return q < 1.3 && h < 18.5;
 }
 
 // H22 NEOs
 // H rounded to nearest integer <= 22
-_Bool isH22Neo(double q, double e, double i, double h)
+static inline _Bool inH22Neo(double q, double e, double i, double h,
+                             double a, double bigQ)
 {
   return q < 1.3 && h < 22.5;
 }
 
 // Mars Crosser
 // 1.3 <= q < 1.67, Q > 1.58
-_Bool isMarsCrosser(double q, double e, double i, double h)
+static inline _Bool inMarsCrosser(double q, double e, double i, double h,
+                                  double a, double bigQ)
 {
-  return q < 1.67 && q >= 1.3 && q * (1 + e) / (1 - e) > 1.58;
+  return q < 1.67 && q >= 1.3 && bigQ > 1.58;
 }
 
 // Hungarias
 // 1.78>a>2.0, e<.18, 16 < i < 28
 // (a node test would be nice...)
-_Bool isHungaria(double q, double e, double i, double h)
+static inline _Bool inHungaria(double q, double e, double i, double h,
+                               double a, double bigQ)
 {
-  if (e > .18 || i < 16 || i > 34)
-    return 0;
-  double a = q / (1 - e);
-  return a < 2 && a > 1.78;
+  return !(e > .18 || i < 16 || i > 34) && a < 2 && a > 1.78;
 }
 
 // Phocaeas
 // q>1.5, 2.2<a<2.45, 20<i<27
-_Bool isPhocaea(double q, double e, double i, double h)
+static inline _Bool inPhocaea(double q, double e, double i, double h,
+                              double a, double bigQ)
 {
-  if (q < 1.5 || i < 20 || i > 27)
-    return 0;
-  double a = q / (1 - e);
-  return a < 2.45 && a > 2.2;
+  return !(q < 1.5 || i < 20 || i > 27) && a < 2.45 && a > 2.2;
 }
 
 // Inner Main Belt
 // q>1.67, 2.1<a<2.5, i<7 at inner edge, <17 at outer
-_Bool isInnerMB(double q, double e, double i, double h)
+static inline _Bool inInnerMB(double q, double e, double i, double h,
+                              double a, double bigQ)
 {
-  if (q < 1.67)
-    return 0;
-  double a = q / (1 - e);
-  return a < 2.5 && a > 2.1 && i < ((a - 2.1) / .4) * 10 + 7;
+  return !(q < 1.67) && a < 2.5 && a > 2.1 && i < ((a - 2.1) / .4) * 10 + 7;
 }
 
 // Hansas
 // 2.55<a<2.72 e<.25, 20<i<23.5
-_Bool isHansa(double q, double e, double i, double h)
+static inline _Bool inHansa(double q, double e, double i, double h,
+                            double a, double bigQ)
 {
-  if (e > .25 || i < 20 || i > 23.5)
-    return 0;
-  double a = q / (1 - e);
-  return a < 2.72 && a > 2.55;
+  return !(e > .25 || i < 20 || i > 23.5) && a < 2.72 && a > 2.55;
 }
 
 // Pallas group
 // 2.5<a<2.8, e<.35, 24<i<37
-_Bool isPallas(double q, double e, double i, double h)
+static inline _Bool inPallas(double q, double e, double i, double h,
+                             double a, double bigQ)
 {
-  if (e > .35 || i < 24 || i > 37)
-    return 0;
-  double a = q / (1 - e);
-  return a < 2.8 && a > 2.5;
+  return !(e > .35 || i < 24 || i > 37) && a < 2.8 && a > 2.5;
 }
 
 // Mid Main Belt
 // 2.5<a<2.8, e<.45, i<20
-_Bool isMidMB(double q, double e, double i, double h)
+static inline _Bool inMidMB(double q, double e, double i, double h,
+                            double a, double bigQ)
 {
-  if (e > .45 || i > 20)
-    return 0;
-  double a = q / (1 - e);
-  return a < 2.8 && a > 2.5;
+  return !(e > .45 || i > 20) && a < 2.8 && a > 2.5;
 }
 
 // Outer Main Belt
 //  2.8<a<3.25 e<.4, i < 20 inner edge, i < 36 outer edge
-_Bool isOuterMB(double q, double e, double i, double h)
+static inline _Bool inOuterMB(double q, double e, double i, double h,
+                              double a, double bigQ)
 {
-  if (e > .4)
-    return 0;
-  double a = q / (1 - e);
-  return a > 2.8 && a < 3.25 && i < ((a - 2.8) / .45) * 16 + 20;
+  return !(e > .4) && a > 2.8 && a < 3.25 && i < ((a - 2.8) / .45) * 16 + 20;
 }
 
 // Hildas
 // 3.9<a<4.02, e<.4, i<18
-_Bool isHilda(double q, double e, double i, double h)
+static inline _Bool inHilda(double q, double e, double i, double h,
+                            double a, double bigQ)
 {
-  if (i > 18 || e > .4)
-    return 0;
-  double a = q / (1 - e);
-  return a > 3.9 && a < 4.02;
+  return !(i > 18 || e > .4) && a > 3.9 && a < 4.02;
 }
 
 // Trojans
 // 5.05<a<5.35, e<.22, i<38
-_Bool isTrojan(double q, double e, double i, double h)
+static inline _Bool inTrojan(double q, double e, double i, double h,
+                             double a, double bigQ)
 {
-  if (e > .22 || i > 38)
-    return 0;
-  double a = q / (1 - e);
-  return a > 5.05 && a < 5.35;
+  return !(e > .22 || i > 38) && a > 5.05 && a < 5.35;
 }
 
 // Jupiter Family Comets
 // 2 < Tj < 3, q >= 1.3
-_Bool isJFC(double q, double e, double i, double h)
+static inline _Bool inJFC(double q, double e, double i, double h,
+                          double a, double bigQ)
 {
   if (q < 1.3)
     return 0;
@@ -204,6 +202,66 @@ _Bool isJFC(double q, double e, double i, double h)
   return t < 3 && t > 2;
 }
 
+#define CLASS_TEST(isName, inName) \
+  _Bool isName(double q, double e, double i, double h) \
+  { \
+    return inName(q, e, i, h, q / (1 - e), q * (1. + e) / (1. - e)); \
+  }
+
+CLASS_TEST(isMpcint, inMpcint)
+CLASS_TEST(isNeo, inNeo)
+CLASS_TEST(isH18Neo, inH18Neo)
+CLASS_TEST(isH22Neo, inH22Neo)
+CLASS_TEST(isMarsCrosser, inMarsCrosser)
+CLASS_TEST(isHungaria, inHungaria)
+CLASS_TEST(isPhocaea, inPhocaea)
+CLASS_TEST(isInnerMB, inInnerMB)
+CLASS_TEST(isHansa, inHansa)
+CLASS_TEST(isPallas, inPallas)
+CLASS_TEST(isMidMB, inMidMB)
+CLASS_TEST(isOuterMB, inOuterMB)
+CLASS_TEST(isHilda, inHilda)
+CLASS_TEST(isTrojan, inTrojan)
+CLASS_TEST(isJFC, inJFC)
+
+/* qeiToBinMask
+
+bin elements q, e, i and test them against classes in one pass.
+
+Equivalent to qeiToBin followed by a call of isClass[c] for each class c
+in 'want': the same class tests, with a and Q computed once.  The
+Jupiter family comet test, the only one needing trig, is skipped unless
+JFC is wanted.
+
+Returns:
+   true if in model, bin indexes returned in 'bin' and in 'mask' bit c
+   set for each class c of 'want' that the orbit is in.
+   false if out of model
+*/
+_Bool qeiToBinMask(double q, double e, double i, double h, uint32_t want,
+                   int bin[3], uint32_t *mask)
+{
+  if (!qeiToBin(q, e, i, bin))
+    return 0;
+
+  double a = q / (1 - e);
+  double bigQ = q * (1. + e) / (1. - e);
+#define IN(inName, c) ((uint32_t) inName(q, e, i, h, a, bigQ) << (c))
+  uint32_t m =
+      IN(inMpcint, CLASS_INT) | IN(inNeo, CLASS_NEO) |
+      IN(inH22Neo, CLASS_N22) | IN(inH18Neo, CLASS_N18) |
+      IN(inMarsCrosser, CLASS_MC) | IN(inHungaria, CLASS_HUN) |
+      IN(inPhocaea, CLASS_PHO) | IN(inInnerMB, CLASS_MB1) |
+      IN(inPallas, CLASS_PAL) | IN(inHansa, CLASS_HAN) |
+      IN(inMidMB, CLASS_MB2) | IN(inOuterMB, CLASS_MB3) |
+      IN(inHilda, CLASS_HIL) | IN(inTrojan, CLASS_JTR);
+#undef IN
+  if ((want >> CLASS_JFC & 1) && inJFC(q, e, i, h, a, bigQ))
+    m |= (uint32_t) 1 << CLASS_JFC;
+  *mask = m & want;
+  return 1;
+}
+
   
 // 12 characters looks nice, 13 is ok.
 // anything over 13 is truncated at run time.
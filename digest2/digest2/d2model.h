@@ -5,6 +5,9 @@
 #ifndef D2MODEL_H
 #define D2MODEL_H
 
+#include <stddef.h>
+#include <stdint.h>
+
 // extents for model
 #define D2CLASSES 15
 #define QX 29
@@ -12,11 +15,59 @@
 #define IX 11
 #define HX 18
 
-// model
-extern double modelAllSS[QX][EX][IX][HX];
-extern double modelUnkSS[QX][EX][IX][HX];
-extern double modelAllClass[D2CLASSES][QX][EX][IX][HX];
-extern double modelUnkClass[D2CLASSES][QX][EX][IX][HX];
+// class indices, the order of classAbbr, classHeading and isClass
+enum {
+  CLASS_INT, CLASS_NEO, CLASS_N22, CLASS_N18, CLASS_MC, CLASS_HUN,
+  CLASS_PHO, CLASS_MB1, CLASS_PAL, CLASS_HAN, CLASS_MB2, CLASS_MB3,
+  CLASS_HIL, CLASS_JTR, CLASS_JFC
+};
+
+// model.  the four arrays are kept together so that a model can be
+// allocated, read, written and shared as a single block.
+typedef struct {
+  double allSS[QX][EX][IX][HX];
+  double unkSS[QX][EX][IX][HX];
+  double allClass[D2CLASSES][QX][EX][IX][HX];
+  double unkClass[D2CLASSES][QX][EX][IX][HX];
+} popModel;
+
+// binary model file.  a header describing the model, then the popModel
+// arrays at dataOffset, a page boundary so the arrays can be used in place
+// from a read-only mapping of the file.  arrays are in native byte order;
+// a file written on a machine of the other byte order fails the header
+// check and is regenerated from the CSV.
+#define D2MODEL_MAGIC "DIGEST2M"
+#define D2MODEL_VERSION 2
+#define D2MODEL_BYTE_ORDER 0x01020304
+#define D2MODEL_DATA_OFFSET 4096
+
+typedef struct {
+  char magic[8];                // D2MODEL_MAGIC, not null terminated
+  uint32_t version;             // D2MODEL_VERSION
+  uint32_t byteOrder;           // D2MODEL_BYTE_ORDER as written
+  uint32_t dataOffset;          // file offset of the popModel arrays
+  uint32_t nClasses;            // D2CLASSES
+  uint32_t qx, ex, ix, hx;      // QX, EX, IX, HX
+  char classAbbr[D2CLASSES][8]; // class order of allClass and unkClass
+  double qpart[QX];             // bin partitions the model was built with
+  double epart[EX];
+  double ipart[IX];
+  double hpart[HX];
+  int64_t csvSize;              // size and mtime of the source CSV
+  int64_t csvMtime;
+  uint64_t dataSize;            // sizeof(popModel)
+  uint64_t checksum;            // see modelChecksum in d2modelio.c
+} modelHeader;
+
+// a loaded model.  pm points either into a read-only mapping of the binary
+// file, shared through the page cache with every other process that maps
+// it, or to an allocated copy read from the CSV.
+typedef struct {
+  const popModel *pm;
+  popModel *owned;              // allocated model, else NULL
+  void *map;                    // mapping of the binary file, else NULL
+  size_t mapLen;
+} modelStore;
 
 // partition arrays
 extern double qpart[QX];
@@ -32,6 +83,8 @@ extern classtest isClass[D2CLASSES];
 
 _Bool qeihToBin(double q, double e, double i, double h, int bin[4]);
 _Bool qeiToBin(double q, double e, double i, int bin[3]);
+_Bool qeiToBinMask(double q, double e, double i, double h, uint32_t want,
+                   int bin[3], uint32_t *mask);
 int hToBin(double h);
 
 #endif // D2MODEL_H
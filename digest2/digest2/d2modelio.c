@@ -2,9 +2,9 @@
 //
 // Public domain.
 
-// posix source added for fileno()
+// posix source added for fileno(), getpid() and mmap()
 #ifndef _MSC_VER
-#define _POSIX_SOURCE
+#define _POSIX_C_SOURCE 200809L
 #endif
 
 #include <math.h>
@@ -16,9 +16,17 @@
 
 // MSVC names POSIX functions with underscore prefix
 #ifdef _MSC_VER
+#include <process.h>
 #define fileno _fileno
 #define fstat  _fstat
 #define stat   _stat
+#define getpid _getpid
+#else
+#include <unistd.h>
+#endif
+#ifndef _WIN32
+#include <fcntl.h>
+#include <sys/mman.h>
 #endif
 
 #include "digest2.h"
@@ -108,7 +116,7 @@ void mheader()
 }
 
 // on failure, global `line` will have a suitable error message.
-_Bool readCSV(struct stat *buf)
+_Bool readCSV(popModel * pm, struct stat *buf)
 {
   FILE *fcsv = openCP(fnCSV, 0, "r"); // 0 because no switch for this.
   if (!fcsv) {
@@ -124,14 +132,14 @@ _Bool readCSV(struct stat *buf)
     sprintf(line, msgCSVHeader, fnCSV);
     return false;
   }
-  if (!readCSVClass(fcsv, modelAllSS, "All", "SS") ||
-      !readCSVClass(fcsv, modelUnkSS, "Unk", "SS")) {
+  if (!readCSVClass(fcsv, pm->allSS, "All", "SS") ||
+      !readCSVClass(fcsv, pm->unkSS, "Unk", "SS")) {
     sprintf(line, msgCSVData, fnCSV);
     return false;
   }
   for (int c = 0; c < D2CLASSES; c++) {
-    if (!readCSVClass(fcsv, modelAllClass[c], "All", classAbbr[c])
-        || !readCSVClass(fcsv, modelUnkClass[c], "Unk", classAbbr[c])) {
+    if (!readCSVClass(fcsv, pm->allClass[c], "All", classAbbr[c])
+        || !readCSVClass(fcsv, pm->unkClass[c], "Unk", classAbbr[c])) {
       sprintf(line, msgCSVData, fnCSV);
       return false;
     }
@@ -141,126 +149,224 @@ _Bool readCSV(struct stat *buf)
   return true;
 }
 
-void mustReadCSV(struct stat *buf)
+void mustReadCSV(popModel * pm, struct stat *buf)
 {
-  if (!readCSV(buf))
+  if (!readCSV(pm, buf))
     fatal(line);
 }
 
-void writeModel(struct stat *csv)
+// FNV-1a over the model arrays, taken a 64-bit word at a time.
+static uint64_t modelChecksum(const popModel * pm)
 {
-    FILE *fp = fopen (fnModel, "r");
-   if (fp)
-     {
-        fclose (fp);
-        }
-   else
-     {
-  FILE *fmod = openCP(fnModel, modelSpec, "w");
-  if (!fmod ||
-      !fwrite(&csv->st_size, sizeof(csv->st_size), 1, fmod) ||
-      !fwrite(&csv->st_mtime, sizeof(csv->st_mtime), 1, fmod) ||
-      !fwrite(modelAllSS, sizeof modelAllSS, 1, fmod) ||
-      !fwrite(modelUnkSS, sizeof modelUnkSS, 1, fmod) ||
-      !fwrite(modelAllClass, sizeof modelAllClass, 1, fmod) ||
-      !fwrite(modelUnkClass, sizeof modelUnkClass, 1, fmod)) {
-    // not fatal
-    printf(msgWrite, fnModel);
+  const unsigned char *p = (const unsigned char *)pm;
+  uint64_t h = 0xcbf29ce484222325ULL;
+  for (size_t i = 0; i < sizeof *pm; i += sizeof h) {
+    uint64_t w;
+    memcpy(&w, p + i, sizeof w);
+    h ^= w;
+    h *= 0x100000001b3ULL;
   }
-  if (fmod) fclose(fmod);
-     }
+  return h;
 }
 
-_Bool readArrays(FILE * fmod)
+static void fillHeader(modelHeader * hdr, const popModel * pm,
+                       struct stat *csv)
 {
-  if (!fread(modelAllSS, sizeof modelAllSS, 1, fmod) ||
-      !fread(modelUnkSS, sizeof modelUnkSS, 1, fmod) ||
-      !fread(modelAllClass, sizeof modelAllClass, 1, fmod) ||
-      !fread(modelUnkClass, sizeof modelUnkClass, 1, fmod)) {
+  memset(hdr, 0, sizeof *hdr);
+  memcpy(hdr->magic, D2MODEL_MAGIC, sizeof hdr->magic);
+  hdr->version = D2MODEL_VERSION;
+  hdr->byteOrder = D2MODEL_BYTE_ORDER;
+  hdr->dataOffset = D2MODEL_DATA_OFFSET;
+  hdr->nClasses = D2CLASSES;
+  hdr->qx = QX;
+  hdr->ex = EX;
+  hdr->ix = IX;
+  hdr->hx = HX;
+  for (int c = 0; c < D2CLASSES; c++)
+    strncpy(hdr->classAbbr[c], classAbbr[c], sizeof hdr->classAbbr[c]);
+  memcpy(hdr->qpart, qpart, sizeof qpart);
+  memcpy(hdr->epart, epart, sizeof epart);
+  memcpy(hdr->ipart, ipart, sizeof ipart);
+  memcpy(hdr->hpart, hpart, sizeof hpart);
+  hdr->csvSize = csv->st_size;
+  hdr->csvMtime = csv->st_mtime;
+  hdr->dataSize = sizeof *pm;
+  hdr->checksum = modelChecksum(pm);
+}
+
+// true if hdr describes a model with the layout, classes and bins of
+// this build.
+static _Bool checkHeader(const modelHeader * hdr)
+{
+  if (memcmp(hdr->magic, D2MODEL_MAGIC, sizeof hdr->magic) ||
+      hdr->version != D2MODEL_VERSION ||
+      hdr->byteOrder != D2MODEL_BYTE_ORDER ||
+      hdr->dataOffset < sizeof *hdr || hdr->dataOffset % sizeof(double) ||
+      hdr->nClasses != D2CLASSES ||
+      hdr->qx != QX || hdr->ex != EX || hdr->ix != IX || hdr->hx != HX ||
+      hdr->dataSize != sizeof(popModel)) {
+    return false;
+  }
+  for (int c = 0; c < D2CLASSES; c++) {
+    if (strncmp(hdr->classAbbr[c], classAbbr[c], sizeof hdr->classAbbr[c]))
+      return false;
+  }
+  return !memcmp(hdr->qpart, qpart, sizeof qpart) &&
+      !memcmp(hdr->epart, epart, sizeof epart) &&
+      !memcmp(hdr->ipart, ipart, sizeof ipart) &&
+      !memcmp(hdr->hpart, hpart, sizeof hpart);
+}
+
+// read and check the header of a binary model file.
+_Bool readModelHeader(FILE * fmod, modelHeader * hdr)
+{
+  return fread(hdr, sizeof *hdr, 1, fmod) && checkHeader(hdr);
+}
+
+// write binary model.  the file is written under a temporary name and
+// renamed into place, so other processes reading or regenerating the
+// model see either the old file or the complete new one.  returns true
+// if the model was written.  failure produces a warning, not fatal.
+_Bool writeModel(const popModel * pm, struct stat *csv)
+{
+  static const char pad[D2MODEL_DATA_OFFSET];
+  modelHeader hdr;
+  fillHeader(&hdr, pm, csv);
+
+  char *fn = CPspec(fnModel, modelSpec);
+  char tmp[FILENAME_MAX];
+  snprintf(tmp, sizeof tmp, "%s.%ld.tmp", fn, (long)getpid());
+  FILE *fmod = fopen(tmp, "wb");
+  _Bool ok = fmod &&
+      fwrite(&hdr, sizeof hdr, 1, fmod) &&
+      fwrite(pad, hdr.dataOffset - sizeof hdr, 1, fmod) &&
+      fwrite(pm, sizeof *pm, 1, fmod);
+  if (fmod && fclose(fmod))
+    ok = false;
+#ifdef _WIN32
+  if (ok)
+    remove(fn);                 // rename doesn't replace on windows
+#endif
+  if (!ok || rename(tmp, fn)) {
+    if (fmod)
+      remove(tmp);
+    printf(msgWrite, fnModel);
     return false;
   }
-  fclose(fmod);
   return true;
 }
 
-// read model from CSV, optionally with fmod as fallback.
-// fatal if no model can be read.
-// if csv read okay, attempt to write model.
-// faliure to write model produces warning, not fatal.
-void convertCSV(FILE * fmod)
+// load binary model fnModel into ms, checking header and checksum.
+// the arrays are used in place from a read-only shared mapping, so every
+// process using the same file shares one copy in the page cache.  where
+// mmap isn't available the arrays are read into an allocated copy.
+// returns false, with ms untouched, if the file is missing or invalid.
+static _Bool mapModel(modelStore * ms, modelHeader * hdr)
 {
-  struct stat csv;
-  if (!fmod) {
-    if (readCSV(&csv)) {        // with no fallback, CSV must work
-      writeModel(&csv);
-    } else {
-      fatal(line);              // sets error flag; don't call writeModel
-    }
-    return;
+  char *fn = CPspec(fnModel, modelSpec);
+#ifdef _WIN32
+  FILE *fmod = fopen(fn, "rb");
+  if (!fmod)
+    return false;
+  popModel *pm = NULL;
+  _Bool ok = readModelHeader(fmod, hdr) &&
+      !fseek(fmod, hdr->dataOffset, SEEK_SET) &&
+      (pm = (popModel *) malloc(sizeof *pm)) &&
+      fread(pm, sizeof *pm, 1, fmod) &&
+      modelChecksum(pm) == hdr->checksum;
+  fclose(fmod);
+  if (!ok) {
+    free(pm);
+    return false;
   }
-  if (!readCSV(&csv)) {
-    if (!readArrays(fmod)) {    // if CSV fails, fallback must work
-      fatal1(msgRead, fnCSV);
-    }
-    return;
+  ms->pm = ms->owned = pm;
+  ms->map = NULL;
+  ms->mapLen = 0;
+  return true;
+#else
+  int fd = open(fn, O_RDONLY);
+  if (fd < 0)
+    return false;
+  struct stat st;
+  void *map = MAP_FAILED;
+  size_t len = 0;
+  if (!fstat(fd, &st) && st.st_size >= (off_t) sizeof *hdr) {
+    len = st.st_size;
+    map = mmap(NULL, len, PROT_READ, MAP_SHARED, fd, 0);
   }
-  // CSV okay. attempt model update.
-  writeModel(&csv);
+  close(fd);
+  if (map == MAP_FAILED)
+    return false;
+  memcpy(hdr, map, sizeof *hdr);
+  if (!checkHeader(hdr) || hdr->dataOffset + sizeof(popModel) > len) {
+    munmap(map, len);
+    return false;
+  }
+  const popModel *pm = (const popModel *)((char *)map + hdr->dataOffset);
+  if (modelChecksum(pm) != hdr->checksum) {
+    munmap(map, len);
+    return false;
+  }
+  ms->pm = pm;
+  ms->owned = NULL;
+  ms->map = map;
+  ms->mapLen = len;
+  return true;
+#endif
+}
+
+void releaseModel(modelStore * ms)
+{
+#ifndef _WIN32
+  if (ms->map)
+    munmap(ms->map, ms->mapLen);
+#endif
+  free(ms->owned);
+  memset(ms, 0, sizeof *ms);
 }
 
 // read population model.
-// prefer binary, with check that it matches the CSV.
-void mustReadModelStatCSV()
+// prefer the binary, used in place, when it was built from the CSV as it
+// is now (or there is no CSV).  otherwise read the CSV and regenerate the
+// binary, falling back on an out of date binary if the CSV can't be read.
+void mustReadModelStatCSV(modelStore * ms)
 {
-  // start with binary, if it's not not there, options are limited.
-  FILE *fmod = openCP(fnModel, modelSpec, "r");
-  if (!fmod) {                  // no binary,
-    convertCSV(0);              // try csv, with no binary fallback
-    return;                     // success reading csv
-  }
-  // binary opened okay, read header
-  struct stat mod;
-  if (!fread(&mod.st_size, sizeof mod.st_size, 1, fmod) ||
-      !fread(&mod.st_mtime, sizeof mod.st_mtime, 1, fmod)) {
-    fclose(fmod);               // binary seems corrupt
-    printf(msgReadInvalid, fnModel); // give warning message
-    convertCSV(0);              // try replacing it, but with no binary fallback
-    return;                     // success reading csv
-  }
-  // binary readable so far, stat csv and compare
+  modelHeader hdr;
+  _Bool mapped = mapModel(ms, &hdr);
   struct stat csv;
   int csv_stat_err = stat(CPspec(fnCSV, 0), &csv);
-  if (csv_stat_err ||           // csv stat failed,
-      csv.st_size != mod.st_size || // or size or time don't match
-      csv.st_mtime != mod.st_mtime) {
-    convertCSV(fmod);           // try replacing it, with fmod as fallback.
-    return;                     // success reading csv
+  if (mapped && (csv_stat_err ||
+                 (csv.st_size == hdr.csvSize &&
+                  csv.st_mtime == hdr.csvMtime))) {
+    return;                     // success with binary
+  }
+  // binary missing, invalid, or not from this csv.  read csv.
+  popModel *pm = (popModel *) malloc(sizeof *pm);
+  if (!pm) {
+    if (!mapped)
+      fatal(msgMemory);
+    return;
   }
-  // at least no csv inconsistency, continue with binary
-  _Bool bin_ok = readArrays(fmod);
-  if (bin_ok) {
-    return;                     // success reading binary
+  if (!readCSV(pm, &csv)) {
+    free(pm);
+    if (!mapped)                // if CSV fails, binary must work
+      fatal(line);
+    return;
   }
-  // last chance
-  if (!csv_stat_err) {
-    convertCSV(0);
-    return;                     // whew, success reading csv
+  if (mapped)
+    releaseModel(ms);
+  // use the regenerated binary if it could be written, to share it
+  if (writeModel(pm, &csv) && mapModel(ms, &hdr)) {
+    free(pm);
+    return;                     // success with new binary
   }
-
-  printf(msgReadInvalid, fnModel); // message about binary
-  fatal1(msgRead, fnCSV);       // and ultimate failure
+  ms->pm = ms->owned = pm;      // success with csv
 }
 
-void mustReadModel()
+void mustReadModel(modelStore * ms)
 {
-  FILE *fmod = openCP(fnModel, modelSpec, "r");
-  if (!fmod) {
-    fatal1(msgOpen, fnModel);
-  }
-  struct stat mod;
-  if (!fread(&mod.st_size, sizeof mod.st_size, 1, fmod) ||
-      !fread(&mod.st_mtime, sizeof mod.st_mtime, 1, fmod) ||
-      !readArrays(fmod)) {
+  modelHeader hdr;
+  if (!mapModel(ms, &hdr)) {
     fatal1(msgRead, fnModel);
   }
 }
@@ -28,7 +28,7 @@ Notes:
    Units of longitude are degrees, 
    Converted here to circles for easier use later.
 */
-_Bool readOCD(void)
+_Bool readOCD(site * table)
 {
   FILE *focd = openCP(fnOCD, ocdSpec, "r");
   if (!focd) {
@@ -41,7 +41,7 @@ _Bool readOCD(void)
     return false;
   }
 
-  site *psite = siteTable;
+  site *psite = table;
   for (int i = 0; i < obscodeNamespaceSize; i++, psite++) {
     psite->obsErr = -1;         // means unspecified
   }
@@ -64,7 +64,7 @@ _Bool readOCD(void)
     if (errno)
       continue;
 
-    site *ps = siteTable + idx;
+    site *ps = table + idx;
     ps->longitude = lon / 360.;
     ps->rhoCosPhi = rcos * sf;
     ps->rhoSinPhi = rsin * sf;
@@ -75,9 +75,9 @@ _Bool readOCD(void)
   return true;
 }
 
-void mustReadOCD(void)
+void mustReadOCD(site * table)
 {
-  if (!readOCD()) {
+  if (!readOCD(table)) {
     fatal(line);
   }
 }
@@ -102,15 +102,15 @@ _Bool getOCD()
   return true;
 }
 
-void mustReadGetOCD()
+void mustReadGetOCD(site * table)
 {
-  if (readOCD()) {
+  if (readOCD(table)) {
     return;
   }
   if (!getOCD()) {
     exit(-1);
   }
-  mustReadOCD();
+  mustReadOCD(table);
 }
 
 /* parseMpc80
@@ -206,9 +206,6 @@ _Bool parseMpcRoving(char *line, observation * obsp){
     y = pos[1];
     z = pos[2];
 
-    double p = sqrt(x*x+y*y+z*z);
-    printf("p = %lf\n", p);
-
     x *= sf;
     y *= sf;
     z *= sf;
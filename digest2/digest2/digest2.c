@@ -47,6 +47,8 @@ pthread_cond_t cDone = PTHREAD_COND_INITIALIZER;
 // can be shared by threads.
 
 site siteTable[obscodeNamespaceSize];
+modelStore cliModel;
+d2_context cliCtx;   // filled from the globals above once config is read
 int outputLineSize;  // computed once in setup(), used for per-tracklet buffer allocation
 
 /* resetInvalid
@@ -72,14 +74,21 @@ tracklet *resetInvalid(void) {
     int saveObsCap = tk->obsCap;
     observation *saveOlist = tk->olist;
     uint64_t saveRand = tk->rand64;
+    d2_context *saveCtx = tk->ctx;
+    scratch saveWork = tk->work;
     perClass *saveClass = tk->class;
+    uint32_t *saveDClassTag = tk->dClassTag;
     char *saveOutputBuf = tk->outputBuf;
     int saveOutputBufSize = tk->outputBufSize;
+    clearDTags(tk);
     memset(tk, 0, sizeof(tracklet));
     tk->obsCap = saveObsCap;
     tk->olist = saveOlist;
     tk->rand64 = saveRand;
+    tk->ctx = saveCtx;
+    tk->work = saveWork;
     tk->class = saveClass;
+    tk->dClassTag = saveDClassTag;
     tk->outputBuf = saveOutputBuf;
     tk->outputBufSize = saveOutputBufSize;
     tk->lines = 1;
@@ -440,23 +449,27 @@ void setup(char *fnObs) {
     if (fnObs) {
         if (modelSpec) {
             // fast path using binary model file only. no csv checks.
-            mustReadModel();
+            mustReadModel(&cliModel);
         } else {
-            mustReadModelStatCSV();   // with model/csv caching logic
+            mustReadModelStatCSV(&cliModel); // with model/csv caching logic
         }
     } else if (modelSpec) {
         // generate model only, no computations
         struct stat csv;
-        mustReadCSV(&csv);
-        writeModel(&csv);
+        popModel *pm = (popModel *) malloc(sizeof *pm);
+        if (!pm)
+            fatal(msgMemory);
+        mustReadCSV(pm, &csv);
+        writeModel(pm, &csv);
+        free(pm);
     }
 
     // similar logic for obscode dat
     if (fnObs) {
         if (ocdSpec) {
-            mustReadOCD();
+            mustReadOCD(siteTable);
         } else {
-            mustReadGetOCD();         // with caching logic
+            mustReadGetOCD(siteTable); // with caching logic
         }
     } else if (ocdSpec) {
         // get obscode dat only, no need to read it.
@@ -488,6 +501,15 @@ void setup(char *fnObs) {
 
     readConfig();                 // configures globals and terminates on error
 
+    // scoring context shared by all scoring threads
+    cliCtx.model = cliModel.pm;
+    memcpy(cliCtx.siteTable, siteTable, sizeof(siteTable));
+    cliCtx.obsErr = obsErr;
+    cliCtx.repeatable = repeatable;
+    cliCtx.noThreshold = noThreshold;
+    cliCtx.nClassCompute = nClassCompute;
+    memcpy(cliCtx.classCompute, classCompute, sizeof(classCompute));
+
     // for --limit, validate that option is configured
     if (limitSpec) {
         for (int i = 0;; i++) {
@@ -544,13 +566,15 @@ void setup(char *fnObs) {
         // per-thread LCG setup.  I think NAG needs an odd number for a seed.
         // see additional notes in d2math.c
         tk->rand64 = 2 * (rand() / 2) + 1;
+        tk->ctx = &cliCtx;
         tk->obsCap = 5;
         tk->olist = (observation *) malloc(tk->obsCap * sizeof(observation));
         if (!tk->olist)
             fatal(msgMemory);
         ring[th] = tk;
         tk->class = (perClass *) calloc(nClassCompute, sizeof(perClass));
-        if (!tk->class)
+        tk->dClassTag = (uint32_t *) calloc(D2BINS, sizeof(uint32_t));
+        if (!tk->class || !tk->dClassTag)
             fatal(msgMemory);
     }
 
@@ -55,25 +55,103 @@ typedef enum {
   SUCCESS
 } tkstatus;
 
+// set of model bins, one bit per bin.  bins are numbered by flat index
+// ((iq * EX + ie) * IX + ii) * HX + ih, the same order as the model arrays,
+// so scanning a set in increasing index order visits bins in the order a
+// nested iq/ie/ii/ih loop would.
+#define D2BINS (QX * EX * IX * HX)
+#define D2BINWORDS ((D2BINS + 63) / 64)
+typedef uint64_t binset[D2BINWORDS];
+
+// tasks a split search divides the distance range into, see searchTask
+#define D2SEARCHTASKS 256
+
+static inline int binIndex(int iq, int ie, int ii, int ih)
+{
+  return ((iq * EX + ie) * IX + ii) * HX + ih;
+}
+
+static inline _Bool binTest(const uint64_t *set, int idx)
+{
+  return (set[idx >> 6] >> (idx & 63)) & 1;
+}
+
+static inline void binSet(uint64_t *set, int idx)
+{
+  set[idx >> 6] |= (uint64_t) 1 << (idx & 63);
+}
+
+static inline void binClear(uint64_t *set, int idx)
+{
+  set[idx >> 6] &= ~((uint64_t) 1 << (idx & 63));
+}
+
 typedef struct {
   double rawScore;
   double noIdScore;
-  _Bool tagInClass[QX][EX][IX][HX];
-  _Bool tagOutOfClass[QX][EX][IX][HX];
+  binset tagInClass;
+  binset tagOutOfClass;
   double sumAllInClass;
   double sumUnkInClass;
   double sumAllOutOfClass;
   double sumUnkOutOfClass;
-  _Bool dInClass[QX][EX][IX][HX];
-  _Bool dOutOfClass[QX][EX][IX][HX];
 } perClass;
 
+// per-distance class tags of a bin: bit c set if an orbit in class c hit
+// the bin, bit c + DTAG_OUT if one out of class c did.
+#define DTAG_OUT 16
+
+// scratch space for temporary arrays, handed out and released in stack
+// order (see scratchMark/scratchRelease in d2math.c).  blocks are kept
+// after release, so once warmed up a tracklet's scratch does no heap
+// allocation.
+typedef struct scratchBlock {
+  struct scratchBlock *next;
+  size_t cap;                   // capacity, in doubles
+  size_t used;
+  double data[];
+} scratchBlock;
+
+typedef struct {
+  scratchBlock *first;
+  scratchBlock *cur;            // block allocations come from, NULL if none
+} scratch;
+
+typedef struct {
+  scratchBlock *block;
+  size_t used;
+} scratchPos;
+
 // Forward declaration for orbit collection buffer (defined in d2lib.h).
 // NULL when not collecting orbits (default via calloc).
 #ifndef D2LIB_H
 typedef struct d2_orbit_buffer d2_orbit_buffer;
+typedef struct d2_context d2_context;
 #endif
 
+#define obscodeNamespaceSize 3600
+
+// scoring context.  everything score() reads that is not specific to a
+// tracklet:  population model, site table, and scoring configuration.
+// the CLI fills a single context from its globals after reading the config
+// file.  library callers may hold any number of independent contexts.
+struct d2_context {
+  const popModel *model;
+  modelStore store;             // model loaded for this context, if any
+  site siteTable[obscodeNamespaceSize];
+  double obsErr;                // default observational error, radians
+  _Bool repeatable;
+  _Bool noThreshold;
+  int nClassCompute;
+  int classCompute[D2CLASSES];
+  // per-tracklet work budget for score(), 0 = no limit
+  int maxOrbits;                // trial orbits solved
+  int maxDistances;             // distances searched
+  double maxSeconds;            // wall-clock time
+  // threads to split the search of one tracklet over, 0 or 1 = no split
+  int searchThreads;
+};
+
 // tracklet.  struct holds working variables and everything associated with
 // computing scores for a single tracklet.
 //
@@ -81,6 +159,7 @@ typedef struct d2_orbit_buffer d2_orbit_buffer;
 typedef struct {
   // these few elements really describe the tracklet
   tkstatus status;
+  d2_context *ctx;              // model and configuration used by score()
   char desig[13];
   observation *olist;
   int obsCap;                   // allocated capacity of olist
@@ -98,6 +177,8 @@ typedef struct {
   double vmag;                  // composite value for the tracklet
   double sun_observer[2][3];    // vectors at times t0 and t1
   double observer_object_unit[2][3]; // vectors at times t0 and t1
+  double offsetUnit[9][2][3];   // observer_object_unit for each offset
+  int nOffsets;                 // offsets searched at each distance
   double dt;                    // t1 - t0
   double invdt;                 // 1/dt
   double invdtsq;               // 1/(dt**2)
@@ -121,12 +202,27 @@ typedef struct {
   double hmag;
   int hmag_bin;
   _Bool dAnyTag;
-  _Bool dTag[QX][EX][IX][HX];
+  binset dTag;
   int dTagList[512];            // flat indices of tagged bins for sparse clearing
   int dTagCount;                // number of entries in dTagList
+  int *tagLog;                  // if not NULL, bins as they are first
+  int tagLogCount;              //   tagged for the tracklet, and the set
+  uint64_t *tagLogged;          //   of them (extents D2BINS, D2BINWORDS)
+  uint32_t *dClassTag;          // class tags by bin, extent D2BINS
+  uint32_t classMask;           // classes computed, bit per class index
 
   double rmsPrime;
   _Bool isAdes;
+
+  // work done by score(), checked against the context's budget
+  int nOrbits;                  // trial orbits solved
+  int nDistances;               // distances searched
+  int maxOrbits;                // limits on the above, 0 if none
+  int maxDistances;
+  double deadline;              // d2Seconds() limit, 0 if none
+  int clockAt;                  // nOrbits at which to next read the clock
+  _Bool partial;                // budget ran out before the search ended
+  scratch work;                 // temporary arrays for twoObs and gc fits
   d2_orbit_buffer *orbit_buf;   // NULL when not collecting (default via calloc)
   perClass *class;              // array, extent = nClassesComputed
   int *classFilter;             // per-tracklet class indices (NULL = use globals)
@@ -144,6 +240,7 @@ typedef struct {
   double (*rs)[2];              // rotated ra and dec
   double t0;                    // time offset
   double *ntime;                // normalized times
+  scratch *work;                // source of temporary arrays
   // fit solution parameters
   double r0;
   double rr;
@@ -176,7 +273,6 @@ extern char msgVersion[];
 extern char msgLimitClassNotConfig[];
 extern char msgLimitScoreNotConfig[];
 
-#define obscodeNamespaceSize 3600
 extern site siteTable[obscodeNamespaceSize];
 extern double K, INV_K, U, TWO_PI;
 extern uint64_t LCGA, LCGM;
@@ -215,15 +311,17 @@ char *parseCl(int argc, char **argv);
 void readConfig();
 
 // functions in d2modelio.c
-void mustReadCSV(struct stat *);
-void mustReadModel();
-void mustReadModelStatCSV();
-void writeModel(struct stat *);
+void mustReadCSV(popModel *, struct stat *);
+void mustReadModel(modelStore *);
+void mustReadModelStatCSV(modelStore *);
+_Bool readModelHeader(FILE *, modelHeader *);
+void releaseModel(modelStore *);
+_Bool writeModel(const popModel *, struct stat *);
 
 // functions in mpc.c
 _Bool getOCD();
-void mustReadOCD();
-void mustReadGetOCD();
+void mustReadOCD(site *);
+void mustReadGetOCD(site *);
 int parseCod3(char *);
 _Bool parseMpc80(char *line, observation * obsp);
 _Bool parseMpcSat(char *line, observation * obsp);
@@ -231,7 +329,20 @@ _Bool parseMpcRoving(char *line, observation * obsp);
 
 // functions in d2math.c
 void initGlobals(void);
+void initContext(d2_context * ctx);
 void score(tracklet * tk);
+void scoreSetup(tracklet * tk);
+void scoreSearch(tracklet * tk);
+void scoreFinish(tracklet * tk);
+void sumTags(tracklet * tk);
+void searchTaskBounds(double bounds[D2SEARCHTASKS + 1]);
+void searchTask(tracklet * tk, const double bounds[D2SEARCHTASKS + 1], int j);
+double d2Seconds(void);
+void clearDTags(tracklet * tk);
+double *scratchAlloc(scratch * s, size_t n);
+scratchPos scratchMark(const scratch * s);
+void scratchRelease(scratch * s, scratchPos pos);
+void scratchFree(scratch * s);
 double tkRand(tracklet * tk);
 double *roving_position(double x, double y, double altitiude);
 
@@ -28,7 +28,7 @@ if platform.system() == "Windows":
     extra_compile_args = ["/std:c11", "/O2"]
 else:
     extra_compile_args = ["-std=c99", "-O2"]
-    libraries = ["m"]
+    libraries = ["m", "pthread"]
 
 ext = Extension(
     "digest2._extension",
@@ -21,10 +21,28 @@ Or as a one-shot::
     result = classify("observations.obs")
 """
 
+from digest2.cache import ResultCache
 from digest2.core import Digest2, classify
-from digest2.observation import Observation, parse_mpc80, parse_mpc80_file, parse_ades_psv
+from digest2.observation import (
+    Observation,
+    iter_ades_psv,
+    iter_ades_xml,
+    iter_mpc80_file,
+    parse_ades_psv,
+    parse_ades_psv_arrays,
+    parse_mpc80,
+    parse_mpc80_file,
+)
 from digest2.population import build_model, read_model_csv
-from digest2.result import ClassificationResult, Scores, TrialOrbit
+from digest2.rescore import rescore
+from digest2.result import (
+    ArrayResult,
+    ClassificationResult,
+    Scores,
+    TagSets,
+    TrialOrbit,
+)
+from digest2.session import ChangeEvent, IncrementalSession
 from digest2.truth import (
     GroundTruthRecord,
     MatchedResult,
@@ -38,15 +56,25 @@ from digest2.truth import (
 __all__ = [
     "Digest2",
     "classify",
+    "ResultCache",
+    "IncrementalSession",
+    "ChangeEvent",
     "ClassificationResult",
+    "ArrayResult",
     "Scores",
+    "TagSets",
     "TrialOrbit",
     "Observation",
     "parse_mpc80",
     "parse_mpc80_file",
     "parse_ades_psv",
+    "parse_ades_psv_arrays",
+    "iter_mpc80_file",
+    "iter_ades_psv",
+    "iter_ades_xml",
     "build_model",
     "read_model_csv",
+    "rescore",
     "GroundTruthRecord",
     "MatchedResult",
     "TruthEvaluator",
@@ -0,0 +1,69 @@
+"""Command-line entry point: ``python -m digest2 serve``."""
+
+import argparse
+import sys
+from typing import List, Optional
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m digest2",
+        description="digest2 NEO orbit classification",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser(
+        "serve", help="keep the model loaded and score files sent over HTTP")
+    serve.add_argument("--host", default="127.0.0.1",
+                       help="address to listen on (default: 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8080,
+                       help="TCP port (default: 8080)")
+    serve.add_argument("--unix-socket", default=None,
+                       help="listen on this Unix socket path instead of TCP")
+    serve.add_argument("-m", "--model", default=None,
+                       help="model file, CSV or binary (default: bundled)")
+    serve.add_argument("-c", "--config", default=None,
+                       help="MPC.config file (default: auto-discovered)")
+    serve.add_argument("-o", "--obscodes", default=None,
+                       help="observatory codes file (default: bundled)")
+    serve.add_argument("--no-threshold", action="store_true",
+                       help="disable per-observation RMS ceiling clamping")
+    serve.add_argument("--max-orbits", type=int, default=None,
+                       help="per-tracklet budget of trial orbits")
+    serve.add_argument("--max-distances", type=int, default=None,
+                       help="per-tracklet budget of distances searched")
+    serve.add_argument("--max-ms", type=float, default=None,
+                       help="per-tracklet time budget in milliseconds; "
+                            "results that hit a budget are marked partial")
+    serve.add_argument("-u", "--workers", type=int, default=None,
+                       help="native scoring threads (default: one per CPU)")
+    serve.add_argument("--batch-window-ms", type=float, default=5.0,
+                       help="time to collect concurrent requests into one "
+                            "batch (default: 5)")
+    serve.add_argument("-v", "--verbose", action="store_true",
+                       help="log each request")
+
+    args = parser.parse_args(argv)
+
+    from digest2.server import serve as run_server
+
+    run_server(
+        model_path=args.model,
+        config_path=args.config,
+        obscodes_path=args.obscodes,
+        no_threshold=args.no_threshold,
+        max_orbits=args.max_orbits,
+        max_distances=args.max_distances,
+        max_seconds=None if args.max_ms is None else args.max_ms / 1000.0,
+        host=args.host,
+        port=args.port,
+        unix_socket=args.unix_socket,
+        max_workers=args.workers,
+        batch_window=args.batch_window_ms / 1000.0,
+        verbose=args.verbose,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
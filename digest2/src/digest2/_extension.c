@@ -11,7 +11,27 @@
 
 // --- Module state ---
 
-static int module_initialized = 0;
+// Context used by the module-level init()/score()/configure() functions.
+// Context objects carry their own and are unaffected by init()/cleanup().
+static d2_context *default_ctx = NULL;
+
+// Load a context, raising RuntimeError on failure.
+static d2_context *open_context(const char *model_path,
+                                const char *obscodes_path) {
+    int rc;
+    d2_context *ctx = d2_context_new(model_path, obscodes_path, &rc);
+    if (!ctx) {
+        const char *msg;
+        switch (rc) {
+            case D2_ERR_MODEL:    msg = "Failed to load population model"; break;
+            case D2_ERR_OBSCODES: msg = "Failed to load observatory codes file"; break;
+            case D2_ERR_MEMORY:   msg = "Memory allocation failed"; break;
+            default:              msg = "Unknown initialization error"; break;
+        }
+        PyErr_SetString(PyExc_RuntimeError, msg);
+    }
+    return ctx;
+}
 
 // --- Python-callable functions ---
 
@@ -22,63 +42,63 @@ static PyObject *py_init(PyObject *self, PyObject *args) {
     if (!PyArg_ParseTuple(args, "ss", &model_path, &obscodes_path))
         return NULL;
 
-    int rc = d2_init(model_path, obscodes_path);
-    if (rc != D2_OK) {
-        const char *msg;
-        switch (rc) {
-            case D2_ERR_MODEL:    msg = "Failed to load population model"; break;
-            case D2_ERR_OBSCODES: msg = "Failed to load observatory codes file"; break;
-            case D2_ERR_MEMORY:   msg = "Memory allocation failed"; break;
-            default:              msg = "Unknown initialization error"; break;
-        }
-        PyErr_SetString(PyExc_RuntimeError, msg);
+    d2_context_free(default_ctx);
+    default_ctx = open_context(model_path, obscodes_path);
+    if (!default_ctx)
         return NULL;
-    }
 
-    module_initialized = 1;
     Py_RETURN_NONE;
 }
 
 static PyObject *py_cleanup(PyObject *self, PyObject *noargs) {
-    d2_cleanup();
-    module_initialized = 0;
+    d2_context_free(default_ctx);
+    default_ctx = NULL;
     Py_RETURN_NONE;
 }
 
 static PyObject *py_is_initialized(PyObject *self, PyObject *noargs) {
-    return PyBool_FromLong(d2_is_initialized());
+    return PyBool_FromLong(default_ctx != NULL);
 }
 
 // --- Shared helpers for observation and class parsing ---
 
-// Parse a Python list of observation tuples/dicts into a C array.
-// Returns allocated d2_observation array, or NULL with Python exception set.
-static d2_observation *parse_obs_list(PyObject *obs_list, Py_ssize_t n_obs) {
-    d2_observation *obs = (d2_observation *)calloc(n_obs, sizeof(d2_observation));
-    if (!obs) {
-        PyErr_NoMemory();
-        return NULL;
+// Read an earth_obs value: a sequence of 3 floats (AU).
+static int parse_earth_obs(PyObject *val, double *out) {
+    PyObject *seq = PySequence_Fast(val, "earth_obs must be a sequence");
+    if (!seq) return -1;
+    if (PySequence_Fast_GET_SIZE(seq) != 3) {
+        PyErr_SetString(PyExc_ValueError, "earth_obs must have 3 elements");
+        Py_DECREF(seq);
+        return -1;
     }
+    for (int k = 0; k < 3; k++)
+        out[k] = PyFloat_AsDouble(PySequence_Fast_GET_ITEM(seq, k));
+    Py_DECREF(seq);
+    return PyErr_Occurred() ? -1 : 0;
+}
 
+// Parse a Python list of observation tuples/dicts into a caller-supplied,
+// zeroed array of n_obs entries.
+// Returns 0 on success, or -1 with Python exception set.
+static int parse_obs_into(PyObject *obs_list, Py_ssize_t n_obs,
+                          d2_observation *obs) {
     for (Py_ssize_t i = 0; i < n_obs; i++) {
         PyObject *item = PyList_GetItem(obs_list, i);
         if (!PyTuple_Check(item) && !PyDict_Check(item)) {
-            free(obs);
             PyErr_SetString(PyExc_TypeError,
                             "Each observation must be a tuple or dict");
-            return NULL;
+            return -1;
         }
 
         if (PyTuple_Check(item)) {
             // Tuple format: (mjd, ra_rad, dec_rad, vmag, site_int, rmsRA, rmsDec)
-            // Optional 8th element: spacebased (int)
+            // Optional 8th element: spacebased (int); 9th: earth_obs
             Py_ssize_t tlen = PyTuple_Size(item);
             if (tlen < 5) {
-                free(obs);
                 PyErr_SetString(PyExc_ValueError,
                     "Observation tuple must have at least 5 elements: "
                     "(mjd, ra_rad, dec_rad, vmag, site_int)");
-                return NULL;
+                return -1;
             }
             obs[i].mjd  = PyFloat_AsDouble(PyTuple_GetItem(item, 0));
             obs[i].ra   = PyFloat_AsDouble(PyTuple_GetItem(item, 1));
@@ -91,26 +111,29 @@ static d2_observation *parse_obs_list(PyObject *obs_list, Py_ssize_t n_obs) {
                 obs[i].rmsDec = PyFloat_AsDouble(PyTuple_GetItem(item, 6));
             if (tlen > 7)
                 obs[i].spacebased = (int)PyLong_AsLong(PyTuple_GetItem(item, 7));
+            if (tlen > 8 &&
+                parse_earth_obs(PyTuple_GetItem(item, 8), obs[i].earth_obs) < 0)
+                return -1;
         } else {
             // Dict format with keys: mjd, ra, dec, vmag, site, rmsRA, rmsDec, spacebased
             PyObject *val;
             val = PyDict_GetItemString(item, "mjd");
-            if (!val) { free(obs); PyErr_SetString(PyExc_KeyError, "mjd"); return NULL; }
+            if (!val) { PyErr_SetString(PyExc_KeyError, "mjd"); return -1; }
             obs[i].mjd = PyFloat_AsDouble(val);
 
             val = PyDict_GetItemString(item, "ra");
-            if (!val) { free(obs); PyErr_SetString(PyExc_KeyError, "ra"); return NULL; }
+            if (!val) { PyErr_SetString(PyExc_KeyError, "ra"); return -1; }
             obs[i].ra = PyFloat_AsDouble(val);
 
             val = PyDict_GetItemString(item, "dec");
-            if (!val) { free(obs); PyErr_SetString(PyExc_KeyError, "dec"); return NULL; }
+            if (!val) { PyErr_SetString(PyExc_KeyError, "dec"); return -1; }
             obs[i].dec = PyFloat_AsDouble(val);
 
             val = PyDict_GetItemString(item, "vmag");
             obs[i].vmag = val ? PyFloat_AsDouble(val) : 0.0;
 
             val = PyDict_GetItemString(item, "site");
-            if (!val) { free(obs); PyErr_SetString(PyExc_KeyError, "site"); return NULL; }
+            if (!val) { PyErr_SetString(PyExc_KeyError, "site"); return -1; }
             obs[i].site = (int)PyLong_AsLong(val);
 
             val = PyDict_GetItemString(item, "rmsRA");
@@ -121,14 +144,38 @@ static d2_observation *parse_obs_list(PyObject *obs_list, Py_ssize_t n_obs) {
 
             val = PyDict_GetItemString(item, "spacebased");
             obs[i].spacebased = val ? (int)PyLong_AsLong(val) : 0;
+
+            val = PyDict_GetItemString(item, "earth_obs");
+            if (val && parse_earth_obs(val, obs[i].earth_obs) < 0)
+                return -1;
         }
 
         if (PyErr_Occurred()) {
-            free(obs);
-            return NULL;
+            return -1;
+        }
+        if (obs[i].site < 0 || obs[i].site >= D2_SITES) {
+            PyErr_Format(PyExc_ValueError,
+                         "site index %d out of range (0..%d)",
+                         obs[i].site, D2_SITES - 1);
+            return -1;
         }
     }
 
+    return 0;
+}
+
+// Parse a Python list of observation tuples/dicts into a C array.
+// Returns allocated d2_observation array, or NULL with Python exception set.
+static d2_observation *parse_obs_list(PyObject *obs_list, Py_ssize_t n_obs) {
+    d2_observation *obs = (d2_observation *)calloc(n_obs, sizeof(d2_observation));
+    if (!obs) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+    if (parse_obs_into(obs_list, n_obs, obs) < 0) {
+        free(obs);
+        return NULL;
+    }
     return obs;
 }
 
@@ -270,15 +317,78 @@ static PyObject *build_trial_orbits_list(const d2_result_ext *ext) {
     return orbits_list;
 }
 
-static PyObject *py_score_common(PyObject *args, int collect_orbits) {
+// Add the tagged bins of ext to a result dict: 'tag_bins' and 'tag_masks'
+// (bytes of native int32 and uint32) and 'tag_classes', as in
+// d2_result_ext.
+static int add_tag_items(PyObject *result, const d2_result_ext *ext) {
+    PyObject *bins = PyBytes_FromStringAndSize(
+        (const char *)ext->tag_bins, (Py_ssize_t)ext->n_tags * sizeof(int));
+    if (!bins || PyDict_SetItemString(result, "tag_bins", bins) < 0) {
+        Py_XDECREF(bins);
+        return -1;
+    }
+    Py_DECREF(bins);
+
+    PyObject *masks = PyBytes_FromStringAndSize(
+        (const char *)ext->tag_masks,
+        (Py_ssize_t)ext->n_tags * sizeof(uint32_t));
+    if (!masks || PyDict_SetItemString(result, "tag_masks", masks) < 0) {
+        Py_XDECREF(masks);
+        return -1;
+    }
+    Py_DECREF(masks);
+    return add_int_item(result, "tag_classes", ext->tag_classes);
+}
+
+// Build the result dict returned by score()/score_orbits().  ext supplies
+// the trial orbits and tagged bins when collect asks for them.
+static PyObject *build_result_dict(const d2_result *res,
+                                   const d2_result_ext *ext,
+                                   int collect) {
+    PyObject *result = PyDict_New();
+    if (!result) return NULL;
+
+    if (add_score_lists(result, res->raw_scores, res->noid_scores) < 0 ||
+        add_float_item(result, "rms", res->rms) < 0 ||
+        add_float_item(result, "rms_prime", res->rms_prime) < 0 ||
+        add_int_item(result, "partial", res->partial) < 0 ||
+        add_int_item(result, "orbits_tried", res->orbits_tried) < 0 ||
+        add_int_item(result, "distances_tried", res->distances_tried) < 0) {
+        Py_DECREF(result);
+        return NULL;
+    }
+
+    if (collect & D2_COLLECT_ORBITS) {
+        if (add_int_item(result, "n_orbits", ext->n_orbits) < 0) {
+            Py_DECREF(result);
+            return NULL;
+        }
+        PyObject *orbits_list = build_trial_orbits_list(ext);
+        if (!orbits_list ||
+            PyDict_SetItemString(result, "trial_orbits", orbits_list) < 0) {
+            Py_XDECREF(orbits_list);
+            Py_DECREF(result);
+            return NULL;
+        }
+        Py_DECREF(orbits_list);
+    }
+    if ((collect & D2_COLLECT_TAGS) && add_tag_items(result, ext) < 0) {
+        Py_DECREF(result);
+        return NULL;
+    }
+    return result;
+}
+
+static PyObject *py_score_common(d2_context *ctx, PyObject *args,
+                                 int collect) {
     PyObject *obs_list;
     PyObject *classes_obj = Py_None;
     int is_ades = 0;
+    int collect_tags = 0;
     d2_observation *obs = NULL;
     int *class_indices = NULL;
     int n_classes = 0;
     PyObject *result = NULL;
-    PyObject *orbits_list = NULL;
     d2_result res;
     d2_result_ext ext;
     int status;
@@ -286,10 +396,13 @@ static PyObject *py_score_common(PyObject *args, int collect_orbits) {
     memset(&res, 0, sizeof(res));
     memset(&ext, 0, sizeof(ext));
 
-    if (!PyArg_ParseTuple(args, "O|Oi", &obs_list, &classes_obj, &is_ades))
+    if (!PyArg_ParseTuple(args, "O|Oii", &obs_list, &classes_obj, &is_ades,
+                          &collect_tags))
         return NULL;
+    if (collect_tags)
+        collect |= D2_COLLECT_TAGS;
 
-    if (!module_initialized) {
+    if (!ctx) {
         PyErr_SetString(PyExc_RuntimeError,
                         "digest2 not initialized. Call init() first.");
         return NULL;
@@ -318,15 +431,17 @@ static PyObject *py_score_common(PyObject *args, int collect_orbits) {
     }
 
     // Release the GIL during scoring — the C scoring engine is thread-safe
-    // (each call operates on its own tracklet with per-tracklet class filter).
-    if (collect_orbits) {
+    // (each call operates on its own tracklet with per-tracklet class filter,
+    // and only reads the shared context).
+    if (collect) {
         Py_BEGIN_ALLOW_THREADS
-        ext = d2_score_observations_ext(obs, (int)n_obs, class_indices, n_classes, is_ades);
+        ext = d2_score_observations_collect(ctx, obs, (int)n_obs, class_indices,
+                                            n_classes, is_ades, collect);
         Py_END_ALLOW_THREADS
         status = ext.base.status;
     } else {
         Py_BEGIN_ALLOW_THREADS
-        res = d2_score_observations(obs, (int)n_obs, class_indices, n_classes, is_ades);
+        res = d2_score_observations(ctx, obs, (int)n_obs, class_indices, n_classes, is_ades);
         Py_END_ALLOW_THREADS
         status = res.status;
     }
@@ -336,77 +451,397 @@ static PyObject *py_score_common(PyObject *args, int collect_orbits) {
         goto cleanup;
     }
 
-    result = PyDict_New();
-    if (!result) goto cleanup;
+    result = build_result_dict(collect ? &ext.base : &res, &ext, collect);
+
+cleanup:
+    free(obs);
+    free(class_indices);
+    if (collect) {
+        d2_free_result_ext(&ext);
+    }
+    if (PyErr_Occurred()) {
+        Py_XDECREF(result);
+        return NULL;
+    }
+    return result;
+}
+
+// Score every tracklet of a batch with a single GIL release.
+// Returns a list with one result dict per tracklet, or None where the
+// scoring engine rejected the tracklet (the cases score() raises
+// RuntimeError for).
+static PyObject *score_many_common(d2_context *ctx, PyObject *args,
+                                   PyObject *kwargs) {
+    static char *kwlist[] = {"tracklets", "classes", "is_ades",
+                             "collect_orbits", "n_threads", "collect_tags",
+                             NULL};
+    PyObject *tracklets_obj;
+    PyObject *classes_obj = Py_None;
+    int is_ades = 0;
+    int collect_orbits = 0;
+    int n_threads = 0;
+    int collect_tags = 0;
+    PyObject *seq = NULL;
+    d2_observation *obs = NULL;
+    int *offsets = NULL;
+    int *class_indices = NULL;
+    int n_classes = 0;
+    d2_result_ext *results = NULL;
+    PyObject *out = NULL;
+    Py_ssize_t n_tracklets = 0;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|Oiiii", kwlist,
+                                     &tracklets_obj, &classes_obj, &is_ades,
+                                     &collect_orbits, &n_threads,
+                                     &collect_tags))
+        return NULL;
+    int collect = (collect_orbits ? D2_COLLECT_ORBITS : 0) |
+                  (collect_tags ? D2_COLLECT_TAGS : 0);
+
+    if (!ctx) {
+        PyErr_SetString(PyExc_RuntimeError,
+                        "digest2 not initialized. Call init() first.");
+        return NULL;
+    }
+
+    seq = PySequence_Fast(tracklets_obj, "tracklets must be a sequence");
+    if (!seq) return NULL;
+    n_tracklets = PySequence_Fast_GET_SIZE(seq);
+    if (n_tracklets > INT_MAX - 1) {
+        PyErr_SetString(PyExc_OverflowError, "too many tracklets");
+        goto cleanup;
+    }
 
-    if (collect_orbits) {
-        if (add_score_lists(result, ext.base.raw_scores, ext.base.noid_scores) < 0 ||
-            add_float_item(result, "rms", ext.base.rms) < 0 ||
-            add_float_item(result, "rms_prime", ext.base.rms_prime) < 0 ||
-            add_int_item(result, "n_orbits", ext.n_orbits) < 0) {
+    // Offsets into one contiguous observation array
+    offsets = (int *)malloc((n_tracklets + 1) * sizeof(int));
+    if (!offsets) { PyErr_NoMemory(); goto cleanup; }
+    offsets[0] = 0;
+    for (Py_ssize_t t = 0; t < n_tracklets; t++) {
+        PyObject *obs_list = PySequence_Fast_GET_ITEM(seq, t);
+        if (!PyList_Check(obs_list)) {
+            PyErr_SetString(PyExc_TypeError,
+                            "each tracklet must be a list of observations");
             goto cleanup;
         }
-
-        orbits_list = build_trial_orbits_list(&ext);
-        if (!orbits_list) goto cleanup;
-        if (PyDict_SetItemString(result, "trial_orbits", orbits_list) < 0) {
+        Py_ssize_t n_obs = PyList_GET_SIZE(obs_list);
+        if (n_obs < 2) {
+            PyErr_Format(PyExc_ValueError,
+                         "At least 2 observations required (tracklet %zd)", t);
             goto cleanup;
         }
-    } else {
-        if (add_score_lists(result, res.raw_scores, res.noid_scores) < 0 ||
-            add_float_item(result, "rms", res.rms) < 0 ||
-            add_float_item(result, "rms_prime", res.rms_prime) < 0) {
+        if (n_obs > INT_MAX - offsets[t]) {
+            PyErr_SetString(PyExc_OverflowError, "too many observations");
+            goto cleanup;
+        }
+        offsets[t + 1] = offsets[t] + (int)n_obs;
+    }
+
+    obs = (d2_observation *)calloc(offsets[n_tracklets] ? offsets[n_tracklets] : 1,
+                                   sizeof(d2_observation));
+    results = (d2_result_ext *)calloc(n_tracklets ? n_tracklets : 1,
+                                      sizeof(d2_result_ext));
+    if (!obs || !results) { PyErr_NoMemory(); goto cleanup; }
+
+    for (Py_ssize_t t = 0; t < n_tracklets; t++) {
+        if (parse_obs_into(PySequence_Fast_GET_ITEM(seq, t),
+                           offsets[t + 1] - offsets[t],
+                           obs + offsets[t]) < 0)
+            goto cleanup;
+    }
+
+    class_indices = parse_class_filter(classes_obj, &n_classes);
+    if (PyErr_Occurred()) goto cleanup;
+
+    Py_BEGIN_ALLOW_THREADS
+    d2_score_many(ctx, obs, offsets, (int)n_tracklets, class_indices,
+                  n_classes, is_ades, collect, n_threads, results);
+    Py_END_ALLOW_THREADS
+
+    out = PyList_New(n_tracklets);
+    if (!out) goto cleanup;
+    for (Py_ssize_t t = 0; t < n_tracklets; t++) {
+        PyObject *item;
+        int status = results[t].base.status;
+        if (status == D2_ERR_MEMORY) {
+            raise_scoring_error(status);
             goto cleanup;
         }
+        if (status != D2_OK) {
+            Py_INCREF(Py_None);
+            item = Py_None;
+        } else {
+            item = build_result_dict(&results[t].base, &results[t],
+                                     collect);
+            if (!item) goto cleanup;
+        }
+        PyList_SET_ITEM(out, t, item);
     }
 
 cleanup:
+    if (results) {
+        for (Py_ssize_t t = 0; t < n_tracklets; t++)
+            d2_free_result_ext(&results[t]);
+    }
+    free(results);
     free(obs);
+    free(offsets);
     free(class_indices);
-    if (collect_orbits) {
-        d2_free_result_ext(&ext);
-    }
-    Py_XDECREF(orbits_list);
+    Py_XDECREF(seq);
     if (PyErr_Occurred()) {
-        Py_XDECREF(result);
+        Py_XDECREF(out);
         return NULL;
     }
-    return result;
+    return out;
+}
+
+// Acquire a C-contiguous buffer of `count` items (count < 0: any length)
+// whose element type is `kind` ('d' float64, 'i' int32, 'q' int64).
+// Returns 0, or -1 with a Python exception set.
+static int get_column(PyObject *obj, Py_buffer *view, char kind,
+                      Py_ssize_t count, int writable, const char *name) {
+    int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT;
+    if (writable) flags |= PyBUF_WRITABLE;
+    if (PyObject_GetBuffer(obj, view, flags) < 0)
+        return -1;
+
+    // Accept native or explicit little/big/native-standard prefixes
+    const char *fmt = view->format ? view->format : "B";
+    if (*fmt == '@' || *fmt == '=' || *fmt == '<' || *fmt == '>' || *fmt == '!')
+        fmt++;
+    int ok;
+    switch (kind) {
+        case 'd': ok = strcmp(fmt, "d") == 0 && view->itemsize == 8; break;
+        case 'i': ok = (strcmp(fmt, "i") == 0 || strcmp(fmt, "l") == 0)
+                       && view->itemsize == 4; break;
+        default:  ok = (strcmp(fmt, "q") == 0 || strcmp(fmt, "l") == 0)
+                       && view->itemsize == 8; break;
+    }
+    if (!ok) {
+        PyErr_Format(PyExc_TypeError, "%s must be a %s buffer", name,
+                     kind == 'd' ? "float64" : kind == 'i' ? "int32" : "int64");
+        PyBuffer_Release(view);
+        return -1;
+    }
+    Py_ssize_t n = view->len / view->itemsize;
+    if (count >= 0 && n != count) {
+        PyErr_Format(PyExc_ValueError, "%s has %zd elements, expected %zd",
+                     name, n, count);
+        PyBuffer_Release(view);
+        return -1;
+    }
+    return 0;
+}
+
+// Score tracklets held as flat columns, reading the caller's buffers in
+// place and writing scores into caller-supplied output buffers.  Rows of
+// tracklets that cannot be scored are filled with NaN.
+static PyObject *score_arrays_common(d2_context *ctx, PyObject *args,
+                                     PyObject *kwargs) {
+    static char *kwlist[] = {"mjd", "ra", "dec", "vmag", "site", "rms_ra",
+                             "rms_dec", "offsets", "raw_out", "noid_out",
+                             "rms_out", "rms_prime_out", "classes",
+                             "is_ades", "n_threads", NULL};
+    enum { MJD, RA, DEC, VMAG, SITE, RMSRA, RMSDEC, OFFSETS,
+           RAW, NOID, RMS, RMSPRIME, NBUF };
+    static const char *names[NBUF] = {"mjd", "ra", "dec", "vmag", "site",
+        "rms_ra", "rms_dec", "offsets", "raw_out", "noid_out", "rms_out",
+        "rms_prime_out"};
+    PyObject *objs[NBUF];
+    Py_buffer views[NBUF];
+    int acquired = 0;
+    PyObject *classes_obj = Py_None;
+    int is_ades = 0;
+    int n_threads = 0;
+    int *class_indices = NULL;
+    int n_classes = 0;
+    d2_result *results = NULL;
+    Py_ssize_t n_obs = 0, n_tracklets = 0;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOOOOOOOOOO|Oii", kwlist,
+            &objs[MJD], &objs[RA], &objs[DEC], &objs[VMAG], &objs[SITE],
+            &objs[RMSRA], &objs[RMSDEC], &objs[OFFSETS], &objs[RAW],
+            &objs[NOID], &objs[RMS], &objs[RMSPRIME],
+            &classes_obj, &is_ades, &n_threads))
+        return NULL;
+
+    if (!ctx) {
+        PyErr_SetString(PyExc_RuntimeError,
+                        "digest2 not initialized. Call init() first.");
+        return NULL;
+    }
+
+    // Observation columns; the first fixes the row count
+    for (; acquired <= RMSDEC; acquired++) {
+        char kind = acquired == SITE ? 'i' : 'd';
+        if (get_column(objs[acquired], &views[acquired], kind,
+                       acquired == MJD ? -1 : n_obs, 0,
+                       names[acquired]) < 0)
+            goto cleanup;
+        if (acquired == MJD)
+            n_obs = views[MJD].len / views[MJD].itemsize;
+    }
+
+    if (get_column(objs[OFFSETS], &views[OFFSETS], 'q', -1, 0,
+                   names[OFFSETS]) < 0)
+        goto cleanup;
+    acquired++;
+    n_tracklets = views[OFFSETS].len / views[OFFSETS].itemsize - 1;
+    if (n_tracklets < 0) {
+        PyErr_SetString(PyExc_ValueError, "offsets must not be empty");
+        goto cleanup;
+    }
+    if (n_tracklets > INT_MAX) {
+        PyErr_SetString(PyExc_OverflowError, "too many tracklets");
+        goto cleanup;
+    }
+    const int64_t *offsets = (const int64_t *)views[OFFSETS].buf;
+    for (Py_ssize_t t = 0; t <= n_tracklets; t++) {
+        if (offsets[t] < 0 || offsets[t] > n_obs ||
+            (t > 0 && offsets[t] < offsets[t - 1])) {
+            PyErr_SetString(PyExc_ValueError,
+                "offsets must be non-decreasing indices into the observations");
+            goto cleanup;
+        }
+    }
+    const int *site = (const int *)views[SITE].buf;
+    for (Py_ssize_t i = 0; i < n_obs; i++) {
+        if (site[i] < 0 || site[i] >= D2_SITES) {
+            PyErr_Format(PyExc_ValueError,
+                         "site index %d out of range (0..%d)",
+                         site[i], D2_SITES - 1);
+            goto cleanup;
+        }
+    }
+
+    // Output buffers
+    for (; acquired < NBUF; acquired++) {
+        Py_ssize_t count = acquired == RAW || acquired == NOID
+                         ? n_tracklets * D2CLASSES : n_tracklets;
+        if (get_column(objs[acquired], &views[acquired], 'd', count, 1,
+                       names[acquired]) < 0)
+            goto cleanup;
+    }
+
+    class_indices = parse_class_filter(classes_obj, &n_classes);
+    if (PyErr_Occurred()) goto cleanup;
+
+    results = (d2_result *)calloc(n_tracklets ? n_tracklets : 1,
+                                  sizeof(d2_result));
+    if (!results) { PyErr_NoMemory(); goto cleanup; }
+
+    d2_columns cols = {
+        (const double *)views[MJD].buf,
+        (const double *)views[RA].buf,
+        (const double *)views[DEC].buf,
+        (const double *)views[VMAG].buf,
+        (const int *)views[SITE].buf,
+        (const double *)views[RMSRA].buf,
+        (const double *)views[RMSDEC].buf,
+    };
+    double *raw = (double *)views[RAW].buf;
+    double *noid = (double *)views[NOID].buf;
+    double *rms = (double *)views[RMS].buf;
+    double *rms_prime = (double *)views[RMSPRIME].buf;
+    int memory_error = 0;
+
+    Py_BEGIN_ALLOW_THREADS
+    d2_score_columns(ctx, &cols, offsets, (int)n_tracklets, class_indices,
+                     n_classes, is_ades, n_threads, results);
+    for (Py_ssize_t t = 0; t < n_tracklets; t++) {
+        const d2_result *r = &results[t];
+        if (r->status == D2_ERR_MEMORY)
+            memory_error = 1;
+        int ok = r->status == D2_OK;
+        for (int c = 0; c < D2CLASSES; c++) {
+            raw[t * D2CLASSES + c]  = ok ? r->raw_scores[c] : Py_NAN;
+            noid[t * D2CLASSES + c] = ok ? r->noid_scores[c] : Py_NAN;
+        }
+        rms[t] = ok ? r->rms : Py_NAN;
+        rms_prime[t] = ok ? r->rms_prime : Py_NAN;
+    }
+    Py_END_ALLOW_THREADS
+
+    if (memory_error)
+        raise_scoring_error(D2_ERR_MEMORY);
+
+cleanup:
+    for (int i = 0; i < acquired; i++)
+        PyBuffer_Release(&views[i]);
+    free(results);
+    free(class_indices);
+    if (PyErr_Occurred())
+        return NULL;
+    Py_RETURN_NONE;
 }
 
 static PyObject *py_score(PyObject *self, PyObject *args) {
     (void)self;
-    return py_score_common(args, 0);
+    return py_score_common(default_ctx, args, 0);
 }
 
 static PyObject *py_score_orbits(PyObject *self, PyObject *args) {
     (void)self;
-    return py_score_common(args, 1);
+    return py_score_common(default_ctx, args, 1);
 }
 
-static PyObject *py_configure(PyObject *self, PyObject *args, PyObject *kwargs) {
+static PyObject *py_score_many(PyObject *self, PyObject *args,
+                               PyObject *kwargs) {
+    (void)self;
+    return score_many_common(default_ctx, args, kwargs);
+}
+
+static PyObject *py_score_arrays(PyObject *self, PyObject *args,
+                                 PyObject *kwargs) {
+    (void)self;
+    return score_arrays_common(default_ctx, args, kwargs);
+}
+
+static PyObject *configure_common(d2_context *ctx, PyObject *args,
+                                  PyObject *kwargs) {
     static char *kwlist[] = {"obserr", "repeatable", "no_threshold",
-                             "site_errors", NULL};
+                             "site_errors", "max_orbits", "max_distances",
+                             "max_seconds", "search_threads", NULL};
     double obserr = -1.0;
     int repeatable_flag = -1;
     int no_threshold_flag = -1;
     PyObject *site_errors = NULL;
+    int max_orbits = -1;
+    int max_distances = -1;
+    double max_seconds = -1.0;
+    int search_threads = -1;
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|diiO", kwlist,
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|diiOiidi", kwlist,
                                      &obserr, &repeatable_flag,
-                                     &no_threshold_flag, &site_errors))
+                                     &no_threshold_flag, &site_errors,
+                                     &max_orbits, &max_distances,
+                                     &max_seconds, &search_threads))
+        return NULL;
+
+    if (!ctx) {
+        PyErr_SetString(PyExc_RuntimeError,
+                        "digest2 not initialized. Call init() first.");
         return NULL;
+    }
 
     if (obserr >= 0.0) {
-        d2_set_default_obserr(obserr);
+        d2_set_default_obserr(ctx, obserr);
     }
 
     if (repeatable_flag >= 0) {
-        d2_set_repeatable(repeatable_flag);
+        d2_set_repeatable(ctx, repeatable_flag);
     }
 
     if (no_threshold_flag >= 0) {
-        d2_set_no_threshold(no_threshold_flag);
+        d2_set_no_threshold(ctx, no_threshold_flag);
+    }
+
+    // The budget is set as a whole; limits not passed are removed.
+    if (max_orbits >= 0 || max_distances >= 0 || max_seconds >= 0.0) {
+        d2_set_budget(ctx, max_orbits, max_distances, max_seconds);
+    }
+
+    if (search_threads >= 0) {
+        d2_set_search_threads(ctx, search_threads);
     }
 
     if (site_errors && PyDict_Check(site_errors)) {
@@ -426,13 +861,18 @@ static PyObject *py_configure(PyObject *self, PyObject *args, PyObject *kwargs)
             }
             double err = PyFloat_AsDouble(value);
             if (PyErr_Occurred()) return NULL;
-            d2_set_site_obserr(site_idx, err);
+            d2_set_site_obserr(ctx, site_idx, err);
         }
     }
 
     Py_RETURN_NONE;
 }
 
+static PyObject *py_configure(PyObject *self, PyObject *args, PyObject *kwargs) {
+    (void)self;
+    return configure_common(default_ctx, args, kwargs);
+}
+
 static PyObject *py_parse_obscode(PyObject *self, PyObject *args) {
     const char *code;
     if (!PyArg_ParseTuple(args, "s", &code))
@@ -446,6 +886,82 @@ static PyObject *py_parse_obscode(PyObject *self, PyObject *args) {
     return PyLong_FromLong(idx);
 }
 
+// Store a copy of n items of size itemsize as out[key], a memoryview of
+// a bytearray cast to fmt.
+static int add_column(PyObject *out, const char *key, const void *data,
+                      Py_ssize_t n, Py_ssize_t itemsize, const char *fmt) {
+    PyObject *bytes = PyByteArray_FromStringAndSize(
+        n ? (const char *)data : "", n * itemsize);
+    if (!bytes) return -1;
+    PyObject *view = PyMemoryView_FromObject(bytes);
+    Py_DECREF(bytes);
+    if (!view) return -1;
+    PyObject *cast = PyObject_CallMethod(view, "cast", "s", fmt);
+    Py_DECREF(view);
+    if (!cast) return -1;
+    int rc = PyDict_SetItemString(out, key, cast);
+    Py_DECREF(cast);
+    return rc;
+}
+
+static PyObject *py_parse_mpc80_buffer(PyObject *self, PyObject *args) {
+    Py_buffer buf;
+    d2_mpc80 m;
+
+    if (!PyArg_ParseTuple(args, "y*", &buf))
+        return NULL;
+
+    // The GIL is kept: roving lines go through a static buffer.
+    int rc = d2_parse_mpc80((const char *)buf.buf, (size_t)buf.len, &m);
+    PyBuffer_Release(&buf);
+    if (rc != D2_OK) {
+        d2_free_mpc80(&m);
+        return PyErr_NoMemory();
+    }
+
+    Py_ssize_t n = (Py_ssize_t)m.n_obs;
+    Py_ssize_t nt = (Py_ssize_t)m.n_tracklets;
+    PyObject *desig = NULL;
+    PyObject *open_start = NULL;
+    PyObject *out = PyDict_New();
+    if (!out) goto cleanup;
+
+    if (add_column(out, "mjd", m.mjd, n, sizeof(double), "d") < 0 ||
+        add_column(out, "ra", m.ra, n, sizeof(double), "d") < 0 ||
+        add_column(out, "dec", m.dec, n, sizeof(double), "d") < 0 ||
+        add_column(out, "vmag", m.vmag, n, sizeof(double), "d") < 0 ||
+        add_column(out, "site", m.site, n, sizeof(int), "i") < 0 ||
+        add_column(out, "spacebased", m.spacebased, n, sizeof(int), "i") < 0 ||
+        add_column(out, "earth_obs", m.earth_obs, 3 * n, sizeof(double),
+                   "d") < 0 ||
+        add_column(out, "offsets", m.offsets, nt + 1, sizeof(int64_t),
+                   "q") < 0)
+        goto cleanup;
+
+    desig = PyList_New(nt);
+    if (!desig) goto cleanup;
+    for (Py_ssize_t t = 0; t < nt; t++) {
+        PyObject *s = PyUnicode_DecodeLatin1(m.desig[t], strlen(m.desig[t]),
+                                             NULL);
+        if (!s) goto cleanup;
+        PyList_SET_ITEM(desig, t, s);
+    }
+    if (PyDict_SetItemString(out, "designations", desig) < 0)
+        goto cleanup;
+
+    open_start = PyLong_FromLongLong((long long)m.open_start);
+    if (!open_start || PyDict_SetItemString(out, "open_start", open_start) < 0)
+        goto cleanup;
+
+cleanup:
+    d2_free_mpc80(&m);
+    Py_XDECREF(desig);
+    Py_XDECREF(open_start);
+    if (PyErr_Occurred())
+        Py_CLEAR(out);
+    return out;
+}
+
 static PyObject *py_get_classes(PyObject *self, PyObject *noargs) {
     int n = d2_get_class_count();
     PyObject *list = PyList_New(n);
@@ -464,6 +980,131 @@ static PyObject *py_get_classes(PyObject *self, PyObject *noargs) {
     return list;
 }
 
+// --- Context type ---
+//
+// A loaded model, site table and scoring configuration.  Each Context is
+// independent: configuring or closing one never affects another, so several
+// can score concurrently from different threads.
+
+typedef struct {
+    PyObject_HEAD
+    d2_context *ctx;
+} ContextObject;
+
+static int Context_init(ContextObject *self, PyObject *args, PyObject *kwargs) {
+    static char *kwlist[] = {"model_path", "obscodes_path", NULL};
+    const char *model_path;
+    const char *obscodes_path;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "ss", kwlist,
+                                     &model_path, &obscodes_path))
+        return -1;
+
+    d2_context_free(self->ctx);
+    self->ctx = open_context(model_path, obscodes_path);
+    return self->ctx ? 0 : -1;
+}
+
+static void Context_dealloc(ContextObject *self) {
+    d2_context_free(self->ctx);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static PyObject *Context_score(ContextObject *self, PyObject *args) {
+    return py_score_common(self->ctx, args, 0);
+}
+
+static PyObject *Context_score_orbits(ContextObject *self, PyObject *args) {
+    return py_score_common(self->ctx, args, 1);
+}
+
+static PyObject *Context_score_many(ContextObject *self, PyObject *args,
+                                    PyObject *kwargs) {
+    return score_many_common(self->ctx, args, kwargs);
+}
+
+static PyObject *Context_score_arrays(ContextObject *self, PyObject *args,
+                                      PyObject *kwargs) {
+    return score_arrays_common(self->ctx, args, kwargs);
+}
+
+static PyObject *Context_configure(ContextObject *self, PyObject *args,
+                                   PyObject *kwargs) {
+    return configure_common(self->ctx, args, kwargs);
+}
+
+static PyObject *Context_close(ContextObject *self, PyObject *noargs) {
+    d2_context_free(self->ctx);
+    self->ctx = NULL;
+    Py_RETURN_NONE;
+}
+
+static PyObject *Context_get_closed(ContextObject *self, void *closure) {
+    return PyBool_FromLong(self->ctx == NULL);
+}
+
+static PyMethodDef Context_methods[] = {
+    {"score",
+    (PyCFunction)Context_score,
+    METH_VARARGS,
+     "score(observations, classes=None, is_ades=0, collect_tags=0) -> dict\n"
+     "Score a tracklet against this context. See _extension.score()."},
+    {"score_orbits",
+    (PyCFunction)Context_score_orbits,
+    METH_VARARGS,
+     "score_orbits(observations, classes=None, is_ades=0, collect_tags=0) -> dict\n"
+     "Score a tracklet and collect trial orbits. See _extension.score_orbits()."},
+    {"score_many",
+    (PyCFunction)Context_score_many,
+    METH_VARARGS | METH_KEYWORDS,
+     "score_many(tracklets, classes=None, is_ades=0, collect_orbits=0, n_threads=0,\n"
+     "           collect_tags=0) -> list\n"
+     "Score many tracklets against this context. See _extension.score_many()."},
+    {"score_arrays",
+    (PyCFunction)Context_score_arrays,
+    METH_VARARGS | METH_KEYWORDS,
+     "score_arrays(mjd, ra, dec, vmag, site, rms_ra, rms_dec, offsets,\n"
+     "             raw_out, noid_out, rms_out, rms_prime_out,\n"
+     "             classes=None, is_ades=0, n_threads=0)\n"
+     "Score columnar tracklets against this context. See _extension.score_arrays()."},
+    {"configure",
+    (PyCFunction)Context_configure,
+    METH_VARARGS | METH_KEYWORDS,
+     "configure(obserr=None, repeatable=None, no_threshold=None, site_errors=None,\n"
+     "          max_orbits=None, max_distances=None, max_seconds=None,\n"
+     "          search_threads=None)\n"
+     "Set scoring configuration for this context only.  max_orbits,\n"
+     "max_distances and max_seconds set the per-tracklet work budget\n"
+     "together (0 or omitted = no limit).  search_threads >= 2 splits the\n"
+     "search of each tracklet over that many threads (0 or 1 = no split)."},
+    {"close",
+    (PyCFunction)Context_close,
+    METH_NOARGS,
+     "close()\nRelease the model. Later scoring calls raise RuntimeError."},
+    {NULL, NULL, 0, NULL}
+};
+
+static PyGetSetDef Context_getset[] = {
+    {"closed", (getter)Context_get_closed, NULL,
+     "True once close() has been called.", NULL},
+    {NULL, NULL, NULL, NULL, NULL}
+};
+
+static PyTypeObject ContextType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "digest2._extension.Context",
+    .tp_doc = "Context(model_path, obscodes_path)\n"
+              "Independently configurable digest2 model and site table.",
+    .tp_basicsize = sizeof(ContextObject),
+    .tp_itemsize = 0,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_new = PyType_GenericNew,
+    .tp_init = (initproc)Context_init,
+    .tp_dealloc = (destructor)Context_dealloc,
+    .tp_methods = Context_methods,
+    .tp_getset = Context_getset,
+};
+
 // --- Module definition ---
 
 static PyMethodDef methods[] = {
@@ -484,26 +1125,68 @@ static PyMethodDef methods[] = {
     {"score",
     py_score,
     METH_VARARGS,
-     "score(observations, classes=None, is_ades=0) -> dict\n"
+     "score(observations, classes=None, is_ades=0, collect_tags=0) -> dict\n"
      "Score a tracklet. observations is a list of tuples or dicts.\n"
-     "Tuple format: (mjd, ra_rad, dec_rad, vmag, site_int[, rmsRA, rmsDec, spacebased])\n"
-     "Returns dict with 'raw_scores', 'noid_scores', 'rms', 'rms_prime'."},
+     "Tuple format: (mjd, ra_rad, dec_rad, vmag, site_int[, rmsRA, rmsDec,\n"
+     "spacebased, earth_obs])\n"
+     "Returns dict with 'raw_scores', 'noid_scores', 'rms', 'rms_prime',\n"
+     "'partial', 'orbits_tried' and 'distances_tried'.  With collect_tags,\n"
+     "also 'tag_bins' and 'tag_masks' (bytes of int32 bin indices and\n"
+     "uint32 class masks) and 'tag_classes', as in d2_result_ext."},
     {"score_orbits",
     py_score_orbits,
     METH_VARARGS,
-     "score_orbits(observations, classes=None, is_ades=0) -> dict\n"
+     "score_orbits(observations, classes=None, is_ades=0, collect_tags=0) -> dict\n"
      "Score a tracklet and collect trial orbits. Same as score() but also\n"
      "returns 'trial_orbits' (list of tuples) and 'n_orbits' (int).\n"
      "Each orbit tuple: (q, e, i, H, d, an, iq, ie, ii, ih, new_tag)."},
+    {"score_many",
+    (PyCFunction)py_score_many,
+    METH_VARARGS | METH_KEYWORDS,
+     "score_many(tracklets, classes=None, is_ades=0, collect_orbits=0, n_threads=0,\n"
+     "           collect_tags=0) -> list\n"
+     "Score a batch of tracklets with one GIL release, spreading the work\n"
+     "over a native thread pool (n_threads <= 0: one per CPU).\n"
+     "tracklets is a sequence of observation lists as accepted by score().\n"
+     "Returns one score()/score_orbits()-style dict per tracklet, or None\n"
+     "where the tracklet could not be scored."},
+    {"score_arrays",
+    (PyCFunction)py_score_arrays,
+    METH_VARARGS | METH_KEYWORDS,
+     "score_arrays(mjd, ra, dec, vmag, site, rms_ra, rms_dec, offsets,\n"
+     "             raw_out, noid_out, rms_out, rms_prime_out,\n"
+     "             classes=None, is_ades=0, n_threads=0)\n"
+     "Score tracklets stored as flat columns, read in place through the\n"
+     "buffer protocol. Inputs are C-contiguous float64 (mjd, ra/dec in\n"
+     "radians, vmag, rms in arcsec), int32 site indices and int64 offsets\n"
+     "(n_tracklets + 1 entries; tracklet t is rows offsets[t]:offsets[t+1]).\n"
+     "Scores go to writable float64 buffers: raw_out and noid_out hold\n"
+     "n_tracklets * 15 values, rms_out and rms_prime_out n_tracklets.\n"
+     "Tracklets that cannot be scored get NaN."},
     {"configure",
     (PyCFunction)py_configure,
     METH_VARARGS | METH_KEYWORDS,
-     "configure(obserr=None, repeatable=None, no_threshold=None, site_errors=None)\n"
+     "configure(obserr=None, repeatable=None, no_threshold=None, site_errors=None,\n"
+     "          max_orbits=None, max_distances=None, max_seconds=None,\n"
+     "          search_threads=None)\n"
      "Set scoring configuration."},
     {"parse_obscode",
     py_parse_obscode,
     METH_VARARGS,
      "parse_obscode(code) -> int\nConvert 3-char MPC obscode to integer index."},
+    {"parse_mpc80_buffer",
+    py_parse_mpc80_buffer,
+    METH_VARARGS,
+     "parse_mpc80_buffer(data) -> dict\n"
+     "Parse MPC 80-column observations from a bytes-like buffer exactly as\n"
+     "the digest2 CLI does, including satellite and roving second lines.\n"
+     "Returns columns as typed memoryviews: 'mjd', 'ra', 'dec' (radians),\n"
+     "'vmag' (float64), 'site', 'spacebased' (int32), 'earth_obs' (float64,\n"
+     "3 per row, AU) and 'offsets' (int64; tracklet t is rows\n"
+     "offsets[t]:offsets[t+1]); 'designations', the 12-character field of\n"
+     "each tracklet; and 'open_start', the byte offset of the line of the\n"
+     "last row if the last tracklet is still open at the end of data, else\n"
+     "len(data).  Parsing again from there continues that tracklet."},
     {"get_classes",
     py_get_classes,
     METH_NOARGS,
@@ -520,5 +1203,18 @@ static struct PyModuleDef moduledef = {
 };
 
 PyMODINIT_FUNC PyInit__extension(void) {
-    return PyModule_Create(&moduledef);
+    if (PyType_Ready(&ContextType) < 0)
+        return NULL;
+
+    PyObject *m = PyModule_Create(&moduledef);
+    if (!m)
+        return NULL;
+
+    Py_INCREF(&ContextType);
+    if (PyModule_AddObject(m, "Context", (PyObject *)&ContextType) < 0) {
+        Py_DECREF(&ContextType);
+        Py_DECREF(m);
+        return NULL;
+    }
+    return m;
 }
@@ -0,0 +1,231 @@
+"""Content-addressed cache of classification results.
+
+A :class:`ResultCache` passed to :class:`~digest2.core.Digest2` lets
+repeated ``classify_*`` calls on the same observations skip scoring.
+Entries are keyed on a hash of the tracklet's observation tuples, the
+class filter, ``is_ades`` and a digest of everything else that affects
+the scores: the model, observatory code and config files and the
+``repeatable``/``no_threshold`` settings.  The designation is not part of
+the key, so a tracklet resubmitted under another name is still a hit.
+
+Results are kept in an in-memory LRU and, optionally, in an SQLite file
+that persists between processes and can be shared by several of them.
+"""
+
+import hashlib
+import sqlite3
+import struct
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Sequence
+
+from digest2.result import ClassificationResult, Scores
+
+# bumped whenever the key or value layout changes
+_KEY_VERSION = b"digest2-cache-2"
+
+# canonical observation: mjd, ra, dec, vmag, site, rmsRA, rmsDec,
+# spacebased, earth_obs[3]
+_OBS_FORMAT = struct.Struct("<4di2di3d")
+
+_CLASS_NAMES = tuple(Scores.__dataclass_fields__)
+
+# raw scores, noid scores, rms, rms_prime, orbits_tried, distances_tried
+_VALUE_FORMAT = struct.Struct(f"<{2 * len(_CLASS_NAMES) + 2}d2i")
+
+
+def file_digest(paths: Iterable[Optional[str]], *settings) -> bytes:
+    """Digest of the contents of some files plus extra settings.
+
+    ``None`` paths are hashed as absent.  Used to key cache entries on the
+    model, observatory codes and config a Digest2 was built from.
+    """
+    h = hashlib.blake2b(_KEY_VERSION, digest_size=20)
+    for path in paths:
+        if path is None:
+            h.update(b"\0none\0")
+            continue
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        h.update(b"\0file\0")
+    h.update(repr(settings).encode())
+    return h.digest()
+
+
+def tracklet_key(context: bytes, obs_tuples: Sequence[tuple],
+                 class_indices: Optional[List[int]], is_ades: bool) -> bytes:
+    """Cache key of one tracklet scored under ``context``.
+
+    Observation tuples are normalized to their full form first, so the
+    short tuples of the MPC 80-column parser and the 8-tuples of
+    ``Observation.to_tuple`` give the same key for the same values.
+    """
+    h = hashlib.blake2b(context, digest_size=20)
+    h.update(b"A" if is_ades else b"M")
+    classes = None if class_indices is None else sorted(set(class_indices))
+    h.update(repr(classes).encode())
+    for obs in obs_tuples:
+        mjd, ra, dec, vmag, site = obs[:5]
+        rms_ra, rms_dec, spacebased = (tuple(obs[5:8]) + (0.0, 0.0, 0)[len(obs) - 5:])[:3]
+        earth_obs = tuple(obs[8]) if len(obs) > 8 else (0.0, 0.0, 0.0)
+        h.update(_OBS_FORMAT.pack(mjd, ra, dec, vmag, site, rms_ra, rms_dec,
+                                  1 if spacebased else 0, *earth_obs))
+    return h.digest()
+
+
+def _pack(result: ClassificationResult) -> bytes:
+    return _VALUE_FORMAT.pack(
+        *(result.raw[c] for c in _CLASS_NAMES),
+        *(result.noid[c] for c in _CLASS_NAMES),
+        result.rms, result.rms_prime,
+        result.orbits_tried, result.distances_tried)
+
+
+def _unpack(data: bytes) -> ClassificationResult:
+    values = _VALUE_FORMAT.unpack(data)
+    n = len(_CLASS_NAMES)
+    return ClassificationResult(
+        raw=Scores(**dict(zip(_CLASS_NAMES, values[:n]))),
+        noid=Scores(**dict(zip(_CLASS_NAMES, values[n:2 * n]))),
+        rms=values[2 * n],
+        rms_prime=values[2 * n + 1],
+        orbits_tried=values[2 * n + 2],
+        distances_tried=values[2 * n + 3],
+    )
+
+
+class ResultCache:
+    """In-memory LRU of classification results, optionally backed by SQLite.
+
+    Safe to share between threads and between Digest2 instances; entries
+    of instances with different models or settings have different keys.
+    Results with trial orbits (``collect_orbits=True``) or tag sets
+    (``collect_tags=True``) and partial results of a work budget are not
+    cached.
+
+    Args:
+        max_entries: Results kept in memory; the least recently used are
+            evicted beyond this.
+        path: SQLite file for a persistent second level, or None.
+        max_disk_entries: Results kept in the SQLite file; the least
+            recently used are evicted beyond this.  None for no limit.
+    """
+
+    def __init__(self, max_entries: int = 100_000, path: Optional[str] = None,
+                 max_disk_entries: Optional[int] = None):
+        if max_entries < 1 or (max_disk_entries is not None
+                               and max_disk_entries < 1):
+            raise ValueError("cache sizes must be at least 1")
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory: "OrderedDict[bytes, ClassificationResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._clock = 0
+        self._disk_entries = 0
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False,
+                                       isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key BLOB PRIMARY KEY, value BLOB NOT NULL, used INTEGER NOT NULL)")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+            self._clock, self._disk_entries = self._db.execute(
+                "SELECT COALESCE(MAX(used), 0), COUNT(*) FROM results").fetchone()
+
+    def get(self, key: bytes) -> Optional[ClassificationResult]:
+        """Return the cached result for ``key``, or None on a miss."""
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    result = _unpack(row[0])
+                    self._touch(key)
+                    self._remember(key, result)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def put(self, key: bytes, result: ClassificationResult) -> None:
+        """Store the result for ``key`` (its designation is not kept)."""
+        if (result.trial_orbits is not None or result.tag_sets is not None
+                or result.partial):
+            return
+        if result.designation:
+            result = _unpack(_pack(result))
+        with self._lock:
+            self._remember(key, result)
+            if self._db is not None:
+                self._clock += 1
+                inserted = self._db.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                    (key, _pack(result), self._clock)).rowcount
+                self._disk_entries += inserted
+                self._evict_disk()
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters and the number of entries."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._memory),
+                "disk_entries": self._disk_entries if self._db else 0,
+            }
+
+    def clear(self) -> None:
+        """Drop all entries (memory and disk) and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._disk_entries = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def close(self) -> None:
+        """Close the SQLite file, if any."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _remember(self, key: bytes, result: ClassificationResult) -> None:
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _touch(self, key: bytes) -> None:
+        self._clock += 1
+        self._db.execute("UPDATE results SET used = ? WHERE key = ?",
+                         (self._clock, key))
+
+    def _evict_disk(self) -> None:
+        """Trim the SQLite file to ``max_disk_entries``, 10% at a time."""
+        limit = self.max_disk_entries
+        if limit is None or self._disk_entries <= limit:
+            return
+        excess = self._disk_entries - limit + limit // 10
+        deleted = self._db.execute(
+            "DELETE FROM results WHERE key IN "
+            "(SELECT key FROM results ORDER BY used LIMIT ?)",
+            (excess,)).rowcount
+        self._disk_entries -= deleted
+        self.evictions += deleted
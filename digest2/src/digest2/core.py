@@ -5,20 +5,113 @@ for stateful classification, and the classify() convenience function for
 one-shot use.
 """
 
+import asyncio
+import collections
+import dataclasses
+import functools
 import math
-from concurrent.futures import ThreadPoolExecutor
+import os
+import weakref
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Union
 
 from digest2 import _extension
+from digest2.cache import ResultCache, file_digest, tracklet_key
 from digest2.model import find_config_path, find_model_path, find_obscodes_path
 from digest2.observation import (
     Observation,
-    parse_ades_psv,
+    iter_ades_psv,
+    iter_ades_xml,
+    parse_ades_psv_arrays,
     parse_ades_xml,
-    parse_mpc80_file,
 )
-from digest2.result import ClassificationResult, Scores, TrialOrbit
+from digest2.result import (ArrayResult, ClassificationResult, Scores,
+                            TagSets, TrialOrbit)
+
+
+# bytes of an MPC 80-column file handed to the C parser at a time
+_MPC80_CHUNK_BYTES = 4 << 20
+
+
+def _mpc80_tracklets(parsed: dict) -> List[tuple]:
+    """Split ``_extension.parse_mpc80_buffer`` output into tracklets.
+
+    Returns (designation, observation tuples) pairs.
+    """
+    columns = [parsed[k].tolist() for k in ("mjd", "ra", "dec", "vmag", "site")]
+    rows = list(zip(*columns))
+    earth_obs = parsed["earth_obs"].tolist()
+    for r, spacebased in enumerate(parsed["spacebased"].tolist()):
+        if spacebased:
+            rows[r] += (0.0, 0.0, 1, tuple(earth_obs[3 * r:3 * r + 3]))
+    offsets = parsed["offsets"].tolist()
+    return [(desig, rows[offsets[t]:offsets[t + 1]])
+            for t, desig in enumerate(parsed["designations"])]
+
+
+def _iter_mpc80_tracklets(filepath: str) -> Iterator[tuple]:
+    """Read an MPC 80-column file with the C parser, a chunk at a time.
+
+    Yields (designation, observation tuples) pairs exactly as the CLI
+    splits the file into tracklets.  A tracklet still open at the end of
+    a chunk keeps its rows; only the line of its last row (and any
+    second lines after it) is parsed again with the next chunk, which
+    continues the tracklet.
+    """
+    with open(filepath, "rb") as f:
+        tail = b""
+        rows = None     # rows of the open tracklet, less its last row
+        while True:
+            block = f.read(_MPC80_CHUNK_BYTES)
+            data = tail + block
+            cut = data.rfind(b"\n") + 1 if block else len(data)
+            parsed = _extension.parse_mpc80_buffer(memoryview(data)[:cut])
+            tracklets = _mpc80_tracklets(parsed)
+            if rows is not None:
+                rows.extend(tracklets[0][1])
+                tracklets[0] = (tracklets[0][0], rows)
+                rows = None
+            if block and parsed["open_start"] < cut:
+                _, rows = tracklets.pop()
+                rows.pop()
+                tail = data[parsed["open_start"]:]
+            else:
+                tail = data[cut:]
+            yield from tracklets
+            if not block:
+                return
+
+
+def _ades_psv_tracklets(filepath: str) -> List[tuple]:
+    """Read an ADES PSV file with ``parse_ades_psv_arrays``.
+
+    Returns (designation, observation tuples) pairs, grouped and sorted
+    as by ``parse_ades_psv``.
+    """
+    import numpy as np
+
+    columns = parse_ades_psv_arrays(filepath)
+    obscodes = columns["obscode"].tolist()
+    site_of = {code: _extension.parse_obscode(code) for code in set(obscodes)}
+    sites = [site_of[code] for code in obscodes]
+    rows = list(zip(
+        columns["mjd"].tolist(),
+        np.radians(columns["ra"]).tolist(),
+        np.radians(columns["dec"]).tolist(),
+        columns["mag"].tolist(),
+        sites,
+        columns["rms_ra"].tolist(),
+        columns["rms_dec"].tolist(),
+    ))
+    offsets = columns["offsets"].tolist()
+    return [(desig, rows[offsets[t]:offsets[t + 1]])
+            for t, desig in enumerate(columns["designations"])]
 
 
 def _parse_config_file(config_path: str) -> dict:
@@ -68,6 +161,30 @@ def _parse_config_file(config_path: str) -> dict:
     return result
 
 
+# classifier of a worker process of a Digest2 process pool
+_process_d2: Optional["Digest2"] = None
+
+# chunks handed to each worker process per batch, for load balancing
+_CHUNKS_PER_PROCESS = 4
+
+
+def _process_init(settings: dict) -> None:
+    """Internal: load the model once in a new worker process."""
+    global _process_d2
+    _process_d2 = Digest2(**settings)
+
+
+def _process_score(batch: List[List[tuple]], designations: List[str],
+                   classes: Optional[List[str]], is_ades: bool,
+                   collect_orbits: bool, collect_tags: bool = False
+                   ) -> List[Optional[ClassificationResult]]:
+    """Internal: score a chunk of tracklets in a worker process."""
+    return _process_d2._score_many(
+        batch, classes=classes, is_ades=is_ades,
+        collect_orbits=collect_orbits, max_workers=1,
+        designations=designations, collect_tags=collect_tags)
+
+
 class Digest2:
     """Stateful digest2 classifier. Loads model once, classifies many tracklets.
 
@@ -95,6 +212,13 @@ class Digest2:
         obscodes_path: Optional[str] = None,
         repeatable: bool = True,
         no_threshold: bool = False,
+        async_workers: Optional[int] = None,
+        async_max_in_flight: Optional[int] = None,
+        cache: Optional[ResultCache] = None,
+        max_orbits: Optional[int] = None,
+        max_distances: Optional[int] = None,
+        max_seconds: Optional[float] = None,
+        search_threads: Optional[int] = None,
     ):
         """Initialize with model data.
 
@@ -108,19 +232,96 @@ class Digest2:
                 at most 5x the configured observatory error. When True, only the
                 floor (the configured error itself) is applied.
                 Overrides any noThreshold setting in the config file.
+            async_workers: Number of scoring threads shared by the
+                ``aclassify_*`` methods.  ``None`` uses one per CPU.
+            async_max_in_flight: Maximum number of tracklets the
+                ``aclassify_*`` methods have queued or being scored at once;
+                further calls wait for a slot.  ``None`` uses
+                ``4 * async_workers``.
+            cache: Optional :class:`~digest2.cache.ResultCache`.  Tracklets
+                whose observations were already scored under the same
+                model, observatory codes, config and settings are then
+                answered from it (except with ``collect_orbits=True`` or
+                ``collect_tags=True``).
+            max_orbits: Per-tracklet budget of trial orbits.  ``None`` for
+                no limit.
+            max_distances: Per-tracklet budget of distances searched.
+            max_seconds: Per-tracklet wall-clock budget in seconds.
+                A tracklet whose budget runs out is scored from the part
+                of orbit space searched so far and its result has
+                ``partial=True``; ``orbits_tried`` and ``distances_tried``
+                report the work done.  Time-limited results depend on
+                machine load, so they are not repeatable.
+            search_threads: Threads to split the search of each tracklet
+                over, for low latency on single large tracklets.  ``None``
+                or 1 searches each tracklet on one thread.  A split search
+                gives slightly different scores from an unsplit one, but
+                the same scores for any ``search_threads`` of 2 or more.
+                Only ``classify_tracklet`` splits the search; bulk methods,
+                whose threads each score a tracklet already, always give
+                unsplit scores.  Ignored for tracklets scored under
+                ``max_orbits`` or ``max_distances``.
         """
+        if async_workers is None:
+            async_workers = os.cpu_count() or 1
+        if async_max_in_flight is None:
+            async_max_in_flight = 4 * async_workers
+        if async_workers < 1 or async_max_in_flight < 1:
+            raise ValueError(
+                "async_workers and async_max_in_flight must be at least 1")
+        budget = dict(max_orbits=max_orbits, max_distances=max_distances,
+                      max_seconds=max_seconds)
+        for name, limit in budget.items():
+            if limit is not None and limit <= 0:
+                raise ValueError(f"{name} must be positive")
+        if search_threads is not None and search_threads < 1:
+            raise ValueError("search_threads must be at least 1")
+
         if model_path is None:
             model_path = find_model_path()
         if obscodes_path is None:
             obscodes_path = find_obscodes_path()
 
-        _extension.init(model_path, obscodes_path)
-        _extension.configure(repeatable=1 if repeatable else 0)
+        # Each instance owns its model, site table and configuration, so
+        # several instances with different settings can coexist.
+        self._ctx = _extension.Context(model_path, obscodes_path)
+        self._ctx.configure(repeatable=1 if repeatable else 0)
 
         # Apply config file settings
         if config_path is None:
             config_path = find_config_path()
 
+        # Worker processes are built from the same settings.
+        self._settings = dict(
+            model_path=model_path, config_path=config_path,
+            obscodes_path=obscodes_path, repeatable=repeatable,
+            no_threshold=no_threshold, search_threads=search_threads,
+            **budget,
+        )
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._process_workers = 0
+
+        # Results are cached per (model, obscodes, config, settings).  Bulk
+        # methods never split the search, so only classify_tracklet keys
+        # its results by whether it does.
+        self._cache = cache
+        self._cache_context = self._split_cache_context = None
+        if cache is not None:
+            self._cache_context = file_digest(
+                (model_path, obscodes_path, config_path), repeatable,
+                no_threshold, max_orbits, max_distances, max_seconds, False)
+            self._split_cache_context = self._cache_context
+            if (search_threads or 1) > 1:
+                self._split_cache_context = file_digest(
+                    (), self._cache_context, True)
+
+        # Thread pool and per-event-loop slots of the aclassify_* methods
+        self._async_workers = async_workers
+        self._async_max_in_flight = async_max_in_flight
+        self._async_pool: Optional[ThreadPoolExecutor] = None
+        self._async_slots: "weakref.WeakKeyDictionary" = \
+            weakref.WeakKeyDictionary()
+
         if config_path is not None:
             cfg = _parse_config_file(config_path)
             kwargs = {}
@@ -133,10 +334,16 @@ class Digest2:
             if cfg["site_errors"]:
                 kwargs["site_errors"] = cfg["site_errors"]
             if kwargs:
-                _extension.configure(**kwargs)
+                self._ctx.configure(**kwargs)
 
         # Explicit no_threshold kwarg overrides config file
-        _extension.configure(no_threshold=1 if no_threshold else 0)
+        self._ctx.configure(no_threshold=1 if no_threshold else 0)
+
+        if any(limit is not None for limit in budget.values()):
+            self._ctx.configure(**{name: limit or 0
+                                   for name, limit in budget.items()})
+        if search_threads is not None:
+            self._ctx.configure(search_threads=search_threads)
 
         # Cache class info
         if Digest2._class_info is None:
@@ -151,9 +358,15 @@ class Digest2:
         self.close()
 
     def close(self):
-        """Release C resources."""
+        """Release C resources and stop any worker processes."""
         if not self._closed:
-            _extension.cleanup()
+            if self._process_pool is not None:
+                self._process_pool.shutdown()
+                self._process_pool = None
+            if self._async_pool is not None:
+                self._async_pool.shutdown()
+                self._async_pool = None
+            self._ctx.close()
             self._closed = True
 
     def _check_open(self):
@@ -166,6 +379,7 @@ class Digest2:
         classes: Optional[List[str]] = None,
         is_ades: bool = False,
         collect_orbits: bool = False,
+        collect_tags: bool = False,
     ) -> ClassificationResult:
         """Classify a single tracklet.
 
@@ -177,12 +391,15 @@ class Digest2:
                      (affects RMS computation).
             collect_orbits: If True, collect individual trial orbit elements
                 (q, e, i, H) in the result's trial_orbits field.
+            collect_tags: If True, collect the bins tagged by the search in
+                the result's tag_sets field (see ``digest2.rescore``).
 
         Returns:
             ClassificationResult with raw/noid Scores, rms, and rms_prime.
         """
         return self._score(observations, classes=classes, is_ades=is_ades,
-                           collect_orbits=collect_orbits)
+                           collect_orbits=collect_orbits,
+                           collect_tags=collect_tags)
 
     def _score(
         self,
@@ -191,41 +408,225 @@ class Digest2:
         is_ades: bool = False,
         designation: str = "",
         collect_orbits: bool = False,
+        collect_tags: bool = False,
     ) -> ClassificationResult:
         """Internal: score a tracklet with an optional designation."""
         self._check_open()
 
-        # Convert class abbreviations to indices
-        class_indices = None
-        if classes is not None:
-            abbr_to_idx = {info[0]: i for i, info in enumerate(self._class_info)}
-            class_indices = []
-            for c in classes:
-                if c not in abbr_to_idx:
-                    raise ValueError(f"Unknown class abbreviation: {c}")
-                class_indices.append(abbr_to_idx[c])
-
-        # Convert observations to tuples for C extension
-        obs_tuples = []
-        for obs in observations:
-            site_idx = _extension.parse_obscode(obs.obscode)
-            obs_tuples.append(obs.to_tuple(site_idx))
+        class_indices = self._class_indices(classes)
+        obs_tuples = self._obs_tuples(observations)
+
+        key = None
+        if self._cache is not None and not (collect_orbits or collect_tags):
+            key = tracklet_key(self._split_cache_context, obs_tuples,
+                               class_indices, is_ades)
+            cached = self._cache.get(key)
+            if cached is not None:
+                return dataclasses.replace(cached, designation=designation)
 
         if collect_orbits:
-            raw_result = _extension.score_orbits(
+            raw_result = self._ctx.score_orbits(
                 obs_tuples,
                 class_indices,
                 1 if is_ades else 0,
+                1 if collect_tags else 0,
             )
         else:
-            raw_result = _extension.score(
+            raw_result = self._ctx.score(
                 obs_tuples,
                 class_indices,
                 1 if is_ades else 0,
+                1 if collect_tags else 0,
             )
 
-        return self._format_result(raw_result, designation=designation,
-                                   collect_orbits=collect_orbits)
+        result = self._format_result(raw_result, designation=designation,
+                                     collect_orbits=collect_orbits)
+        if key is not None:
+            self._cache.put(key, result)
+        return result
+
+    def _class_indices(self, classes: Optional[List[str]]) -> Optional[List[int]]:
+        """Internal: convert class abbreviations to C class indices."""
+        if classes is None:
+            return None
+        abbr_to_idx = {info[0]: i for i, info in enumerate(self._class_info)}
+        class_indices = []
+        for c in classes:
+            if c not in abbr_to_idx:
+                raise ValueError(f"Unknown class abbreviation: {c}")
+            class_indices.append(abbr_to_idx[c])
+        return class_indices
+
+    @staticmethod
+    def _obs_tuples(
+        observations: List[Observation],
+        site_cache: Optional[Dict[str, int]] = None,
+    ) -> List[tuple]:
+        """Internal: convert Observations to C extension tuples.
+
+        ``site_cache`` memoizes obscode lookups across tracklets of a batch.
+        """
+        if site_cache is None:
+            site_cache = {}
+        obs_tuples = []
+        for obs in observations:
+            site_idx = site_cache.get(obs.obscode)
+            if site_idx is None:
+                site_idx = _extension.parse_obscode(obs.obscode)
+                site_cache[obs.obscode] = site_idx
+            obs_tuples.append(obs.to_tuple(site_idx))
+        return obs_tuples
+
+    def _score_many(
+        self,
+        batch: List[List[tuple]],
+        classes: Optional[List[str]],
+        is_ades: bool,
+        collect_orbits: bool,
+        max_workers: Optional[int],
+        designations: Optional[List[str]] = None,
+        executor: str = "thread",
+        use_cache: bool = True,
+        collect_tags: bool = False,
+    ) -> List[Optional[ClassificationResult]]:
+        """Internal: score a batch of observation tuple lists in one C call.
+
+        With ``executor="process"`` the batch is split into chunks that are
+        scored by worker processes instead.  With a result cache, only the
+        tracklets it does not hold are scored.  Returns None for tracklets
+        that could not be scored.
+        """
+        self._check_open()
+
+        if (use_cache and self._cache is not None
+                and not (collect_orbits or collect_tags)):
+            return self._score_cached(
+                batch, classes=classes, is_ades=is_ades,
+                max_workers=max_workers, designations=designations,
+                executor=executor)
+
+        if executor == "process":
+            return self._score_in_processes(
+                batch, classes=classes, is_ades=is_ades,
+                collect_orbits=collect_orbits, max_workers=max_workers,
+                designations=designations, collect_tags=collect_tags)
+        if executor != "thread":
+            raise ValueError(
+                f"executor must be 'thread' or 'process', not {executor!r}")
+
+        class_indices = self._class_indices(classes)
+        raw_results = self._ctx.score_many(
+            batch,
+            class_indices,
+            1 if is_ades else 0,
+            1 if collect_orbits else 0,
+            0 if max_workers is None else max_workers,
+            1 if collect_tags else 0,
+        )
+
+        if designations is None:
+            designations = [""] * len(raw_results)
+        return [
+            None if raw is None else self._format_result(
+                raw, designation=desig, collect_orbits=collect_orbits)
+            for raw, desig in zip(raw_results, designations)
+        ]
+
+    def _score_cached(
+        self,
+        batch: List[List[tuple]],
+        classes: Optional[List[str]],
+        is_ades: bool,
+        max_workers: Optional[int],
+        designations: Optional[List[str]],
+        executor: str,
+    ) -> List[Optional[ClassificationResult]]:
+        """Internal: answer a batch from the result cache, scoring misses."""
+        # Reject bad input here, where tracklet numbers are batch-wide.
+        class_indices = self._class_indices(classes)
+        for t, obs_tuples in enumerate(batch):
+            if len(obs_tuples) < 2:
+                raise ValueError(
+                    f"At least 2 observations required (tracklet {t})")
+
+        if designations is None:
+            designations = [""] * len(batch)
+        keys = [tracklet_key(self._cache_context, obs_tuples, class_indices,
+                             is_ades)
+                for obs_tuples in batch]
+        results: List[Optional[ClassificationResult]] = []
+        misses = []
+        for t, (key, desig) in enumerate(zip(keys, designations)):
+            cached = self._cache.get(key)
+            if cached is None:
+                misses.append(t)
+            else:
+                cached = dataclasses.replace(cached, designation=desig)
+            results.append(cached)
+
+        if misses:
+            scored = self._score_many(
+                [batch[t] for t in misses], classes=classes, is_ades=is_ades,
+                collect_orbits=False, max_workers=max_workers,
+                designations=[designations[t] for t in misses],
+                executor=executor, use_cache=False)
+            for t, result in zip(misses, scored):
+                if result is not None:
+                    self._cache.put(keys[t], result)
+                results[t] = result
+        return results
+
+    def _score_in_processes(
+        self,
+        batch: List[List[tuple]],
+        classes: Optional[List[str]],
+        is_ades: bool,
+        collect_orbits: bool,
+        max_workers: Optional[int],
+        designations: Optional[List[str]],
+        collect_tags: bool = False,
+    ) -> List[Optional[ClassificationResult]]:
+        """Internal: score a batch in chunks on the worker process pool."""
+        # Reject bad input here, where tracklet numbers are batch-wide.
+        self._class_indices(classes)
+        for t, obs_tuples in enumerate(batch):
+            if len(obs_tuples) < 2:
+                raise ValueError(
+                    f"At least 2 observations required (tracklet {t})")
+        pool = self._get_process_pool(max_workers)
+
+        if designations is None:
+            designations = [""] * len(batch)
+        size = max(1, math.ceil(
+            len(batch) / (_CHUNKS_PER_PROCESS * self._process_workers)))
+        futures = [
+            pool.submit(_process_score, batch[i:i + size],
+                        designations[i:i + size], classes, is_ades,
+                        collect_orbits, collect_tags)
+            for i in range(0, len(batch), size)
+        ]
+        return [r for future in futures for r in future.result()]
+
+    def _get_process_pool(self, max_workers: Optional[int]
+                          ) -> ProcessPoolExecutor:
+        """Internal: the worker process pool, started on first use.
+
+        Each worker builds its own Digest2 from this instance's settings
+        once, when it starts.  A binary model file is memory-mapped, so
+        the workers share its pages rather than holding a copy each.
+        """
+        workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        if workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if self._process_pool is not None and self._process_workers != workers:
+            self._process_pool.shutdown()
+            self._process_pool = None
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=workers, initializer=_process_init,
+                initargs=(self._settings,))
+            self._process_workers = workers
+        return self._process_pool
 
     def classify_file(
         self,
@@ -233,81 +634,182 @@ class Digest2:
         classes: Optional[List[str]] = None,
         collect_orbits: bool = False,
         max_workers: Optional[int] = None,
+        executor: str = "thread",
+        collect_tags: bool = False,
     ) -> List[ClassificationResult]:
         """Classify all tracklets in an observation file.
 
-        Supports MPC 80-column (.obs) and ADES XML (.xml) formats.
+        Supports MPC 80-column (.obs), ADES XML (.xml) and ADES PSV (.psv)
+        formats.  MPC 80-column files are read by the C parser the CLI uses,
+        including satellite and roving observer lines, and split into
+        tracklets as the CLI does: at each change of designation or line
+        that is not an observation.
 
-        With ``max_workers`` > 1, tracklets are scored in parallel using
-        threads.  The C scoring engine releases the GIL, so multiple
-        tracklets genuinely execute concurrently on separate CPU cores.
+        By default all tracklets are handed to the C engine in a single
+        call, which releases the GIL once and scores them on a native
+        thread pool.  With ``executor="process"`` they are sent in chunks
+        to a pool of worker processes instead, each with its own copy of
+        the classifier, so that building the results in Python also runs
+        in parallel.  The pool is started on first use and kept until
+        ``close()``.
 
         Args:
             filepath: Path to the observation file.
             classes: List of class abbreviations to compute (default: all).
             collect_orbits: If True, collect trial orbit elements per tracklet.
-            max_workers: Maximum number of threads for parallel scoring.
-                ``None`` (default) lets the runtime choose (typically
-                ``min(32, cpu_count + 4)``).  Use ``1`` to force sequential
-                scoring.
+            max_workers: Number of native threads (or worker processes) for
+                parallel scoring.  ``None`` (default) uses one per CPU.
+                Use ``1`` to force sequential scoring.
+            executor: ``"thread"`` (default) or ``"process"``.
+            collect_tags: If True, collect the bins tagged by the search
+                per tracklet (see ``classify_tracklet``).
 
         Returns:
             List of ClassificationResult objects, one per tracklet.
         """
         self._check_open()
 
-        is_xml = filepath.lower().endswith(".xml")
-        is_psv = filepath.lower().endswith(".psv")
-        is_ades = is_xml or is_psv
-
-        if is_xml:
-            tracklets = parse_ades_xml(filepath)
-        elif is_psv:
-            tracklets = parse_ades_psv(filepath)
-        else:
-            tracklets = parse_mpc80_file(filepath)
-
-        # Build list of (designation, obs_list) pairs with enough observations
+        is_ades = self._is_ades_path(filepath)
         scoreable = [
-            (desig.strip(), obs_list)
-            for desig, obs_list in tracklets.items()
-            if len(obs_list) >= 2
+            (desig.strip(), obs_tuples)
+            for desig, obs_tuples in self._iter_file_tracklets(filepath)
+            if len(obs_tuples) >= 2
         ]
 
         if not scoreable:
             return []
 
-        # Sequential path
-        if max_workers == 1 or len(scoreable) <= 1:
-            results = []
-            for desig, obs_list in scoreable:
-                try:
-                    result = self._score(
-                        obs_list, classes=classes, is_ades=is_ades,
-                        designation=desig,
-                        collect_orbits=collect_orbits,
-                    )
-                    results.append(result)
-                except RuntimeError:
-                    continue
-            return results
-
-        # Parallel path — GIL is released during C scoring
-        def _score_one(item):
-            desig, obs_list = item
-            try:
-                return self._score(
-                    obs_list, classes=classes, is_ades=is_ades,
-                    designation=desig,
-                    collect_orbits=collect_orbits,
-                )
-            except RuntimeError:
+        results = self._score_many(
+            [obs_tuples for _, obs_tuples in scoreable],
+            classes=classes, is_ades=is_ades,
+            collect_orbits=collect_orbits, max_workers=max_workers,
+            designations=[desig for desig, _ in scoreable],
+            executor=executor, collect_tags=collect_tags,
+        )
+        return [r for r in results if r is not None]
+
+    @staticmethod
+    def _is_ades_path(filepath: str) -> bool:
+        """Internal: whether a file is ADES (XML or PSV) by its extension."""
+        return filepath.lower().endswith((".xml", ".psv"))
+
+    def _iter_file_tracklets(self, filepath: str,
+                             streaming: bool = False) -> Iterator[tuple]:
+        """Internal: yield (designation, observation tuples) of a file.
+
+        MPC 80-column files are always read incrementally; with
+        ``streaming``, ADES files are too, one run of observations per
+        tracklet, instead of being grouped by designation first.
+        """
+        lower = filepath.lower()
+        if lower.endswith(".xml"):
+            tracklets = (iter_ades_xml(filepath) if streaming
+                         else parse_ades_xml(filepath).items())
+        elif lower.endswith(".psv"):
+            if not streaming:
+                return iter(_ades_psv_tracklets(filepath))
+            tracklets = iter_ades_psv(filepath)
+        else:
+            return _iter_mpc80_tracklets(filepath)
+
+        site_cache: Dict[str, int] = {}
+        return ((desig, self._obs_tuples(obs_list, site_cache))
+                for desig, obs_list in tracklets)
+
+    def iter_classify_file(
+        self,
+        filepath: str,
+        classes: Optional[List[str]] = None,
+        collect_orbits: bool = False,
+        max_workers: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        ordered: bool = True,
+        collect_tags: bool = False,
+    ) -> Iterator[ClassificationResult]:
+        """Classify the tracklets of an observation file as it is read.
+
+        Unlike ``classify_file``, the file is not loaded first: each
+        tracklet is handed to a scoring thread as soon as its block of
+        observations ends, and at most ``max_in_flight`` tracklets are
+        read but not yet yielded, so memory use does not grow with the
+        file.  Files are split into tracklets as by ``classify_file``,
+        except that in ADES files a tracklet is a run of consecutive
+        observations with the same designation (see ``iter_ades_psv`` and
+        ``iter_ades_xml``).
+
+        Args:
+            filepath: Path to the observation file.
+            classes: List of class abbreviations to compute (default: all).
+            collect_orbits: If True, collect trial orbit elements per tracklet.
+            max_workers: Number of scoring threads.  ``None`` (default)
+                uses one per CPU.
+            max_in_flight: Maximum number of tracklets being scored or
+                waiting to be yielded.  ``None`` uses ``4 * max_workers``.
+            ordered: If True (default), yield results in file order;
+                otherwise yield each as soon as it is scored.
+            collect_tags: If True, collect the bins tagged by the search
+                per tracklet (see ``classify_tracklet``).
+
+        Yields:
+            ClassificationResult objects; tracklets that cannot be scored
+            are skipped, as in ``classify_file``.
+        """
+        self._check_open()
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if max_in_flight is None:
+            max_in_flight = 4 * max_workers
+        if max_workers < 1 or max_in_flight < 1:
+            raise ValueError("max_workers and max_in_flight must be at least 1")
+
+        is_ades = self._is_ades_path(filepath)
+        tracklets = self._iter_file_tracklets(filepath, streaming=True)
+        class_indices = self._class_indices(classes)
+
+        def score(desig, obs_tuples):
+            # A one-tracklet batch reports rejected tracklets as None
+            # rather than raising, and runs on the calling thread.
+            raw = self._ctx.score_many(
+                [obs_tuples], class_indices, 1 if is_ades else 0,
+                1 if collect_orbits else 0, 1, 1 if collect_tags else 0)[0]
+            if raw is None:
                 return None
+            return self._format_result(raw, designation=desig,
+                                       collect_orbits=collect_orbits)
 
+        pending = collections.deque()
         with ThreadPoolExecutor(max_workers=max_workers) as pool:
-            raw_results = list(pool.map(_score_one, scoreable))
-
-        return [r for r in raw_results if r is not None]
+            try:
+                for desig, obs_tuples in tracklets:
+                    if len(obs_tuples) < 2:
+                        continue
+                    pending.append(pool.submit(score, desig.strip(), obs_tuples))
+                    if len(pending) >= max_in_flight:
+                        yield from self._drain(pending, ordered, max_in_flight - 1)
+                yield from self._drain(pending, ordered, 0)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    @staticmethod
+    def _drain(pending: "collections.deque", ordered: bool,
+               keep: int) -> Iterator[ClassificationResult]:
+        """Internal: yield results of ``pending`` futures until ``keep`` remain.
+
+        Takes the oldest future if ``ordered``, else whichever finish first.
+        """
+        while len(pending) > keep:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                done = [f for f in pending if f in finished]
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                result = future.result()
+                if result is not None:
+                    yield result
 
     def classify_batch(
         self,
@@ -316,11 +818,14 @@ class Digest2:
         is_ades: bool = False,
         collect_orbits: bool = False,
         max_workers: Optional[int] = None,
+        executor: str = "thread",
+        collect_tags: bool = False,
     ) -> List[Optional[ClassificationResult]]:
         """Classify multiple tracklets.
 
-        With ``max_workers`` > 1, tracklets are scored in parallel using
-        threads (the C engine releases the GIL).
+        The whole batch is scored in one C call on a native thread pool
+        (the GIL is released once for the batch), or on worker processes
+        with ``executor="process"`` (see ``classify_file``).
 
         Args:
             tracklets: List of tracklets, each a list of Observations.
@@ -328,34 +833,214 @@ class Digest2:
             is_ades: If True, use ADES RMS handling in the scoring engine.
                 Set this when observations were parsed from ADES XML files.
             collect_orbits: If True, collect trial orbit elements per tracklet.
-            max_workers: Maximum number of threads for parallel scoring.
-                ``None`` lets the runtime choose.  Use ``1`` for sequential.
+            max_workers: Number of native threads (or worker processes) for
+                parallel scoring.  ``None`` uses one per CPU.  Use ``1`` for
+                sequential.
+            executor: ``"thread"`` (default) or ``"process"``.
+            collect_tags: If True, collect the bins tagged by the search
+                per tracklet (see ``classify_tracklet``).
 
         Returns:
             List of ClassificationResult objects (None for failed tracklets).
         """
-        if max_workers == 1 or len(tracklets) <= 1:
-            results = []
-            for obs_list in tracklets:
-                try:
-                    result = self.classify_tracklet(obs_list, classes=classes,
-                                                    is_ades=is_ades,
-                                                    collect_orbits=collect_orbits)
-                    results.append(result)
-                except RuntimeError:
-                    results.append(None)
-            return results
-
-        def _score_one(obs_list):
-            try:
-                return self.classify_tracklet(obs_list, classes=classes,
-                                              is_ades=is_ades,
-                                              collect_orbits=collect_orbits)
-            except RuntimeError:
-                return None
+        site_cache: Dict[str, int] = {}
+        batch = [self._obs_tuples(obs_list, site_cache) for obs_list in tracklets]
+        return self._score_many(batch, classes=classes, is_ades=is_ades,
+                                collect_orbits=collect_orbits,
+                                max_workers=max_workers, executor=executor,
+                                collect_tags=collect_tags)
+
+    def classify_arrays(
+        self,
+        mjd,
+        ra,
+        dec,
+        mag,
+        obscode_idx,
+        rms_ra,
+        rms_dec,
+        offsets,
+        classes: Optional[List[str]] = None,
+        is_ades: bool = False,
+        max_workers: Optional[int] = None,
+    ) -> ArrayResult:
+        """Classify tracklets held as flat observation arrays.
 
-        with ThreadPoolExecutor(max_workers=max_workers) as pool:
-            return list(pool.map(_score_one, tracklets))
+        Observations of all tracklets are concatenated; tracklet ``k`` is
+        rows ``offsets[k]:offsets[k + 1]``.  Arrays that are already
+        C-contiguous with the expected dtype (float64; int32 for
+        ``obscode_idx``; int64 for ``offsets``) are read in place by the C
+        engine without copying.  Scoring runs on a native thread pool as in
+        ``classify_batch``.
+
+        Args:
+            mjd: Observation times (MJD, UTC).
+            ra: Right ascension in radians.
+            dec: Declination in radians.
+            mag: V-band magnitude (0 = no magnitude).
+            obscode_idx: Site indices from ``_extension.parse_obscode``;
+                an index outside 0..3599 raises ValueError.
+            rms_ra: RA uncertainty in arcseconds (0 = use default).
+            rms_dec: Dec uncertainty in arcseconds (0 = use default).
+            offsets: Tracklet boundaries, ``n_tracklets + 1`` entries.
+            classes: List of class abbreviations to compute (default: all).
+                Columns of classes not computed are zero.
+            is_ades: If True, use ADES RMS handling in the scoring engine.
+            max_workers: Number of native threads for parallel scoring.
+                ``None`` uses one per online CPU.  Use ``1`` for sequential.
+
+        Returns:
+            ArrayResult with (n_tracklets, 15) raw and noid score arrays and
+            rms/rms_prime vectors.  Tracklets that cannot be scored
+            (fewer than 2 observations, no motion) are NaN.
+        """
+        import numpy as np
+
+        self._check_open()
+
+        columns = [np.ascontiguousarray(a, dtype=np.float64)
+                   for a in (mjd, ra, dec, mag)]
+        site = np.ascontiguousarray(obscode_idx, dtype=np.int32)
+        rms = [np.ascontiguousarray(a, dtype=np.float64)
+               for a in (rms_ra, rms_dec)]
+        offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+
+        n_tracklets = max(len(offsets) - 1, 0)
+        raw_out = np.empty((n_tracklets, len(self._class_info)), dtype=np.float64)
+        noid_out = np.empty_like(raw_out)
+        rms_out = np.empty(n_tracklets, dtype=np.float64)
+        rms_prime_out = np.empty(n_tracklets, dtype=np.float64)
+
+        self._ctx.score_arrays(
+            *columns, site, *rms, offsets,
+            raw_out, noid_out, rms_out, rms_prime_out,
+            self._class_indices(classes),
+            1 if is_ades else 0,
+            0 if max_workers is None else max_workers,
+        )
+
+        return ArrayResult(
+            raw=raw_out,
+            noid=noid_out,
+            rms=rms_out,
+            rms_prime=rms_prime_out,
+            classes=tuple(info[0] for info in self._class_info),
+        )
+
+    async def _arun(self, fn, *args):
+        """Internal: run ``fn(*args)`` on the shared async scoring pool.
+
+        Waits for one of ``async_max_in_flight`` slots first.  Cancelling
+        the caller before the call starts withdraws it; a call already
+        running in the C engine finishes, but its result is dropped.
+        """
+        self._check_open()
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.get(loop)
+        if slots is None:
+            slots = asyncio.Semaphore(self._async_max_in_flight)
+            self._async_slots[loop] = slots
+        if self._async_pool is None:
+            self._async_pool = ThreadPoolExecutor(
+                max_workers=self._async_workers,
+                thread_name_prefix="digest2")
+        async with slots:
+            return await loop.run_in_executor(self._async_pool, fn, *args)
+
+    async def aclassify_tracklet(
+        self,
+        observations: List[Observation],
+        classes: Optional[List[str]] = None,
+        is_ades: bool = False,
+        collect_orbits: bool = False,
+        collect_tags: bool = False,
+    ) -> ClassificationResult:
+        """Classify a single tracklet without blocking the event loop.
+
+        Awaitable version of ``classify_tracklet``.  All ``aclassify_*``
+        calls of an instance share one long-lived pool of
+        ``async_workers`` threads, and at most ``async_max_in_flight``
+        tracklets are queued or scored at a time; further calls wait.
+        """
+        return await self._arun(
+            functools.partial(self.classify_tracklet, observations,
+                              classes=classes, is_ades=is_ades,
+                              collect_orbits=collect_orbits,
+                              collect_tags=collect_tags))
+
+    async def aclassify_batch(
+        self,
+        tracklets: List[List[Observation]],
+        classes: Optional[List[str]] = None,
+        is_ades: bool = False,
+        collect_orbits: bool = False,
+        collect_tags: bool = False,
+    ) -> List[Optional[ClassificationResult]]:
+        """Classify multiple tracklets without blocking the event loop.
+
+        Awaitable version of ``classify_batch``.  Each tracklet is scored
+        as a separate call on the shared async pool (see
+        ``aclassify_tracklet``), so concurrent requests are interleaved
+        and cancelling this call withdraws the tracklets not yet started.
+        """
+        site_cache: Dict[str, int] = {}
+        batch = [self._obs_tuples(obs_list, site_cache) for obs_list in tracklets]
+        return await self._ascore_many(batch, None, classes, is_ades,
+                                       collect_orbits, collect_tags)
+
+    async def aclassify_file(
+        self,
+        filepath: str,
+        classes: Optional[List[str]] = None,
+        collect_orbits: bool = False,
+        collect_tags: bool = False,
+    ) -> List[ClassificationResult]:
+        """Classify all tracklets in an observation file asynchronously.
+
+        Awaitable version of ``classify_file``; the file is read on the
+        shared async pool and its tracklets are scored as by
+        ``aclassify_batch``.
+        """
+        scoreable = await self._arun(lambda: [
+            (desig.strip(), obs_tuples)
+            for desig, obs_tuples in self._iter_file_tracklets(filepath)
+            if len(obs_tuples) >= 2
+        ])
+        results = await self._ascore_many(
+            [obs_tuples for _, obs_tuples in scoreable],
+            [desig for desig, _ in scoreable],
+            classes, self._is_ades_path(filepath), collect_orbits,
+            collect_tags)
+        return [r for r in results if r is not None]
+
+    async def _ascore_many(
+        self,
+        batch: List[List[tuple]],
+        designations: Optional[List[str]],
+        classes: Optional[List[str]],
+        is_ades: bool,
+        collect_orbits: bool,
+        collect_tags: bool = False,
+    ) -> List[Optional[ClassificationResult]]:
+        """Internal: score tracklets one per call on the shared async pool."""
+        self._class_indices(classes)
+        for t, obs_tuples in enumerate(batch):
+            if len(obs_tuples) < 2:
+                raise ValueError(
+                    f"At least 2 observations required (tracklet {t})")
+        if designations is None:
+            designations = [""] * len(batch)
+
+        def score(obs_tuples, desig):
+            return self._score_many(
+                [obs_tuples], classes=classes, is_ades=is_ades,
+                collect_orbits=collect_orbits, max_workers=1,
+                designations=[desig], collect_tags=collect_tags)[0]
+
+        return list(await asyncio.gather(*(
+            self._arun(score, obs_tuples, desig)
+            for obs_tuples, desig in zip(batch, designations)
+        )))
 
     def _format_result(
         self, raw_result: dict, designation: str = "",
@@ -384,6 +1069,15 @@ class Digest2:
                 for t in raw_result["trial_orbits"]
             )
 
+        tag_sets = None
+        if "tag_bins" in raw_result:
+            import numpy as np
+
+            tag_sets = TagSets._from_mask(
+                raw_result["tag_classes"],
+                np.frombuffer(raw_result["tag_bins"], dtype=np.int32),
+                np.frombuffer(raw_result["tag_masks"], dtype=np.uint32))
+
         return ClassificationResult(
             raw=Scores(**raw_kwargs),
             noid=Scores(**noid_kwargs),
@@ -391,6 +1085,10 @@ class Digest2:
             rms_prime=raw_result["rms_prime"],
             designation=designation,
             trial_orbits=trial_orbits,
+            partial=bool(raw_result["partial"]),
+            orbits_tried=raw_result["orbits_tried"],
+            distances_tried=raw_result["distances_tried"],
+            tag_sets=tag_sets,
         )
 
 
@@ -405,6 +1103,8 @@ def classify(
     is_ades: bool = False,
     collect_orbits: bool = False,
     max_workers: Optional[int] = None,
+    executor: str = "thread",
+    collect_tags: bool = False,
 ) -> Union[ClassificationResult, List[ClassificationResult]]:
     """One-shot classification. Accepts a filepath, tracklet, or batch.
 
@@ -423,8 +1123,12 @@ def classify(
             Set this when observations were parsed from ADES XML files.
             Ignored when *input* is a filepath (auto-detected from extension).
         collect_orbits: If True, collect trial orbit elements per tracklet.
-        max_workers: Maximum number of threads for parallel scoring.
-            ``None`` lets the runtime choose.  Use ``1`` for sequential.
+        max_workers: Number of native threads for parallel scoring.
+            ``None`` uses one per online CPU.  Use ``1`` for sequential.
+        executor: ``"thread"`` (default) or ``"process"`` to score a file
+            or batch on worker processes.
+        collect_tags: If True, collect the bins tagged by the search per
+            tracklet, for ``digest2.rescore``.
 
     Returns:
         ClassificationResult for a single tracklet, or list of
@@ -440,12 +1144,17 @@ def classify(
         if isinstance(input, (str, Path)):
             return d2.classify_file(str(input), classes=classes,
                                     collect_orbits=collect_orbits,
-                                    max_workers=max_workers)
+                                    max_workers=max_workers,
+                                    executor=executor,
+                                    collect_tags=collect_tags)
         if isinstance(input, list) and input and isinstance(input[0], list):
             return d2.classify_batch(input, classes=classes,
                                      is_ades=is_ades,
                                      collect_orbits=collect_orbits,
-                                     max_workers=max_workers)
+                                     max_workers=max_workers,
+                                     executor=executor,
+                                     collect_tags=collect_tags)
         return d2.classify_tracklet(input, classes=classes,
                                     is_ades=is_ades,
-                                    collect_orbits=collect_orbits)
+                                    collect_orbits=collect_orbits,
+                                    collect_tags=collect_tags)
@@ -1,9 +1,10 @@
 """Observation data classes and parsers for various astrometric formats."""
 
+import itertools
 import math
 from datetime import datetime
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 
 @dataclass
@@ -51,9 +52,10 @@ class Observation:
             site_index: Integer site index from parse_obscode().
 
         Returns:
-            Tuple of (mjd, ra_rad, dec_rad, vmag, site_int, rmsRA, rmsDec, spacebased).
+            Tuple of (mjd, ra_rad, dec_rad, vmag, site_int, rmsRA, rmsDec,
+            spacebased), followed by earth_obs for space-based observations.
         """
-        return (
+        values = (
             self.mjd,
             self.ra_rad,
             self.dec_rad,
@@ -63,6 +65,9 @@ class Observation:
             self.rms_dec,
             1 if self.spacebased else 0,
         )
+        if self.spacebased:
+            values += (tuple(self.earth_obs),)
+        return values
 
 
 # Magnitude band correction to V-band (same as common.c updateMagnitude)
@@ -200,6 +205,28 @@ def parse_mpc80(line: str) -> Optional[Observation]:
     )
 
 
+def _iter_mpc80_obs(filepath: str) -> Iterator[Tuple[str, Observation]]:
+    """Yield (designation, Observation) for each parseable line of a file."""
+    with open(filepath, "r") as f:
+        for raw_line in f:
+            line = raw_line.rstrip("\n")
+            if len(line) < 80:
+                continue
+
+            obs = parse_mpc80(line)
+            if obs is None:
+                continue
+
+            yield line[0:12], obs
+
+
+def _blocks(pairs: Iterable[Tuple[str, Observation]]
+            ) -> Iterator[Tuple[str, List[Observation]]]:
+    """Group runs of consecutive observations with the same designation."""
+    for desig, run in itertools.groupby(pairs, key=lambda pair: pair[0]):
+        yield desig, [obs for _, obs in run]
+
+
 def parse_mpc80_file(filepath: str) -> Dict[str, List[Observation]]:
     """Parse an MPC 80-column format observation file.
 
@@ -212,29 +239,100 @@ def parse_mpc80_file(filepath: str) -> Dict[str, List[Observation]]:
         Dict mapping designation string -> list of Observations.
     """
     tracklets: Dict[str, List[Observation]] = {}
+    for desig, obs in _iter_mpc80_obs(filepath):
+        if desig not in tracklets:
+            tracklets[desig] = []
+        tracklets[desig].append(obs)
+    return tracklets
 
-    with open(filepath, "r") as f:
-        for raw_line in f:
-            line = raw_line.rstrip("\n")
-            if len(line) < 80:
-                continue
 
-            obs = parse_mpc80(line)
-            if obs is None:
-                continue
+def iter_mpc80_file(filepath: str) -> Iterator[Tuple[str, List[Observation]]]:
+    """Read an MPC 80-column observation file one tracklet at a time.
 
-            desig = line[0:12]
-            if desig not in tracklets:
-                tracklets[desig] = []
-            tracklets[desig].append(obs)
+    As in the C ``readMPC80`` loop, a tracklet ends where the designation
+    changes, so only one tracklet is held in memory.  Unlike
+    :func:`parse_mpc80_file`, observations of a designation that appears
+    in separate blocks of the file are yielded as separate tracklets.
 
-    return tracklets
+    Args:
+        filepath: Path to the observation file.
+
+    Yields:
+        (designation, list of Observations) pairs in file order.
+    """
+    return _blocks(_iter_mpc80_obs(filepath))
+
+
+def _optical_fields(optical) -> Dict[str, str]:
+    """Map the local tag names of an <optical> element's children to text.
+
+    The children are walked once; empty elements and comments are left
+    out, and the first of any repeated tag wins (as with ``find``).
+    """
+    fields: Dict[str, str] = {}
+    for child in optical:
+        tag = child.tag
+        if isinstance(tag, str) and child.text:
+            fields.setdefault(tag.rpartition("}")[2], child.text)
+    return fields
+
+
+def _ades_xml_desig(fields: Dict[str, str]) -> str:
+    """Tracklet ID of an <optical> element: trkSub, else provID, else permID."""
+    for key in ("trkSub", "provID", "permID"):
+        if key in fields:
+            return fields[key].strip()
+    return "unknown"
+
+
+def _iter_ades_xml_obs(filepath: str) -> Iterator[Tuple[str, Observation]]:
+    """Yield (designation, Observation) for each <optical> of an ADES XML file.
+
+    The document is read with ``iterparse`` and each element is discarded
+    once parsed, so memory use does not grow with the file.  If the file
+    has ``obsBlock`` elements, only observations in their ``obsData`` are
+    read; otherwise every <optical> is (flat ADES layout).
+    """
+    from lxml import etree as ET
+
+    has_blocks = False
+    in_block = 0
+    in_data = 0
+
+    for event, elem in ET.iterparse(
+            filepath, events=("start", "end"),
+            tag=("{*}obsBlock", "{*}obsData", "{*}optical")):
+        name = elem.tag.rpartition("}")[2]
+        if event == "start":
+            if name == "obsBlock":
+                has_blocks = True
+                in_block += 1
+            elif name == "obsData":
+                in_data += 1
+            continue
+
+        if name == "optical":
+            if not has_blocks or (in_block and in_data):
+                fields = _optical_fields(elem)
+                obs = _parse_ades_fields(fields)
+                if obs is not None:
+                    yield _ades_xml_desig(fields), obs
+        elif name == "obsBlock":
+            in_block -= 1
+        else:
+            in_data -= 1
+
+        # Drop the finished element and any siblings already read.
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
 
 
 def parse_ades_xml(filepath: str) -> Dict[str, List[Observation]]:
-    """Parse an ADES XML observation file using Python's xml.etree.
+    """Parse an ADES XML observation file using lxml.
 
-    No libxml2 dependency required.
+    Observations are read from ``obsBlock``/``obsData`` elements, or from
+    anywhere in the document if it has no ``obsBlock`` (flat ADES layout).
 
     Args:
         filepath: Path to the ADES XML file.
@@ -242,94 +340,48 @@ def parse_ades_xml(filepath: str) -> Dict[str, List[Observation]]:
     Returns:
         Dict mapping designation/tracklet ID -> list of Observations.
     """
-    from lxml import etree as ET
+    tracklets: Dict[str, List[Observation]] = {}
+    for desig, obs in _iter_ades_xml_obs(filepath):
+        tracklets.setdefault(desig, []).append(obs)
+    return tracklets
 
-    tree = ET.parse(filepath)
-    root = tree.getroot()
 
-    # Handle namespaces - ADES XML may use a default namespace
-    ns = ""
-    if root.tag.startswith("{"):
-        ns = root.tag.split("}")[0] + "}"
+def iter_ades_xml(filepath: str) -> Iterator[Tuple[str, List[Observation]]]:
+    """Read an ADES XML observation file one tracklet at a time.
 
-    tracklets: Dict[str, List[Observation]] = {}
+    The document is parsed incrementally, so large submissions can be
+    classified without holding the element tree in memory.  A tracklet is
+    a run of consecutive <optical> elements with the same designation (see
+    :func:`iter_mpc80_file`).
 
-    def _process_optical(optical):
-        """Process a single <optical> element and add to tracklets."""
-        obs = _parse_ades_optical(optical, ns)
-        if obs is not None:
-            # Get tracklet sub-designation or provisional ID
-            trkSub_el = optical.find(f"{ns}trkSub")
-            provID_el = optical.find(f"{ns}provID")
-            permID_el = optical.find(f"{ns}permID")
-
-            desig = "unknown"
-            if trkSub_el is not None and trkSub_el.text:
-                desig = trkSub_el.text.strip()
-            elif provID_el is not None and provID_el.text:
-                desig = provID_el.text.strip()
-            elif permID_el is not None and permID_el.text:
-                desig = permID_el.text.strip()
-
-            if desig not in tracklets:
-                tracklets[desig] = []
-            tracklets[desig].append(obs)
-
-    # Find optical observations in obsBlock/obsData structure
-    for obs_block in root.iter(f"{ns}obsBlock"):
-        for obs_data in obs_block.iter(f"{ns}obsData"):
-            for optical in obs_data.iter(f"{ns}optical"):
-                _process_optical(optical)
-
-    # Also find optical observations directly under root (flat ADES format)
-    if not tracklets:
-        for optical in root.iter(f"{ns}optical"):
-            _process_optical(optical)
+    Args:
+        filepath: Path to the ADES XML file.
 
-    return tracklets
+    Yields:
+        (designation, list of Observations) pairs in file order.
+    """
+    return _blocks(_iter_ades_xml_obs(filepath))
 
 
-def _parse_ades_optical(optical, ns: str) -> Optional[Observation]:
-    """Parse a single ADES <optical> element."""
+def _parse_ades_fields(fields: Dict[str, str]) -> Optional[Observation]:
+    """Parse the child fields of a single ADES <optical> element."""
     try:
         # Required fields
-        obsTime_el = optical.find(f"{ns}obsTime")
-        ra_el = optical.find(f"{ns}ra")
-        dec_el = optical.find(f"{ns}dec")
-        stn_el = optical.find(f"{ns}stn")
-
-        if obsTime_el is None or ra_el is None or dec_el is None or stn_el is None:
-            return None
-
-        # Parse ISO date to MJD
-        obstime_str = obsTime_el.text.strip()
-        mjd = _iso_to_mjd(obstime_str)
-
-        ra_deg = float(ra_el.text.strip())
-        dec_deg = float(dec_el.text.strip())
-        obscode = stn_el.text.strip()
+        mjd = _iso_to_mjd(fields["obsTime"])
+        ra_deg = float(fields["ra"].strip())
+        dec_deg = float(fields["dec"].strip())
+        obscode = fields["stn"].strip()
 
         # Optional fields
-        mag = 0.0
-        band = "V"
-        mag_el = optical.find(f"{ns}mag")
-        band_el = optical.find(f"{ns}band")
-        if mag_el is not None and mag_el.text:
-            mag = float(mag_el.text.strip())
-        if band_el is not None and band_el.text:
-            band = band_el.text.strip()
+        mag = float(fields["mag"].strip()) if "mag" in fields else 0.0
+        band = fields["band"].strip() if "band" in fields else "V"
 
         vmag = _update_magnitude(band, mag)
 
         # RMS values
-        rms_ra = 0.0
-        rms_dec = 0.0
-        rmsRA_el = optical.find(f"{ns}rmsRA")
-        rmsDec_el = optical.find(f"{ns}rmsDec")
-        if rmsRA_el is not None and rmsRA_el.text:
-            rms_ra = float(rmsRA_el.text.strip())
-        if rmsDec_el is not None and rmsDec_el.text:
-            rms_dec = float(rmsDec_el.text.strip())
+        rms_ra = float(fields["rmsRA"].strip()) if "rmsRA" in fields else 0.0
+        rms_dec = (float(fields["rmsDec"].strip())
+                   if "rmsDec" in fields else 0.0)
 
         return Observation(
             mjd=mjd,
@@ -342,7 +394,7 @@ def _parse_ades_optical(optical, ns: str) -> Optional[Observation]:
             rms_dec=rms_dec,
         )
 
-    except (ValueError, AttributeError):
+    except (ValueError, KeyError):
         return None
 
 
@@ -381,6 +433,88 @@ def _parse_ades_psv_row(row: Dict[str, str]) -> Optional[Observation]:
         return None
 
 
+def _split_psv(line: str) -> List[str]:
+    """Split a PSV line on '|', strip whitespace, and drop trailing empty field."""
+    parts = [p.strip() for p in line.split("|")]
+    if parts and parts[-1] == "":
+        parts = parts[:-1]
+    return parts
+
+
+def _psv_content(line: str) -> Optional[str]:
+    """Return the header or data part of a PSV line, None for comments."""
+    if line.startswith("#"):
+        return None
+    # Skip metadata key-value lines (e.g. "! mpcCode G96") but not the
+    # column-header line which also starts with "!" in the full ADES spec
+    # (e.g. "!Obstype|permID|...").
+    if line.startswith("!"):
+        if "|" not in line:
+            return None
+        return line[1:]  # strip leading "!" from "!Obstype|..." header
+    return line
+
+
+def _iter_psv_rows(filepath: str) -> Iterator[Tuple[List[str], List[str]]]:
+    """Yield (headers, fields) for each data row of a PSV file.
+
+    Rows whose field count does not match the header are skipped.
+    """
+    headers: Optional[List[str]] = None
+
+    with open(filepath, "r") as f:
+        for raw_line in f:
+            line = _psv_content(raw_line.rstrip("\n"))
+            if line is None:
+                continue
+            if headers is None:
+                headers = _split_psv(line)
+                continue
+            fields = _split_psv(line)
+            if len(fields) != len(headers):
+                continue
+            yield headers, fields
+
+
+def _read_psv_columns(filepath: str) -> Dict[str, List[str]]:
+    """Read the data rows of a PSV file column by column.
+
+    Keeps the rows :func:`_iter_psv_rows` yields, but splits them in one
+    call; fields are left unstripped.
+    """
+    with open(filepath, "r") as f:
+        lines = [_psv_content(line) if line.startswith(("#", "!")) else line
+                 for line in f.read().split("\n")]
+    lines = [line for line in lines if line is not None]
+    if not lines:
+        return {}
+
+    headers = _split_psv(lines[0])
+    n = len(headers)
+    # Drop an empty trailing field, as _split_psv does, then keep rows
+    # with one field per header.
+    rows = [s[:-1] if s.endswith("|") else s
+            for s in (line.rstrip() for line in lines[1:])]
+    rows = [s for s in rows if s.count("|") == n - 1]
+    fields = "|".join(rows).split("|") if rows else []
+    return {name: fields[i::n] for i, name in enumerate(headers)}
+
+
+def _iter_ades_psv_obs(filepath: str) -> Iterator[Tuple[str, Observation]]:
+    """Yield (designation, Observation) for each parseable PSV data row."""
+    for headers, fields in _iter_psv_rows(filepath):
+        row = dict(zip(headers, fields))
+        desig = next(
+            (v for k in ("trkSub", "provID", "permID")
+             if (v := row.get(k, "")) and v != "None"),
+            "unknown",
+        )
+
+        obs = _parse_ades_psv_row(row)
+        if obs is not None:
+            yield desig, obs
+
+
 def parse_ades_psv(filepath: str) -> Dict[str, List[Observation]]:
     """Parse an ADES PSV (pipe-separated values) observation file.
 
@@ -396,48 +530,215 @@ def parse_ades_psv(filepath: str) -> Dict[str, List[Observation]]:
         Dict mapping designation string -> list of Observations sorted by MJD.
         Rows that cannot be parsed are skipped silently.
     """
+    tracklets: Dict[str, List[Observation]] = {}
+    for desig, obs in _iter_ades_psv_obs(filepath):
+        tracklets.setdefault(desig, []).append(obs)
 
-    def _split(line: str) -> List[str]:
-        """Split a PSV line on '|', strip whitespace, and drop trailing empty field."""
-        parts = [p.strip() for p in line.split("|")]
-        if parts and parts[-1] == "":
-            parts = parts[:-1]
-        return parts
+    return {k: sorted(v, key=lambda o: o.mjd) for k, v in tracklets.items()}
 
-    tracklets: Dict[str, List[Observation]] = {}
-    headers: Optional[List[str]] = None
 
-    with open(filepath, "r") as f:
-        for raw_line in f:
-            line = raw_line.rstrip("\n")
-            if line.startswith("#"):
-                continue
-            # Skip metadata key-value lines (e.g. "! mpcCode G96") but not the
-            # column-header line which also starts with "!" in the full ADES spec
-            # (e.g. "!Obstype|permID|...").
-            if line.startswith("!") and "|" not in line:
-                continue
-            if line.startswith("!"):
-                line = line[1:]  # strip leading "!" from "!Obstype|..." header
-            if headers is None:
-                headers = _split(line)
-                continue
-            fields = _split(line)
-            if len(fields) != len(headers):
-                continue
+def iter_ades_psv(filepath: str) -> Iterator[Tuple[str, List[Observation]]]:
+    """Read an ADES PSV observation file one tracklet at a time.
 
-            row = dict(zip(headers, fields))
-            desig = next(
-                (v for k in ("trkSub", "provID", "permID")
-                 if (v := row.get(k, "")) and v != "None"),
-                "unknown",
-            )
+    A tracklet is a run of consecutive rows with the same designation (see
+    :func:`iter_mpc80_file`), sorted by MJD as in :func:`parse_ades_psv`.
 
-            obs = _parse_ades_psv_row(row)
-            if obs is not None:
-                tracklets.setdefault(desig, []).append(obs)
+    Args:
+        filepath: Path to the ADES PSV file.
 
-    return {k: sorted(v, key=lambda o: o.mjd) for k, v in tracklets.items()}
+    Yields:
+        (designation, list of Observations sorted by MJD) pairs.
+    """
+    for desig, obs_list in _blocks(_iter_ades_psv_obs(filepath)):
+        yield desig, sorted(obs_list, key=lambda o: o.mjd)
+
+
+def parse_ades_psv_arrays(filepath: str) -> dict:
+    """Parse an ADES PSV observation file into NumPy columns.
+
+    A fast path for :func:`parse_ades_psv`: column positions are looked up
+    once from the header, fields are converted a column at a time and
+    ``obsTime`` is converted to MJD by :func:`_iso_to_mjd_array`.  The
+    same rows are kept, with the same values, as by :func:`parse_ades_psv`.
+
+    Rows are grouped into tracklets with a single sort: tracklets are in
+    order of first appearance of their designation and observations
+    within each are sorted by MJD, so tracklet ``k`` is rows
+    ``offsets[k]:offsets[k + 1]``.
+
+    Args:
+        filepath: Path to the ADES PSV file.
+
+    Returns:
+        Dict with float64 arrays ``mjd``, ``ra``, ``dec`` (degrees),
+        ``mag`` (V-band corrected), ``rms_ra``, ``rms_dec``; string arrays
+        ``band`` and ``obscode``; int64 ``offsets`` (``n_tracklets + 1``
+        entries) and the list ``designations``, one per tracklet.
+    """
+    import numpy as np
+
+    table = _read_psv_columns(filepath)
+    n_rows = len(next(iter(table.values()), []))
+    if not all(k in table for k in ("obsTime", "ra", "dec", "stn")):
+        n_rows = 0
+
+    def column(name: str) -> List[str]:
+        return table[name][:n_rows] if name in table else [""] * n_rows
+
+    def stripped(name: str) -> List[str]:
+        return [v.strip() for v in column(name)]
+
+    ok = np.ones(n_rows, dtype=bool)
+    mjd = _iso_to_mjd_array(stripped("obsTime"), ok)
+    ra = _psv_floats(column("ra"), ok)
+    dec = _psv_floats(column("dec"), ok)
+    mag = _psv_floats(column("mag"), ok, default=0.0)
+    rms_ra = _psv_floats(column("rmsRA"), ok, default=0.0)
+    rms_dec = _psv_floats(column("rmsDec"), ok, default=0.0)
+    obscode = stripped("stn")
+    ok &= np.array([bool(code) for code in obscode], dtype=bool)
+    band = [b or "V" for b in stripped("band")]
+
+    desig = ["unknown"] * n_rows
+    for key in ("permID", "provID", "trkSub"):
+        desig = [v if v and v != "None" else d
+                 for v, d in zip(stripped(key), desig)]
+
+    # One stable sort groups rows by designation, in order of first
+    # appearance, then by MJD.
+    keep = np.flatnonzero(ok)
+    rank: Dict[str, int] = {}
+    group = np.fromiter((rank.setdefault(desig[i], len(rank))
+                         for i in keep.tolist()), np.int64, len(keep))
+    by_group = np.lexsort((mjd[keep], group))
+    order = keep[by_group]
+    group = group[by_group]
+    offsets = np.concatenate(
+        ([0], np.flatnonzero(np.diff(group)) + 1, [len(order)])
+    ).astype(np.int64)
+
+    rows = order.tolist()
+    band = [band[i] for i in rows]
+    mag = mag[order]
+    correction = np.fromiter(
+        (_BAND_CORRECTIONS.get(b, -0.8) for b in band), np.float64, len(band))
+    mag = np.where(mag > 0, mag + correction, mag)
+
+    return {
+        "mjd": mjd[order],
+        "ra": ra[order],
+        "dec": dec[order],
+        "mag": mag,
+        "band": np.array(band, dtype=str),
+        "obscode": np.array([obscode[i] for i in rows], dtype=str),
+        "rms_ra": rms_ra[order],
+        "rms_dec": rms_dec[order],
+        "offsets": offsets if len(order) else offsets[:1],
+        "designations": list(rank),
+    }
+
+
+def _psv_floats(values: List[str], ok, default: Optional[float] = None):
+    """Convert a column of PSV fields to float64 with ``float``.
+
+    Empty and ``None`` fields are ``default``, or invalid if no default is
+    given.  Rows that cannot be converted are cleared in ``ok``.
+    """
+    import numpy as np
+
+    if default is not None:
+        text = repr(float(default))
+        values = [text if v.strip() in ("", "None") else v for v in values]
+    try:
+        return np.fromiter(map(float, values), np.float64, len(values))
+    except ValueError:
+        pass
+
+    out = np.zeros(len(values), dtype=np.float64)
+    for i, v in enumerate(values):
+        try:
+            out[i] = float(v)
+        except ValueError:
+            ok[i] = False
+    return out
+
+
+# days in each month of a common year, for validating dates
+_MONTH_DAYS = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _iso_to_mjd_array(values: List[str], ok):
+    """Convert a list of stripped ISO 8601 datetime strings to MJD.
+
+    Strings in the usual ADES layout, ``YYYY-MM-DDThh:mm:ss`` with an
+    optional 3- or 6-digit fraction and ``Z``, are converted with array
+    arithmetic that repeats the floating-point operations of
+    :func:`_iso_to_mjd` and :func:`_date_to_mjd` in the same order, so
+    results are bit-identical.  Other strings go through
+    :func:`_iso_to_mjd`; rows it rejects are cleared in ``ok``.
+    """
+    import numpy as np
+
+    n = len(values)
+    mjd = np.zeros(n, dtype=np.float64)
+    if n == 0:
+        return mjd
+
+    raw = np.array([v.encode("ascii", "replace") for v in values])
+    width = max(raw.dtype.itemsize, 27)
+    chars = raw.astype(f"S{width}").view(np.uint8).reshape(n, width)
+    length = np.fromiter(map(len, values), np.int64, n)
+    digits = chars - ord("0")
+
+    def number(start, stop):
+        value = np.zeros(n, dtype=np.int64)
+        for col in range(start, stop):
+            value = value * 10 + digits[:, col]
+        return value
+
+    body = length - (chars[np.arange(n), np.maximum(length - 1, 0)] == ord("Z"))
+    fast = np.isin(body, (19, 23, 26))
+    for col, sep in ((4, "-"), (7, "-"), (10, "T"), (13, ":"), (16, ":")):
+        fast &= chars[:, col] == ord(sep)
+    fast &= (body == 19) | (chars[:, 19] == ord("."))
+    digit_cols = [c for c in range(26) if c not in (4, 7, 10, 13, 16, 19)]
+    is_digit = (digits[:, digit_cols] <= 9)
+    is_digit |= np.asarray(digit_cols) >= body[:, None]
+    fast &= is_digit.all(axis=1)
+
+    year = number(0, 4)
+    month = number(5, 7)
+    day = number(8, 10)
+    hour = number(11, 13)
+    minute = number(14, 16)
+    second = number(17, 19)
+    micro = np.where(body == 26, number(20, 26),
+                     np.where(body == 23, number(20, 23) * 1000, 0))
+
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    valid_month = (month >= 1) & (month <= 12)
+    month_days = np.asarray(_MONTH_DAYS)[np.where(valid_month, month, 0)]
+    month_days = month_days + (leap & (month == 2))
+    fast &= (year >= 1) & valid_month & (day >= 1) & (day <= month_days)
+    fast &= (hour < 24) & (minute < 60) & (second < 60)
+
+    # Same operation order as _iso_to_mjd and _date_to_mjd.
+    day_fraction = (hour + minute / 60.0 + second / 3600.0
+                    + micro / 3_600_000_000.0)
+    days = day + day_fraction / 24.0
+    flookup = np.array([0, 306, 337, 0, 31, 61, 92, 122, 153, 184, 214,
+                        245, 275], dtype=np.int64)
+    z = year + np.where(month <= 2, -1, 0)
+    m = (flookup[np.where(valid_month, month, 0)] + 365 * z + z // 4
+         - z // 100 + z // 400 - 678882)
+    mjd[fast] = (m + days)[fast]
+
+    for i in np.flatnonzero(~fast).tolist():
+        try:
+            mjd[i] = _iso_to_mjd(values[i])
+        except ValueError:
+            ok[i] = False
+    return mjd
 
 
 def _iso_to_mjd(iso_str: str) -> float:
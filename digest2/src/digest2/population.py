@@ -14,7 +14,12 @@ The original C versions remain available under population/make_population/.
 Public domain.
 """
 
+import hashlib
+import io
+import itertools
 import math
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Callable, Dict, List, Optional, Tuple
 
@@ -209,6 +214,56 @@ CLASS_TESTS: List[Callable[[float, float, float, float], bool]] = [
     is_mid_mb, is_outer_mb, is_hilda, is_trojan, is_jfc,
 ]
 
+
+
+def _class_masks(q: np.ndarray, e: np.ndarray, i: np.ndarray,
+                 h: np.ndarray) -> np.ndarray:
+    """Evaluate all CLASS_TESTS over arrays of orbits.
+
+    Returns a bool array of shape (D2CLASSES, n).  Each row matches the
+    scalar test element for element, including for NaN elements.
+    """
+    q, e, i, h = (np.asarray(x, dtype=np.float64) for x in (q, e, i, h))
+    masks = np.empty((D2CLASSES, len(q)), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        bound = ~(e >= 1.0)
+        a = q / (1 - e)
+        aphelion = q * (1 + e) / (1 - e)
+        tj = (5.2 * (1 - e) / q
+              + 2 * np.sqrt(q * (1 + e) / 5.2) * np.cos(np.radians(i)))
+
+    masks[0] = (e >= 1.0) | (q < 1.3) | (e >= 0.5) | (i >= 40.0) | \
+        (aphelion > 10.0)
+    masks[1] = q < 1.3
+    masks[2] = (q < 1.3) & (h < 22.5)
+    masks[3] = (q < 1.3) & (h < 18.5)
+    masks[4] = bound & (q < 1.67) & (q >= 1.3) & (aphelion > 1.58)
+    masks[5] = ~((e > 0.18) | (i < 16) | (i > 34)) & bound & \
+        (1.78 < a) & (a < 2.0)
+    masks[6] = ~((q < 1.5) | (i < 20) | (i > 27)) & bound & \
+        (2.2 < a) & (a < 2.45)
+    masks[7] = ~(q < 1.67) & bound & (2.1 < a) & (a < 2.5) & \
+        (i < ((a - 2.1) / 0.4) * 10 + 7)
+    masks[8] = ~((e > 0.35) | (i < 24) | (i > 37)) & bound & \
+        (2.5 < a) & (a < 2.8)
+    masks[9] = ~((e > 0.25) | (i < 20) | (i > 23.5)) & bound & \
+        (2.55 < a) & (a < 2.72)
+    masks[10] = ~((e > 0.45) | (i > 20)) & bound & (2.5 < a) & (a < 2.8)
+    masks[11] = ~(e > 0.4) & bound & (2.8 < a) & (a < 3.25) & \
+        (i < ((a - 2.8) / 0.45) * 16 + 20)
+    masks[12] = ~((i > 18) | (e > 0.4)) & bound & (3.9 < a) & (a < 4.02)
+    masks[13] = ~((e > 0.22) | (i > 38)) & bound & (5.05 < a) & (a < 5.35)
+
+    # np.cos may differ from math.cos in the last place, so Tisserand
+    # values right at a limit are decided by the scalar test.
+    jfc = ~(q < 1.3) & bound
+    masks[14] = jfc & (2 < tj) & (tj < 3)
+    edge = np.flatnonzero(jfc & ((np.abs(tj - 2) < 1e-9) |
+                                 (np.abs(tj - 3) < 1e-9)))
+    for k in edge.tolist():
+        masks[14, k] = is_jfc(q[k], e[k], i[k], h[k])
+    return masks
+
 # ---------------------------------------------------------------------------
 # Binning functions (from d2model.c)
 # ---------------------------------------------------------------------------
@@ -249,10 +304,70 @@ def qeih_to_bin(q: float, e: float, i: float,
         return None
     return (*result, h_to_bin(h))
 
+
+def _bin_indices(q: np.ndarray, e: np.ndarray, i: np.ndarray,
+                 h: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized qeih_to_bin.
+
+    Returns the flat bin index ((iq * EX + ie) * IX + ii) * HX + ih of
+    each orbit and a mask of the orbits that are in the model.
+    """
+    def part_index(part, x):
+        # same as scanning while x >= part[k]; NaN stops at 0
+        idx = np.searchsorted(part, x, side="right")
+        idx[np.isnan(x)] = 0
+        return idx
+
+    iq = part_index(QPART, q)
+    ie = part_index(EPART, e)
+    ii = part_index(IPART, i)
+    ih = np.searchsorted(HPART[:-1], h, side="right")
+    in_model = (iq < QX) & (ie < EX) & (ii < IX)
+    flat = ((iq * EX + ie) * IX + ii) * HX + ih
+    return flat, in_model
+
 # ---------------------------------------------------------------------------
 # S3M file processing (equivalent to s3mbin.c)
 # ---------------------------------------------------------------------------
 
+# lines of an S3M file parsed and binned at a time
+_S3M_CHUNK_LINES = 1 << 20
+
+# with several workers, files larger than this are split into byte ranges
+# binned separately
+_S3M_RANGE_BYTES = 128 << 20
+
+# number of bins in the flattened (QX, EX, IX, HX) grid
+_N_BINS = QX * EX * IX * HX
+
+
+def _parse_s3m_lines(lines: List[str]) -> np.ndarray:
+    """Parse q, e, i, H from S3M orbit lines into an (n, 4) array.
+
+    Lines with fewer than 9 fields or unparseable values are skipped.
+    """
+    if not lines:
+        return np.empty((0, 4))
+    try:
+        return np.loadtxt(lines, usecols=(2, 3, 4, 8), comments=None,
+                          ndmin=2).reshape(-1, 4)
+    except ValueError:
+        pass
+    # some line is malformed; parse the chunk line by line
+    rows = []
+    for line in lines:
+        parts = line.split()
+        # S3M format: id subid q e i node peri epoch H
+        if len(parts) < 9:
+            continue
+        try:
+            rows.append((float(parts[2]), float(parts[3]),
+                         float(parts[4]), float(parts[8])))
+        except ValueError:
+            continue
+    return np.array(rows, dtype=np.float64).reshape(-1, 4)
+
+
 def bin_s3m(filepath: str, clip_neo: bool = False) -> Tuple[np.ndarray, np.ndarray]:
     """Bin a single S3M synthetic orbit file.
 
@@ -270,50 +385,141 @@ def bin_s3m(filepath: str, clip_neo: bool = False) -> Tuple[np.ndarray, np.ndarr
         Binned count for solar-system-wide histogram.
     all_class : ndarray, shape (D2CLASSES, QX, EX, IX, HX)
         Binned count per orbit class.
-    """
-    all_ss = np.zeros((QX, EX, IX, HX))
-    all_class = np.zeros((D2CLASSES, QX, EX, IX, HX))
 
+    The file is read in chunks; each chunk is parsed, filtered, binned and
+    classified with array operations.
+    """
     with open(filepath, "r") as f:
-        for line in f:
-            # Skip S3M comment lines
-            if line.startswith("!!"):
-                continue
+        counts = _bin_s3m_stream(f, clip_neo)
+    return _counts_to_histograms(counts)
 
-            parts = line.split()
-            # S3M format: id subid q e i node peri epoch H
-            if len(parts) < 9:
-                continue
-            try:
-                q = float(parts[2])
-                e = float(parts[3])
-                i = float(parts[4])
-                h = float(parts[8])
-            except (ValueError, IndexError):
-                continue
 
-            if q <= 0.0 or e < 0.0 or e > 1.1 or i < 0.0 or i >= 180.0:
-                continue
+def _bin_s3m_stream(f, clip_neo: bool) -> np.ndarray:
+    """Bin the S3M orbit lines of text stream f.
+
+    Returns a partial histogram: int64 counts of shape
+    (1 + D2CLASSES, QX * EX * IX * HX), row 0 for all orbits and row
+    1 + c for class c.  Partial histograms are merged by adding them.
+    """
+    counts = np.zeros((1 + D2CLASSES, _N_BINS), dtype=np.int64)
+    while True:
+        chunk = list(itertools.islice(f, _S3M_CHUNK_LINES))
+        if not chunk:
+            break
+        # Skip S3M comment lines
+        lines = [line for line in chunk if not line.startswith("!!")]
+        q, e, i, h = _parse_s3m_lines(lines).T
+
+        keep = ~((q <= 0.0) | (e < 0.0) | (e > 1.1) | (i < 0.0) |
+                 (i >= 180.0))
+        if clip_neo:
+            keep &= ~(q < 1.3)
+        _add_counts(counts, q[keep], e[keep], i[keep], h[keep])
+    return counts
+
+
+def _add_counts(counts: np.ndarray, q: np.ndarray, e: np.ndarray,
+                i: np.ndarray, h: np.ndarray) -> int:
+    """Add orbits to a partial histogram (see _bin_s3m_stream).
+
+    Orbits outside the model are ignored.  Returns the number added.
+    """
+    flat, in_model = _bin_indices(q, e, i, h)
+    q, e, i, h = q[in_model], e[in_model], i[in_model], h[in_model]
+    flat = flat[in_model]
+
+    counts[0] += np.bincount(flat, minlength=_N_BINS)
+    masks = _class_masks(q, e, i, h)
+    for c in range(D2CLASSES):
+        counts[1 + c] += np.bincount(flat[masks[c]], minlength=_N_BINS)
+    return len(flat)
 
-            if clip_neo and q < 1.3:
-                continue
 
-            b = qeih_to_bin(q, e, i, h)
-            if b is None:
+def _counts_to_histograms(counts: np.ndarray
+                          ) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert a partial histogram to (all_ss, all_class) arrays."""
+    all_ss = counts[0].astype(np.float64).reshape(QX, EX, IX, HX)
+    all_class = counts[1:].astype(np.float64).reshape(
+        D2CLASSES, QX, EX, IX, HX)
+    return all_ss, all_class
+
+
+def _bin_s3m_range(filepath: str, clip_neo: bool, start: int,
+                   end: int) -> np.ndarray:
+    """Partial histogram of the lines of an S3M file in [start, end).
+
+    start and end must be line boundaries (see _s3m_ranges).  Runs in pool
+    workers.
+    """
+    with open(filepath, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # newline=None translates line endings as text-mode open() does
+    return _bin_s3m_stream(io.StringIO(data.decode(), newline=None),
+                           clip_neo)
+
+
+def _s3m_ranges(filepath: str, range_bytes: int) -> List[Tuple[int, int]]:
+    """Split a file into byte ranges of about range_bytes on line boundaries."""
+    size = os.path.getsize(filepath)
+    bounds = [0]
+    with open(filepath, "rb") as f:
+        for target in range(range_bytes, size, range_bytes):
+            if target <= bounds[-1]:
                 continue
+            # the line containing byte target - 1 ends the range
+            f.seek(target - 1)
+            f.readline()
+            if f.tell() < size:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
 
-            iq, ie, ii, ih = b
-            all_ss[iq, ie, ii, ih] += 1
 
-            for c in range(D2CLASSES):
-                if CLASS_TESTS[c](q, e, i, h):
-                    all_class[c, iq, ie, ii, ih] += 1
+def _s3m_cache_path(cache_dir: str, filepath: str, clip_neo: bool) -> Path:
+    """Cache file for the partial histogram of an S3M file.
+
+    The key is the SHA-256 of the file contents, so a renamed or touched
+    file still hits and an edited one misses.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    clip = "clip" if clip_neo else "all"
+    return Path(cache_dir) / f"{digest.hexdigest()}-{clip}.npz"
+
+
+def _read_s3m_cache(path: Path) -> Optional[np.ndarray]:
+    """Load a cached partial histogram, or None if missing or not usable."""
+    try:
+        with np.load(path) as cached:
+            if not (np.array_equal(cached["qpart"], QPART) and
+                    np.array_equal(cached["epart"], EPART) and
+                    np.array_equal(cached["ipart"], IPART) and
+                    np.array_equal(cached["hpart"], HPART)):
+                return None
+            counts = cached["counts"]
+    except (OSError, KeyError, ValueError):
+        return None
+    if counts.shape != (1 + D2CLASSES, _N_BINS):
+        return None
+    return counts
 
-    return all_ss, all_class
+
+def _write_s3m_cache(path: Path, counts: np.ndarray) -> None:
+    """Save a partial histogram, replacing any existing file atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+    np.savez(tmp, counts=counts, qpart=QPART, epart=EPART, ipart=IPART,
+             hpart=HPART)
+    os.replace(tmp, path)
 
 
 def build_s3m(s3m_files: List[Tuple[str, bool]],
-              output_path: str = "s3m.dat") -> Dict:
+              output_path: str = "s3m.dat",
+              workers: Optional[int] = 1,
+              cache_dir: Optional[str] = None) -> Dict:
     """Process multiple S3M files and write s3m.dat.
 
     Parameters
@@ -322,18 +528,62 @@ def build_s3m(s3m_files: List[Tuple[str, bool]],
         Each entry is (path_to_s3m_file, clip_neo_flag).
     output_path : str
         Where to write the output s3m.dat file.
+    workers : int or None
+        Number of worker processes.  Files, and byte ranges of large
+        files, are binned in parallel and their partial histograms summed
+        here.  1 (default) bins in this process; None uses all CPUs.
+    cache_dir : str, optional
+        Directory of cached per-file partial histograms, keyed by file
+        contents and clip_neo.  Files with a cached histogram aren't
+        re-binned; newly binned files are added to the cache.
 
     Returns
     -------
     dict with keys 'total_orbits', 'class_counts'.
     """
-    total_ss = np.zeros((QX, EX, IX, HX))
-    total_class = np.zeros((D2CLASSES, QX, EX, IX, HX))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    # one _bin_s3m_range call per file, or per range of a large file
+    tasks = []
+    owners = []                 # index into s3m_files of each task
+    file_counts: List[Optional[np.ndarray]] = [None] * len(s3m_files)
+    cache_paths: List[Optional[Path]] = [None] * len(s3m_files)
+    for k, (filepath, clip_neo) in enumerate(s3m_files):
+        if cache_dir is not None:
+            cache_paths[k] = _s3m_cache_path(cache_dir, filepath, clip_neo)
+            file_counts[k] = _read_s3m_cache(cache_paths[k])
+            if file_counts[k] is not None:
+                continue
+        if workers > 1:
+            ranges = _s3m_ranges(filepath, _S3M_RANGE_BYTES)
+        else:
+            ranges = [(0, os.path.getsize(filepath))]
+        for start, end in ranges:
+            tasks.append((filepath, clip_neo, start, end))
+            owners.append(k)
+
+    def merge(results):
+        for k, counts in zip(owners, results):
+            if file_counts[k] is None:
+                file_counts[k] = counts
+            else:
+                file_counts[k] += counts
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as ex:
+            merge(ex.map(_bin_s3m_range, *zip(*tasks)))
+    else:
+        merge(_bin_s3m_range(*task) for task in tasks)
 
-    for filepath, clip_neo in s3m_files:
-        ss, cls = bin_s3m(filepath, clip_neo)
-        total_ss += ss
-        total_class += cls
+    total = np.zeros((1 + D2CLASSES, _N_BINS), dtype=np.int64)
+    for k, counts in enumerate(file_counts):
+        if cache_paths[k] is not None and k in owners:
+            _write_s3m_cache(cache_paths[k], counts)
+        total += counts
+    total_ss, total_class = _counts_to_histograms(total)
 
     _write_s3m(output_path, total_ss, total_class)
 
@@ -444,6 +694,91 @@ def read_s3m(filepath: str) -> Tuple[np.ndarray, np.ndarray]:
 # Reading astorb.dat catalog (equivalent to catalog reading in muk.c)
 # ---------------------------------------------------------------------------
 
+# lines of a catalog read and binned at a time
+_CATALOG_CHUNK_LINES = 1 << 18
+
+# Fixed-format astorb.dat fields (matching muk.c exactly), as 0-indexed
+# slices:  H line[42:47], i line[147:157], e line[158:168], a line[169:181]
+_ASTORB_COLUMNS = ((42, 47), (147, 157), (158, 168), (169, 181))
+
+
+def _parse_fixed_floats(field: np.ndarray, present: np.ndarray
+                        ) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse a column of fixed-width decimal fields.
+
+    field is a uint8 array (n, width) of the field's characters; present
+    marks the positions that are within the line.  Plain decimals (blank
+    padding, optional sign, digits with at most one point) are converted
+    as mantissa / 10**k.  Both are exact doubles for fields this narrow, so
+    the one rounding is the same as float()'s.
+
+    Returns (values, ok); ok is False for fields needing float().
+    """
+    n, width = field.shape
+    assert width <= 15, "mantissa must be exact"
+    c = field.astype(np.int64)
+    space = ~present | (c == 32) | ((c >= 9) & (c <= 13))
+    digit = present & (c >= 48) & (c <= 57)
+    point = present & (c == 46)
+    sign = present & ((c == 43) | (c == 45))
+    body = ~space
+
+    # non-blank characters must be contiguous, sign first
+    rows = np.arange(n)
+    first = np.argmax(body, axis=1)
+    last = width - 1 - np.argmax(body[:, ::-1], axis=1)
+    n_sign = sign.sum(axis=1)
+    ok = ((digit | point | sign | space).all(axis=1) &
+          (last - first + 1 == body.sum(axis=1)) &
+          ((n_sign == 0) | ((n_sign == 1) & sign[rows, first])) &
+          (point.sum(axis=1) <= 1) & digit.any(axis=1))
+
+    mantissa = np.zeros(n, dtype=np.int64)
+    for j in range(width):
+        mantissa = np.where(digit[:, j], mantissa * 10 + (c[:, j] - 48),
+                            mantissa)
+    after_point = np.cumsum(point, axis=1) > 0
+    scale = (digit & after_point).sum(axis=1)
+    values = mantissa / np.power(10.0, scale)
+    negative = (sign & (c == 45)).any(axis=1)
+    values = np.where(negative, -values, values)
+    return values, ok
+
+
+def _read_fixed_columns(lines: List[bytes],
+                        columns: Tuple[Tuple[int, int], ...]
+                        ) -> Tuple[np.ndarray, np.ndarray]:
+    """Read float fields at fixed columns of text lines.
+
+    Returns values, shape (len(columns), len(lines)), and a mask of the
+    lines where every field parsed, the same as float(line[start:stop])
+    for each (start, stop).
+    """
+    n = len(lines)
+    width = max(stop for _, stop in columns)
+    lengths = np.fromiter(map(len, lines), dtype=np.intp, count=n)
+    buf = np.array(lines, dtype=f"S{width}").view(np.uint8).reshape(n, width)
+
+    values = np.empty((len(columns), n))
+    # byte columns are character columns only for ASCII lines
+    fast = buf.max(axis=1, initial=0) < 0x80
+    for k, (start, stop) in enumerate(columns):
+        present = start + np.arange(stop - start) < lengths[:, None]
+        values[k], ok = _parse_fixed_floats(buf[:, start:stop], present)
+        fast &= ok
+
+    ok = fast.copy()
+    for r in np.flatnonzero(~fast).tolist():
+        line = lines[r].decode("utf-8", errors="replace")
+        try:
+            values[:, r] = [float(line[start:stop])
+                            for start, stop in columns]
+            ok[r] = True
+        except ValueError:
+            pass
+    return values, ok
+
+
 def read_astorb(filepath: str) -> Tuple[np.ndarray, np.ndarray, Dict]:
     """Read an astorb.dat catalog and bin known objects.
 
@@ -457,51 +792,34 @@ def read_astorb(filepath: str) -> Tuple[np.ndarray, np.ndarray, Dict]:
     known_ss : ndarray, shape (QX, EX, IX, HX)
     known_class : ndarray, shape (D2CLASSES, QX, EX, IX, HX)
     stats : dict with keys 'lines', 'parse_fails', 'out_of_model', 'usable'
-    """
-    known_ss = np.zeros((QX, EX, IX, HX))
-    known_class = np.zeros((D2CLASSES, QX, EX, IX, HX))
 
+    The catalog is read in chunks of lines, each parsed at the fixed
+    columns and binned with array operations.
+    """
+    counts = np.zeros((1 + D2CLASSES, _N_BINS), dtype=np.int64)
     lines = 0
     parse_fails = 0
-    out_of_model = 0
     usable = 0
 
-    with open(filepath, "r") as f:
-        for line in f:
-            lines += 1
-
-            # Fixed-format column extraction (matching muk.c exactly):
-            #   H:    columns 42-46  (0-indexed, line[42:47])
-            #   i:    columns 147-156 (line[147:157])
-            #   e:    columns 158-167 (line[158:168])
-            #   a:    columns 169-180 (line[169:181])
-            try:
-                h = float(line[42:47])
-                i = float(line[147:157])
-                e = float(line[158:168])
-                a = float(line[169:181])
-            except (ValueError, IndexError):
-                parse_fails += 1
-                continue
-
-            q = a * (1 - e)
-            b = qeih_to_bin(q, e, i, h)
-            if b is None:
-                out_of_model += 1
-                continue
+    with open(filepath, "rb") as f:
+        while True:
+            chunk = list(itertools.islice(f, _CATALOG_CHUNK_LINES))
+            if not chunk:
+                break
+            lines += len(chunk)
 
-            usable += 1
-            iq, ie, ii, ih = b
-            known_ss[iq, ie, ii, ih] += 1
+            values, ok = _read_fixed_columns(chunk, _ASTORB_COLUMNS)
+            parse_fails += int(np.count_nonzero(~ok))
+            h, i, e, a = values[:, ok]
 
-            for c in range(D2CLASSES):
-                if CLASS_TESTS[c](q, e, i, h):
-                    known_class[c, iq, ie, ii, ih] += 1
+            q = a * (1 - e)
+            usable += _add_counts(counts, q, e, i, h)
 
+    known_ss, known_class = _counts_to_histograms(counts)
     return known_ss, known_class, {
         "lines": lines,
         "parse_fails": parse_fails,
-        "out_of_model": out_of_model,
+        "out_of_model": lines - parse_fails - usable,
         "usable": usable,
     }
 
@@ -509,6 +827,23 @@ def read_astorb(filepath: str) -> Tuple[np.ndarray, np.ndarray, Dict]:
 # Volume scaling + model assembly (equivalent to muk.c main)
 # ---------------------------------------------------------------------------
 
+def _volume_isqv() -> np.ndarray:
+    """Inverse square root of the (q, e, i, H) volume of each model bin.
+
+    Computed as in muk.c, shape (QX, EX, IX, HX).
+    """
+    dq = np.diff(QPART, prepend=0.0)
+    de = np.diff(EPART, prepend=0.0)
+    di = np.diff(IPART, prepend=0.0)
+    dh = np.diff(HPART, prepend=0.0)
+    d1 = np.where(EPART < 1.0, 1.0 - EPART, 0.0)
+    d0 = np.concatenate(([1.0], d1[:-1]))
+
+    dae = dq[:, None] * de[None, :] / (d0 + d1)[None, :]
+    daei = dae[:, :, None] * di[None, None, :]
+    return 1.0 / np.sqrt(daei[..., None] * dh)
+
+
 def _volume_scale(all_ss: np.ndarray, known_ss: np.ndarray,
                   all_class: np.ndarray, known_class: np.ndarray):
     """Apply volume scaling and compute unk = (all - known) * isqv.
@@ -516,55 +851,31 @@ def _volume_scale(all_ss: np.ndarray, known_ss: np.ndarray,
     Modifies arrays *in place* and returns (unk_ss, unk_class).
     After this call, all_ss and all_class have been scaled too.
     """
-    unk_ss = np.zeros_like(all_ss)
-    unk_class = np.zeros_like(all_class)
-
-    q0 = 0.0
-    for iq in range(QX):
-        q1 = QPART[iq]
-        dq = q1 - q0
-        q0 = q1
-        e0 = 0.0
-        d1 = 1.0
-        for ie in range(EX):
-            e1 = EPART[ie]
-            d0 = d1
-            d1 = 1.0 - e1 if e1 < 1.0 else 0.0
-            dae = dq * (e1 - e0) / (d0 + d1)
-            e0 = e1
-            i0 = 0.0
-            for ii in range(IX):
-                i1 = IPART[ii]
-                daei = dae * (i1 - i0)
-                i0 = i1
-                h0 = 0.0
-                for ih in range(HX):
-                    h1 = HPART[ih]
-                    isqv = 1.0 / math.sqrt(daei * (h1 - h0))
-                    h0 = h1
-
-                    unk_ss[iq, ie, ii, ih] = (
-                        (all_ss[iq, ie, ii, ih]
-                         - known_ss[iq, ie, ii, ih]) * isqv)
-                    all_ss[iq, ie, ii, ih] *= isqv
-
-                    for c in range(D2CLASSES):
-                        unk_class[c, iq, ie, ii, ih] = (
-                            (all_class[c, iq, ie, ii, ih]
-                             - known_class[c, iq, ie, ii, ih]) * isqv)
-                        all_class[c, iq, ie, ii, ih] *= isqv
-
+    isqv = _volume_isqv()
+    unk_ss = (all_ss - known_ss) * isqv
+    unk_class = (all_class - known_class) * isqv
+    all_ss *= isqv
+    all_class *= isqv
     return unk_ss, unk_class
 
 # ---------------------------------------------------------------------------
 # CSV output (equivalent to mputclass / mheader in muk.c)
 # ---------------------------------------------------------------------------
 
+# (Model, Class) label of each section of the CSV, in file order: All and
+# Unk for SS, then All and Unk for each class.
+_CSV_SECTIONS = [(mod, cls)
+                 for cls in ["SS"] + CLASS_ABBR for mod in ("All", "Unk")]
+
+
 def write_model_csv(output_path: str,
                     all_ss: np.ndarray, unk_ss: np.ndarray,
                     all_class: np.ndarray, unk_class: np.ndarray) -> None:
     """Write the digest2.model.csv file.
 
+    Values are formatted with ``%.15g``; zero bins are written as empty
+    fields.
+
     Parameters
     ----------
     output_path : str
@@ -572,33 +883,35 @@ def write_model_csv(output_path: str,
     all_ss, unk_ss : ndarray, shape (QX, EX, IX, HX)
     all_class, unk_class : ndarray, shape (D2CLASSES, QX, EX, IX, HX)
     """
+    pops = np.empty((len(_CSV_SECTIONS), QX, EX, IX, HX))
+    pops[0] = all_ss
+    pops[1] = unk_ss
+    pops[2::2] = all_class
+    pops[3::2] = unk_class
+
+    # Format nonzero bins; zero bins are empty fields
+    flat = pops.ravel()
+    nonzero = flat != 0
+    text = np.full(flat.size, "", dtype=object)
+    text[nonzero] = [f"{v:.15g}" for v in flat[nonzero].tolist()]
+    text = text.reshape(-1, HX)
+
+    # Model, Class, Q, e, i fields of every row
+    qei = [f"{q:g},{e:g},{i:g},"
+           for q in QPART for e in EPART for i in IPART]
+    prefixes = [f"{mod},{cls_label},{p}"
+                for mod, cls_label in _CSV_SECTIONS for p in qei]
+
+    # Assemble rows as one sequence of fields, delimiters attached
+    cells = np.empty((len(text), HX + 1), dtype=object)
+    cells[:, 0] = prefixes
+    cells[:, 1:HX] = text[:, :-1] + ","
+    cells[:, HX] = text[:, -1] + "\n"
+
+    hdr = "Model,Class,Q,e,i" + "".join(f",H{h:g}" for h in HPART)
     with open(output_path, "w") as f:
-        # Header
-        hdr = "Model,Class,Q,e,i"
-        for ih in range(HX):
-            hdr += f",H{HPART[ih]:g}"
         f.write(hdr + "\n")
-
-        def _write_section(mod: str, cls_label: str,
-                           pop: np.ndarray) -> None:
-            for iq in range(QX):
-                for ie in range(EX):
-                    for ii in range(IX):
-                        line = (f"{mod},{cls_label},"
-                                f"{QPART[iq]:g},{EPART[ie]:g},{IPART[ii]:g}")
-                        for ih in range(HX):
-                            v = pop[iq, ie, ii, ih]
-                            if v == 0:
-                                line += ","
-                            else:
-                                line += f",{v:.15g}"
-                        f.write(line + "\n")
-
-        _write_section("All", "SS", all_ss)
-        _write_section("Unk", "SS", unk_ss)
-        for c in range(D2CLASSES):
-            _write_section("All", CLASS_ABBR[c], all_class[c])
-            _write_section("Unk", CLASS_ABBR[c], unk_class[c])
+        f.write("".join(cells.ravel().tolist()))
 
 # ---------------------------------------------------------------------------
 # CSV reading (equivalent to readCSVClass in d2modelio.c)
@@ -613,61 +926,53 @@ def read_model_csv(filepath: str) -> Dict:
         'all_ss', 'unk_ss' : ndarray (QX, EX, IX, HX)
         'all_class', 'unk_class' : ndarray (D2CLASSES, QX, EX, IX, HX)
     """
-    all_ss = np.zeros((QX, EX, IX, HX))
-    unk_ss = np.zeros((QX, EX, IX, HX))
-    all_class = np.zeros((D2CLASSES, QX, EX, IX, HX))
-    unk_class = np.zeros((D2CLASSES, QX, EX, IX, HX))
-
-    # Build lookup for class abbreviation -> index
-    abbr_to_idx = {a: i for i, a in enumerate(CLASS_ABBR)}
-
     with open(filepath, "r") as f:
-        header = f.readline()  # skip header
-
-        for line in f:
-            parts = line.rstrip("\n").split(",")
-            mod = parts[0]   # "All" or "Unk"
-            cls = parts[1]   # "SS" or class abbreviation
-            q_val = float(parts[2])
-            e_val = float(parts[3])
-            i_val = float(parts[4])
-
-            # Find bin indices from partition values
-            iq = _find_partition_index(QPART, q_val)
-            ie = _find_partition_index(EPART, e_val)
-            ii = _find_partition_index(IPART, i_val)
-
-            h_vals = np.zeros(HX)
-            for ih in range(HX):
-                field = parts[5 + ih] if 5 + ih < len(parts) else ""
-                h_vals[ih] = float(field) if field else 0.0
-
-            if cls == "SS":
-                if mod == "All":
-                    all_ss[iq, ie, ii, :] = h_vals
-                else:
-                    unk_ss[iq, ie, ii, :] = h_vals
-            else:
-                c = abbr_to_idx[cls]
-                if mod == "All":
-                    all_class[c, iq, ie, ii, :] = h_vals
-                else:
-                    unk_class[c, iq, ie, ii, :] = h_vals
+        f.readline()  # skip header
+        lines = f.read().splitlines()
+
+    section_of = {label: s for s, label in enumerate(_CSV_SECTIONS)}
+    try:
+        section = np.array([section_of[tuple(line.split(",", 2)[:2])]
+                            for line in lines], dtype=np.intp)
+    except KeyError as exc:
+        raise ValueError(f"{filepath}: unknown model section {exc}") from None
+
+    # Parse Q, e, i and H columns in bulk.  Empty H fields are zero; fill
+    # them in first (twice, as a run of empty fields shares delimiters).
+    body = "\n".join(lines) + "\n"
+    body = body.replace(",,", ",0,").replace(",,", ",0,")
+    body = body.replace(",\n", ",0\n")
+    values = np.loadtxt(body.splitlines(), delimiter=",", ndmin=2,
+                        usecols=range(2, 5 + HX)) if lines else \
+        np.empty((0, 3 + HX))
+    h_vals = values[:, 3:]
+
+    # Bin indices from partition values
+    iq = _find_partition_index(QPART, values[:, 0])
+    ie = _find_partition_index(EPART, values[:, 1])
+    ii = _find_partition_index(IPART, values[:, 2])
+
+    pops = np.zeros((len(_CSV_SECTIONS), QX, EX, IX, HX))
+    pops[section, iq, ie, ii] = h_vals
 
     return {
-        "all_ss": all_ss,
-        "unk_ss": unk_ss,
-        "all_class": all_class,
-        "unk_class": unk_class,
+        "all_ss": pops[0],
+        "unk_ss": pops[1],
+        "all_class": np.ascontiguousarray(pops[2::2]),
+        "unk_class": np.ascontiguousarray(pops[3::2]),
     }
 
 
-def _find_partition_index(part: np.ndarray, value: float) -> int:
-    """Find the index in a partition array matching a value (within tolerance)."""
-    for idx in range(len(part)):
-        if abs(part[idx] - value) < 1e-9:
-            return idx
-    raise ValueError(f"Value {value} not found in partition array")
+def _find_partition_index(part: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Find the indices in a partition array matching values (within tolerance)."""
+    values = np.asarray(values, dtype=np.float64)
+    idx = np.searchsorted(part, values - 1e-9)
+    idx = np.minimum(idx, len(part) - 1)
+    missing = np.abs(part[idx] - values) >= 1e-9
+    if missing.any():
+        raise ValueError(
+            f"Value {values[missing][0]} not found in partition array")
+    return idx
 
 # ---------------------------------------------------------------------------
 # Main entry point: build_model (equivalent to muk.c main)
@@ -707,11 +1012,8 @@ def build_model(s3m_path: str,
         raise ValueError(f"Unsupported catalog format: {catalog_format!r}")
 
     # Step 3: fix up — where known > all, set all = known
-    mask = known_ss > all_ss
-    all_ss[mask] = known_ss[mask]
-    for c in range(D2CLASSES):
-        mask_c = known_class[c] > all_class[c]
-        all_class[c][mask_c] = known_class[c][mask_c]
+    np.copyto(all_ss, known_ss, where=known_ss > all_ss)
+    np.copyto(all_class, known_class, where=known_class > all_class)
 
     # Step 4: volume scaling
     unk_ss, unk_class = _volume_scale(all_ss, known_ss, all_class, known_class)
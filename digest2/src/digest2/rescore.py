@@ -0,0 +1,90 @@
+"""Re-scoring of collected tag sets under other population models.
+
+The orbit search of a tracklet decides which model bins are tagged in and
+out of each class; the population model only weights them.  Tag sets
+collected with ``collect_tags=True`` can therefore be scored under a
+candidate model without searching again::
+
+    from digest2 import Digest2, read_model_csv, rescore
+
+    with Digest2() as d2:
+        results = d2.classify_file("archive.obs", collect_tags=True)
+    candidate = read_model_csv("candidate.model.csv")
+    for r in results:
+        raw, noid = rescore(r.tag_sets, candidate)
+
+Scores are sums over tagged bins taken in bin order, as the split search
+(``search_threads``) computes them; against a single-threaded search they
+agree to rounding.
+"""
+
+import os
+from dataclasses import fields
+from typing import Dict, Tuple, Union
+
+import numpy as np
+
+from digest2.population import read_model_csv
+from digest2.result import _TAG_OUT, Scores, TagSets
+
+
+def _sums(values: np.ndarray, tagged: np.ndarray) -> np.ndarray:
+    """Row sums of the tagged values, added one at a time in bin order.
+
+    This is the order and rounding of the C engine's sums; untagged bins
+    add an exact zero.
+    """
+    if not values.shape[1]:
+        return np.zeros(len(values))
+    return np.cumsum(np.where(tagged, values, 0.0), axis=1)[:, -1]
+
+
+def _scores(in_class: np.ndarray, out_of_class: np.ndarray,
+            class_idx: np.ndarray) -> np.ndarray:
+    """Scores from in- and out-of-class sums, as scoreFinish in d2math.c."""
+    d = in_class + out_of_class
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(d > 0.0, 100.0 * in_class / d,
+                        np.where(class_idx < 2, 100.0, 0.0))
+
+
+def rescore(tag_sets: TagSets,
+            model: Union[str, os.PathLike, Dict[str, np.ndarray]]
+            ) -> Tuple[Scores, Scores]:
+    """Score tag sets under a population model.
+
+    Args:
+        tag_sets: Tag sets of one tracklet, from a result's ``tag_sets``
+            or ``TagSets.from_bytes``.
+        model: Path to a ``digest2.model.csv`` file, or the dict returned
+            by ``read_model_csv`` (read it once when re-scoring many
+            tracklets).
+
+    Returns:
+        ``(raw, noid)`` Scores for the classes of ``tag_sets``; other
+        classes are zero, as in a ClassificationResult.
+    """
+    if not isinstance(model, dict):
+        model = read_model_csv(os.fspath(model))
+    all_ss = np.asarray(model["all_ss"], dtype=np.float64).reshape(-1)
+    unk_ss = np.asarray(model["unk_ss"], dtype=np.float64).reshape(-1)
+    all_class = np.asarray(model["all_class"], dtype=np.float64)
+    unk_class = np.asarray(model["unk_class"], dtype=np.float64)
+    all_class = all_class.reshape(len(all_class), -1)
+    unk_class = unk_class.reshape(len(unk_class), -1)
+
+    names = [f.name for f in fields(Scores)]
+    class_idx = np.array([names.index(abbr) for abbr in tag_sets.classes],
+                         dtype=np.uint32)
+    bins, masks = tag_sets.bins, tag_sets.masks
+    tagged_in = (masks >> class_idx[:, None]) & 1 == 1
+    tagged_out = (masks >> (class_idx[:, None] + _TAG_OUT)) & 1 == 1
+
+    all_in = all_class[class_idx[:, None], bins]
+    unk_in = unk_class[class_idx[:, None], bins]
+    raw = _scores(_sums(all_in, tagged_in),
+                  _sums(all_ss[bins] - all_in, tagged_out), class_idx)
+    noid = _scores(_sums(unk_in, tagged_in),
+                   _sums(unk_ss[bins] - unk_in, tagged_out), class_idx)
+    return (Scores(**dict(zip(tag_sets.classes, raw.tolist()))),
+            Scores(**dict(zip(tag_sets.classes, noid.tolist()))))
@@ -1,5 +1,6 @@
 """Dataclasses for digest2 classification results."""
 
+import struct
 from dataclasses import dataclass, field, fields
 from typing import Optional, Tuple
 
@@ -76,6 +77,100 @@ class TrialOrbit:
     new_tag: bool
 
 
+# Bit of a tag mask set for a bin tagged out of a class (bit c + _TAG_OUT)
+_TAG_OUT = 16
+
+# Header of TagSets.to_bytes: class mask and number of bins, little-endian
+_TAGS_HEADER = struct.Struct("<Ii")
+
+
+@dataclass(frozen=True, eq=False)
+class TagSets:
+    """Model bins tagged by the orbit search of one tracklet.
+
+    Which bins the search tags, in and out of each class, depends on the
+    observations and configuration but not on the population model, so
+    scores under another model can be computed from the tag sets alone
+    (see :func:`digest2.rescore.rescore`).
+
+    Attributes:
+        classes: Class abbreviations the tag sets were collected for.
+        bins: Flat indices of the bins tagged in or out of any class,
+            ``((iq * 8 + ie) * 11 + ii) * 18 + ih`` (the model arrays'
+            C order), increasing; int32 array.
+        masks: Per bin, bit ``c`` set if it is tagged in class ``c`` and
+            bit ``c + 16`` if it is tagged out of class ``c``, with ``c``
+            the class's position in ``Scores``; uint32 array.
+    """
+
+    classes: Tuple[str, ...]
+    bins: "numpy.ndarray"
+    masks: "numpy.ndarray"
+
+    def __len__(self) -> int:
+        return len(self.bins)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, TagSets):
+            return NotImplemented
+        import numpy as np
+
+        return (self.classes == other.classes
+                and np.array_equal(self.bins, other.bins)
+                and np.array_equal(self.masks, other.masks))
+
+    __hash__ = None
+
+    def _bit(self, abbr: str) -> int:
+        if abbr not in self.classes:
+            raise KeyError(abbr)
+        return [f.name for f in fields(Scores)].index(abbr)
+
+    def in_class(self, abbr: str) -> "numpy.ndarray":
+        """Return the bins tagged in class ``abbr``."""
+        bit = self._bit(abbr)
+        return self.bins[(self.masks >> bit) & 1 == 1]
+
+    def out_of_class(self, abbr: str) -> "numpy.ndarray":
+        """Return the bins tagged out of class ``abbr``."""
+        bit = self._bit(abbr) + _TAG_OUT
+        return self.bins[(self.masks >> bit) & 1 == 1]
+
+    def to_bytes(self) -> bytes:
+        """Serialize to a compact, platform-independent byte string."""
+        names = [f.name for f in fields(Scores)]
+        class_mask = sum(1 << names.index(abbr) for abbr in self.classes)
+        return (_TAGS_HEADER.pack(class_mask, len(self.bins))
+                + self.bins.astype("<i4").tobytes()
+                + self.masks.astype("<u4").tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TagSets":
+        """Rebuild tag sets serialized with :meth:`to_bytes`."""
+        import numpy as np
+
+        class_mask, n = _TAGS_HEADER.unpack_from(data)
+        if len(data) != _TAGS_HEADER.size + 8 * n:
+            raise ValueError("truncated or invalid tag sets")
+        start = _TAGS_HEADER.size
+        bins = np.frombuffer(data, dtype="<i4", count=n, offset=start)
+        masks = np.frombuffer(data, dtype="<u4", count=n, offset=start + 4 * n)
+        return cls._from_mask(class_mask, bins, masks)
+
+    @classmethod
+    def _from_mask(cls, class_mask: int, bins, masks) -> "TagSets":
+        """Internal: build from a class bit mask and bin/mask arrays."""
+        import numpy as np
+
+        names = [f.name for f in fields(Scores)]
+        return cls(
+            classes=tuple(abbr for c, abbr in enumerate(names)
+                          if class_mask >> c & 1),
+            bins=np.asarray(bins, dtype=np.int32),
+            masks=np.asarray(masks, dtype=np.uint32),
+        )
+
+
 @dataclass(frozen=True)
 class ClassificationResult:
     """Result of classifying a single tracklet.
@@ -86,6 +181,13 @@ class ClassificationResult:
         rms: Great-circle RMS fit of the tracklet in arcseconds.
         rms_prime: RMS prime value from ADES uncertainties.
         designation: Object designation (populated by ``classify_file``).
+        partial: True if the work budget of the ``Digest2`` ran out before
+            the orbit search finished; the scores then cover only the
+            part of orbit space searched.
+        orbits_tried: Number of trial orbits solved.
+        distances_tried: Number of distances searched.
+        tag_sets: Bins tagged by the search (with ``collect_tags=True``),
+            for re-scoring under other population models.
     """
 
     raw: Scores
@@ -94,6 +196,10 @@ class ClassificationResult:
     rms_prime: float
     designation: str = ""
     trial_orbits: Optional[Tuple[TrialOrbit, ...]] = None
+    partial: bool = False
+    orbits_tried: int = 0
+    distances_tried: int = 0
+    tag_sets: Optional[TagSets] = None
     _orbit_elements_cache: Optional[dict] = field(
         default=None, init=False, repr=False, compare=False
     )
@@ -153,3 +259,49 @@ class ClassificationResult:
             result["new_tag"][j] = orb.new_tag
         object.__setattr__(self, "_orbit_elements_cache", result)
         return result
+
+
+@dataclass(frozen=True, eq=False)
+class ArrayResult:
+    """Scores for a batch of tracklets classified from columnar arrays.
+
+    Returned by ``Digest2.classify_arrays``. Row ``k`` belongs to tracklet
+    ``k``; score columns follow ``classes``. Rows of tracklets that could
+    not be scored are NaN.
+
+    Attributes:
+        raw: Raw scores, float64 array of shape (n_tracklets, 15).
+        noid: NoID scores, float64 array of shape (n_tracklets, 15).
+        rms: Great-circle RMS per tracklet in arcseconds, shape (n_tracklets,).
+        rms_prime: RMS prime per tracklet, shape (n_tracklets,).
+        classes: Class abbreviations naming the score columns.
+    """
+
+    raw: "numpy.ndarray"
+    noid: "numpy.ndarray"
+    rms: "numpy.ndarray"
+    rms_prime: "numpy.ndarray"
+    classes: Tuple[str, ...]
+
+    def __len__(self) -> int:
+        return len(self.rms)
+
+    @property
+    def valid(self) -> "numpy.ndarray":
+        """Boolean mask of tracklets that were scored."""
+        import numpy as np
+
+        return ~np.isnan(self.rms)
+
+    def column(self, abbr: str, noid: bool = True) -> "numpy.ndarray":
+        """Return the scores of one class for every tracklet.
+
+        Args:
+            abbr: Class abbreviation, e.g. ``"NEO"``.
+            noid: If True (default) return NoID scores, else raw scores.
+        """
+        try:
+            idx = self.classes.index(abbr)
+        except ValueError:
+            raise KeyError(abbr)
+        return (self.noid if noid else self.raw)[:, idx]
@@ -0,0 +1,358 @@
+"""Persistent digest2 scoring service.
+
+Keeps one :class:`~digest2.core.Digest2` (model, observatory codes and
+configuration) loaded and scores observation files posted to it over
+localhost HTTP or HTTP on a Unix socket, so a request costs scoring time
+rather than model-load time::
+
+    python -m digest2 serve --port 8080
+    curl --data-binary @sample.obs http://127.0.0.1:8080/classify
+
+Endpoints:
+
+- ``POST /classify`` -- the body is an MPC 80-column, ADES PSV or ADES XML
+  file.  Query parameters: ``format`` (``obs``, ``psv`` or ``xml``;
+  detected from the payload if omitted), ``output`` (``json``, the
+  default, or ``psv``) and ``classes`` (comma-separated abbreviations).
+- ``GET /health`` -- ``{"status": "ok"}``.
+
+Tracklets of requests that arrive within ``batch_window`` seconds of each
+other are scored together in one call on the C engine's native thread
+pool.
+"""
+
+import json
+import os
+import queue
+import socketserver
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from digest2.core import Digest2
+from digest2.result import ClassificationResult, Scores
+
+# file extension of each payload format, as used by Digest2.classify_file
+_FORMATS = {"obs": ".obs", "mpc80": ".obs", "psv": ".psv", "xml": ".xml"}
+
+# largest accepted request body
+_MAX_PAYLOAD_BYTES = 256 << 20
+
+
+class MicroBatcher:
+    """Collects tracklets of concurrent requests into shared C calls.
+
+    ``submit`` is called from request threads; a single batching thread
+    waits ``batch_window`` seconds after the first pending request (or
+    until ``max_batch`` tracklets are pending), then scores everything
+    pending with one ``score_many`` call per (classes, is_ades) pair.
+    """
+
+    def __init__(self, d2: Digest2, max_workers: Optional[int] = None,
+                 batch_window: float = 0.005, max_batch: int = 4096):
+        self._d2 = d2
+        self._max_workers = max_workers
+        self._batch_window = batch_window
+        self._max_batch = max_batch
+        self._pending: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="digest2-batcher")
+        self._thread.start()
+
+    def submit(self, tracklets: List[Tuple[str, List[tuple]]], is_ades: bool,
+               classes: Optional[List[str]] = None,
+               ) -> List[ClassificationResult]:
+        """Score (designation, observation tuples) pairs; blocks until done.
+
+        Tracklets that cannot be scored are left out of the result.
+        """
+        if not tracklets:
+            return []
+        future: Future = Future()
+        self._pending.put((tracklets, is_ades,
+                           None if classes is None else tuple(classes), future))
+        return future.result()
+
+    def close(self) -> None:
+        """Stop the batching thread after the pending requests."""
+        self._pending.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            first = self._pending.get()
+            if first is None:
+                return
+            requests = [first]
+            count = len(first[0])
+            deadline = time.monotonic() + self._batch_window
+            stop = False
+            while count < self._max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._pending.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                requests.append(request)
+                count += len(request[0])
+
+            groups: dict = {}
+            for request in requests:
+                groups.setdefault(request[1:3], []).append(request)
+            for (is_ades, classes), group in groups.items():
+                self._score(group, is_ades, classes)
+            if stop:
+                return
+
+    def _score(self, group: list, is_ades: bool,
+               classes: Optional[Tuple[str, ...]]) -> None:
+        """Score the tracklets of several requests in one call."""
+        batch = [obs for tracklets, _, _, _ in group for _, obs in tracklets]
+        designations = [d for tracklets, _, _, _ in group for d, _ in tracklets]
+        try:
+            results = self._d2._score_many(
+                batch, classes=None if classes is None else list(classes),
+                is_ades=is_ades, collect_orbits=False,
+                max_workers=self._max_workers, designations=designations)
+        except Exception as exc:
+            for _, _, _, future in group:
+                future.set_exception(exc)
+            return
+
+        start = 0
+        for tracklets, _, _, future in group:
+            stop = start + len(tracklets)
+            future.set_result([r for r in results[start:stop] if r is not None])
+            start = stop
+
+
+def detect_format(payload: bytes) -> str:
+    """Guess the format (``obs``, ``psv`` or ``xml``) of an observation file."""
+    text = payload.lstrip()
+    if text.startswith(b"<"):
+        return "xml"
+    for line in text.splitlines():
+        if line.startswith(b"#") or (line.startswith(b"!") and b"|" not in line):
+            continue
+        return "psv" if b"|" in line else "obs"
+    return "obs"
+
+
+def read_tracklets(d2: Digest2, payload: bytes, fmt: str
+                   ) -> List[Tuple[str, List[tuple]]]:
+    """Parse a payload as ``Digest2.classify_file`` parses a file.
+
+    Returns the (designation, observation tuples) pairs of the tracklets
+    that have at least two observations.
+    """
+    if fmt not in _FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    fd, path = tempfile.mkstemp(suffix=_FORMATS[fmt], prefix="digest2-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        return [(desig.strip(), obs_tuples)
+                for desig, obs_tuples in d2._iter_file_tracklets(path)
+                if len(obs_tuples) >= 2]
+    finally:
+        os.unlink(path)
+
+
+def results_to_json(results: List[ClassificationResult],
+                    classes: Optional[List[str]] = None) -> str:
+    """Serialize results as a JSON list of objects."""
+    def scores(s):
+        return {k: v for k, v in s.items() if classes is None or k in classes}
+
+    return json.dumps([
+        {
+            "designation": r.designation,
+            "rms": r.rms,
+            "rms_prime": r.rms_prime,
+            "partial": r.partial,
+            "raw": scores(r.raw),
+            "noid": scores(r.noid),
+        }
+        for r in results
+    ])
+
+
+def results_to_psv(results: List[ClassificationResult],
+                   classes: Optional[List[str]] = None) -> str:
+    """Serialize results as PSV: designation, RMS, then NoID scores."""
+    names = list(classes) if classes is not None else list(Scores())
+    lines = ["|".join(["desig", "rms"] + names)]
+    for r in results:
+        lines.append("|".join([r.designation, f"{r.rms:.2f}"]
+                              + [f"{r.noid[c]:.0f}" for c in names]))
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """HTTP request handler; ``server`` carries ``d2`` and ``batcher``."""
+
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address.
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, status: int, body: str, content_type: str) -> None:
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str) -> None:
+        self._reply(status, json.dumps({"error": message}), "application/json")
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self._reply(200, json.dumps({"status": "ok"}), "application/json")
+        else:
+            self._error(404, "not found")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/classify":
+            self._error(404, "not found")
+            return
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        # the body is not read on these errors, so the connection closes
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self._error(400, "invalid Content-Length")
+            return
+        if length > _MAX_PAYLOAD_BYTES:
+            self.close_connection = True
+            self._error(413, "payload too large")
+            return
+        payload = self.rfile.read(length)
+
+        output = query.get("output", "json")
+        if output not in ("json", "psv"):
+            self._error(400, f"Unknown output: {output}")
+            return
+        classes = query["classes"].split(",") if query.get("classes") else None
+        fmt = query.get("format") or detect_format(payload)
+
+        try:
+            self.server.d2._class_indices(classes)
+            tracklets = read_tracklets(self.server.d2, payload, fmt)
+            results = self.server.batcher.submit(
+                tracklets, is_ades=_FORMATS.get(fmt) != ".obs", classes=classes)
+        except (ValueError, SyntaxError) as exc:
+            # SyntaxError: malformed XML (lxml's XMLSyntaxError)
+            self._error(400, str(exc))
+            return
+        except Exception as exc:
+            self._error(500, f"{type(exc).__name__}: {exc}")
+            return
+
+        if output == "psv":
+            self._reply(200, results_to_psv(results, classes), "text/plain")
+        else:
+            self._reply(200, results_to_json(results, classes),
+                        "application/json")
+
+
+class _ScoringServer:
+    """Mixin holding the served Digest2 and its batcher."""
+
+    daemon_threads = True
+
+    def __init__(self, address, d2: Digest2, batcher: MicroBatcher,
+                 verbose: bool):
+        self.d2 = d2
+        self.batcher = batcher
+        self.verbose = verbose
+        super().__init__(address, _Handler)
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+        if isinstance(self.server_address, str) and \
+                os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+class _TCPServer(_ScoringServer, ThreadingHTTPServer):
+    """HTTP over TCP."""
+
+
+class _UnixServer(_ScoringServer, socketserver.ThreadingMixIn,
+                  socketserver.UnixStreamServer):
+    """HTTP over a Unix domain socket."""
+
+
+def make_server(d2: Digest2, host: str = "127.0.0.1", port: int = 8080,
+                unix_socket: Optional[str] = None,
+                max_workers: Optional[int] = None,
+                batch_window: float = 0.005, verbose: bool = False):
+    """Create (but do not start) a scoring server around a Digest2.
+
+    Args:
+        d2: Classifier to serve; it must stay open while serving.
+        host: Address to listen on for HTTP.
+        port: TCP port (``0`` picks a free port).
+        unix_socket: If given, listen on this Unix socket path instead.
+        max_workers: Native scoring threads per batch (``None``: one per
+            CPU).
+        batch_window: Seconds to wait for more requests to share a batch.
+        verbose: Log each request to stderr.
+
+    Returns:
+        A ``socketserver`` server; call ``serve_forever()`` to run it and
+        ``server_close()`` when done (which also stops the batcher).
+    """
+    batcher = MicroBatcher(d2, max_workers=max_workers,
+                           batch_window=batch_window)
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        return _UnixServer(unix_socket, d2, batcher, verbose)
+    return _TCPServer((host, port), d2, batcher, verbose)
+
+
+def serve(model_path: Optional[str] = None, config_path: Optional[str] = None,
+          obscodes_path: Optional[str] = None, no_threshold: bool = False,
+          max_orbits: Optional[int] = None,
+          max_distances: Optional[int] = None,
+          max_seconds: Optional[float] = None,
+          **server_kwargs) -> None:
+    """Load the model once and serve classification requests until interrupted.
+
+    Keyword arguments other than the Digest2 settings (including its
+    per-tracklet work budget) are passed to :func:`make_server`.
+    """
+    with Digest2(model_path=model_path, config_path=config_path,
+                 obscodes_path=obscodes_path, no_threshold=no_threshold,
+                 max_orbits=max_orbits, max_distances=max_distances,
+                 max_seconds=max_seconds) as d2:
+        server = make_server(d2, **server_kwargs)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,206 @@
+"""Incremental re-scoring of a changing set of tracklets.
+
+An NEOCP-style loop re-reads the same observation file every few
+minutes, while only a few designations gain or lose observations in
+between.  :class:`IncrementalSession` keeps the observations and latest
+result of every designation, diffs each new snapshot (or batch of added
+and removed observations) against them, rescores only the designations
+that changed and reports what changed as :class:`ChangeEvent` objects::
+
+    with Digest2() as d2:
+        session = IncrementalSession(d2, classes=["NEO", "MC"])
+        while True:
+            for event in session.update_file("neocp.obs"):
+                print(event.kind, event.designation)
+            time.sleep(300)
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from digest2.core import Digest2
+from digest2.observation import Observation
+from digest2.result import ClassificationResult
+
+
+def _obs_id(obs: tuple) -> tuple:
+    """Identity of an observation tuple: (mjd, ra, dec, site)."""
+    return obs[0], obs[1], obs[2], obs[4]
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """A designation that was added, rescored or removed by an update.
+
+    Attributes:
+        kind: ``"added"``, ``"updated"`` or ``"removed"``.
+        designation: The designation concerned.
+        result: Its new result; None if removed or if the tracklet could
+            not be scored (e.g. it has a single observation).
+        previous: Its result before the update; None if added.
+    """
+
+    kind: str
+    designation: str
+    result: Optional[ClassificationResult] = None
+    previous: Optional[ClassificationResult] = None
+
+
+class IncrementalSession:
+    """Latest results for a set of tracklets, rescored only when they change.
+
+    Tracklets are keyed by designation; observations of a designation that
+    appears in several blocks of a file are scored together.  All changes
+    of one update are scored in a single ``score_many`` call.
+
+    Args:
+        d2: Classifier used for scoring; it must stay open.
+        classes: Class abbreviations to compute (default: all).
+        is_ades: Whether the observations are ADES.  ``None`` takes it
+            from the extension of the first file passed to
+            ``update_file`` (and False for the other methods).
+        max_workers: Native scoring threads per update (``None``: one per
+            CPU).
+    """
+
+    def __init__(self, d2: Digest2, classes: Optional[List[str]] = None,
+                 is_ades: Optional[bool] = None,
+                 max_workers: Optional[int] = None):
+        d2._class_indices(classes)
+        self._d2 = d2
+        self.classes = classes
+        self.is_ades = is_ades
+        self.max_workers = max_workers
+        self._tracklets: Dict[str, List[tuple]] = {}
+        self._results: Dict[str, Optional[ClassificationResult]] = {}
+        self._site_cache: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._tracklets)
+
+    def __contains__(self, designation: str) -> bool:
+        return designation in self._tracklets
+
+    def __getitem__(self, designation: str) -> Optional[ClassificationResult]:
+        """Latest result of a designation (None if it could not be scored)."""
+        return self._results[designation]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tracklets)
+
+    @property
+    def results(self) -> Dict[str, Optional[ClassificationResult]]:
+        """Latest result of every designation, in order of first appearance."""
+        return dict(self._results)
+
+    def update_file(self, filepath: str) -> List[ChangeEvent]:
+        """Replace the tracklets with a new snapshot of an observation file.
+
+        The file is read as by ``Digest2.classify_file``.  Designations
+        whose observations differ from the previous snapshot are rescored,
+        designations no longer in the file are removed.
+        """
+        is_ades = self._d2._is_ades_path(filepath)
+        if self.is_ades is None:
+            self.is_ades = is_ades
+        elif self.is_ades != is_ades:
+            raise ValueError(
+                f"{filepath} is {'' if is_ades else 'not '}ADES, "
+                f"but this session is_ades={self.is_ades}")
+
+        snapshot: Dict[str, List[tuple]] = {}
+        for desig, obs_tuples in self._d2._iter_file_tracklets(filepath):
+            snapshot.setdefault(desig.strip(), []).extend(obs_tuples)
+        return self._replace(snapshot)
+
+    def update(self, tracklets: Dict[str, List[Observation]]) -> List[ChangeEvent]:
+        """Replace the tracklets with a snapshot of designation -> observations."""
+        return self._replace({
+            desig: self._d2._obs_tuples(obs_list, self._site_cache)
+            for desig, obs_list in tracklets.items()
+        })
+
+    def apply(self, added: Optional[Dict[str, List[Observation]]] = None,
+              removed: Optional[Dict[str, Optional[List[Observation]]]] = None,
+              ) -> List[ChangeEvent]:
+        """Add and remove observations, then rescore the designations touched.
+
+        Args:
+            added: Observations to add, by designation.  A tracklet's
+                observations are kept in time order.
+            removed: Observations to remove, by designation; ``None`` in
+                place of a list removes the designation.  Observations are
+                matched by time, position and site; removing one that is
+                not there is not an error.
+
+        Returns:
+            The change events, removals first.
+        """
+        changed: Dict[str, List[tuple]] = {}
+        gone: List[str] = []
+        for desig, obs_list in (removed or {}).items():
+            if desig not in self._tracklets:
+                continue
+            if obs_list is None:
+                gone.append(desig)
+                continue
+            drop = {_obs_id(obs) for obs in
+                    self._d2._obs_tuples(obs_list, self._site_cache)}
+            kept = [obs for obs in changed.get(desig, self._tracklets[desig])
+                    if _obs_id(obs) not in drop]
+            if kept:
+                changed[desig] = kept
+            else:
+                gone.append(desig)
+        for desig, obs_list in (added or {}).items():
+            current = changed.get(desig, [] if desig in gone
+                                  else self._tracklets.get(desig, []))
+            merged = current + self._d2._obs_tuples(obs_list, self._site_cache)
+            merged.sort(key=lambda obs: obs[0])
+            changed[desig] = merged
+            if desig in gone:
+                gone.remove(desig)
+
+        events = [self._remove(desig) for desig in gone]
+        return events + self._rescore({
+            desig: obs_tuples for desig, obs_tuples in changed.items()
+            if obs_tuples != self._tracklets.get(desig)
+        })
+
+    def _replace(self, snapshot: Dict[str, List[tuple]]) -> List[ChangeEvent]:
+        """Diff a full snapshot against the current tracklets."""
+        events = [self._remove(desig) for desig in list(self._tracklets)
+                  if desig not in snapshot]
+        return events + self._rescore({
+            desig: obs_tuples for desig, obs_tuples in snapshot.items()
+            if obs_tuples != self._tracklets.get(desig)
+        })
+
+    def _remove(self, designation: str) -> ChangeEvent:
+        del self._tracklets[designation]
+        return ChangeEvent("removed", designation,
+                           previous=self._results.pop(designation))
+
+    def _rescore(self, changed: Dict[str, List[tuple]]) -> List[ChangeEvent]:
+        """Score the changed tracklets in one call and record the results."""
+        scoreable: List[Tuple[str, List[tuple]]] = [
+            (desig, obs_tuples) for desig, obs_tuples in changed.items()
+            if len(obs_tuples) >= 2]
+        scored: Dict[str, Optional[ClassificationResult]] = {}
+        if scoreable:
+            results = self._d2._score_many(
+                [obs_tuples for _, obs_tuples in scoreable],
+                classes=self.classes, is_ades=bool(self.is_ades),
+                collect_orbits=False, max_workers=self.max_workers,
+                designations=[desig for desig, _ in scoreable])
+            scored = {desig: r for (desig, _), r in zip(scoreable, results)}
+
+        events = []
+        for desig, obs_tuples in changed.items():
+            result = scored.get(desig)
+            kind = "updated" if desig in self._tracklets else "added"
+            events.append(ChangeEvent(kind, desig, result=result,
+                                      previous=self._results.get(desig)))
+            self._tracklets[desig] = obs_tuples
+            self._results[desig] = result
+        return events
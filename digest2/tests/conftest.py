@@ -5,6 +5,8 @@ from pathlib import Path
 
 import pytest
 
+from digest2 import Digest2
+
 
 @pytest.fixture
 def digest2_dir():
@@ -49,6 +51,12 @@ def sample_psv_path(digest2_dir):
     return str(digest2_dir / "digest2" / "sample.psv")
 
 
+@pytest.fixture
+def three_hr_tracklets_path(digest2_dir):
+    """Return path to three-hr-tracklets.obs."""
+    return str(digest2_dir / "digest2" / "three-hr-tracklets.obs")
+
+
 @pytest.fixture
 def mpc_config_path(digest2_dir):
     """Return path to the MPC.config in population/."""
@@ -61,3 +69,15 @@ def empty_config_path(tmp_path):
     p = tmp_path / "empty.config"
     p.write_text("# empty config\n")
     return str(p)
+
+
+@pytest.fixture
+def d2(model_path, obscodes_path, empty_config_path):
+    """Yield a repeatable Digest2 with an empty config."""
+    with Digest2(
+        model_path=model_path,
+        obscodes_path=obscodes_path,
+        config_path=empty_config_path,
+        repeatable=True,
+    ) as d2:
+        yield d2
@@ -0,0 +1,161 @@
+"""Tests for the content-addressed result cache (digest2.cache)."""
+
+import pytest
+
+from digest2 import Digest2, ResultCache
+from digest2.cache import file_digest, tracklet_key
+from digest2.observation import iter_mpc80_file
+from digest2.result import ClassificationResult, Scores
+
+OBS = [(60000.0, 1.0, 0.5, 20.0, 3), (60000.02, 1.001, 0.5005, 20.1, 3)]
+
+
+def _result(neo, designation=""):
+    return ClassificationResult(raw=Scores(NEO=neo), noid=Scores(NEO=neo / 2),
+                                rms=0.3, rms_prime=0.25,
+                                designation=designation)
+
+
+class TestTrackletKey:
+    """Test cache key construction."""
+
+    def test_short_and_full_tuples_agree(self):
+        full = [obs + (0.0, 0.0, False) for obs in OBS]
+        assert tracklet_key(b"ctx", OBS, None, False) == \
+            tracklet_key(b"ctx", full, None, False)
+
+    def test_inputs_change_key(self):
+        key = tracklet_key(b"ctx", OBS, None, False)
+        assert key != tracklet_key(b"other", OBS, None, False)
+        assert key != tracklet_key(b"ctx", OBS, None, True)
+        assert key != tracklet_key(b"ctx", OBS, [1], False)
+        assert key != tracklet_key(b"ctx", OBS[::-1], None, False)
+
+    def test_class_order_ignored(self):
+        assert tracklet_key(b"ctx", OBS, [1, 4], False) == \
+            tracklet_key(b"ctx", OBS, [4, 1], False)
+
+    def test_file_digest(self, tmp_path):
+        path = tmp_path / "model"
+        path.write_bytes(b"abc")
+        digest = file_digest([str(path), None], True, False)
+        assert digest == file_digest([str(path), None], True, False)
+        assert digest != file_digest([str(path), None], True, True)
+        path.write_bytes(b"abd")
+        assert digest != file_digest([str(path), None], True, False)
+
+
+class TestResultCache:
+    """Test the LRU and SQLite levels and the counters."""
+
+    def test_lru_eviction(self):
+        cache = ResultCache(max_entries=2)
+        cache.put(b"a", _result(1))
+        cache.put(b"b", _result(2))
+        assert cache.get(b"a").raw.NEO == 1
+        cache.put(b"c", _result(3))
+        assert cache.get(b"b") is None
+        assert cache.get(b"a") is not None
+        assert cache.stats() == {"hits": 2, "misses": 1, "evictions": 1,
+                                 "entries": 2, "disk_entries": 0}
+
+    def test_designation_dropped(self):
+        cache = ResultCache()
+        cache.put(b"a", _result(1, designation="K24A00A"))
+        assert cache.get(b"a") == _result(1)
+
+    def test_partial_not_cached(self):
+        cache = ResultCache()
+        cache.put(b"a", ClassificationResult(
+            raw=Scores(), noid=Scores(), rms=0.1, rms_prime=0.1,
+            partial=True, orbits_tried=10))
+        assert len(cache) == 0
+
+    def test_sqlite_persists(self, tmp_path):
+        path = str(tmp_path / "results.sqlite")
+        cache = ResultCache(path=path)
+        cache.put(b"a", ClassificationResult(
+            raw=Scores(NEO=42), noid=Scores(), rms=0.1, rms_prime=0.1,
+            orbits_tried=1234, distances_tried=56))
+        cache.close()
+
+        cache = ResultCache(path=path)
+        assert len(cache) == 0
+        result = cache.get(b"a")
+        assert result.raw.NEO == 42
+        assert (result.orbits_tried, result.distances_tried) == (1234, 56)
+        assert cache.stats()["disk_entries"] == 1
+        cache.clear()
+        assert cache.get(b"a") is None
+        cache.close()
+
+    def test_sqlite_eviction(self, tmp_path):
+        cache = ResultCache(max_entries=1, path=str(tmp_path / "r.sqlite"),
+                            max_disk_entries=10)
+        for i in range(30):
+            cache.put(bytes([i]), _result(i))
+        assert cache.stats()["disk_entries"] <= 10
+        assert cache.get(bytes([29])) is not None
+        assert cache.get(bytes([0])) is None
+        cache.close()
+
+    def test_bad_sizes(self):
+        with pytest.raises(ValueError):
+            ResultCache(max_entries=0)
+
+
+class TestDigest2Cache:
+    """Test Digest2(cache=...) against uncached scoring."""
+
+    @pytest.fixture
+    def cache(self):
+        return ResultCache()
+
+    @pytest.fixture
+    def d2(self, model_path, obscodes_path, empty_config_path, cache):
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+            cache=cache,
+        ) as d2:
+            yield d2
+
+    @pytest.fixture
+    def plain(self, model_path, obscodes_path, empty_config_path):
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+        ) as d2:
+            yield d2
+
+    def test_classify_file_hits(self, d2, plain, cache,
+                                three_hr_tracklets_path):
+        expected = plain.classify_file(three_hr_tracklets_path,
+                                       classes=["NEO", "MB1"])
+        first = d2.classify_file(three_hr_tracklets_path,
+                                 classes=["NEO", "MB1"])
+        second = d2.classify_file(three_hr_tracklets_path,
+                                  classes=["MB1", "NEO"])
+        assert first == expected
+        assert second == expected
+        stats = cache.stats()
+        assert stats["misses"] == len(expected)
+        assert stats["hits"] == len(expected)
+
+    def test_tracklet_renamed_and_batch(self, d2, plain, cache,
+                                        three_hr_tracklets_path):
+        batch = [obs for _, obs in iter_mpc80_file(three_hr_tracklets_path)]
+        result = d2.classify_tracklet(batch[0])
+        assert result == plain.classify_tracklet(batch[0])
+        results = d2.classify_batch(batch)
+        assert results == plain.classify_batch(batch)
+        assert cache.stats()["hits"] == 1
+
+    def test_orbits_not_cached(self, d2, cache, three_hr_tracklets_path):
+        batch = [obs for _, obs in iter_mpc80_file(three_hr_tracklets_path)]
+        result = d2.classify_tracklet(batch[0], classes=["NEO"],
+                                      collect_orbits=True)
+        assert result.trial_orbits
+        assert len(cache) == 0
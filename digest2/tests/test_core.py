@@ -1,12 +1,14 @@
 """Tests for the high-level Python API (digest2.core)."""
 
+import os
 import subprocess
 import tempfile
+import threading
 from pathlib import Path
 
 import pytest
 
-from digest2 import Digest2, classify, ClassificationResult, Scores
+from digest2 import Digest2, classify, ClassificationResult, ResultCache, Scores
 from digest2.observation import Observation, parse_ades_psv, parse_ades_xml, parse_mpc80_file
 
 
@@ -200,6 +202,35 @@ class TestDigest2Class:
         # With real site errors, this object scores as high-probability NEO.
         assert result.noid.NEO > 50
 
+    def test_instances_are_independent(self, model_path, obscodes_path,
+                                       empty_config_path, mpc_config_path):
+        """Two instances with different configs coexist; closing one leaves
+        the other usable."""
+        obs = [
+            Observation(mjd=59938.384965, ra=128.15118, dec=17.17665,
+                        mag=22.22, obscode="G96"),
+            Observation(mjd=59938.395273, ra=128.14899, dec=17.17702,
+                        mag=21.96, obscode="G96"),
+            Observation(mjd=59938.400402, ra=128.14780, dec=17.17717,
+                        mag=21.55, obscode="G96"),
+        ]
+        plain = Digest2(model_path=model_path, obscodes_path=obscodes_path,
+                        config_path=empty_config_path)
+        tuned = Digest2(model_path=model_path, obscodes_path=obscodes_path,
+                        config_path=mpc_config_path)
+        try:
+            before = plain.classify_tracklet(obs)
+            tuned_result = tuned.classify_tracklet(obs)
+            assert tuned_result.noid.NEO != before.noid.NEO
+
+            tuned.close()
+            after = plain.classify_tracklet(obs)
+            assert after.noid == before.noid
+            assert after.rms == before.rms
+        finally:
+            plain.close()
+            tuned.close()
+
 
 class TestClassifyFunction:
     """Test the polymorphic classify() convenience function."""
@@ -566,6 +597,35 @@ class TestParallelScoring:
                 assert sr.noid[cls] == pr.noid[cls], \
                     f"Mismatch for class {cls}: seq={sr.noid[cls]} par={pr.noid[cls]}"
 
+    def test_classify_batch_matches_classify_tracklet(
+        self, model_path, obscodes_path, empty_config_path
+    ):
+        """Bulk scoring gives the same result as one tracklet at a time."""
+        obs1 = [
+            Observation(mjd=59938.384965, ra=128.15118, dec=17.17665,
+                        mag=22.22, obscode="G96"),
+            Observation(mjd=59938.395273, ra=128.14899, dec=17.17702,
+                        mag=21.96, obscode="G96"),
+        ]
+        obs2 = [
+            Observation(mjd=59938.384965, ra=130.0, dec=20.0,
+                        mag=20.0, obscode="F51"),
+            Observation(mjd=59938.395273, ra=130.01, dec=20.01,
+                        mag=20.0, obscode="F51"),
+        ]
+
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+            repeatable=True,
+        ) as d2:
+            batch = d2.classify_batch([obs1, obs2], collect_orbits=True)
+            single = [d2.classify_tracklet(o, collect_orbits=True)
+                      for o in (obs1, obs2)]
+
+        assert batch == single
+
     def test_classify_file_parallel_with_class_filter(
         self, model_path, obscodes_path, sample_obs_path, empty_config_path
     ):
@@ -589,6 +649,441 @@ class TestParallelScoring:
             assert sr.noid.MB1 == pr.noid.MB1
 
 
+class TestIterClassifyFile:
+    """Test streaming classification with iter_classify_file."""
+
+    def test_matches_classify_file(self, d2, three_hr_tracklets_path):
+        expected = d2.classify_file(three_hr_tracklets_path,
+                                    collect_orbits=True)
+        results = list(d2.iter_classify_file(
+            three_hr_tracklets_path, collect_orbits=True, max_workers=3,
+            max_in_flight=2))
+        assert len(expected) > 1
+        assert results == expected
+
+    def test_unordered(self, d2, three_hr_tracklets_path):
+        expected = d2.classify_file(three_hr_tracklets_path, classes=["NEO"])
+        results = list(d2.iter_classify_file(
+            three_hr_tracklets_path, classes=["NEO"], ordered=False,
+            max_workers=2))
+        key = lambda r: r.designation
+        assert sorted(results, key=key) == sorted(expected, key=key)
+
+    def test_psv(self, d2, sample_psv_path):
+        assert list(d2.iter_classify_file(sample_psv_path)) == \
+            d2.classify_file(sample_psv_path)
+
+    def test_xml(self, d2, sample_xml_path):
+        assert list(d2.iter_classify_file(sample_xml_path)) == \
+            d2.classify_file(sample_xml_path)
+
+    def test_chunk_boundaries(self, d2, three_hr_tracklets_path, monkeypatch):
+        import digest2.core
+
+        expected = d2.classify_file(three_hr_tracklets_path)
+        monkeypatch.setattr(digest2.core, "_MPC80_CHUNK_BYTES", 100)
+        assert list(d2.iter_classify_file(three_hr_tracklets_path)) == expected
+
+    def test_chunks_reparse_only_open_rows(self, tmp_path, monkeypatch):
+        import digest2.core
+        from digest2 import _extension
+
+        obs = ("     K16S99K 1C2022 12 25.39527308 32 35.635+17 10 37.27"
+               "         21.72GV     G96")
+        sat = ("     K16S99K 1s2022 12 25.3952731 - 5634.1734 + 2466.2657"
+               " + 3038.3924        G96")
+        lines = ([obs, sat] * 20 + ["not an observation"] * 30
+                 + [obs.replace("K16S99K", "K16S99L")] * 5)
+        data = ("\n".join(lines) + "\n").encode()
+        path = tmp_path / "long.obs"
+        path.write_bytes(data)
+        expected = digest2.core._mpc80_tracklets(
+            _extension.parse_mpc80_buffer(data))
+
+        parsed = []
+        parse_buffer = _extension.parse_mpc80_buffer
+
+        def parse(buf):
+            parsed.append(len(buf))
+            return parse_buffer(buf)
+
+        monkeypatch.setattr(digest2.core, "_MPC80_CHUNK_BYTES", 100)
+        monkeypatch.setattr(digest2.core._extension, "parse_mpc80_buffer",
+                            parse)
+        assert list(digest2.core._iter_mpc80_tracklets(str(path))) == expected
+        # neither a long tracklet nor junk after one is carried over
+        assert max(parsed) < 100 + 3 * 82
+
+    def test_early_close(self, d2, three_hr_tracklets_path):
+        results = d2.iter_classify_file(three_hr_tracklets_path,
+                                        max_in_flight=1)
+        first = next(results)
+        results.close()
+        assert first == d2.classify_file(three_hr_tracklets_path)[0]
+
+    def test_bad_max_in_flight(self, d2, three_hr_tracklets_path):
+        with pytest.raises(ValueError, match="max_in_flight"):
+            next(d2.iter_classify_file(three_hr_tracklets_path,
+                                       max_in_flight=0))
+
+
+class TestProcessExecutor:
+    """Test scoring on worker processes with executor="process"."""
+
+    def test_classify_file_matches_threads(self, d2, three_hr_tracklets_path):
+        expected = d2.classify_file(three_hr_tracklets_path,
+                                    classes=["NEO", "MB1"])
+        results = d2.classify_file(three_hr_tracklets_path,
+                                   classes=["NEO", "MB1"], max_workers=2,
+                                   executor="process")
+        assert len(expected) > 1
+        assert results == expected
+
+    def test_classify_batch_matches_threads(self, d2, three_hr_tracklets_path):
+        from digest2.observation import iter_mpc80_file
+
+        batch = [obs for _, obs in iter_mpc80_file(three_hr_tracklets_path)]
+        expected = d2.classify_batch(batch)
+        results = d2.classify_batch(batch, max_workers=3, executor="process")
+        assert results == expected
+
+        batch.append(batch[0][:1])
+        with pytest.raises(ValueError, match=f"tracklet {len(batch) - 1}"):
+            d2.classify_batch(batch, max_workers=3, executor="process")
+
+    def test_pool_reused_until_close(self, d2, three_hr_tracklets_path):
+        d2.classify_file(three_hr_tracklets_path, max_workers=2,
+                         executor="process")
+        pool = d2._process_pool
+        d2.classify_file(three_hr_tracklets_path, max_workers=2,
+                         executor="process")
+        assert d2._process_pool is pool
+        d2.close()
+        assert d2._process_pool is None
+
+    def test_bad_executor(self, d2, three_hr_tracklets_path):
+        with pytest.raises(ValueError, match="executor"):
+            d2.classify_file(three_hr_tracklets_path, executor="fork")
+
+
+class TestAsyncClassify:
+    """Test the asyncio API (aclassify_tracklet/batch/file)."""
+
+    @pytest.fixture
+    def d2(self, model_path, obscodes_path, empty_config_path):
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+            repeatable=True,
+            async_workers=2,
+            async_max_in_flight=2,
+        ) as d2:
+            yield d2
+
+    @pytest.fixture
+    def batch(self, three_hr_tracklets_path):
+        from digest2.observation import iter_mpc80_file
+
+        return [obs for _, obs in iter_mpc80_file(three_hr_tracklets_path)]
+
+    def test_matches_sync(self, d2, three_hr_tracklets_path, batch):
+        import asyncio
+
+        async def main():
+            return await asyncio.gather(
+                d2.aclassify_tracklet(batch[0], classes=["NEO"]),
+                d2.aclassify_batch(batch, classes=["NEO", "MB1"]),
+                d2.aclassify_file(three_hr_tracklets_path),
+            )
+
+        tracklet, results, file_results = asyncio.run(main())
+        assert tracklet == d2.classify_tracklet(batch[0], classes=["NEO"])
+        assert results == d2.classify_batch(batch, classes=["NEO", "MB1"])
+        assert file_results == d2.classify_file(three_hr_tracklets_path)
+
+    def test_backpressure_and_cancellation(self, d2, batch, monkeypatch):
+        import asyncio
+        import threading
+
+        lock = threading.Lock()
+        calls = []
+        running = [0, 0]  # current, peak
+        score_many = d2._score_many
+
+        def counting_score_many(*args, **kwargs):
+            with lock:
+                calls.append(1)
+                running[0] += 1
+                running[1] = max(running)
+            try:
+                return score_many(*args, **kwargs)
+            finally:
+                with lock:
+                    running[0] -= 1
+
+        monkeypatch.setattr(d2, "_score_many", counting_score_many)
+
+        async def main():
+            task = asyncio.ensure_future(d2.aclassify_batch(batch * 4))
+            while not calls:
+                await asyncio.sleep(0.001)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+        assert running[1] <= 2
+        assert len(calls) < len(batch) * 4
+
+    def test_bad_tracklet(self, d2, batch):
+        import asyncio
+
+        with pytest.raises(ValueError, match="tracklet 1"):
+            asyncio.run(d2.aclassify_batch([batch[0], batch[1][:1]]))
+
+    def test_closed(self, d2, batch):
+        import asyncio
+
+        d2.close()
+        with pytest.raises(RuntimeError):
+            asyncio.run(d2.aclassify_tracklet(batch[0]))
+
+
+class TestWorkBudget:
+    """Test the per-tracklet work budget (max_orbits/distances/seconds)."""
+
+    def _classify(self, model_path, obscodes_path, empty_config_path,
+                  path, **budget):
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+            **budget,
+        ) as d2:
+            return d2.classify_file(path, classes=["NEO", "MB1"])
+
+    def test_unlimited_not_partial(self, model_path, obscodes_path,
+                                   empty_config_path, three_hr_tracklets_path):
+        results = self._classify(model_path, obscodes_path,
+                                 empty_config_path, three_hr_tracklets_path)
+        for r in results:
+            assert not r.partial
+            assert r.orbits_tried > 0 and r.distances_tried > 2
+
+    @pytest.mark.parametrize("budget, field, limit", [
+        ({"max_orbits": 500}, "orbits_tried", 500),
+        ({"max_distances": 5}, "distances_tried", 5),
+    ])
+    def test_work_budget(self, model_path, obscodes_path, empty_config_path,
+                         three_hr_tracklets_path, budget, field, limit):
+        full = self._classify(model_path, obscodes_path, empty_config_path,
+                              three_hr_tracklets_path)
+        results = self._classify(model_path, obscodes_path,
+                                 empty_config_path, three_hr_tracklets_path,
+                                 **budget)
+        assert len(results) == len(full)
+        for r, f in zip(results, full):
+            assert r.partial
+            assert getattr(r, field) == limit
+            assert r.orbits_tried < f.orbits_tried
+            assert -0.01 <= r.noid.NEO <= 100.01
+        # repeatable, so the same budget gives the same partial scores
+        assert results == self._classify(model_path, obscodes_path,
+                                         empty_config_path,
+                                         three_hr_tracklets_path, **budget)
+
+    def test_time_budget(self, model_path, obscodes_path, empty_config_path,
+                         three_hr_tracklets_path):
+        full = self._classify(model_path, obscodes_path, empty_config_path,
+                              three_hr_tracklets_path)
+        results = self._classify(model_path, obscodes_path,
+                                 empty_config_path, three_hr_tracklets_path,
+                                 max_seconds=1e-6)
+        for r, f in zip(results, full):
+            assert r.partial
+            assert r.orbits_tried < f.orbits_tried
+
+    def test_bad_budget(self, model_path, obscodes_path, empty_config_path):
+        with pytest.raises(ValueError, match="max_orbits"):
+            Digest2(model_path=model_path, obscodes_path=obscodes_path,
+                    config_path=empty_config_path, max_orbits=0)
+
+
+class TestSearchThreads:
+    """Test splitting one tracklet's search over threads (search_threads)."""
+
+    @pytest.fixture
+    def batch(self, three_hr_tracklets_path):
+        from digest2.observation import iter_mpc80_file
+
+        return [obs for _, obs in iter_mpc80_file(three_hr_tracklets_path)][:4]
+
+    def _classify(self, model_path, obscodes_path, empty_config_path,
+                  batch, **settings):
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+            **settings,
+        ) as d2:
+            return [d2.classify_tracklet(obs, classes=["NEO", "MB1"])
+                    for obs in batch]
+
+    def test_independent_of_thread_count(self, model_path, obscodes_path,
+                                         empty_config_path, batch):
+        two = self._classify(model_path, obscodes_path, empty_config_path,
+                             batch, search_threads=2)
+        four = self._classify(model_path, obscodes_path, empty_config_path,
+                              batch, search_threads=4)
+        assert two == four
+        serial = self._classify(model_path, obscodes_path, empty_config_path,
+                                batch)
+        for r, s in zip(two, serial):
+            assert not r.partial
+            assert r.noid.NEO == pytest.approx(s.noid.NEO, abs=5)
+
+    def test_orbits_collected(self, model_path, obscodes_path,
+                              empty_config_path, batch):
+        orbits = []
+        for threads in (2, 3):
+            with Digest2(
+                model_path=model_path,
+                obscodes_path=obscodes_path,
+                config_path=empty_config_path,
+                search_threads=threads,
+            ) as d2:
+                result = d2.classify_tracklet(batch[0], classes=["NEO"],
+                                              collect_orbits=True)
+            assert 0 < len(result.trial_orbits) <= result.orbits_tried
+            orbits.append(result.trial_orbits)
+        # tasks' orbits are concatenated in task order, not finishing order
+        assert orbits[0] == orbits[1]
+
+    def test_budget_not_split(self, model_path, obscodes_path,
+                              empty_config_path, batch):
+        budget = {"max_orbits": 500}
+        split = self._classify(model_path, obscodes_path, empty_config_path,
+                               batch, search_threads=4, **budget)
+        serial = self._classify(model_path, obscodes_path, empty_config_path,
+                                batch, **budget)
+        assert split == serial
+
+    def test_bulk_scoring_unsplit(self, model_path, obscodes_path,
+                                  empty_config_path, batch):
+        serial = self._classify(model_path, obscodes_path, empty_config_path,
+                                batch)
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+            search_threads=4,
+            cache=ResultCache(),
+        ) as d2:
+            # split results in the cache are not answers for bulk calls
+            split = [d2.classify_tracklet(obs, classes=["NEO", "MB1"])
+                     for obs in batch]
+            bulk = d2.classify_batch(batch, classes=["NEO", "MB1"],
+                                     max_workers=2)
+            arrays = d2.classify_arrays(**TestClassifyArrays._columns(batch),
+                                        classes=["NEO", "MB1"], max_workers=2)
+            assert [d2.classify_tracklet(obs, classes=["NEO", "MB1"])
+                    for obs in batch] == split
+        assert split != serial
+        assert bulk == serial
+        assert list(arrays.column("NEO")) == [r.noid.NEO for r in serial]
+
+    @staticmethod
+    def _peak_threads(score):
+        """Native threads of the process before and at most during score()."""
+        def threads():
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("Threads:"):
+                        return int(line.split()[1])
+
+        done = threading.Event()
+        peak = [0]
+
+        def sample():
+            while not done.is_set():
+                peak[0] = max(peak[0], threads())
+
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+        try:
+            before = threads()
+            score()
+        finally:
+            done.set()
+            sampler.join()
+        return before, peak[0]
+
+    def test_bulk_scoring_does_not_nest_pools(self, model_path, obscodes_path,
+                                              empty_config_path, batch):
+        if not os.path.exists("/proc/self/status"):
+            pytest.skip("needs /proc/self/status")
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+            search_threads=4,
+        ) as d2:
+            # a single tracklet starts search threads...
+            before, peak = self._peak_threads(
+                lambda: [d2.classify_tracklet(obs, classes=["NEO"])
+                         for obs in batch])
+            assert peak > before
+            # ...a bulk worker runs the search tasks itself
+            before, peak = self._peak_threads(
+                lambda: d2.classify_batch(batch, classes=["NEO"],
+                                          max_workers=1))
+            assert peak == before
+
+    def test_bad_search_threads(self, model_path, obscodes_path,
+                                empty_config_path):
+        with pytest.raises(ValueError, match="search_threads"):
+            Digest2(model_path=model_path, obscodes_path=obscodes_path,
+                    config_path=empty_config_path, search_threads=0)
+
+
+class TestSpaceBasedObservations:
+    """Test satellite observations in MPC 80-column files."""
+
+    LINES = (
+        "     K16S99K  S2022 12 25.38496508 32 36.283+17 10 35.94         21.98GV     G96",
+        "     K16S99K  s2022 12 25.3849651 - 5634.1734 + 2466.2657 + 3038.3924        G96",
+        "     K16S99K 1C2022 12 25.39527308 32 35.635+17 10 37.27         21.72GV     G96",
+        "     K16S99K 1C2022 12 25.40040208 32 35.473+17 10 37.38         21.31GV     G96",
+    )
+
+    def test_satellite_position_is_used(self, model_path, obscodes_path,
+                                        empty_config_path, tmp_path):
+        sat_path = tmp_path / "sat.obs"
+        sat_path.write_text("\n".join(self.LINES) + "\n")
+        ground_path = tmp_path / "ground.obs"
+        ground_path.write_text("\n".join(self.LINES[:1] + self.LINES[2:]) + "\n")
+
+        obs = parse_mpc80_file(str(ground_path))["     K16S99K"]
+        obs[0].spacebased = True
+        obs[0].earth_obs = [x / 149.59787e6
+                            for x in (-5634.1734, 2466.2657, 3038.3924)]
+
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+            repeatable=True,
+        ) as d2:
+            sat = d2.classify_file(str(sat_path))
+            ground = d2.classify_file(str(ground_path))
+            tracklet = d2.classify_tracklet(obs)
+
+        assert len(sat) == 1
+        assert sat[0].noid == tracklet.noid
+        assert sat[0].noid != ground[0].noid
+
+
 class TestClassifyBatchIsAdes:
     """Test that classify_batch with is_ades=True matches classify_file on XML."""
 
@@ -753,6 +1248,54 @@ class TestBinaryModelLoading:
                 f"Score mismatch for class {cls}: CSV={csv_result.noid[cls]} binary={bin_result.noid[cls]}"
         assert csv_result.rms == bin_result.rms
 
+    def test_binary_model_header(self, model_path, obscodes_path,
+                                 empty_config_path, tmp_path):
+        """The binary model is written with a versioned header."""
+        import shutil
+        import struct
+
+        csv_path = tmp_path / "digest2.model.csv"
+        shutil.copy(model_path, csv_path)
+        with Digest2(model_path=str(csv_path), obscodes_path=obscodes_path,
+                     config_path=empty_config_path):
+            pass
+
+        data = (tmp_path / "digest2.model").read_bytes()
+        assert data[:8] == b"DIGEST2M"
+        version, _, data_offset, n_classes = struct.unpack_from("=4I", data, 8)
+        assert version == 2
+        assert n_classes == 15
+        assert data_offset % 8 == 0
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_corrupt_binary_model_is_regenerated(self, model_path,
+                                                 obscodes_path,
+                                                 empty_config_path, tmp_path):
+        """A binary model failing its checksum is rebuilt from the CSV."""
+        import shutil
+
+        csv_path = tmp_path / "digest2.model.csv"
+        bin_path = tmp_path / "digest2.model"
+        shutil.copy(model_path, csv_path)
+        kwargs = dict(obscodes_path=obscodes_path,
+                      config_path=empty_config_path)
+        with Digest2(model_path=str(csv_path), **kwargs):
+            pass
+        good = bin_path.read_bytes()
+
+        corrupt = bytearray(good)
+        corrupt[-1] ^= 0xFF
+        bin_path.write_bytes(bytes(corrupt))
+        with Digest2(model_path=str(csv_path), **kwargs):
+            pass
+        assert bin_path.read_bytes() == good
+
+        # with no CSV to rebuild from, the corrupt binary is an error
+        bin_path.write_bytes(bytes(corrupt))
+        csv_path.unlink()
+        with pytest.raises(RuntimeError):
+            Digest2(model_path=str(bin_path), **kwargs)
+
 
 class TestParallelNonRepeatable:
     """Test parallel scoring with repeatable=False (stochastic mode).
@@ -831,3 +1374,107 @@ class TestParallelNonRepeatable:
             for cls in ALL_CLASSES:
                 assert -0.01 <= r.noid[cls] <= 100.01, \
                     f"Score out of range for {cls}: {r.noid[cls]}"
+
+
+class TestClassifyArrays:
+    """Test scoring from flat observation arrays."""
+
+    TRACKLETS = [
+        [
+            Observation(mjd=59938.384965, ra=128.15118, dec=17.17665,
+                        mag=22.22, obscode="G96"),
+            Observation(mjd=59938.395273, ra=128.14899, dec=17.17702,
+                        mag=21.96, obscode="G96"),
+            Observation(mjd=59938.400402, ra=128.14780, dec=17.17717,
+                        mag=21.55, obscode="G96"),
+        ],
+        [
+            Observation(mjd=59938.384965, ra=130.0, dec=20.0,
+                        mag=20.0, obscode="F51", rms_ra=0.2, rms_dec=0.3),
+            Observation(mjd=59938.395273, ra=130.01, dec=20.01,
+                        mag=20.0, obscode="F51", rms_ra=0.2, rms_dec=0.3),
+        ],
+    ]
+
+    @staticmethod
+    def _columns(tracklets):
+        import numpy as np
+        from digest2 import _extension
+
+        flat = [o for trk in tracklets for o in trk]
+        offsets = np.cumsum([0] + [len(trk) for trk in tracklets])
+        return dict(
+            mjd=np.array([o.mjd for o in flat]),
+            ra=np.array([o.ra_rad for o in flat]),
+            dec=np.array([o.dec_rad for o in flat]),
+            mag=np.array([o.mag for o in flat]),
+            obscode_idx=np.array([_extension.parse_obscode(o.obscode)
+                                  for o in flat], dtype=np.int32),
+            rms_ra=np.array([o.rms_ra for o in flat]),
+            rms_dec=np.array([o.rms_dec for o in flat]),
+            offsets=offsets,
+        )
+
+    def test_matches_classify_batch(self, model_path, obscodes_path,
+                                    empty_config_path):
+        import numpy as np
+
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+        ) as d2:
+            expected = d2.classify_batch(self.TRACKLETS)
+            result = d2.classify_arrays(**self._columns(self.TRACKLETS))
+
+        assert result.raw.shape == (2, 15)
+        assert result.noid.shape == (2, 15)
+        assert result.valid.all()
+        for k, r in enumerate(expected):
+            assert result.rms[k] == r.rms
+            assert result.rms_prime[k] == r.rms_prime
+            assert list(result.noid[k]) == [r.noid[c] for c in ALL_CLASSES]
+            assert list(result.raw[k]) == [r.raw[c] for c in ALL_CLASSES]
+        assert np.array_equal(result.column("NEO"),
+                              [r.noid.NEO for r in expected])
+
+    def test_unscoreable_tracklet_is_nan(self, model_path, obscodes_path,
+                                         empty_config_path):
+        single = [self.TRACKLETS[0][:1]]
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+        ) as d2:
+            result = d2.classify_arrays(
+                **self._columns(self.TRACKLETS + single))
+
+        assert list(result.valid) == [True, True, False]
+        assert all(v != v for v in result.noid[2])
+
+    def test_bad_offsets(self, model_path, obscodes_path, empty_config_path):
+        cols = self._columns(self.TRACKLETS)
+        cols["offsets"] = [0, 10]
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+        ) as d2:
+            with pytest.raises(ValueError, match="offsets"):
+                d2.classify_arrays(**cols)
+
+    @pytest.mark.parametrize("bad", [-5, 3600, 100000000])
+    def test_bad_site_index(self, model_path, obscodes_path,
+                            empty_config_path, bad):
+        cols = self._columns(self.TRACKLETS)
+        cols["obscode_idx"][1] = bad
+        with Digest2(
+            model_path=model_path,
+            obscodes_path=obscodes_path,
+            config_path=empty_config_path,
+        ) as d2:
+            with pytest.raises(ValueError, match="site index"):
+                d2.classify_arrays(**cols)
+            with pytest.raises(ValueError, match="site index"):
+                d2._ctx.score([(59938.38, 2.23, 0.3, 22.0, bad),
+                               (59938.39, 2.24, 0.3, 22.0, 0)])
@@ -29,6 +29,108 @@ class TestExtensionBasic:
         assert ext.is_initialized() is False
 
 
+class TestParseMpc80Buffer:
+    """Test the C MPC 80-column parser."""
+
+    OBS = (
+        "     K16S99K 1C2022 12 25.38496508 32 36.283+17 10 35.94         21.98GV     G96",
+        "     K16S99K 1C2022 12 25.39527308 32 35.635+17 10 37.27         21.72GV     G96",
+        "     K16S99K 1C2022 12 25.40040208 32 35.473+17 10 37.38         21.31GV     G96",
+    )
+
+    @staticmethod
+    def _second_line(obs_line, kind, x, y, z, units="1"):
+        """Build an s/v line for obs_line with position fields x, y, z."""
+        line = list(obs_line[:14] + kind + obs_line[15:32] + units + " " * 44
+                    + obs_line[77:80])
+        for start, value in ((34, x), (46, y), (58, z)):
+            line[start:start + 11] = ("-" if value < 0 else "+") + \
+                "%10.4f" % abs(value)
+        return "".join(line)
+
+    def test_columns(self):
+        data = "\n".join(self.OBS).encode()
+        parsed = ext.parse_mpc80_buffer(data)
+        assert parsed["designations"] == ["     K16S99K"]
+        assert list(parsed["offsets"]) == [0, 3]
+        assert parsed["open_start"] == data.index(self.OBS[2].encode())
+        assert parsed["mjd"].format == "d"
+        assert list(parsed["site"]) == [ext.parse_obscode("G96")] * 3
+        assert list(parsed["spacebased"]) == [0, 0, 0]
+        assert list(parsed["earth_obs"]) == [0.0] * 9
+        assert parsed["mjd"][0] == 59938 + 0.384965
+        assert parsed["ra"][0] == \
+            ((8 * 60 + 32) * 60 + 36.283) * math.pi / (12 * 3600)
+        assert parsed["dec"][0] == \
+            ((17 * 60 + 10) * 60 + 35.94) * math.pi / (180 * 3600)
+        assert abs(parsed["vmag"][0] - (21.98 + 0.24)) < 1e-12
+
+    def test_empty(self):
+        parsed = ext.parse_mpc80_buffer(b"")
+        assert parsed["designations"] == []
+        assert list(parsed["offsets"]) == [0]
+        assert parsed["open_start"] == 0
+
+    def test_tracklet_boundaries(self):
+        other = self.OBS[2].replace("K16S99K", "K16S99L")
+        lines = [self.OBS[0], self.OBS[1], "not an observation", self.OBS[2],
+                 other]
+        data = "\n".join(lines).encode()
+        parsed = ext.parse_mpc80_buffer(data)
+        assert [d.strip() for d in parsed["designations"]] == \
+            ["K16S99K", "K16S99K", "K16S99L"]
+        assert list(parsed["offsets"]) == [0, 2, 3, 4]
+        assert parsed["open_start"] == data.index(other.encode())
+
+    def test_open_start(self):
+        sat = self.OBS[1].replace(" C2022", " S2022")
+        second = self._second_line(sat, "s", 1.0, 2.0, 3.0)
+        data = "\n".join([self.OBS[0], sat, second, ""]).encode()
+        # the tracklet is open: parsing again from its last row continues it
+        assert ext.parse_mpc80_buffer(data)["open_start"] == \
+            data.index(sat.encode())
+        # an unparseable line closes it
+        data += b"not an observation\n"
+        assert ext.parse_mpc80_buffer(data)["open_start"] == len(data)
+
+    def test_satellite_line(self):
+        sat = self.OBS[0].replace(" C2022", " S2022")
+        lines = [sat, self._second_line(sat, "s", -5634.1734, 2466.2657,
+                                        3038.3924),
+                 self.OBS[1], self.OBS[2]]
+        parsed = ext.parse_mpc80_buffer("\n".join(lines).encode())
+        assert list(parsed["offsets"]) == [0, 3]
+        assert list(parsed["spacebased"]) == [1, 0, 0]
+        au_km = 149.59787e6
+        assert list(parsed["earth_obs"][:3]) == [
+            -5634.1734 / au_km, 2466.2657 / au_km, 3038.3924 / au_km]
+        assert list(parsed["earth_obs"][3:]) == [0.0] * 6
+
+    def test_satellite_line_in_au(self):
+        lines = [self.OBS[0],
+                 self._second_line(self.OBS[0], "s", 0.0001, -0.0002,
+                                   0.0003, units="2"),
+                 self.OBS[1]]
+        parsed = ext.parse_mpc80_buffer("\n".join(lines).encode())
+        assert list(parsed["earth_obs"][:3]) == [0.0001, -0.0002, 0.0003]
+
+    def test_satellite_line_for_other_site_ends_tracklet(self):
+        bad = self._second_line(self.OBS[0], "s", 1.0, 2.0, 3.0)
+        bad = bad[:77] + "C51"
+        lines = [self.OBS[0], bad, self.OBS[1], self.OBS[2]]
+        parsed = ext.parse_mpc80_buffer("\n".join(lines).encode())
+        assert list(parsed["offsets"]) == [0, 1, 3]
+        assert list(parsed["spacebased"]) == [0, 0, 0]
+
+    def test_roving_line(self):
+        lines = [self.OBS[0],
+                 self._second_line(self.OBS[0], "v", 0.5, 0.25, 100.0),
+                 self.OBS[1]]
+        parsed = ext.parse_mpc80_buffer("\n".join(lines).encode())
+        assert list(parsed["spacebased"]) == [1, 0]
+        assert all(v != 0.0 for v in parsed["earth_obs"][:3])
+
+
 class TestExtensionScoring:
     """Test scoring via the C extension."""
 
@@ -148,6 +250,123 @@ class TestExtensionScoring:
         ext.configure(repeatable=1)
 
 
+class TestContext:
+    """Test independent scoring contexts."""
+
+    OBS = [
+        (59938.384965, 2.236660, 0.299789, 22.22, 1696, 0.0, 0.0),
+        (59938.395273, 2.236622, 0.299795, 21.96, 1696, 0.0, 0.0),
+        (59938.400402, 2.236601, 0.299798, 21.55, 1696, 0.0, 0.0),
+    ]
+
+    def test_bad_model_path(self, obscodes_path):
+        with pytest.raises(RuntimeError, match="model"):
+            ext.Context("/nonexistent/model.csv", obscodes_path)
+
+    def test_configure_is_per_context(self, model_path, obscodes_path):
+        a = ext.Context(model_path, obscodes_path)
+        b = ext.Context(model_path, obscodes_path)
+        b.configure(site_errors={"G96": 0.29})
+        assert a.score(self.OBS) != b.score(self.OBS)
+        a.close()
+        b.close()
+
+    def test_close_leaves_others_usable(self, model_path, obscodes_path):
+        a = ext.Context(model_path, obscodes_path)
+        b = ext.Context(model_path, obscodes_path)
+        expected = b.score(self.OBS)
+        a.close()
+        assert a.closed is True
+        with pytest.raises(RuntimeError, match="not initialized"):
+            a.score(self.OBS)
+        assert b.score(self.OBS) == expected
+        b.close()
+
+    def test_module_cleanup_leaves_context_usable(self, model_path,
+                                                  obscodes_path):
+        ctx = ext.Context(model_path, obscodes_path)
+        ext.init(model_path, obscodes_path)
+        ext.cleanup()
+        assert ctx.score(self.OBS)["rms"] >= 0
+        ctx.close()
+
+
+class TestScoreMany:
+    """Test bulk scoring via score_many()."""
+
+    OBS = TestContext.OBS
+
+    @pytest.fixture
+    def ctx(self, model_path, obscodes_path):
+        ctx = ext.Context(model_path, obscodes_path)
+        yield ctx
+        ctx.close()
+
+    def test_matches_score(self, ctx):
+        batch = [self.OBS, self.OBS[:2], self.OBS[1:]]
+        results = ctx.score_many(batch, n_threads=3)
+        assert results == [ctx.score(obs) for obs in batch]
+
+    def test_matches_score_orbits(self, ctx):
+        batch = [self.OBS, self.OBS[1:]]
+        results = ctx.score_many(batch, [1, 7], collect_orbits=1)
+        assert results == [ctx.score_orbits(obs, [1, 7]) for obs in batch]
+
+    def test_unscoreable_tracklet_is_none(self, ctx):
+        stationary = [self.OBS[0], self.OBS[0]]
+        results = ctx.score_many([self.OBS, stationary])
+        assert results[0] is not None
+        assert results[1] is None
+
+    def test_too_few_obs(self, ctx):
+        with pytest.raises(ValueError, match="At least 2"):
+            ctx.score_many([self.OBS, self.OBS[:1]])
+
+    def test_empty_batch(self, ctx):
+        assert ctx.score_many([]) == []
+
+    def test_repeated_scoring_is_stable(self, ctx):
+        """Reused per-thread state doesn't leak between tracklets."""
+        expected = ctx.score(self.OBS[1:], [1, 7])
+        stationary = [self.OBS[0], self.OBS[0]]
+        batch = [self.OBS, stationary, self.OBS[1:], self.OBS[:2]] * 4
+        ctx.score_many(batch, n_threads=2)
+        assert ctx.score(self.OBS[1:], [1, 7]) == expected
+
+
+class TestScoreArrays:
+    """Test buffer validation in score_arrays()."""
+
+    @staticmethod
+    def _args(mjd_dtype="float64"):
+        import numpy as np
+
+        obs = TestContext.OBS
+        cols = [np.array([o[k] for o in obs], dtype=mjd_dtype if k == 0 else "float64")
+                for k in range(4)]
+        site = np.array([o[4] for o in obs], dtype=np.int32)
+        rms = [np.zeros(len(obs)), np.zeros(len(obs))]
+        offsets = np.array([0, len(obs)], dtype=np.int64)
+        out = [np.empty(15), np.empty(15), np.empty(1), np.empty(1)]
+        return cols + [site] + rms + [offsets] + out
+
+    def test_fills_outputs(self, model_path, obscodes_path):
+        ctx = ext.Context(model_path, obscodes_path)
+        args = self._args()
+        ctx.score_arrays(*args)
+        expected = ctx.score(TestContext.OBS)
+        ctx.close()
+        assert list(args[8]) == expected["raw_scores"]
+        assert list(args[9]) == expected["noid_scores"]
+        assert args[10][0] == expected["rms"]
+
+    def test_wrong_dtype(self, model_path, obscodes_path):
+        ctx = ext.Context(model_path, obscodes_path)
+        with pytest.raises(TypeError, match="mjd must be a float64"):
+            ctx.score_arrays(*self._args(mjd_dtype="float32"))
+        ctx.close()
+
+
 class TestExtensionInit:
     """Test initialization error handling."""
 
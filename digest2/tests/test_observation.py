@@ -10,10 +10,16 @@ from digest2.observation import (
     Observation,
     _date_to_mjd,
     _iso_to_mjd,
+    _iso_to_mjd_array,
     _update_magnitude,
+    iter_ades_psv,
+    iter_ades_xml,
+    iter_mpc80_file,
     parse_mpc80,
     parse_mpc80_file,
     parse_ades_psv,
+    parse_ades_psv_arrays,
+    parse_ades_xml,
 )
 
 
@@ -119,6 +125,14 @@ class TestObservation:
         assert t[5] == 0.5  # rmsRA
         assert t[6] == 0.3  # rmsDec
         assert t[7] == 0  # spacebased
+        assert len(t) == 8
+
+    def test_to_tuple_spacebased(self):
+        obs = Observation(mjd=59938.0, ra=128.15, dec=17.18, obscode="C51",
+                          spacebased=True, earth_obs=[1e-5, 2e-5, 3e-5])
+        t = obs.to_tuple(site_index=1251)
+        assert t[7] == 1
+        assert t[8] == (1e-5, 2e-5, 3e-5)
 
 
 class TestParseMpc80:
@@ -186,6 +200,29 @@ class TestParseMpc80File:
         assert len(tracklets) == 2
 
 
+class TestIterMpc80File:
+    """Test streaming MPC 80-column file reading."""
+
+    LINES = (
+        "     K16S99K 1C2022 12 25.38496508 32 36.283+17 10 35.94         21.98GV     G96\n",
+        "     K16S99K 1C2022 12 25.39527308 32 35.635+17 10 37.27         21.72GV     G96\n",
+        "     K16S99L 1C2022 12 25.38496508 33 36.283+17 10 35.94         21.98GV     G96\n",
+        "     K16S99K 1C2022 12 25.40040208 32 35.473+17 10 37.38         21.31GV     G96\n",
+    )
+
+    def test_matches_parse_for_contiguous_blocks(self, sample_obs_path):
+        assert dict(iter_mpc80_file(sample_obs_path)) == \
+            parse_mpc80_file(sample_obs_path)
+
+    def test_splits_on_designation_change(self, tmp_path):
+        f = tmp_path / "multi.obs"
+        f.write_text("".join(self.LINES) + "short line\n")
+        blocks = list(iter_mpc80_file(str(f)))
+        assert [(desig.strip(), len(obs)) for desig, obs in blocks] == [
+            ("K16S99K", 2), ("K16S99L", 1), ("K16S99K", 1)]
+        assert blocks[2][1][0] == parse_mpc80(self.LINES[3].rstrip("\n"))
+
+
 class TestParseAdesPsv:
     """Test ADES PSV file parsing against real-world format variants."""
 
@@ -261,3 +298,158 @@ class TestParseAdesPsv:
         f = tmp_path / "test.psv"
         f.write_text(content)
         assert len(parse_ades_psv(str(f))["J81E35N"]) == 2
+
+
+class TestIterAdesPsv:
+    """Test streaming ADES PSV reading."""
+
+    def test_blocks_sorted_by_mjd(self, tmp_path):
+        content = (
+            f"{TestParseAdesPsv._HEADER}\n"
+            "None|None|A|CCD|D29|2022-07-26T17:22:00.077Z|313.90775|1.52200|None|None|20.6|R\n"
+            "None|None|A|CCD|D29|2022-07-26T16:41:16.426Z|313.91454|1.52442|None|None|20.6|R\n"
+            "None|None|B|CCD|D29|2022-07-26T16:41:16.426Z|313.91454|1.52442|None|None|20.6|R\n"
+            "None|None|A|CCD|D29|2022-07-26T18:41:16.426Z|313.91454|1.52442|None|None|20.6|R\n"
+        )
+        f = tmp_path / "test.psv"
+        f.write_text(content)
+        blocks = list(iter_ades_psv(str(f)))
+        assert [(desig, len(obs)) for desig, obs in blocks] == [
+            ("A", 2), ("B", 1), ("A", 1)]
+        assert blocks[0][1] == parse_ades_psv(str(f))["A"][:2]
+
+
+class TestParseAdesPsvArrays:
+    """Test the columnar ADES PSV reader against parse_ades_psv."""
+
+    CONTENT = (
+        "# version=2017\n"
+        "! mpcCode D29\n"
+        f"!{TestParseAdesPsv._HEADER}|\n"
+        "None|None|A|CCD|D29|2022-07-26T17:22:00.077Z|313.90775|1.52200|None|None|20.6|R|\n"
+        "None|None|B|CCD|D29|2022-07-26T16:41:16.426Z|313.91454|1.52442|0.3| |20.6||\n"
+        "None|2016 SK99|None|CCD| F51 |2022-07-26T16:41:16Z|313.9|1.5|None|None|None|G|\n"
+        "None|None|A|CCD|D29|2022-07-26T16:41:16.426123Z|313.91454|1.52442|None|None|0|V|\n"
+        "None|None|B|CCD|D29|2022-07-26T18:41:16.4Z|313.91454|1.52442|None|None|21|w|\n"
+        "None|None|A|CCD|D29|2022-07-26T18:41:16|313.91454|1.52442|None|None|21|w|\n"
+        "5157|None|None|UNK|675|2022-02-29T09:00:30.240Z|213.27|-13.68|None|None|None|None|\n"
+        "5157|None|None|UNK|675|2022-07-26T09:00:30.240Z|bad|-13.68|None|None|None|None|\n"
+        "5157|None|None|UNK||2022-07-26T09:00:30.240Z|213.27|-13.68|None|None|None|None|\n"
+        "None|None|C|CCD|D29|2022-07-26T17:22:00.077Z|313.90775|1.52200|None|None|20.6\n"
+        "BROKEN_ROW\n"
+    )
+
+    def test_matches_parse_ades_psv(self, tmp_path):
+        f = tmp_path / "test.psv"
+        f.write_text(self.CONTENT)
+        expected = parse_ades_psv(str(f))
+        columns = parse_ades_psv_arrays(str(f))
+
+        assert columns["designations"] == list(expected)
+        offsets = columns["offsets"].tolist()
+        assert offsets[-1] == len(columns["mjd"])
+        for k, obs_list in enumerate(expected.values()):
+            rows = range(offsets[k], offsets[k + 1])
+            assert [
+                Observation(
+                    mjd=columns["mjd"][r], ra=columns["ra"][r],
+                    dec=columns["dec"][r], mag=columns["mag"][r],
+                    band=str(columns["band"][r]),
+                    obscode=str(columns["obscode"][r]),
+                    rms_ra=columns["rms_ra"][r], rms_dec=columns["rms_dec"][r],
+                )
+                for r in rows
+            ] == obs_list
+
+    def test_matches_sample(self, sample_psv_path):
+        expected = parse_ades_psv(sample_psv_path)
+        columns = parse_ades_psv_arrays(sample_psv_path)
+        assert columns["designations"] == list(expected)
+        assert columns["mjd"].tolist() == \
+            [o.mjd for obs_list in expected.values() for o in obs_list]
+
+    def test_empty(self, tmp_path):
+        f = tmp_path / "empty.psv"
+        f.write_text(f"{TestParseAdesPsv._HEADER}\n")
+        columns = parse_ades_psv_arrays(str(f))
+        assert columns["offsets"].tolist() == [0]
+        assert columns["designations"] == []
+        assert len(columns["mjd"]) == 0
+
+    def test_iso_to_mjd_array_is_exact(self):
+        import numpy as np
+
+        values = [
+            "2022-12-25T09:14:20.544Z",
+            "2022-12-25T09:14:20.544123Z",
+            "2022-12-25T09:14:20",
+            "2000-02-29T23:59:59.999Z",
+            "1954-01-01T00:00:00.000Z",
+            "2022-03-01T12:00:00Z",
+            "2022-12-25T09:14:20.5Z",
+            "2022-13-25T09:14:20Z",
+            "2021-02-29T00:00:00Z",
+            "garbage",
+        ]
+        ok = np.ones(len(values), dtype=bool)
+        mjd = _iso_to_mjd_array(values, ok)
+        for value, got, valid in zip(values, mjd.tolist(), ok.tolist()):
+            try:
+                expected = _iso_to_mjd(value)
+            except ValueError:
+                assert not valid
+            else:
+                assert valid and got == expected
+
+
+class TestIterAdesXml:
+    """Test incremental ADES XML reading."""
+
+    @staticmethod
+    def _optical(trksub, minute, extra=""):
+        return (
+            f"<optical><trkSub>{trksub}</trkSub><stn>G96</stn>"
+            f"<obsTime>2022-12-25T09:{minute:02d}:20.991Z</obsTime>"
+            f"<ra>128.15</ra><dec>17.18</dec>{extra}</optical>"
+        )
+
+    def test_matches_parse_for_flat_layout(self, sample_xml_path):
+        assert dict(iter_ades_xml(sample_xml_path)) == \
+            parse_ades_xml(sample_xml_path)
+
+    def test_obs_blocks(self, tmp_path):
+        o = self._optical
+        content = (
+            '<?xml version="1.0"?>\n'
+            '<ades xmlns="urn:test" version="2017">'
+            "<obsBlock><obsContext><observatory><mpcCode>G96</mpcCode>"
+            "</observatory></obsContext><obsData>"
+            + o("A", 1, "<mag>21.98</mag><band>G</band><rmsRA>0.25</rmsRA>")
+            + o("A", 2) + o("B", 3) +
+            "</obsData></obsBlock>"
+            "<obsBlock><obsData>" + o("A", 4) + "</obsData></obsBlock>"
+            "</ades>"
+        )
+        f = tmp_path / "blocks.xml"
+        f.write_text(content)
+        blocks = list(iter_ades_xml(str(f)))
+        assert [(desig, len(obs)) for desig, obs in blocks] == [
+            ("A", 2), ("B", 1), ("A", 1)]
+        first = blocks[0][1][0]
+        assert first.mjd == pytest.approx(_iso_to_mjd("2022-12-25T09:01:20.991Z"))
+        assert first.mag == pytest.approx(_update_magnitude("G", 21.98))
+        assert first.rms_ra == 0.25
+        assert first.rms_dec == 0.0
+        assert len(parse_ades_xml(str(f))["A"]) == 3
+
+    def test_skips_incomplete_optical(self, tmp_path):
+        content = (
+            "<ades>" + self._optical("A", 1)
+            + "<optical><trkSub>A</trkSub><stn>G96</stn><ra>1</ra></optical>"
+            + "<optical><provID>2016 SK99</provID><stn>G96</stn>"
+            "<obsTime>2022-12-25T09:05:00Z</obsTime><ra>1</ra><dec/></optical>"
+            + "</ades>"
+        )
+        f = tmp_path / "flat.xml"
+        f.write_text(content)
+        assert [(d, len(obs)) for d, obs in iter_ades_xml(str(f))] == [("A", 1)]
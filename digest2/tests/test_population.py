@@ -20,7 +20,9 @@ from digest2.population import (
     IX,
     QPART,
     QX,
+    bin_s3m,
     build_model,
+    build_s3m,
     h_to_bin,
     is_hansa,
     is_hilda,
@@ -39,11 +41,14 @@ from digest2.population import (
     is_trojan,
     qei_to_bin,
     qeih_to_bin,
+    read_astorb,
     read_model_csv,
     read_s3m,
     write_model_csv,
+    _class_masks,
     _volume_scale,
 )
+import digest2.population as population
 
 
 # ---------------------------------------------------------------------------
@@ -68,6 +73,28 @@ def existing_model_path():
     return str(p)
 
 
+@pytest.fixture
+def s3m_file(tmp_path):
+    """Write a synthetic S3M file, including a few malformed lines."""
+    rng = np.random.default_rng(11)
+    path = tmp_path / "test.s3m"
+    with open(path, "w") as f:
+        f.write("!!OID FORMAT q e i Node Peri M epoch H\n")
+        for k in range(3000):
+            q = rng.choice([rng.uniform(0.05, 6.0), rng.uniform(0, 150),
+                            QPART[k % QX], 1.3])
+            e = rng.choice([rng.uniform(0.0, 1.15), EPART[k % EX]])
+            i = rng.choice([rng.uniform(-1.0, 181.0), IPART[k % IX]])
+            h = rng.choice([rng.uniform(5.0, 27.0), HPART[k % HX]])
+            q, e, i, h = (float(x) for x in (q, e, i, h))
+            f.write(f"S{k:07d}a S{k:07d}a {q!r} {e!r} {i!r} "
+                    f"12.3 45.6 78.9 {h!r} 54800 1\n")
+        f.write("S1 S1 1.2 0.3\n")
+        f.write("S2 S2 1.2 0.3 x 1 2 3 20.0\n")
+        f.write("S3 S3 nan 0.3 5.0 1 2 3 20.0\n")
+    return str(path)
+
+
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
@@ -255,6 +282,121 @@ class TestClassTests:
         assert len(CLASS_TESTS) == 15
 
 
+class TestClassMasks:
+    def test_matches_class_tests(self):
+        rng = np.random.default_rng(7)
+        n = 20000
+        q = rng.uniform(0.05, 6.0, n)
+        e = rng.uniform(0.0, 1.1, n)
+        i = rng.uniform(0.0, 180.0, n)
+        h = rng.uniform(5.0, 27.0, n)
+        # orbits on semimajor axis limits of the class tests
+        a = rng.choice([1.78, 2.0, 2.2, 2.45, 2.5, 2.8, 3.25, 3.9, 5.35], n)
+        on_limit = rng.random(n) < 0.1
+        q[on_limit] = a[on_limit] * (1 - e[on_limit])
+        e[:4] = [1.0, 0.18, np.nan, 0.5]
+        i[4:8] = [16.0, 20.0, 40.0, np.nan]
+        q[8] = np.nan
+
+        masks = _class_masks(q, e, i, h)
+        assert masks.shape == (D2CLASSES, n)
+        for k in range(n):
+            for c in range(D2CLASSES):
+                assert masks[c, k] == CLASS_TESTS[c](q[k], e[k], i[k], h[k]), \
+                    (CLASS_ABBR[c], q[k], e[k], i[k], h[k])
+
+
+class TestBinS3m:
+    @staticmethod
+    def _reference(path, clip_neo):
+        """Bin an S3M file orbit by orbit with the scalar functions."""
+        all_ss = np.zeros((QX, EX, IX, HX))
+        all_class = np.zeros((D2CLASSES, QX, EX, IX, HX))
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if line.startswith("!!") or len(parts) < 9:
+                    continue
+                try:
+                    q, e, i, h = (float(parts[k]) for k in (2, 3, 4, 8))
+                except ValueError:
+                    continue
+                if q <= 0.0 or e < 0.0 or e > 1.1 or i < 0.0 or i >= 180.0:
+                    continue
+                if clip_neo and q < 1.3:
+                    continue
+                b = qeih_to_bin(q, e, i, h)
+                if b is None:
+                    continue
+                all_ss[b] += 1
+                for c in range(D2CLASSES):
+                    if CLASS_TESTS[c](q, e, i, h):
+                        all_class[(c,) + b] += 1
+        return all_ss, all_class
+
+    @pytest.mark.parametrize("clip_neo", [False, True])
+    def test_matches_reference(self, s3m_file, clip_neo):
+        all_ss, all_class = bin_s3m(s3m_file, clip_neo)
+        ref_ss, ref_class = self._reference(s3m_file, clip_neo)
+        np.testing.assert_array_equal(all_ss, ref_ss)
+        np.testing.assert_array_equal(all_class, ref_class)
+        assert all_ss.sum() > 1000
+
+    def test_chunked(self, s3m_file, monkeypatch):
+        expected = bin_s3m(s3m_file)
+        monkeypatch.setattr(population, "_S3M_CHUNK_LINES", 7)
+        chunked = bin_s3m(s3m_file)
+        np.testing.assert_array_equal(chunked[0], expected[0])
+        np.testing.assert_array_equal(chunked[1], expected[1])
+
+
+class TestBuildS3m:
+    def test_workers_match_sequential(self, s3m_file, tmp_path, monkeypatch):
+        files = [(s3m_file, False), (s3m_file, True)]
+        seq_path = tmp_path / "seq.dat"
+        stats = build_s3m(files, str(seq_path))
+
+        # small ranges so each file is split across workers
+        monkeypatch.setattr(population, "_S3M_RANGE_BYTES", 16 << 10)
+        assert len(population._s3m_ranges(s3m_file, 16 << 10)) > 1
+        par_path = tmp_path / "par.dat"
+        assert build_s3m(files, str(par_path), workers=2) == stats
+        assert par_path.read_text() == seq_path.read_text()
+
+        expected = bin_s3m(s3m_file)[0].sum() + bin_s3m(s3m_file, True)[0].sum()
+        assert stats["total_orbits"] == int(expected)
+
+    def test_ranges_split_on_lines(self, s3m_file):
+        data = Path(s3m_file).read_bytes()
+        ranges = population._s3m_ranges(s3m_file, 1000)
+        assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert end == start
+            assert data[end - 1:end] == b"\n"
+
+    def test_cache(self, s3m_file, tmp_path, monkeypatch):
+        cache_dir = tmp_path / "cache"
+        files = [(s3m_file, False)]
+        first = build_s3m(files, str(tmp_path / "a.dat"),
+                          cache_dir=str(cache_dir))
+        assert len(list(cache_dir.glob("*.npz"))) == 1
+
+        # a cached file is not binned again
+        def fail(*args):
+            raise AssertionError("file was re-binned")
+        monkeypatch.setattr(population, "_bin_s3m_range", fail)
+        second = build_s3m(files, str(tmp_path / "b.dat"),
+                           cache_dir=str(cache_dir))
+        assert second == first
+        assert (tmp_path / "a.dat").read_text() == \
+            (tmp_path / "b.dat").read_text()
+
+        # the same contents with clip_neo is a different entry
+        with pytest.raises(AssertionError, match="re-binned"):
+            build_s3m([(s3m_file, True)], str(tmp_path / "c.dat"),
+                      cache_dir=str(cache_dir))
+
+
 # ---------------------------------------------------------------------------
 # Read existing s3m.dat
 # ---------------------------------------------------------------------------
@@ -344,6 +486,113 @@ class TestWriteReadRoundTrip:
         np.testing.assert_array_equal(result["all_ss"], all_ss)
         np.testing.assert_array_equal(result["unk_ss"], unk_ss)
 
+    def test_written_rows(self, tmp_path):
+        """Rows are labelled in section order with %.15g values."""
+        all_ss = np.zeros((QX, EX, IX, HX))
+        unk_ss = np.zeros((QX, EX, IX, HX))
+        all_class = np.zeros((D2CLASSES, QX, EX, IX, HX))
+        unk_class = np.zeros((D2CLASSES, QX, EX, IX, HX))
+        all_ss[0, 0, 0, 0] = 1 / 3
+        unk_class[D2CLASSES - 1, QX - 1, EX - 1, IX - 1, HX - 1] = 2.5
+
+        csv_path = tmp_path / "test_rows.csv"
+        write_model_csv(str(csv_path), all_ss, unk_ss, all_class, unk_class)
+        lines = csv_path.read_text().splitlines()
+
+        rows_per_section = QX * EX * IX
+        assert len(lines) == 1 + 2 * (D2CLASSES + 1) * rows_per_section
+        assert lines[0].startswith("Model,Class,Q,e,i,H6,H8,")
+        assert lines[1] == "All,SS,0.4,0.1,2," + f"{1 / 3:.15g}" + "," * (HX - 1)
+        assert lines[1 + rows_per_section].startswith("Unk,SS,0.4,0.1,2,")
+        assert lines[-1] == "Unk,JFC,100,1.1,180" + "," * (HX - 1) + ",2.5"
+
+    def test_read_unknown_section(self, tmp_path):
+        all_ss = np.zeros((QX, EX, IX, HX))
+        all_class = np.zeros((D2CLASSES, QX, EX, IX, HX))
+        csv_path = tmp_path / "test_bad.csv"
+        write_model_csv(str(csv_path), all_ss, all_ss, all_class, all_class)
+        text = csv_path.read_text().replace("Unk,JFC,", "Unk,XYZ,", 1)
+        csv_path.write_text(text)
+        with pytest.raises(ValueError, match="unknown model section"):
+            read_model_csv(str(csv_path))
+
+
+# ---------------------------------------------------------------------------
+# Catalog reading
+# ---------------------------------------------------------------------------
+
+class TestReadAstorb:
+    FIELDS = ((42, 47), (147, 157), (158, 168), (169, 181))
+
+    @pytest.fixture
+    def astorb_file(self, tmp_path):
+        """Write a synthetic astorb.dat, including malformed fields."""
+        rng = np.random.default_rng(3)
+        odd = ["     ", "  1.2e-1", "  nan", " 1_0.5", "  -1.5", "  +.5",
+               "  5.", "  1 5", "  .", "-", "12.3x", "1e999"]
+        path = tmp_path / "astorb.dat"
+        with open(path, "w", encoding="utf-8") as f:
+            for k in range(2000):
+                line = [" "] * 267
+                line[:10] = "Ünïcødé %2d" % (k % 100) if k % 7 == 0 else "%10d" % k
+                values = [f"{rng.uniform(3, 25):.2f}",
+                          f"{rng.uniform(0, 60):.6f}",
+                          f"{rng.uniform(0, 1.05):.8f}",
+                          f"{rng.uniform(0.5, 120):.8f}"]
+                if k % 13 == 0:
+                    values[k % 4] = odd[k % len(odd)]
+                for (start, stop), text in zip(self.FIELDS, values):
+                    text = text.rjust(stop - start)[: stop - start]
+                    line[start:stop] = text
+                text = "".join(line)
+                if k % 97 == 0:
+                    text = text[: 40 + k % 150].rstrip()
+                f.write(text + "\n")
+            f.write("short\n\n" + "x" * 175)
+        return str(path)
+
+    @classmethod
+    def _reference(cls, path):
+        """Line-at-a-time reader the vectorized one must agree with."""
+        all_ss = np.zeros((QX, EX, IX, HX))
+        all_class = np.zeros((D2CLASSES, QX, EX, IX, HX))
+        stats = {"lines": 0, "parse_fails": 0, "out_of_model": 0, "usable": 0}
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                stats["lines"] += 1
+                try:
+                    h, i, e, a = (float(line[s:t]) for s, t in cls.FIELDS)
+                except ValueError:
+                    stats["parse_fails"] += 1
+                    continue
+                q = a * (1 - e)
+                idx = qeih_to_bin(q, e, i, h)
+                if idx is None:
+                    stats["out_of_model"] += 1
+                    continue
+                stats["usable"] += 1
+                all_ss[idx] += 1
+                for c in range(D2CLASSES):
+                    if CLASS_TESTS[c](q, e, i, h):
+                        all_class[c][idx] += 1
+        return all_ss, all_class, stats
+
+    def test_matches_reference(self, astorb_file):
+        all_ss, all_class, stats = read_astorb(astorb_file)
+        ref_ss, ref_class, ref_stats = self._reference(astorb_file)
+        assert stats == ref_stats
+        assert stats["parse_fails"] > 50
+        np.testing.assert_array_equal(all_ss, ref_ss)
+        np.testing.assert_array_equal(all_class, ref_class)
+
+    def test_chunked(self, astorb_file, monkeypatch):
+        expected = read_astorb(astorb_file)
+        monkeypatch.setattr(population, "_CATALOG_CHUNK_LINES", 333)
+        all_ss, all_class, stats = read_astorb(astorb_file)
+        assert stats == expected[2]
+        np.testing.assert_array_equal(all_ss, expected[0])
+        np.testing.assert_array_equal(all_class, expected[1])
+
 
 # ---------------------------------------------------------------------------
 # Volume scaling
@@ -394,6 +643,42 @@ class TestVolumeScaling:
 
         assert np.all(unk_ss >= -1e-10)
 
+    def test_matches_per_bin_loop(self):
+        rng = np.random.default_rng(9)
+        all_ss = rng.random((QX, EX, IX, HX)) * 100
+        known_ss = rng.random((QX, EX, IX, HX)) * 50
+        all_class = rng.random((D2CLASSES, QX, EX, IX, HX)) * 80
+        known_class = rng.random((D2CLASSES, QX, EX, IX, HX)) * 40
+        ref = [all_ss.copy(), all_ss - known_ss, all_class.copy(),
+               all_class - known_class]
+
+        q0 = 0.0
+        for iq in range(QX):
+            dq = QPART[iq] - q0
+            e0, d0 = 0.0, 1.0
+            for ie in range(EX):
+                d1 = 1.0 - EPART[ie] if EPART[ie] < 1 else 0.0
+                dae = dq * (EPART[ie] - e0) / (d0 + d1)
+                i0 = 0.0
+                for ii in range(IX):
+                    daei = dae * (IPART[ii] - i0)
+                    h0 = 0.0
+                    for ih in range(HX):
+                        isqv = 1.0 / math.sqrt(daei * (HPART[ih] - h0))
+                        for arr in ref:
+                            arr[..., iq, ie, ii, ih] *= isqv
+                        h0 = HPART[ih]
+                    i0 = IPART[ii]
+                e0, d0 = EPART[ie], d1
+            q0 = QPART[iq]
+
+        unk_ss, unk_class = _volume_scale(all_ss, known_ss,
+                                          all_class, known_class)
+        np.testing.assert_allclose(all_ss, ref[0], rtol=1e-14)
+        np.testing.assert_allclose(unk_ss, ref[1], rtol=1e-12)
+        np.testing.assert_allclose(all_class, ref[2], rtol=1e-14)
+        np.testing.assert_allclose(unk_class, ref[3], rtol=1e-12)
+
 
 # ---------------------------------------------------------------------------
 # Build model from s3m.dat (integration test)
@@ -6,6 +6,7 @@ Covers:
 - Multiple input file support (mix .obs and .xml)
 - Sparse bin tracking (bit-identical scores, deterministic in repeatable mode)
 - Python library API path with sparse bins
+- Pinned repeatable scores (order of the angle search)
 """
 import subprocess
 import tempfile
@@ -315,3 +316,102 @@ class TestLibraryAPI:
         for r in results:
             assert r.designation is not None
             assert 0 <= r.noid['NEO'] <= 100
+
+
+# ---------------------------------------------------------------------------
+# Pinned scores — the search must keep its order of draws and tags
+# ---------------------------------------------------------------------------
+class TestPinnedScores:
+    """Pin repeatable scores so that a reordered search shows up.
+
+    The angle search draws a random mid point per interval and tags bins in
+    search order; visiting intervals in another order changes which orbits
+    tag new bins and so the scores, by whole points.
+    """
+
+    # NoID scores of three-hr-tracklets.obs, in Scores order
+    THREE_HR_NOID = {
+        "23662": (56.8, 26.5, 18.9, 10.2, 4.6, 0.0, 0.0, 0.4, 0.0, 0.0, 1.5, 0.0, 0.0, 0.0, 0.2),
+        "65558": (56.7, 31.2, 17.9, 5.8, 3.4, 0.0, 0.0, 0.5, 0.0, 0.0, 0.9, 0.0, 0.0, 0.0, 0.6),
+        "99516": (57.8, 31.9, 21.6, 6.6, 2.4, 0.0, 0.0, 1.6, 0.0, 0.0, 0.9, 0.0, 0.0, 0.0, 0.4),
+        "J6666": (47.3, 20.1, 12.8, 9.4, 5.0, 0.0, 0.0, 0.4, 0.0, 0.0, 2.5, 0.9, 0.0, 0.0, 1.6),
+        "L7488": (47.5, 15.7, 12.6, 3.2, 4.7, 0.0, 0.0, 0.1, 0.0, 0.0, 0.9, 2.3, 0.0, 0.0, 5.8),
+        "M9358": (56.9, 27.5, 18.7, 6.4, 4.4, 0.0, 0.0, 0.6, 0.0, 0.0, 0.8, 0.0, 0.0, 0.0, 0.4),
+        "A0421": (50.9, 20.5, 14.3, 3.8, 3.3, 0.0, 0.0, 0.6, 0.0, 0.0, 2.1, 1.5, 0.0, 0.0, 2.7),
+        "S1795": (44.8, 17.6, 11.7, 2.7, 2.8, 0.0, 0.0, 0.0, 0.0, 0.0, 1.7, 3.2, 0.0, 0.0, 4.6),
+        "i9130": (58.2, 26.9, 15.2, 7.0, 5.4, 0.0, 0.0, 0.6, 0.0, 0.0, 0.4, 0.0, 0.0, 0.0, 0.9),
+        "K21V32W": (52.1, 23.7, 12.1, 6.0, 3.8, 0.0, 0.0, 1.4, 0.0, 0.0, 3.0, 1.2, 0.0, 0.0, 2.0),
+    }
+
+    # Raw and NoID scores of NEO, N22, MB1 and JFC, to the last digit
+    EXACT_CLASSES = ("NEO", "N22", "MB1", "JFC")
+    EXACT = {
+        "K16S99K": (
+            (37.102505099345095, 32.69688969218338, 0.38283147674025525, 2.241690404301674),
+            (30.34572114370519, 24.910462779432375, 0.227079444423641, 1.215887381642688)),
+        "K23M01O": (
+            (69.55031647820783, 14.611758904850932, 0.0, 1.8942521943458115),
+            (64.48980269152727, 11.734938819089221, 0.0, 0.9657228314501907)),
+        "23662": (
+            (31.130284067245103, 23.944606484955752, 0.989180821802145, 0.4595783764216098),
+            (26.515423486692413, 18.94825495978927, 0.3519037700470784, 0.18379488496383078)),
+        "65558": (
+            (35.306186516972765, 23.335519848555943, 0.5787348615500368, 1.084312215256808),
+            (31.237408342734245, 17.91250493617307, 0.47705146640720153, 0.55575290963389)),
+    }
+
+    # ADES files (offset grid over the reported RMS): raw and NoID NEO,
+    # raw and NoID MB1, distances and orbits searched
+    ADES = {
+        "sample.xml": (36.839071085028515, 30.063161755339635, 0.38574107033126587, 0.22943542981547232, 2691, 444184),
+        "sample1.xml": (63.60902842766646, 59.67820485006788, 0.0, 0.0, 2251, 66750),
+        "sample.psv": (36.62180544134342, 29.57660950843721, 0.38851081467975174, 0.22991078166572645, 2677, 441623),
+    }
+
+    @staticmethod
+    def _classify(model_path, obscodes_path, config_path, path, **kwargs):
+        from digest2 import Digest2
+        with Digest2(model_path=model_path, obscodes_path=obscodes_path,
+                     config_path=config_path, repeatable=True) as d2:
+            return d2.classify_file(str(path), **kwargs)
+
+    def test_three_hr_tracklets(self, model_path, obscodes_path,
+                                empty_config_path, three_hr_tracklets_path):
+        results = self._classify(model_path, obscodes_path, empty_config_path,
+                                 three_hr_tracklets_path)
+        assert [r.designation for r in results] == list(self.THREE_HR_NOID)
+        for r in results:
+            noid = tuple(v for _, v in r.noid.items())
+            assert noid == pytest.approx(self.THREE_HR_NOID[r.designation],
+                                         abs=0.051), r.designation
+
+    def test_exact_scores(self, digest2_dir, model_path, obscodes_path,
+                          empty_config_path):
+        """Bin tags are bit sets; the sums over them must not change."""
+        results = []
+        for name in ("sample.obs", "sample1.obs", "three-hr-tracklets.obs"):
+            results += self._classify(
+                model_path, obscodes_path, empty_config_path,
+                digest2_dir / "digest2" / name)
+        got = {r.designation: r for r in results
+               if r.designation in self.EXACT}
+        assert sorted(got) == sorted(self.EXACT)
+        for desig, (raw, noid) in self.EXACT.items():
+            r = got[desig]
+            assert tuple(r.raw[c] for c in self.EXACT_CLASSES) == \
+                pytest.approx(raw, rel=1e-12, abs=1e-12), desig
+            assert tuple(r.noid[c] for c in self.EXACT_CLASSES) == \
+                pytest.approx(noid, rel=1e-12, abs=1e-12), desig
+
+    @pytest.mark.parametrize("name", sorted(ADES))
+    def test_ades_offsets(self, digest2_dir, model_path, obscodes_path,
+                          empty_config_path, name):
+        """Offset motion vectors are solved once; the search must not change."""
+        results = self._classify(model_path, obscodes_path, empty_config_path,
+                                 digest2_dir / "digest2" / name)
+        assert len(results) == 1
+        r = results[0]
+        *scores, distances, orbits = self.ADES[name]
+        assert (r.raw.NEO, r.noid.NEO, r.raw.MB1, r.noid.MB1) == \
+            pytest.approx(tuple(scores), rel=1e-12, abs=1e-12)
+        assert (r.distances_tried, r.orbits_tried) == (distances, orbits)
@@ -0,0 +1,121 @@
+"""Tests for tag set collection and re-scoring (digest2.rescore)."""
+
+import numpy as np
+import pytest
+
+from digest2 import Digest2, ResultCache, TagSets, read_model_csv, rescore
+from digest2.observation import iter_mpc80_file
+from digest2.population import D2CLASSES, EX, HX, IX, QX
+
+
+def _model(all_ss=0.0, unk_ss=0.0):
+    shape = (QX, EX, IX, HX)
+    return {
+        "all_ss": np.full(shape, all_ss),
+        "unk_ss": np.full(shape, unk_ss),
+        "all_class": np.zeros((D2CLASSES,) + shape),
+        "unk_class": np.zeros((D2CLASSES,) + shape),
+    }
+
+
+class TestTagSets:
+    """Test the TagSets container."""
+
+    TAGS = TagSets._from_mask(0b11, [3, 10, 42],
+                              [0b01, 0b10 | 1 << 16, 1 << 16 | 1 << 17])
+
+    def test_classes_and_bins(self):
+        assert self.TAGS.classes == ("Int", "NEO")
+        assert len(self.TAGS) == 3
+        assert self.TAGS.in_class("Int").tolist() == [3]
+        assert self.TAGS.out_of_class("Int").tolist() == [10, 42]
+        assert self.TAGS.in_class("NEO").tolist() == [10]
+        assert self.TAGS.out_of_class("NEO").tolist() == [42]
+        with pytest.raises(KeyError):
+            self.TAGS.in_class("MB1")
+
+    def test_bytes_round_trip(self):
+        data = self.TAGS.to_bytes()
+        assert len(data) == 8 + 8 * 3
+        assert TagSets.from_bytes(data) == self.TAGS
+        with pytest.raises(ValueError):
+            TagSets.from_bytes(data[:-1])
+
+
+class TestRescoreFormula:
+    """Test rescore() against hand-computed scores."""
+
+    def test_sums(self):
+        model = _model(all_ss=4.0, unk_ss=2.0)
+        neo = 1
+        model["all_class"][neo].flat[[5, 7]] = [3.0, 1.0]
+        model["unk_class"][neo].flat[[5, 7]] = [1.0, 0.5]
+        # bin 5 in class, bin 7 in and out, bin 9 out
+        tags = TagSets._from_mask(1 << neo, [5, 7, 9], [
+            1 << neo, 1 << neo | 1 << (neo + 16), 1 << (neo + 16)])
+        raw, noid = rescore(tags, model)
+        assert raw.NEO == pytest.approx(100 * 4 / (4 + 3 + 4))
+        assert noid.NEO == pytest.approx(100 * 1.5 / (1.5 + 1.5 + 2))
+        assert raw.MB1 == 0.0
+
+    def test_no_tags(self):
+        tags = TagSets._from_mask(1 << 1 | 1 << 7, [], [])
+        raw, noid = rescore(tags, _model())
+        assert (raw.NEO, raw.MB1) == (100.0, 0.0)
+        assert (noid.NEO, noid.MB1) == (100.0, 0.0)
+
+
+class TestCollectTags:
+    """Test collect_tags=True against the scores of the search."""
+
+    @pytest.fixture
+    def batch(self, three_hr_tracklets_path):
+        return [obs for _, obs in iter_mpc80_file(three_hr_tracklets_path)][:3]
+
+    @pytest.fixture
+    def model(self, model_path):
+        if not model_path.endswith(".csv"):
+            pytest.skip("rescore needs a CSV model")
+        return read_model_csv(model_path)
+
+    def _d2(self, model_path, obscodes_path, empty_config_path, **settings):
+        return Digest2(model_path=model_path, obscodes_path=obscodes_path,
+                       config_path=empty_config_path, **settings)
+
+    def test_rescore_same_model(self, model_path, obscodes_path,
+                                empty_config_path, batch, model):
+        with self._d2(model_path, obscodes_path, empty_config_path) as d2:
+            results = d2.classify_batch(batch, collect_tags=True)
+        for r in results:
+            assert r.tag_sets.classes == tuple(r.raw)
+            raw, noid = rescore(r.tag_sets, model)
+            for abbr in r.raw:
+                assert raw[abbr] == pytest.approx(r.raw[abbr], abs=1e-9)
+                assert noid[abbr] == pytest.approx(r.noid[abbr], abs=1e-9)
+
+    def test_rescore_exact_for_split_search(self, model_path, obscodes_path,
+                                            empty_config_path, batch, model):
+        # the split search sums tags in bin order, as rescore does
+        with self._d2(model_path, obscodes_path, empty_config_path,
+                      search_threads=2) as d2:
+            results = [d2.classify_tracklet(obs, classes=["NEO", "MB1"],
+                                            collect_tags=True)
+                       for obs in batch]
+        for r in results:
+            assert r.tag_sets.classes == ("NEO", "MB1")
+            assert rescore(r.tag_sets, model) == (r.raw, r.noid)
+
+    def test_entry_points_agree(self, model_path, obscodes_path,
+                                empty_config_path, batch):
+        with self._d2(model_path, obscodes_path, empty_config_path,
+                      cache=ResultCache()) as d2:
+            single = d2.classify_tracklet(batch[0], classes=["NEO"],
+                                          collect_tags=True)
+            many = d2.classify_batch(batch, classes=["NEO"],
+                                     collect_tags=True)
+            plain = d2.classify_tracklet(batch[0], classes=["NEO"])
+            assert len(d2._cache) == 1
+        assert single == many[0]
+        assert plain.tag_sets is None
+        assert single.noid == plain.noid
+        assert single.tag_sets.in_class("NEO").size > 0
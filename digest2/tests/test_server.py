@@ -0,0 +1,137 @@
+"""Tests for the scoring service (digest2.server)."""
+
+import http.client
+import json
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from digest2.server import detect_format, make_server
+
+
+class TestDetectFormat:
+    """Test payload format detection."""
+
+    def test_xml(self):
+        assert detect_format(b'\n<?xml version="1.0"?><ades/>') == "xml"
+
+    def test_psv(self):
+        assert detect_format(b"# version=2017\n! mpcCode G96\n"
+                             b"!permID|provID|trkSub\n") == "psv"
+
+    def test_mpc80(self, sample_obs_path):
+        with open(sample_obs_path, "rb") as f:
+            assert detect_format(f.read()) == "obs"
+
+
+class TestServer:
+    """Test HTTP scoring over TCP and a Unix socket."""
+
+    @pytest.fixture
+    def url(self, d2):
+        server = make_server(d2, port=0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+    @staticmethod
+    def _post(url, path, data):
+        request = urllib.request.Request(url + path, data=data)
+        with urllib.request.urlopen(request) as response:
+            return response.read().decode()
+
+    @pytest.mark.parametrize("name", ["sample.obs", "sample.xml",
+                                      "sample.psv", "three-hr-tracklets.obs"])
+    def test_matches_classify_file(self, d2, url, digest2_dir, name):
+        path = digest2_dir / "digest2" / name
+        results = json.loads(self._post(url, "/classify", path.read_bytes()))
+        expected = d2.classify_file(str(path))
+        assert [(r["designation"], r["rms"], r["noid"]) for r in results] == \
+            [(e.designation, e.rms, dict(e.noid.items())) for e in expected]
+
+    def test_concurrent_requests(self, d2, url, three_hr_tracklets_path):
+        with open(three_hr_tracklets_path, "rb") as f:
+            data = f.read()
+        replies = []
+
+        def post():
+            replies.append(self._post(url, "/classify?classes=NEO", data))
+
+        threads = [threading.Thread(target=post) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(replies) == 4
+        assert all(r == replies[0] for r in replies)
+        assert list(json.loads(replies[0])[0]["noid"]) == ["NEO"]
+
+    def test_psv_output(self, d2, url, sample_obs_path):
+        with open(sample_obs_path, "rb") as f:
+            reply = self._post(url, "/classify?output=psv&classes=NEO,MB1",
+                               f.read())
+        header, row = reply.splitlines()
+        assert header == "desig|rms|NEO|MB1"
+        expected = d2.classify_file(sample_obs_path)[0]
+        assert row.split("|")[0] == expected.designation
+        assert float(row.split("|")[2]) == round(expected.noid.NEO)
+
+    def test_bad_request(self, url, sample_obs_path):
+        with pytest.raises(urllib.error.HTTPError) as info:
+            self._post(url, "/classify?classes=XX", b"")
+        assert info.value.code == 400
+        assert "XX" in json.loads(info.value.read())["error"]
+
+    def test_malformed_xml(self, url):
+        with pytest.raises(urllib.error.HTTPError) as info:
+            self._post(url, "/classify?format=xml", b"<ades><bad")
+        assert info.value.code == 400
+        assert json.loads(info.value.read())["error"]
+
+    @pytest.mark.parametrize("length", ["abc", "-5"])
+    def test_bad_content_length(self, url, length):
+        conn = http.client.HTTPConnection(url.partition("//")[2], timeout=10)
+        conn.putrequest("POST", "/classify")
+        conn.putheader("Content-Length", length)
+        conn.endheaders()
+        response = conn.getresponse()
+        assert response.status == 400
+        assert "Content-Length" in json.loads(response.read())["error"]
+        conn.close()
+
+    def test_internal_error(self, url, monkeypatch, sample_obs_path):
+        def fail(*args):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr("digest2.server.read_tracklets", fail)
+        with open(sample_obs_path, "rb") as f:
+            with pytest.raises(urllib.error.HTTPError) as info:
+                self._post(url, "/classify", f.read())
+        assert info.value.code == 500
+        assert "boom" in json.loads(info.value.read())["error"]
+
+    def test_unix_socket(self, d2, tmp_path, sample_obs_path):
+        path = str(tmp_path / "digest2.sock")
+        server = make_server(d2, unix_socket=path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            sock = socket.socket(socket.AF_UNIX)
+            sock.connect(path)
+            conn = http.client.HTTPConnection("localhost")
+            conn.sock = sock
+            with open(sample_obs_path, "rb") as f:
+                conn.request("POST", "/classify", body=f.read())
+            results = json.loads(conn.getresponse().read())
+            conn.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        assert [r["designation"] for r in results] == ["K16S99K"]
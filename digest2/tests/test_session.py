@@ -0,0 +1,98 @@
+"""Tests for incremental re-scoring (digest2.session)."""
+
+import pytest
+
+from digest2 import IncrementalSession
+from digest2.observation import iter_mpc80_file
+
+
+class TestIncrementalSession:
+    """Test snapshot diffs and added/removed observations."""
+
+    @pytest.fixture
+    def lines(self, three_hr_tracklets_path):
+        with open(three_hr_tracklets_path) as f:
+            return f.readlines()
+
+    @pytest.fixture
+    def session(self, d2):
+        return IncrementalSession(d2, classes=["NEO", "MB1"])
+
+    def test_first_snapshot_matches_classify_file(self, d2, session,
+                                                  three_hr_tracklets_path):
+        events = session.update_file(three_hr_tracklets_path)
+        expected = d2.classify_file(three_hr_tracklets_path,
+                                    classes=["NEO", "MB1"])
+        assert [e.kind for e in events] == ["added"] * len(expected)
+        assert [e.result for e in events] == expected
+        assert list(session.results.values()) == expected
+        assert session.is_ades is False
+
+    def test_only_changes_rescored(self, d2, session, lines, tmp_path,
+                                   monkeypatch):
+        path = tmp_path / "neocp.obs"
+        path.write_text("".join(lines))
+        session.update_file(str(path))
+        first = session.results
+
+        calls = []
+        score_many = d2._score_many
+
+        def counting_score_many(batch, **kwargs):
+            calls.append(len(batch))
+            return score_many(batch, **kwargs)
+
+        monkeypatch.setattr(d2, "_score_many", counting_score_many)
+        assert session.update_file(str(path)) == []
+        assert calls == []
+
+        # Drop the last observation of the first tracklet and the whole
+        # second tracklet.
+        first_desig = lines[0][:12].strip()
+        second_desig = lines[6][:12].strip()
+        path.write_text("".join(lines[:5] + lines[12:]))
+        events = session.update_file(str(path))
+        assert calls == [1]
+        assert [(e.kind, e.designation) for e in events] == [
+            ("removed", second_desig), ("updated", first_desig)]
+        assert events[1].previous == first[first_desig]
+        assert events[1].result is not None
+        assert second_desig not in session
+        assert len(session) == len(first) - 1
+        for desig in session:
+            if desig != first_desig:
+                assert session[desig] == first[desig]
+
+    def test_apply(self, d2, session, three_hr_tracklets_path):
+        (desig, obs), = list(iter_mpc80_file(three_hr_tracklets_path))[:1]
+        events = session.apply(added={desig: obs[:1]})
+        assert [(e.kind, e.result) for e in events] == [("added", None)]
+
+        events = session.apply(added={desig: obs[1:]})
+        assert events[0].kind == "updated"
+        expected = d2.classify_tracklet(obs, classes=["NEO", "MB1"])
+        assert events[0].result.noid == expected.noid
+        assert events[0].result.designation == desig
+
+        events = session.apply(removed={desig: obs[-1:]})
+        expected = d2.classify_tracklet(obs[:-1], classes=["NEO", "MB1"])
+        assert events[0].result.noid == expected.noid
+        assert session.apply(removed={desig: obs[-1:]}) == []
+
+        events = session.apply(removed={desig: None})
+        assert [e.kind for e in events] == ["removed"]
+        assert len(session) == 0
+
+    def test_update_mapping(self, session, three_hr_tracklets_path):
+        tracklets = dict(iter_mpc80_file(three_hr_tracklets_path))
+        assert len(session.update(tracklets)) == len(tracklets)
+        assert session.update(tracklets) == []
+
+    def test_format_mismatch(self, session, three_hr_tracklets_path, tmp_path):
+        session.update_file(three_hr_tracklets_path)
+        with pytest.raises(ValueError, match="ADES"):
+            session.update_file(str(tmp_path / "neocp.psv"))
+
+    def test_unknown_class(self, d2):
+        with pytest.raises(ValueError, match="Unknown class"):
+            IncrementalSession(d2, classes=["XYZ"])